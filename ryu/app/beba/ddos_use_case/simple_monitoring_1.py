@@ -1,13 +1,13 @@
 import logging
 import selective_monitoring_1
-import math
 import time
-import csv
 from ryu.lib.packet import ether_types, in_proto
 from ryu.controller import ofp_event
 from ryu.controller.handler import MAIN_DISPATCHER, DEAD_DISPATCHER
 from ryu.controller.handler import set_ev_cls
+from ryu.lib import entropy_detector
 from ryu.lib import hub
+from ryu.lib import telemetry
 import ryu.ofproto.ofproto_v1_3 as ofproto
 import ryu.ofproto.ofproto_v1_3_parser as ofparser
 import ryu.ofproto.beba_v1_0 as bebaproto
@@ -18,28 +18,37 @@ LOG = logging.getLogger('app.beba.simple_monitoring_1')
 timewindow = 4
 precision = 3  # 1 -> small precision 68% / 2 -> medium precision 95% / 3 -> high precision 99,7%
 
+# state table -> (features, key conversion); TCP and UDP ports are also
+# counted together as 'port_src' / 'port_dst'
+table_features = {0: (('ipv4_src',), entropy_detector.ipv4_keys),
+                  1: (('ipv4_dst',), entropy_detector.ipv4_keys),
+                  2: (('port_src', 'tcp_port_src'), entropy_detector.port_keys),
+                  3: (('port_dst', 'tcp_port_dst'), entropy_detector.port_keys),
+                  4: (('port_src', 'udp_port_src'), entropy_detector.port_keys),
+                  5: (('port_dst', 'udp_port_dst'), entropy_detector.port_keys)}
+
 
 class SimpleMonitoring_1(selective_monitoring_1.BebaSelectiveMonitoring_1):
     def __init__(self, *args, **kwargs):
         super(SimpleMonitoring_1, self).__init__(*args, **kwargs)
         self.monitor_thread = hub.spawn(self._monitor)
-        self.entropy_ipsrc, self.entropy_ipdst, self.entropy_portsrc, self.entropy_portdst, self.abscisse_time = ([] for i in range(5)) # Entropy Lists
-        self.datapaths, self.ipsrc, self.ipdst, self.portsrc, self.portdst, self.tcp_portsrc, self.tcp_portdst, self.udp_portsrc, self.udp_portdst = ({} for i in range(9)) # Datapath + Features dictionaries
-        # External files to store calculated values
-        with open('entropy.csv', 'wb') as csvfile:  # Set the header and Empty the file
-            writer = csv.writer(csvfile, delimiter=',', quoting=csv.QUOTE_MINIMAL, lineterminator='\n')
-            writer.writerow(
-                ["Time (s)", " IP Src Entropy", " IP Dst Entropy", " Port Src Entropy", " Port Dst Entropy"])
-            csvfile.close()
-        with open('counters.csv', 'wb') as csvfile:
-            writer = csv.writer(csvfile, delimiter=';', quoting=csv.QUOTE_MINIMAL, lineterminator='\n')
-            writer.writerow(
-                ["Time (s)", " IPsrc", " State", " IPdst", " State", " Portsrc", " State", " Portdst", " State"])
-            csvfile.close()
-        open('counter_ip_src.csv', 'wb').close()
-        open('counter_ip_dst.csv', 'wb').close()
-        open('counter_port_src.csv', 'wb').close()
-        open('counter_port_dst.csv', 'wb').close()
+        self.datapaths = {}
+        self.abscisse_time = []
+        # Features counters are aggregated per window by the detector
+        self.detector = entropy_detector.EntropyDetector(
+            ('ipv4_src', 'ipv4_dst', 'port_src', 'port_dst',
+             'tcp_port_src', 'tcp_port_dst', 'udp_port_src', 'udp_port_dst'),
+            precision=precision, digits=5)
+        self.window = None  # Counters of the last window
+        # Entropy Lists
+        self.entropy_ipsrc = self.detector.history['ipv4_src']
+        self.entropy_ipdst = self.detector.history['ipv4_dst']
+        self.entropy_portsrc = self.detector.history['port_src']
+        self.entropy_portdst = self.detector.history['port_dst']
+        # Entropies and counters are appended to ddos-*.tlm files
+        # (CSV export: ryu telemetry-export --prefix=ddos)
+        self.telemetry = telemetry.TelemetryWriter('.', 'ddos')
+        self.telemetry.start()
         self.timer = 1
         self.replies = 0
 
@@ -64,42 +73,42 @@ class SimpleMonitoring_1(selective_monitoring_1.BebaSelectiveMonitoring_1):
             hub.sleep(timewindow)  # Wait X seconds
             self.replies = 0
 
-    def mean(self, mylist):
-        return float(sum(mylist)) / len(mylist) if len(mylist) > 0 else float('nan')
-
-    def variance(self, mylist):
-        xmean = self.mean(mylist)
-        return self.mean([(x - xmean) ** 2 for x in mylist])
-
-    def entropy(self, dictionary):
-        total_states = 0
-        entropy = 0
-        p = 0
-
-        for index in dictionary:
-            total_states += dictionary[index]
-        if (total_states != 1 and len(dictionary) != 1):  # Division by 0
-            for index in dictionary:
-                p = float(dictionary[index]) / total_states
-                entropy += (-p * math.log(p, 2)) / (math.log(len(dictionary), 2))  # Normalized entropy
-            return round(entropy, 5)
+    def counters(self, feature):
+        # (key, counter) of the last window, IPs as strings
+        keys = self.window.keys(feature)
+        if feature.startswith('ipv4'):
+            keys = [entropy_detector.ipv4_to_str(key) for key in keys]
         else:
-            return 0
+            keys = keys.tolist()
+        return zip(keys, self.window.counts(feature).tolist())
+
+    def protocols(self, feature, ports):
+        # 6 (TCP), 17 (UDP) or 0 (both as much) per port
+        tcp = self.window.lookup('tcp_' + feature, ports)
+        udp = self.window.lookup('udp_' + feature, ports)
+        protocols = []
+        for tcp_count, udp_count in zip(tcp, udp):
+            if tcp_count > udp_count:
+                protocols.append(6)
+            elif tcp_count == udp_count:
+                protocols.append(0)
+            else:
+                protocols.append(17)
+        return protocols
 
     def detection(self):
         # No threats
         attack_type = mitigation_type = i = 0
         victim_address, victim_port, attacker_address, attacker_port, proto_src, proto_dst = ([] for i in range(6))
 
-        # Entropy IP/Port DST variance calculation for the Statistic Gauss's law limits  
-        variance_entropy_ipdst = self.variance(self.entropy_ipdst[:-1])
-        variance_entropy_ipsrc = self.variance(self.entropy_ipsrc[:-1])
-        variance_entropy_portdst = self.variance(self.entropy_portdst[:-1])
+        # Entropy IP/Port DST deviations from the Statistic Gauss's law limits
+        # (normal values are in the [meanx-precision*sigma;meanx+precision*sigma] range, if NOT -> Attack!)
+        deviation_ipdst = self.detector.deviation('ipv4_dst')
+        deviation_ipsrc = self.detector.deviation('ipv4_src')
+        deviation_portdst = self.detector.deviation('port_dst')
 
-        # DDoS Detection (normal values are in the [meanx-precision*sigma;meanx+precision*sigma] range, if NOT -> Attack!)
-        if ((self.mean(self.entropy_ipdst[:-1]) - precision * (variance_entropy_ipdst ** 0.5) > self.entropy_ipdst[-1])
-            and (self.mean(self.entropy_portdst[:-1]) - precision * (variance_entropy_portdst ** 0.5) >
-                     self.entropy_portdst[-1])):
+        # DDoS Detection
+        if deviation_ipdst < 0 and deviation_portdst < 0:
 
             LOG.info('\033[91m******* (D)DoS Flooding  DETECTED *******\033[0m')
             LOG.info('\033[91m******* Time: ' + str(datetime.datetime.now().time()) + ' *******\033[0m')
@@ -107,10 +116,7 @@ class SimpleMonitoring_1(selective_monitoring_1.BebaSelectiveMonitoring_1):
             attack_type = 1
 
         # DoS ICMP FLOODING Detection
-        elif (
-            (self.mean(self.entropy_ipdst[:-1]) - precision * (variance_entropy_ipdst ** 0.5) > self.entropy_ipdst[-1])
-        and (self.mean(self.entropy_ipsrc[:-1]) - precision * (variance_entropy_ipsrc ** 0.5) > self.entropy_ipsrc[
-            -1])):
+        elif deviation_ipdst < 0 and deviation_ipsrc < 0:
 
             LOG.info('\033[91m******* DoS ICMP Flooding  DETECTED *******\033[0m')
             LOG.info('\033[91m******* Time: ' + str(datetime.datetime.now().time()) + ' *******\033[0m')
@@ -118,10 +124,7 @@ class SimpleMonitoring_1(selective_monitoring_1.BebaSelectiveMonitoring_1):
             attack_type = 3
 
         # DDoS ICMP FLOODING Detection
-        elif (
-            (self.mean(self.entropy_ipdst[:-1]) - precision * (variance_entropy_ipdst ** 0.5) > self.entropy_ipdst[-1])
-        and (self.mean(self.entropy_ipsrc[:-1]) + precision * (variance_entropy_ipsrc ** 0.5) < self.entropy_ipsrc[
-            -1])):
+        elif deviation_ipdst < 0 and deviation_ipsrc > 0:
 
             LOG.info('\033[91m******* DDoS ICMP Flooding  DETECTED *******\033[0m')
             LOG.info('\033[91m******* Time: ' + str(datetime.datetime.now().time()) + ' *******\033[0m')
@@ -129,10 +132,7 @@ class SimpleMonitoring_1(selective_monitoring_1.BebaSelectiveMonitoring_1):
             attack_type = 4
 
         # PortScan detection
-        elif (
-            (self.mean(self.entropy_ipdst[:-1]) - precision * (variance_entropy_ipdst ** 0.5) > self.entropy_ipdst[-1])
-        and (self.mean(self.entropy_portdst[:-1]) + precision * (variance_entropy_portdst ** 0.5) <
-                 self.entropy_portdst[-1])):
+        elif deviation_ipdst < 0 and deviation_portdst > 0:
 
             LOG.info('\033[91m******* PortScan  DETECTED *******\033[0m')
             LOG.info('\033[91m******* Time: ' + str(datetime.datetime.now().time()) + ' *******\033[0m')
@@ -141,33 +141,16 @@ class SimpleMonitoring_1(selective_monitoring_1.BebaSelectiveMonitoring_1):
 
         # Extract information about the attack
         if (mitigation_type != 0):
-            # Victims information:
+            # Victims information (counters greater than the mean+sigma limit):
             # IPs
-            variance_IPdst = self.variance((self.ipdst).values())
-            for index in self.ipdst:  # Store the IP values greater than the mean+sigma limit
-                if (self.mean((self.ipdst).values()) + precision * (variance_IPdst ** 0.5) < self.ipdst[index]):
-                    victim_address.append(index)
+            victim_address = [entropy_detector.ipv4_to_str(ip) for ip in
+                              self.window.outliers('ipv4_dst', precision)]
 
             # Ports
             if (attack_type == 1):  # if not a portscan attack or ICMP Flooding
-                variance_Portdst = self.variance((self.portdst).values())
-                for index in self.portdst:
-                    if (self.mean((self.portdst).values()) + precision * (variance_Portdst ** 0.5) < self.portdst[
-                        index]):
-                        victim_port.append(index)
+                victim_port = self.window.outliers('port_dst', precision).tolist()
                 # Protocols <-> Ports
-                for port in victim_port:
-                    if port in self.tcp_portdst and port in self.udp_portdst:
-                        if (self.tcp_portdst[port] > self.udp_portdst[port]):
-                            proto_dst.append(6)
-                        elif (self.tcp_portdst[port] == self.udp_portdst[port]):
-                            proto_dst.append(0)
-                        else:
-                            proto_dst.append(17)
-                    elif port in self.tcp_portdst:
-                        proto_dst.append(6)
-                    elif port in self.udp_portdst:
-                        proto_dst.append(17)
+                proto_dst = self.protocols('port_dst', victim_port)
 
             # Printing the Victims' information:
             for ip in victim_address:
@@ -175,11 +158,9 @@ class SimpleMonitoring_1(selective_monitoring_1.BebaSelectiveMonitoring_1):
             for port in victim_port:
                 LOG.info('\033[93m** Victim Portdst: %s **\033[0m', port)
 
-                # Attackers information:
-            variance_IPsrc = self.variance((self.ipsrc).values())
-            for index in self.ipsrc:  # Store the IP values that are greater than the mean+sigma limit
-                if (self.mean((self.ipsrc).values()) + precision * (variance_IPsrc ** 0.5) < self.ipsrc[index]):
-                    attacker_address.append(index)
+            # Attackers information:
+            attacker_address = [entropy_detector.ipv4_to_str(ip) for ip in
+                                self.window.outliers('ipv4_src', precision)]
             if (len(attacker_address) != 0):
                 mitigation_type = 2
 
@@ -187,24 +168,9 @@ class SimpleMonitoring_1(selective_monitoring_1.BebaSelectiveMonitoring_1):
             # if (((self.entropy_portsrc[-2]-self.entropy_portsrc[-1])<0) and (attack_type != 3 and attack_type != 4)):
             #     LOG.info('\033[91m** SPOOFED Port Src **\033[0m')
             if (attack_type != 3 and attack_type != 4):
-                variance_Portsrc = self.variance((self.portsrc).values())
-                for index in self.portsrc:  # Store the Port values that are greater than the mean+sigma limit
-                    if (self.mean((self.portsrc).values()) + precision * (variance_Portsrc ** 0.5) < self.portsrc[
-                        index]):
-                        attacker_port.append(index)
-                # Protocols <-> Ports
-                for port in attacker_port:  # For each port store also the protocol type (needed to send the OF rule)
-                    if port in self.tcp_portsrc and port in self.udp_portsrc:
-                        if (self.tcp_portsrc[port] > self.udp_portsrc[port]):
-                            proto_src.append(6)
-                        elif (self.tcp_portsrc[port] == self.udp_portsrc[port]):
-                            proto_src.append(0)
-                        else:
-                            proto_src.append(17)
-                    elif port in self.tcp_portsrc:
-                        proto_src.append(6)
-                    elif port in self.udp_portsrc:
-                        proto_src.append(17)
+                attacker_port = self.window.outliers('port_src', precision).tolist()
+                # Protocols <-> Ports (needed to send the OF rule)
+                proto_src = self.protocols('port_src', attacker_port)
 
             # Printing the Attackers' information:
             for ip in attacker_address:
@@ -213,11 +179,9 @@ class SimpleMonitoring_1(selective_monitoring_1.BebaSelectiveMonitoring_1):
                 LOG.info('\033[93m** Attacker Portsrc: %s **\033[0m', port)
 
             # Don't store the last entropy values because it was during an abnormal traffic 
-            del self.entropy_ipsrc[-1]
-            del self.entropy_ipdst[-1]
+            self.detector.discard_last(('ipv4_src', 'ipv4_dst'))
             if (attack_type != 3 and attack_type != 4):
-                del self.entropy_portsrc[-1]
-                del self.entropy_portdst[-1]
+                self.detector.discard_last(('port_src', 'port_dst'))
 
             # Mitigation process
             # Mitigation only if there is all the information needed:
@@ -320,86 +284,44 @@ class SimpleMonitoring_1(selective_monitoring_1.BebaSelectiveMonitoring_1):
             req = bebaparser.OFPExpStateStatsMultipartRequestAndDelete(datapath, table_id=table)
             datapath.send_msg(req)
 
-    def convertPort2Int(self, keys):
-        port_int = 0
-        for index in range(len(keys)):
-            port_int += keys[index] * math.pow(256, index)
-        return int(port_int)
-
     def storeInFile(self):
         # Storing the time
         self.abscisse_time.append(timewindow * self.timer)
         self.timer += 1
 
-        with open('entropy.csv', 'ab') as csvfile:
-            writer = csv.writer(csvfile, delimiter=',', quoting=csv.QUOTE_MINIMAL, lineterminator='\n')
-            writer.writerow(
-                [self.abscisse_time[-1], self.entropy_ipsrc[-1], self.entropy_ipdst[-1], self.entropy_portsrc[-1],
-                 self.entropy_portdst[-1]])
-            csvfile.close()
-
-        with open('counters.csv', 'ab') as csvfile:
-            writer = csv.writer(csvfile, delimiter=';', quoting=csv.QUOTE_MINIMAL, lineterminator='\n')
-            for index in self.ipsrc:
-                writer.writerow([self.abscisse_time[-1], index, self.ipsrc[index], None, None, None, None, None, None])
-            for index in self.ipdst:
-                writer.writerow([self.abscisse_time[-1], None, None, index, self.ipdst[index], None, None, None, None])
-            for index in self.portsrc:
-                writer.writerow(
-                    [self.abscisse_time[-1], None, None, None, None, index, self.portsrc[index], None, None])
-            for index in self.portdst:
-                writer.writerow(
-                    [self.abscisse_time[-1], None, None, None, None, None, None, index, self.portdst[index]])
-            csvfile.close()
-
-        with open('counter_ip_src.csv', 'wb') as csvfile:
-            writer = csv.writer(csvfile, delimiter=';', quoting=csv.QUOTE_MINIMAL, lineterminator='\n')
-            writer.writerow(["IP Src", " IP Src ID", " State"])
-            position_id = 1
-            for index in self.ipsrc:
-                writer.writerow([index, position_id, self.ipsrc[index]])
-                position_id += 1
-            csvfile.close()
-
-        with open('counter_ip_dst.csv', 'wb') as csvfile:
-            writer = csv.writer(csvfile, delimiter=';', quoting=csv.QUOTE_MINIMAL, lineterminator='\n')
-            writer.writerow(["IP Dst", " IP Dst ID", " State"])
-            position_id = 1
-            for index in self.ipdst:
-                writer.writerow([index, position_id, self.ipdst[index]])
-                position_id += 1
-            csvfile.close()
-
-        with open('counter_port_src.csv', 'wb') as csvfile:
-            writer = csv.writer(csvfile, delimiter=',', quoting=csv.QUOTE_MINIMAL, lineterminator='\n')
-            writer.writerow(["Port Src", " State"])
-            for index in self.portsrc:
-                writer.writerow([index, self.portsrc[index]])
-            csvfile.close()
-
-        with open('counter_port_dst.csv', 'wb') as csvfile:
-            writer = csv.writer(csvfile, delimiter=',', quoting=csv.QUOTE_MINIMAL, lineterminator='\n')
-            writer.writerow(["Port Dst", " State"])
-            for index in self.portdst:
-                writer.writerow([index, self.portdst[index]])
-            csvfile.close()
+        # Written off the event loop; the window arrays are not modified afterwards
+        self.telemetry.write('entropy', {'time': self.abscisse_time[-1],
+                                         'ip_src': self.entropy_ipsrc[-1],
+                                         'ip_dst': self.entropy_ipdst[-1],
+                                         'port_src': self.entropy_portsrc[-1],
+                                         'port_dst': self.entropy_portdst[-1]})
+        for feature, series, key in (('ipv4_src', 'ip_src', 'ipv4'),
+                                     ('ipv4_dst', 'ip_dst', 'ipv4'),
+                                     ('port_src', 'port_src', 'port'),
+                                     ('port_dst', 'port_dst', 'port')):
+            self.telemetry.write(series, {'time': self.abscisse_time[-1],
+                                          key: self.window.keys(feature),
+                                          'state': self.window.counts(feature)})
+
+    def close(self):
+        self.telemetry.stop()
 
     def printcounters(self):
         # Print the state stats of the dictionaries
-        if ((len(self.ipsrc) != 0) and (len(self.ipdst) != 0) and (len(self.portsrc) != 0) and (
-            len(self.portdst) != 0)):
+        if all(len(self.window.counts(feature)) != 0
+               for feature in ('ipv4_src', 'ipv4_dst', 'port_src', 'port_dst')):
             LOG.info('===========================================')
-            for index in self.ipsrc:
-                LOG.info('IPsrc= %s \t\tState= %s', index, self.ipsrc[index])
+            for index, state in self.counters('ipv4_src'):
+                LOG.info('IPsrc= %s \t\tState= %s', index, state)
             LOG.info(' ')
-            for index in self.ipdst:
-                LOG.info('IPdst= %s \t\tState= %s', index, self.ipdst[index])
+            for index, state in self.counters('ipv4_dst'):
+                LOG.info('IPdst= %s \t\tState= %s', index, state)
             LOG.info(' ')
-            for index in self.portsrc:
-                LOG.info('Portsrc= %d \t\t\tState= %s', index, self.portsrc[index])
+            for index, state in self.counters('port_src'):
+                LOG.info('Portsrc= %d \t\t\tState= %s', index, state)
             LOG.info(' ')
-            for index in self.portdst:
-                LOG.info('Portdst= %d \t\t\tState= %s', index, self.portdst[index])
+            for index, state in self.counters('port_dst'):
+                LOG.info('Portdst= %d \t\t\tState= %s', index, state)
         # State Stats General Parser:
         """ LOG.info('Length=%s Table ID=%s Duration_sec=%s Duration_nsec=%s Field_count=%s\n'
             'Keys:%s State=%s\n'
@@ -410,65 +332,20 @@ class SimpleMonitoring_1(selective_monitoring_1.BebaSelectiveMonitoring_1):
             LOG.info('*************************************************************') """
 
     def entropy_computation(self):
-        # Port src dictionary = TCP + UDP Port src dictionaries
-        for index in self.udp_portsrc:
-            if index in self.portsrc:  # We add the two values
-                new_port = self.portsrc[index] + self.udp_portsrc[index]
-                self.portsrc[index] = new_port
-            else:  # We create a new entry
-                self.portsrc[index] = self.udp_portsrc[index]
-        # Port dst dictionary = TCP + UDP Port dst dictionaries
-        for index in self.udp_portdst:
-            if index in self.portdst:
-                new_port = self.portdst[index] + self.udp_portdst[index]
-                self.portdst[index] = new_port
-            else:
-                self.portdst[index] = self.udp_portdst[index]
+        # Counters aggregation (Port src/dst = TCP + UDP Port src/dst) and entropy calculation:
+        self.window = self.detector.end_window()
 
         # Printing the counters:
         self.printcounters()
 
-        # Entropy calculation:
-        entropy_ip_src = self.entropy(self.ipsrc)
-        entropy_ip_dst = self.entropy(self.ipdst)
-        entropy_port_src = self.entropy(self.portsrc)
-        entropy_port_dst = self.entropy(self.portdst)
-
-        # Storing entropies in lists:
-        self.entropy_ipsrc.append(entropy_ip_src)
-        self.entropy_ipdst.append(entropy_ip_dst)
-        self.entropy_portsrc.append(entropy_port_src)
-        self.entropy_portdst.append(entropy_port_dst)
-
         # Storing the Counters + Entropies in an output file:
         self.storeInFile()
 
-        # Printing the entropies:
-        # LOG.info('===========================================')
-        # LOG.info('Entropy IP Src')
-        # LOG.info(self.entropy_ipsrc)
-        # LOG.info('Entropy IP Dst')
-        # LOG.info(self.entropy_ipdst)
-        # LOG.info('Entropy Port Src')
-        # LOG.info(self.entropy_portsrc)
-        # LOG.info('Entropy Port Dst')
-        # LOG.info(self.entropy_portdst)
-
         # Detection process
         if ((len(self.entropy_ipsrc) > int(20 / timewindow)) and sum(
                 self.entropy_ipsrc) > 1):  # Wait 20s before starting the detection, we need at least 2 elements in entropy lists
             self.detection()
 
-        # Emptying dictionaries
-        self.ipsrc.clear()
-        self.ipdst.clear()
-        self.portsrc.clear()
-        self.portdst.clear()
-        self.tcp_portsrc.clear()
-        self.tcp_portdst.clear()
-        self.udp_portsrc.clear()
-        self.udp_portdst.clear()
-
     @set_ev_cls(ofp_event.EventOFPExperimenterStatsReply, MAIN_DISPATCHER)
     def _state_stats_reply_handler(self, ev):
         msg = ev.msg
@@ -476,40 +353,18 @@ class SimpleMonitoring_1(selective_monitoring_1.BebaSelectiveMonitoring_1):
         # Retreive and store states stats information 
         if (msg.body.experimenter == 0XBEBABEBA):
             if (msg.body.exp_type == bebaproto.OFPMP_EXP_STATE_STATS_AND_DELETE):
-                data = msg.body.data
-                state_stats_list = bebaparser.OFPStateStats.parser(data, 0)
-                if (state_stats_list != 0):
-                    self.replies += 1
-                    for index in range(len(state_stats_list)):
-                        if (state_stats_list[index].entry.state != 0):
-
-                            if (int(state_stats_list[index].table_id) == 0):  # IP src dictionary
-                                self.ipsrc[(str(state_stats_list[index].entry.key)[1:-1]).replace(", ", ".")] = \
-                                state_stats_list[index].entry.state
-
-                            elif (int(state_stats_list[index].table_id) == 1):  # IP dst dictionary
-                                self.ipdst[(str(state_stats_list[index].entry.key)[1:-1]).replace(", ", ".")] = \
-                                state_stats_list[index].entry.state
-
-                            elif (int(state_stats_list[index].table_id) == 2):  # TCP Port src + Port src dictionaries
-                                portsrc = self.convertPort2Int(state_stats_list[index].entry.key)
-                                self.portsrc[portsrc] = state_stats_list[index].entry.state
-                                self.tcp_portsrc[portsrc] = state_stats_list[index].entry.state
-
-                            elif (int(state_stats_list[index].table_id) == 3):  # TCP Port dst + Port dst dictionaries
-                                portdst = self.convertPort2Int(state_stats_list[index].entry.key)
-                                self.portdst[portdst] = state_stats_list[index].entry.state
-                                self.tcp_portdst[portdst] = state_stats_list[index].entry.state
-
-                            elif (int(state_stats_list[index].table_id) == 4):  # UDP Port src dictionary
-                                portsrc = self.convertPort2Int(state_stats_list[index].entry.key)
-                                self.udp_portsrc[portsrc] = state_stats_list[index].entry.state
-
-                            elif (int(state_stats_list[index].table_id) == 5):  # UDP Port dst dictionary
-                                portdst = self.convertPort2Int(state_stats_list[index].entry.key)
-                                self.udp_portdst[portdst] = state_stats_list[index].entry.state
-                else:
-                    LOG.info("No data")
+                # Parsed in bulk: one record array per reply, no object per state entry
+                records = entropy_detector.parse_state_stats(msg.body.data)
+                self.replies += 1
+                for table_id in set(records['table_id'].tolist()):
+                    if table_id not in table_features:
+                        continue
+                    features, convert = table_features[table_id]
+                    table_records = records[records['table_id'] == table_id]
+                    keys = convert(table_records)
+                    for feature in features:
+                        self.detector.add(feature, keys, table_records['state'])
         if (self.replies == 6):  # If we have all the replies
-            if (len(self.ipsrc) != 0):  # if counters are != 0
+            if (self.detector.pending('ipv4_src') != 0):  # if counters are != 0
                 self.entropy_computation()
+            # Otherwise the counters are kept for the next window
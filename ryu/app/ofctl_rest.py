@@ -30,6 +30,7 @@ from ryu.ofproto import ofproto_v1_3
 from ryu.lib import ofctl_v1_0
 from ryu.lib import ofctl_v1_2
 from ryu.lib import ofctl_v1_3
+from ryu.lib import stats_cache
 from ryu.app.wsgi import ControllerBase, WSGIApplication
 
 
@@ -42,6 +43,12 @@ supported_ofctl = {
     ofproto_v1_3.OFP_VERSION: ofctl_v1_3,
 }
 
+# stats cache entries dropped by modifications through this API
+_FLOW_STATS = ('flow', 'aggregate_flow', 'table')
+_METER_STATS = ('meter_config', 'meter')
+_GROUP_STATS = ('group_desc', 'group')
+_PORT_STATS = ('port_desc', 'port')
+
 # REST API
 #
 
@@ -100,6 +107,15 @@ supported_ofctl = {
 #
 # get ports description of the switch
 # GET /stats/portdesc/<dpid>
+#
+# get hit/miss counters of the stats cache
+# GET /stats/cache
+#
+#  Note: Stats replies are cached for --stats-cache-ttl seconds
+#        (descriptions and features for 60 seconds), and concurrent
+#        identical requests share one request to the switch.
+#        The cache of a switch is dropped when it is modified through
+#        this API.
 
 # Update the switch stats
 #
@@ -152,12 +168,17 @@ class StatsController(ControllerBase):
         super(StatsController, self).__init__(req, link, data, **config)
         self.dpset = data['dpset']
         self.waiters = data['waiters']
+        self.stats_cache = data['stats_cache']
 
     def get_dpids(self, req, **_kwargs):
         dps = list(self.dpset.dps.keys())
         body = json.dumps(dps)
         return Response(content_type='application/json', body=body)
 
+    def get_cache_stats(self, req, **_kwargs):
+        body = json.dumps(self.stats_cache.metrics())
+        return Response(content_type='application/json', body=body)
+
     def get_desc_stats(self, req, dpid, **_kwargs):
 
         if type(dpid) == str and not dpid.isdigit():
@@ -172,7 +193,8 @@ class StatsController(ControllerBase):
 
         _ofctl = supported_ofctl.get(_ofp_version, None)
         if _ofctl is not None:
-            desc = _ofctl.get_desc_stats(dp, self.waiters)
+            desc = self.stats_cache.get(dp, 'desc', _ofctl.get_desc_stats,
+                                        self.waiters)
 
         else:
             LOG.debug('Unsupported OF protocol')
@@ -208,7 +230,8 @@ class StatsController(ControllerBase):
 
         _ofctl = supported_ofctl.get(_ofp_version, None)
         if _ofctl is not None:
-            flows = _ofctl.get_flow_stats(dp, self.waiters, flow)
+            flows = self.stats_cache.get(dp, 'flow', _ofctl.get_flow_stats,
+                                         self.waiters, flow)
 
         else:
             LOG.debug('Unsupported OF protocol')
@@ -243,7 +266,9 @@ class StatsController(ControllerBase):
 
         _ofctl = supported_ofctl.get(_ofp_version, None)
         if _ofctl is not None:
-            flows = _ofctl.get_aggregate_flow_stats(dp, self.waiters, flow)
+            flows = self.stats_cache.get(
+                dp, 'aggregate_flow', _ofctl.get_aggregate_flow_stats,
+                self.waiters, flow)
 
         else:
             LOG.debug('Unsupported OF protocol')
@@ -267,7 +292,8 @@ class StatsController(ControllerBase):
 
         _ofctl = supported_ofctl.get(_ofp_version, None)
         if _ofctl is not None:
-            ports = _ofctl.get_table_stats(dp, self.waiters)
+            ports = self.stats_cache.get(dp, 'table', _ofctl.get_table_stats,
+                                         self.waiters)
 
         else:
             LOG.debug('Unsupported OF protocol')
@@ -291,7 +317,9 @@ class StatsController(ControllerBase):
 
         _ofctl = supported_ofctl.get(_ofp_version, None)
         if _ofctl is not None:
-            ports = _ofctl.get_table_features(dp, self.waiters)
+            ports = self.stats_cache.get(
+                dp, 'table_features', _ofctl.get_table_features,
+                self.waiters)
 
         else:
             LOG.debug('Unsupported OF protocol')
@@ -315,7 +343,8 @@ class StatsController(ControllerBase):
 
         _ofctl = supported_ofctl.get(_ofp_version, None)
         if _ofctl is not None:
-            ports = _ofctl.get_port_stats(dp, self.waiters)
+            ports = self.stats_cache.get(dp, 'port', _ofctl.get_port_stats,
+                                         self.waiters)
 
         else:
             LOG.debug('Unsupported OF protocol')
@@ -339,7 +368,8 @@ class StatsController(ControllerBase):
 
         _ofctl = supported_ofctl.get(_ofp_version, None)
         if _ofctl is not None:
-            queues = _ofctl.get_queue_stats(dp, self.waiters)
+            queues = self.stats_cache.get(dp, 'queue', _ofctl.get_queue_stats,
+                                          self.waiters)
 
         else:
             LOG.debug('Unsupported OF protocol')
@@ -392,7 +422,9 @@ class StatsController(ControllerBase):
         _ofctl = supported_ofctl.get(_ofp_version, None)
 
         if _ofctl is not None and hasattr(_ofctl, 'get_meter_features'):
-            meters = _ofctl.get_meter_features(dp, self.waiters)
+            meters = self.stats_cache.get(
+                dp, 'meter_features', _ofctl.get_meter_features,
+                self.waiters)
 
         else:
             LOG.debug('Unsupported OF protocol or \
@@ -417,7 +449,9 @@ class StatsController(ControllerBase):
         _ofctl = supported_ofctl.get(_ofp_version, None)
 
         if _ofctl is not None and hasattr(_ofctl, 'get_meter_config'):
-            meters = _ofctl.get_meter_config(dp, self.waiters)
+            meters = self.stats_cache.get(
+                dp, 'meter_config', _ofctl.get_meter_config,
+                self.waiters)
 
         else:
             LOG.debug('Unsupported OF protocol or \
@@ -442,7 +476,8 @@ class StatsController(ControllerBase):
         _ofctl = supported_ofctl.get(_ofp_version, None)
 
         if _ofctl is not None and hasattr(_ofctl, 'get_meter_stats'):
-            meters = _ofctl.get_meter_stats(dp, self.waiters)
+            meters = self.stats_cache.get(dp, 'meter', _ofctl.get_meter_stats,
+                                          self.waiters)
 
         else:
             LOG.debug('Unsupported OF protocol or \
@@ -467,7 +502,9 @@ class StatsController(ControllerBase):
         _ofctl = supported_ofctl.get(_ofp_version, None)
 
         if _ofctl is not None and hasattr(_ofctl, 'get_group_features'):
-            groups = _ofctl.get_group_features(dp, self.waiters)
+            groups = self.stats_cache.get(
+                dp, 'group_features', _ofctl.get_group_features,
+                self.waiters)
 
         else:
             LOG.debug('Unsupported OF protocol or \
@@ -492,7 +529,9 @@ class StatsController(ControllerBase):
         _ofctl = supported_ofctl.get(_ofp_version, None)
 
         if _ofctl is not None and hasattr(_ofctl, 'get_group_desc'):
-            groups = _ofctl.get_group_desc(dp, self.waiters)
+            groups = self.stats_cache.get(
+                dp, 'group_desc', _ofctl.get_group_desc,
+                self.waiters)
 
         else:
             LOG.debug('Unsupported OF protocol or \
@@ -517,7 +556,8 @@ class StatsController(ControllerBase):
         _ofctl = supported_ofctl.get(_ofp_version, None)
 
         if _ofctl is not None and hasattr(_ofctl, 'get_group_stats'):
-            groups = _ofctl.get_group_stats(dp, self.waiters)
+            groups = self.stats_cache.get(dp, 'group', _ofctl.get_group_stats,
+                                          self.waiters)
 
         else:
             LOG.debug('Unsupported OF protocol or \
@@ -542,7 +582,9 @@ class StatsController(ControllerBase):
 
         _ofctl = supported_ofctl.get(_ofp_version, None)
         if _ofctl is not None:
-            groups = _ofctl.get_port_desc(dp, self.waiters)
+            groups = self.stats_cache.get(
+                dp, 'port_desc', _ofctl.get_port_desc,
+                self.waiters)
 
         else:
             LOG.debug('Unsupported OF protocol')
@@ -588,6 +630,7 @@ class StatsController(ControllerBase):
         _ofctl = supported_ofctl.get(_ofp_version, None)
         if _ofctl is not None:
             _ofctl.mod_flow_entry(dp, flow, cmd)
+            self.stats_cache.invalidate(dp.id, _FLOW_STATS)
         else:
             LOG.debug('Unsupported OF protocol')
             return Response(status=501)
@@ -615,6 +658,7 @@ class StatsController(ControllerBase):
         _ofctl = supported_ofctl.get(_ofp_version, None)
         if _ofctl is not None:
             _ofctl.mod_flow_entry(dp, flow, dp.ofproto.OFPFC_DELETE)
+            self.stats_cache.invalidate(dp.id, _FLOW_STATS)
 
         else:
             LOG.debug('Unsupported OF protocol')
@@ -656,6 +700,7 @@ class StatsController(ControllerBase):
 
         if _ofctl is not None and hasattr(_ofctl, 'mod_meter_entry'):
             _ofctl.mod_meter_entry(dp, flow, cmd)
+            self.stats_cache.invalidate(dp.id, _METER_STATS)
 
         else:
             LOG.debug('Unsupported OF protocol or \
@@ -698,6 +743,7 @@ class StatsController(ControllerBase):
 
         if _ofctl is not None and hasattr(_ofctl, 'mod_group_entry'):
             _ofctl.mod_group_entry(dp, group, cmd)
+            self.stats_cache.invalidate(dp.id, _GROUP_STATS)
 
         else:
             LOG.debug('Unsupported OF protocol or \
@@ -747,6 +793,7 @@ class StatsController(ControllerBase):
         _ofctl = supported_ofctl.get(_ofp_version, None)
         if _ofctl is not None:
             _ofctl.mod_port_behavior(dp, port_config)
+            self.stats_cache.invalidate(dp.id, _PORT_STATS)
 
         else:
             LOG.debug('Unsupported OF protocol')
@@ -802,6 +849,8 @@ class RestStatsApi(app_manager.RyuApp):
         self.data = {}
         self.data['dpset'] = self.dpset
         self.data['waiters'] = self.waiters
+        self.stats_cache = stats_cache.StatsCache()
+        self.data['stats_cache'] = self.stats_cache
         mapper = wsgi.mapper
 
         wsgi.registory['StatsController'] = self.data
@@ -811,6 +860,11 @@ class RestStatsApi(app_manager.RyuApp):
                        controller=StatsController, action='get_dpids',
                        conditions=dict(method=['GET']))
 
+        uri = path + '/cache'
+        mapper.connect('stats', uri,
+                       controller=StatsController, action='get_cache_stats',
+                       conditions=dict(method=['GET']))
+
         uri = path + '/desc/{dpid}'
         mapper.connect('stats', uri,
                        controller=StatsController, action='get_desc_stats',
@@ -972,3 +1026,8 @@ class RestStatsApi(app_manager.RyuApp):
 
         del self.waiters[dp.id][msg.xid]
         lock.set()
+
+    @set_ev_cls(dpset.EventDP, dpset.DPSET_EV_DISPATCHER)
+    def handler_datapath(self, ev):
+        if not ev.enter:
+            self.stats_cache.invalidate(ev.dp.id)
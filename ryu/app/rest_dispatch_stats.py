@@ -0,0 +1,86 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+from webob import Response
+
+from ryu.app.wsgi import ControllerBase, WSGIApplication, route
+from ryu.base import app_manager
+from ryu.lib import dispatch_stats
+
+# REST API of the event dispatch statistics
+#
+# get the statistics of the handlers and the datapaths
+# GET /v1.0/dispatch/stats
+#
+# reset the statistics
+# DELETE /v1.0/dispatch/stats
+#
+# enable or disable the statistics, and set the sampling
+# PUT /v1.0/dispatch/stats
+#
+# request body format:
+#  {"enabled": <true or false>,
+#   "sample": <time one handler call out of N>}
+
+
+class DispatchStatsAPI(app_manager.RyuApp):
+    _CONTEXTS = {
+        'wsgi': WSGIApplication
+    }
+
+    def __init__(self, *args, **kwargs):
+        super(DispatchStatsAPI, self).__init__(*args, **kwargs)
+
+        wsgi = kwargs['wsgi']
+        wsgi.register(DispatchStatsController,
+                      {'dispatch_stats': dispatch_stats.STATS})
+
+
+class DispatchStatsController(ControllerBase):
+    def __init__(self, req, link, data, **config):
+        super(DispatchStatsController, self).__init__(req, link, data,
+                                                      **config)
+        self.stats = data['dispatch_stats']
+
+    def _snapshot(self):
+        body = json.dumps(self.stats.snapshot())
+        return Response(content_type='application/json', charset='utf-8',
+                        body=body)
+
+    @route('dispatch', '/v1.0/dispatch/stats', methods=['GET'])
+    def get_stats(self, req, **_kwargs):
+        return self._snapshot()
+
+    @route('dispatch', '/v1.0/dispatch/stats', methods=['DELETE'])
+    def reset_stats(self, req, **_kwargs):
+        self.stats.reset()
+        return self._snapshot()
+
+    @route('dispatch', '/v1.0/dispatch/stats', methods=['PUT'])
+    def set_stats(self, req, **_kwargs):
+        try:
+            body = json.loads(req.body)
+            enabled = body.get('enabled', self.stats.enabled)
+            sample = body.get('sample')
+            if sample is not None:
+                sample = int(sample)
+        except (ValueError, TypeError, AttributeError):
+            return Response(status=400)
+        if enabled:
+            self.stats.enable(sample)
+        else:
+            self.stats.disable()
+            if sample is not None:
+                self.stats.sample = max(1, sample)
+        return self._snapshot()
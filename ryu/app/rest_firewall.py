@@ -16,16 +16,22 @@
 
 import logging
 import json
+import struct
+
+import six
 
 from webob import Response
 
 from ryu.app.wsgi import ControllerBase
 from ryu.app.wsgi import WSGIApplication
+from ryu.app.wsgi import load_json_records
 from ryu.base import app_manager
 from ryu.controller import ofp_event
 from ryu.controller import dpset
 from ryu.controller.handler import MAIN_DISPATCHER
 from ryu.controller.handler import set_ev_cls
+from ryu.exception import OFPRequestError
+from ryu.exception import OFPRequestTimeout
 from ryu.exception import OFPUnknownVersion
 from ryu.lib import mac
 from ryu.lib import dpid as dpid_lib
@@ -139,6 +145,26 @@ from ryu.ofproto import ofproto_v1_3_parser
 #     <field>  : <value>
 #    "rule_id" : "<int>" or "all"
 #
+#
+# set many rules to the firewall switches at once
+# * for no vlan
+# POST /firewall/rules/bulk/{switch-id}
+#
+# * for specific vlan group
+# POST /firewall/rules/bulk/{switch-id}/{vlan-id}
+#
+#  request body format:
+#   a JSON array of rules, or one rule per line (NDJSON)
+#   [{"<field1>":"<value1>",...}, {"<field1>":"<value1>",...},...]
+#
+#   Note: The result of each rule refers to its position in the
+#         request by "index".  Invalid rules are reported and skipped.
+#
+#
+# reload the rules of the firewall switches from their flow tables
+# (the rules are normally served from the controller's copy)
+# PUT /firewall/rules/reconcile/{switch-id}
+#
 
 
 SWITCHID_PATTERN = dpid_lib.DPID_PATTERN + r'|all'
@@ -259,6 +285,28 @@ class RestFirewallAPI(app_manager.RyuApp):
                        conditions=dict(method=['PUT']),
                        requirements=requirements)
 
+        # for the rule table
+        uri = path + '/rules/reconcile/{switchid}'
+        mapper.connect('firewall', uri,
+                       controller=FirewallController,
+                       action='reconcile_rules',
+                       conditions=dict(method=['PUT']),
+                       requirements=requirements)
+
+        # for bulk rule installation
+        uri = path + '/rules/bulk/{switchid}'
+        mapper.connect('firewall', uri,
+                       controller=FirewallController, action='set_rules',
+                       conditions=dict(method=['POST']),
+                       requirements=requirements)
+
+        uri += '/{vlanid}'
+        mapper.connect('firewall', uri,
+                       controller=FirewallController,
+                       action='set_vlan_rules',
+                       conditions=dict(method=['POST']),
+                       requirements=requirements)
+
         # for no VLAN data
         uri = path + '/rules/{switchid}'
         mapper.connect('firewall', uri,
@@ -337,6 +385,14 @@ class RestFirewallAPI(app_manager.RyuApp):
     def packet_in_handler(self, ev):
         FirewallController.packet_in_handler(ev.msg)
 
+    @set_ev_cls(ofp_event.EventOFPFlowRemoved, MAIN_DISPATCHER)
+    def flow_removed_handler(self, ev):
+        FirewallController.flow_removed_handler(ev.msg)
+
+    @set_ev_cls(ofp_event.EventOFPErrorMsg, MAIN_DISPATCHER)
+    def error_msg_handler(self, ev):
+        FirewallController.error_msg_handler(ev.msg)
+
 
 class FirewallOfsList(dict):
     def __init__(self):
@@ -451,6 +507,11 @@ class FirewallController(ControllerBase):
         body = json.dumps(msgs)
         return Response(content_type='application/json', body=body)
 
+    # PUT /firewall/rules/reconcile/{switchid}
+    def reconcile_rules(self, dummy, switchid, **_kwargs):
+        return self._access_module(switchid, 'reconcile_rules',
+                                   waiters=self.waiters)
+
     # GET /firewall/rules/{switchid}
     def get_rules(self, req, switchid, **_kwargs):
         return self._get_rules(switchid)
@@ -467,6 +528,14 @@ class FirewallController(ControllerBase):
     def set_vlan_rule(self, req, switchid, vlanid, **_kwargs):
         return self._set_rule(req, switchid, vlan_id=vlanid)
 
+    # POST /firewall/rules/bulk/{switchid}
+    def set_rules(self, req, switchid, **_kwargs):
+        return self._set_rules(req, switchid)
+
+    # POST /firewall/rules/bulk/{switchid}/{vlanid}
+    def set_vlan_rules(self, req, switchid, vlanid, **_kwargs):
+        return self._set_rules(req, switchid, vlan_id=vlanid)
+
     # DELETE /firewall/rules/{switchid}
     def delete_rule(self, req, switchid, **_kwargs):
         return self._delete_rule(req, switchid)
@@ -514,6 +583,30 @@ class FirewallController(ControllerBase):
         body = json.dumps(msgs)
         return Response(content_type='application/json', body=body)
 
+    def _set_rules(self, req, switchid, vlan_id=VLANID_NONE):
+        try:
+            rules = load_json_records(req.body)
+        except ValueError as message:
+            FirewallController._LOGGER.debug('invalid syntax %s', message)
+            return Response(status=400, body=str(message))
+
+        try:
+            dps = self._OFS_LIST.get_ofs(switchid)
+            vid = FirewallController._conv_toint_vlanid(vlan_id)
+        except ValueError as message:
+            return Response(status=400, body=str(message))
+
+        msgs = []
+        for f_ofs in dps.values():
+            # each switch gets its own copy, as the rules are modified.
+            msg = f_ofs.set_rules([dict(rule) if isinstance(rule, dict)
+                                   else rule for rule in rules],
+                                  self.waiters, vid)
+            msgs.append(msg)
+
+        body = json.dumps(msgs)
+        return Response(content_type='application/json', body=body)
+
     def _delete_rule(self, req, switchid, vlan_id=VLANID_NONE):
         try:
             ruleid = json.loads(req.body)
@@ -556,6 +649,92 @@ class FirewallController(ControllerBase):
         FirewallController._LOGGER.info('dpid=%s: Blocked packet = %s',
                                         dpid_str, pkt)
 
+    @staticmethod
+    def flow_removed_handler(msg):
+        f_ofs = FirewallController._OFS_LIST.get(msg.datapath.id)
+        if f_ofs is not None:
+            f_ofs.flow_removed(msg.cookie)
+
+    @staticmethod
+    def error_msg_handler(msg):
+        f_ofs = FirewallController._OFS_LIST.get(msg.datapath.id)
+        if (f_ofs is not None and
+                msg.type == msg.datapath.ofproto.OFPET_FLOW_MOD_FAILED):
+            f_ofs.flow_mod_failed(msg.data)
+
+
+class FirewallRule(object):
+    """ An ACL rule installed by the firewall. """
+
+    def __init__(self, cookie, priority, match, allow, rest):
+        self.cookie = cookie
+        self.priority = priority
+        # match in the format of ryu.lib.ofctl_v1_*, for FlowMods.
+        self.match = match
+        self.allow = allow
+        # representation returned by GET /firewall/rules.
+        self.rest = rest
+
+    @property
+    def vlan_id(self):
+        return self.cookie >> COOKIE_SHIFT_VLANID
+
+    @property
+    def rule_id(self):
+        return Firewall._cookie_to_ruleid(self.cookie)
+
+
+class FirewallRuleTable(object):
+    """
+    Controller side copy of the ACL rules of a switch, indexed by
+    cookie, VLAN ID and rule ID.
+    """
+
+    def __init__(self):
+        super(FirewallRuleTable, self).__init__()
+        self.rules = {}
+        self.vlans = {}
+        self.rule_ids = {}
+
+    def __len__(self):
+        return len(self.rules)
+
+    def __contains__(self, cookie):
+        return cookie in self.rules
+
+    def add(self, rule):
+        self.remove(rule.cookie)
+        self.rules[rule.cookie] = rule
+        self.vlans.setdefault(rule.vlan_id, {})[rule.cookie] = rule
+        self.rule_ids.setdefault(rule.rule_id, {})[rule.cookie] = rule
+
+    def remove(self, cookie):
+        rule = self.rules.pop(cookie, None)
+        if rule is None:
+            return None
+        for index, key in ((self.vlans, rule.vlan_id),
+                           (self.rule_ids, rule.rule_id)):
+            rules = index[key]
+            del rules[cookie]
+            if not rules:
+                del index[key]
+        return rule
+
+    def clear(self):
+        self.rules.clear()
+        self.vlans.clear()
+        self.rule_ids.clear()
+
+    def find(self, vlan_id=REST_ALL, rule_id=REST_ALL):
+        if rule_id != REST_ALL:
+            rules = self.rule_ids.get(rule_id, {})
+        elif vlan_id != REST_ALL:
+            rules = self.vlans.get(vlan_id, {})
+        else:
+            rules = self.rules
+        return [rule for rule in rules.values()
+                if vlan_id == REST_ALL or rule.vlan_id == vlan_id]
+
 
 class Firewall(object):
 
@@ -575,11 +754,89 @@ class Firewall(object):
 
         self.ofctl = self._OFCTL[version]
 
+        # ACL rules are served from this table instead of dumping the
+        # flow table of the switch.  It is filled from the switch once
+        # (see reconcile()) and then kept up to date by the FlowMods we
+        # send, Flow Removed messages and FlowMod errors.
+        self.rules = FirewallRuleTable()
+        self.synced = False
+        self.log_enabled = None
+
     def _update_vlan_list(self, vlan_list):
-        for vlan_id in self.vlan_list.keys():
+        for vlan_id in list(self.vlan_list.keys()):
             if vlan_id is not VLANID_NONE and vlan_id not in vlan_list:
                 del self.vlan_list[vlan_id]
 
+    def _sync(self, waiters):
+        if not self.synced:
+            self.reconcile(waiters)
+
+    def _send_flow_mods(self, flows, cmd):
+        self._send_msgs([self.ofctl.to_flow_mod(self.dp, flow, cmd)
+                         for flow in flows])
+
+    def _send_msgs(self, msgs):
+        try:
+            self.dp.send_msgs_and_wait(msgs)
+        except (OFPRequestTimeout, OFPRequestError) as e:
+            FirewallController._LOGGER.warning(
+                'dpid=%s: %s', dpid_lib.dpid_to_str(self.dp.id), e)
+
+    def _new_rule(self, cookie, priority, match, allow, flow_mod):
+        of_match = self.ofctl.match_to_str(flow_mod.match)
+        rule = {REST_RULE_ID: Firewall._cookie_to_ruleid(cookie),
+                REST_PRIORITY: priority}
+        rule.update(Match.to_rest({REST_MATCH: of_match}))
+        rule[REST_ACTION] = REST_ACTION_ALLOW if allow else REST_ACTION_DENY
+        return FirewallRule(cookie, priority, match, allow, rule)
+
+    def reconcile(self, waiters):
+        """ Rebuild the rule table from the flow table of the switch. """
+        msgs = self.ofctl.get_flow_stats(self.dp, waiters)
+
+        self.rules.clear()
+        action_allow = ['OUTPUT:%d' % self.dp.ofproto.OFPP_NORMAL]
+        for flow_stat in msgs.get(str(self.dp.id), []):
+            priority = flow_stat[REST_PRIORITY]
+            if (priority == STATUS_FLOW_PRIORITY
+                    or priority == ARP_FLOW_PRIORITY
+                    or priority == LOG_FLOW_PRIORITY):
+                continue
+            cookie = flow_stat[REST_COOKIE]
+            match = Match.to_mod_openflow(flow_stat[REST_MATCH])
+            allow = flow_stat[REST_ACTION] == action_allow
+            self.rules.add(FirewallRule(cookie, priority, match, allow,
+                                        self._to_rest_rule(flow_stat)))
+
+            # do not hand out rule IDs which are still in use.
+            vid = cookie >> COOKIE_SHIFT_VLANID
+            rule_id = Firewall._cookie_to_ruleid(cookie)
+            if self.vlan_list.get(vid, 0) < rule_id:
+                self.vlan_list[vid] = rule_id
+        self.synced = True
+
+    def flow_removed(self, cookie):
+        self.rules.remove(cookie)
+
+    def flow_mod_failed(self, data):
+        ofproto = self.dp.ofproto
+        if ofproto.OFP_VERSION == ofproto_v1_0.OFP_VERSION:
+            offset = ofproto.OFP_HEADER_SIZE + ofproto.OFP_MATCH_SIZE
+            fmt = '!QH'
+        else:
+            # cookie, cookie_mask, table_id and command
+            offset = ofproto.OFP_HEADER_SIZE
+            fmt = '!Q8xxB'
+        if (len(data) < offset + struct.calcsize(fmt) or
+                six.indexbytes(data, 1) != ofproto.OFPT_FLOW_MOD):
+            return
+        cookie, command = struct.unpack_from(fmt, data, offset)
+        if command == ofproto.OFPFC_ADD and self.rules.remove(cookie):
+            FirewallController._LOGGER.info(
+                'dpid=%s: Rule rejected by the switch. : rule_id=%d',
+                dpid_lib.dpid_to_str(self.dp.id),
+                Firewall._cookie_to_ruleid(cookie))
+
     def _get_cookie(self, vlan_id):
         if vlan_id == REST_ALL:
             vlan_ids = self.vlan_list.keys()
@@ -669,6 +926,13 @@ class Firewall(object):
 
         return REST_LOG_STATUS, status
 
+    @rest_command
+    def reconcile_rules(self, waiters):
+        self.reconcile(waiters)
+        msg = {'result': 'success',
+               'details': 'Rules reconciled. : %d rules' % len(self.rules)}
+        return REST_COMMAND_RESULT, msg
+
     @rest_command
     def set_log_disable(self, waiters=None):
         return self._set_log_status(False, waiters)
@@ -687,31 +951,23 @@ class Firewall(object):
             details = 'Log collection stopped.'
 
         cmd = self.dp.ofproto.OFPFC_ADD
+        flows = [self._to_of_flow(cookie=0, priority=LOG_FLOW_PRIORITY,
+                                  match={}, actions=actions)]
 
         if waiters:
-            msgs = self.ofctl.get_flow_stats(self.dp, waiters)
-
-            if str(self.dp.id) in msgs:
-                flow_stats = msgs[str(self.dp.id)]
-                for flow_stat in flow_stats:
-                    priority = flow_stat[REST_PRIORITY]
-                    if (priority == STATUS_FLOW_PRIORITY
-                            or priority == ARP_FLOW_PRIORITY):
-                        continue
-                    action = flow_stat[REST_ACTION]
-                    if action == ['OUTPUT:%d' % self.dp.ofproto.OFPP_NORMAL]:
-                        continue
-
-                    cookie = flow_stat[REST_COOKIE]
-                    match = Match.to_mod_openflow(flow_stat[REST_MATCH])
-                    flow = self._to_of_flow(cookie=cookie, priority=priority,
-                                            match=match, actions=actions)
-                    self.ofctl.mod_flow_entry(self.dp, flow, cmd)
+            # update the actions of every DENY rule as well.
+            self._sync(waiters)
+            for rule in self.rules.find():
+                if not rule.allow:
+                    flows.append(self._to_of_flow(
+                        cookie=rule.cookie, priority=rule.priority,
+                        match=rule.match, actions=actions,
+                        flags=self.dp.ofproto.OFPFF_SEND_FLOW_REM))
+            self._send_flow_mods(flows, cmd)
         else:
             # Initialize.
-            flow = self._to_of_flow(cookie=0, priority=LOG_FLOW_PRIORITY,
-                                    match={}, actions=actions)
-            self.ofctl.mod_flow_entry(self.dp, flow, cmd)
+            self.ofctl.mod_flow_entry(self.dp, flows[0], cmd)
+        self.log_enabled = is_enable
 
         msg = {'result': 'success',
                'details': details}
@@ -731,6 +987,7 @@ class Firewall(object):
 
     @rest_command
     def set_rule(self, rest, waiters, vlan_id):
+        self._sync(waiters)
         msgs = []
         cookie_list = self._get_cookie(vlan_id)
         for cookie, vid in cookie_list:
@@ -738,7 +995,53 @@ class Firewall(object):
             msgs.append(msg)
         return REST_COMMAND_RESULT, msgs
 
+    @rest_command
+    def set_rules(self, rests, waiters, vlan_id):
+        self._sync(waiters)
+        msgs = []
+        flow_mods = []
+        for index, rest in enumerate(rests):
+            try:
+                if not isinstance(rest, dict):
+                    raise ValueError('Invalid rule format.')
+                rule_msgs = []
+                rule_flow_mods = []
+                for cookie, vid in self._get_cookie(vlan_id):
+                    flow_mod, rule = self._to_flow_mod(cookie, rest,
+                                                       waiters, vid)
+                    rule_flow_mods.append((flow_mod, rule))
+                    rule_msgs.append(self._rule_added_msg(rule, index))
+            except ValueError as message:
+                msgs.append({'index': index, 'result': 'failure',
+                             'details': str(message)})
+                continue
+            flow_mods.extend(rule_flow_mods)
+            msgs.extend(rule_msgs)
+
+        # register the rules first, so that errors reported by the
+        # switch can withdraw them.
+        for _flow_mod, rule in flow_mods:
+            self.rules.add(rule)
+        self._send_msgs([flow_mod for flow_mod, _rule in flow_mods])
+        return REST_COMMAND_RESULT, msgs
+
     def _set_rule(self, cookie, rest, waiters, vlan_id):
+        flow_mod, rule = self._to_flow_mod(cookie, rest, waiters, vlan_id)
+        self.rules.add(rule)
+        self.dp.send_msg(flow_mod)
+        return self._rule_added_msg(rule)
+
+    @staticmethod
+    def _rule_added_msg(rule, index=None):
+        msg = {'result': 'success',
+               'details': 'Rule added. : rule_id=%d' % rule.rule_id}
+        if index is not None:
+            msg['index'] = index
+        if rule.vlan_id != VLANID_NONE:
+            msg.setdefault(REST_VLANID, rule.vlan_id)
+        return msg
+
+    def _to_flow_mod(self, cookie, rest, waiters, vlan_id):
         priority = int(rest.get(REST_PRIORITY, ACL_FLOW_PRIORITY_MIN))
 
         if (priority < ACL_FLOW_PRIORITY_MIN
@@ -750,45 +1053,33 @@ class Firewall(object):
             rest[REST_DL_VLAN] = vlan_id
 
         match = Match.to_openflow(rest)
+        allow = rest.get(REST_ACTION, REST_ACTION_ALLOW) == REST_ACTION_ALLOW
         if rest.get(REST_ACTION) == REST_ACTION_DENY:
-            result = self.get_log_status(waiters)
-            if result[REST_LOG_STATUS] == REST_STATUS_ENABLE:
+            if self.log_enabled is None:
+                result = self.get_log_status(waiters)
+                self.log_enabled = (result[REST_LOG_STATUS] ==
+                                    REST_STATUS_ENABLE)
+            if self.log_enabled:
                 rest[REST_ACTION] = REST_ACTION_PACKETIN
         actions = Action.to_openflow(self.dp, rest)
         flow = self._to_of_flow(cookie=cookie, priority=priority,
-                                match=match, actions=actions)
+                                match=match, actions=actions,
+                                flags=self.dp.ofproto.OFPFF_SEND_FLOW_REM)
 
         cmd = self.dp.ofproto.OFPFC_ADD
         try:
-            self.ofctl.mod_flow_entry(self.dp, flow, cmd)
+            flow_mod = self.ofctl.to_flow_mod(self.dp, flow, cmd)
+            rule = self._new_rule(cookie, priority, match, allow, flow_mod)
         except:
             raise ValueError('Invalid rule parameter.')
-
-        rule_id = Firewall._cookie_to_ruleid(cookie)
-        msg = {'result': 'success',
-               'details': 'Rule added. : rule_id=%d' % rule_id}
-
-        if vlan_id != VLANID_NONE:
-            msg.setdefault(REST_VLANID, vlan_id)
-        return msg
+        return flow_mod, rule
 
     @rest_command
     def get_rules(self, waiters, vlan_id):
+        self._sync(waiters)
         rules = {}
-        msgs = self.ofctl.get_flow_stats(self.dp, waiters)
-
-        if str(self.dp.id) in msgs:
-            flow_stats = msgs[str(self.dp.id)]
-            for flow_stat in flow_stats:
-                priority = flow_stat[REST_PRIORITY]
-                if (priority != STATUS_FLOW_PRIORITY
-                        and priority != ARP_FLOW_PRIORITY
-                        and priority != LOG_FLOW_PRIORITY):
-                    vid = flow_stat[REST_MATCH].get(REST_DL_VLAN, VLANID_NONE)
-                    if vlan_id == REST_ALL or vlan_id == vid:
-                        rule = self._to_rest_rule(flow_stat)
-                        rules.setdefault(vid, [])
-                        rules[vid].append(rule)
+        for rule in self.rules.find(vlan_id=vlan_id):
+            rules.setdefault(rule.vlan_id, []).append(rule.rest)
 
         get_data = []
         for vid, rule in rules.items():
@@ -810,30 +1101,11 @@ class Firewall(object):
         except:
             raise ValueError('Invalid ruleID.')
 
-        vlan_list = []
-        delete_list = []
-
-        msgs = self.ofctl.get_flow_stats(self.dp, waiters)
-        if str(self.dp.id) in msgs:
-            flow_stats = msgs[str(self.dp.id)]
-            for flow_stat in flow_stats:
-                cookie = flow_stat[REST_COOKIE]
-                ruleid = Firewall._cookie_to_ruleid(cookie)
-                priority = flow_stat[REST_PRIORITY]
-                dl_vlan = flow_stat[REST_MATCH].get(REST_DL_VLAN, VLANID_NONE)
-
-                if (priority != STATUS_FLOW_PRIORITY
-                        and priority != ARP_FLOW_PRIORITY
-                        and priority != LOG_FLOW_PRIORITY):
-                    if ((rule_id == REST_ALL or rule_id == ruleid) and
-                            (vlan_id == dl_vlan or vlan_id == REST_ALL)):
-                        match = Match.to_mod_openflow(flow_stat[REST_MATCH])
-                        delete_list.append([cookie, priority, match])
-                    else:
-                        if dl_vlan not in vlan_list:
-                            vlan_list.append(dl_vlan)
-
-        self._update_vlan_list(vlan_list)
+        self._sync(waiters)
+        delete_list = self.rules.find(vlan_id=vlan_id, rule_id=rule_id)
+        for rule in delete_list:
+            self.rules.remove(rule.cookie)
+        self._update_vlan_list(self.rules.vlans)
 
         if len(delete_list) == 0:
             msg_details = 'Rule is not exist.'
@@ -844,17 +1116,19 @@ class Firewall(object):
         else:
             cmd = self.dp.ofproto.OFPFC_DELETE_STRICT
             actions = []
+            flows = []
             delete_ids = {}
-            for cookie, priority, match in delete_list:
-                flow = self._to_of_flow(cookie=cookie, priority=priority,
-                                        match=match, actions=actions)
-                self.ofctl.mod_flow_entry(self.dp, flow, cmd)
+            for rule in sorted(delete_list, key=lambda r: r.cookie):
+                flows.append(self._to_of_flow(
+                    cookie=rule.cookie, priority=rule.priority,
+                    match=rule.match, actions=actions))
 
-                vid = match.get(REST_DL_VLAN, VLANID_NONE)
-                rule_id = Firewall._cookie_to_ruleid(cookie)
+                vid = rule.vlan_id
+                rule_id = rule.rule_id
                 delete_ids.setdefault(vid, '')
                 delete_ids[vid] += (('%d' if delete_ids[vid] == ''
                                      else ',%d') % rule_id)
+            self._send_flow_mods(flows, cmd)
 
             msg = []
             for vid, rule_ids in delete_ids.items():
@@ -866,10 +1140,10 @@ class Firewall(object):
 
         return REST_COMMAND_RESULT, msg
 
-    def _to_of_flow(self, cookie, priority, match, actions):
+    def _to_of_flow(self, cookie, priority, match, actions, flags=0):
         flow = {'cookie': cookie,
                 'priority': priority,
-                'flags': 0,
+                'flags': flags,
                 'idle_timeout': 0,
                 'hard_timeout': 0,
                 'match': match,
@@ -0,0 +1,97 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+from webob import Response
+
+from ryu.app.wsgi import ControllerBase, WSGIApplication, route
+from ryu.base import app_manager
+from ryu.lib import profiler
+
+# REST API of the sampling profiler
+#
+# get the state of the profiler
+# GET /v1.0/profiler
+#
+# start or stop the profiler
+# PUT /v1.0/profiler
+#
+# request body format:
+#  {"enabled": <true or false>,
+#   "interval": <seconds between two samples>}
+#
+# clear the samples
+# DELETE /v1.0/profiler
+#
+# get the stacks in the folded format of FlameGraph
+# GET /v1.0/profiler/stacks
+
+
+class ProfilerAPI(app_manager.RyuApp):
+    _CONTEXTS = {
+        'wsgi': WSGIApplication
+    }
+
+    def __init__(self, *args, **kwargs):
+        super(ProfilerAPI, self).__init__(*args, **kwargs)
+
+        wsgi = kwargs['wsgi']
+        wsgi.register(ProfilerController, {'profiler': profiler.PROFILER})
+
+
+class ProfilerController(ControllerBase):
+    def __init__(self, req, link, data, **config):
+        super(ProfilerController, self).__init__(req, link, data, **config)
+        self.profiler = data['profiler']
+
+    def _state(self):
+        body = json.dumps({'running': self.profiler.running,
+                           'interval': self.profiler.interval,
+                           'samples': self.profiler.samples,
+                           'idle': self.profiler.idle})
+        return Response(content_type='application/json', charset='utf-8',
+                        body=body)
+
+    @route('profiler', '/v1.0/profiler', methods=['GET'])
+    def get_state(self, req, **_kwargs):
+        return self._state()
+
+    @route('profiler', '/v1.0/profiler', methods=['PUT'])
+    def set_state(self, req, **_kwargs):
+        try:
+            body = json.loads(req.body)
+            enabled = body.get('enabled', self.profiler.running)
+            interval = body.get('interval')
+            if interval is not None:
+                interval = float(interval)
+                if interval <= 0:
+                    raise ValueError(interval)
+        except (ValueError, TypeError, AttributeError):
+            return Response(status=400)
+        if enabled:
+            self.profiler.start(interval)
+        else:
+            self.profiler.stop()
+            if interval is not None:
+                self.profiler.interval = interval
+        return self._state()
+
+    @route('profiler', '/v1.0/profiler', methods=['DELETE'])
+    def reset(self, req, **_kwargs):
+        self.profiler.reset()
+        return self._state()
+
+    @route('profiler', '/v1.0/profiler/stacks', methods=['GET'])
+    def get_stacks(self, req, **_kwargs):
+        return Response(content_type='text/plain', charset='utf-8',
+                        body=self.profiler.folded())
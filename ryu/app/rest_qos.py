@@ -14,6 +14,7 @@
 # limitations under the License.
 
 
+import copy
 import logging
 import json
 import re
@@ -22,18 +23,22 @@ from webob import Response
 
 from ryu.app import conf_switch_key as cs_key
 from ryu.app.wsgi import ControllerBase, WSGIApplication, route
+from ryu.app.wsgi import load_json_records
 from ryu.base import app_manager
 from ryu.controller import conf_switch
 from ryu.controller import ofp_event
 from ryu.controller import dpset
 from ryu.controller.handler import set_ev_cls
 from ryu.controller.handler import MAIN_DISPATCHER
+from ryu.exception import OFPRequestError
+from ryu.exception import OFPRequestTimeout
 from ryu.exception import OFPUnknownVersion
 from ryu.lib import dpid as dpid_lib
 from ryu.lib import mac
 from ryu.lib import ofctl_v1_0
 from ryu.lib import ofctl_v1_2
 from ryu.lib import ofctl_v1_3
+from ryu.lib import stats_cache
 from ryu.lib.ovs import bridge
 from ryu.ofproto import ofproto_v1_0
 from ryu.ofproto import ofproto_v1_2
@@ -56,6 +61,13 @@ from ryu.ofproto import inet
 # get status of queue
 # GET /qos/queue/status/{switch-id}
 #
+# get hit/miss counters of the stats cache
+# GET /qos/cache
+#
+#   Note: Queue status, qos rules and meter stats are cached for
+#         --stats-cache-ttl seconds, and concurrent identical
+#         requests share one request to the switch.
+#
 # about queues
 # get a queue configurations
 # GET /qos/queue/{switch-id}
@@ -159,6 +171,20 @@ from ryu.ofproto import inet
 #     <field>  : <value>
 #    "qos_id" : "<int>" or "all"
 #
+# set many qos rules at once
+# * for no vlan
+# POST /qos/rules/bulk/{switch-id}
+#
+# * for specific vlan group
+# POST /qos/rules/bulk/{switch-id}/{vlan-id}
+#
+#  request body format:
+#   a JSON array of qos rules, or one qos rule per line (NDJSON)
+#   [{"priority": ..., "match": {...}, "actions": {...}},...]
+#
+#   Note: The result of each rule refers to its position in the
+#         request by "index".  Invalid rules are reported and skipped.
+#
 # about meter entries
 #
 # set a meter entry
@@ -246,6 +272,10 @@ VLANID_MIN = 2
 VLANID_MAX = 4094
 COOKIE_SHIFT_VLANID = 32
 
+# stats cache entries dropped by modifications through this API
+_FLOW_STATS = ('flow', 'aggregate_flow', 'table')
+_METER_STATS = ('meter_config', 'meter')
+
 BASE_URL = '/qos'
 REQUIREMENTS = {'switchid': SWITCHID_PATTERN,
                 'vlanid': VLANID_PATTERN}
@@ -375,6 +405,7 @@ class QoSController(ControllerBase):
 
     _OFS_LIST = QoSOfsList()
     _LOGGER = None
+    _STATS_CACHE = stats_cache.StatsCache()
 
     def __init__(self, req, link, data, **config):
         super(QoSController, self).__init__(req, link, data, **config)
@@ -412,6 +443,7 @@ class QoSController(ControllerBase):
     def unregist_ofs(dp):
         if dp.id in QoSController._OFS_LIST:
             del QoSController._OFS_LIST[dp.id]
+            QoSController._STATS_CACHE.invalidate(dp.id)
             QoSController._LOGGER.info('dpid=%s: Leave qos switch.',
                                        dpid_lib.dpid_to_str(dp.id))
 
@@ -444,6 +476,12 @@ class QoSController(ControllerBase):
         return self._access_switch(req, switchid, VLANID_NONE,
                                    'delete_queue', None)
 
+    @route('qos_switch', BASE_URL + '/cache',
+           methods=['GET'])
+    def get_cache_stats(self, req, **_kwargs):
+        body = json.dumps(QoSController._STATS_CACHE.metrics())
+        return Response(content_type='application/json', body=body)
+
     @route('qos_switch', BASE_URL + '/queue/status/{switchid}',
            methods=['GET'], requirements=REQUIREMENTS)
     def get_status(self, req, switchid, **_kwargs):
@@ -474,6 +512,18 @@ class QoSController(ControllerBase):
         return self._access_switch(req, switchid, vlanid,
                                    'set_qos', self.waiters)
 
+    @route('qos_switch', BASE_URL + '/rules/bulk/{switchid}',
+           methods=['POST'], requirements=REQUIREMENTS)
+    def set_qos_rules(self, req, switchid, **_kwargs):
+        return self._access_switch(req, switchid, VLANID_NONE,
+                                   'set_qos_rules', self.waiters, bulk=True)
+
+    @route('qos_switch', BASE_URL + '/rules/bulk/{switchid}/{vlanid}',
+           methods=['POST'], requirements=REQUIREMENTS)
+    def set_vlan_qos_rules(self, req, switchid, vlanid, **_kwargs):
+        return self._access_switch(req, switchid, vlanid,
+                                   'set_qos_rules', self.waiters, bulk=True)
+
     @route('qos_switch', BASE_URL + '/rules/{switchid}',
            methods=['DELETE'], requirements=REQUIREMENTS)
     def delete_qos(self, req, switchid, **_kwargs):
@@ -504,12 +554,20 @@ class QoSController(ControllerBase):
         return self._access_switch(req, switchid, VLANID_NONE,
                                    'delete_meter', self.waiters)
 
-    def _access_switch(self, req, switchid, vlan_id, func, waiters):
-        try:
-            rest = json.loads(req.body) if req.body else {}
-        except SyntaxError:
-            QoSController._LOGGER.debug('invalid syntax %s', req.body)
-            return Response(status=400)
+    def _access_switch(self, req, switchid, vlan_id, func, waiters,
+                       bulk=False):
+        if bulk:
+            try:
+                records = load_json_records(req.body)
+            except ValueError as message:
+                QoSController._LOGGER.debug('invalid syntax %s', message)
+                return Response(status=400, body=str(message))
+        else:
+            try:
+                rest = json.loads(req.body) if req.body else {}
+            except SyntaxError:
+                QoSController._LOGGER.debug('invalid syntax %s', req.body)
+                return Response(status=400)
 
         try:
             dps = self._OFS_LIST.get_ofs(switchid)
@@ -520,6 +578,9 @@ class QoSController(ControllerBase):
         msgs = []
         for f_ofs in dps.values():
             function = getattr(f_ofs, func)
+            if bulk:
+                # each switch gets its own copy, as the rules are modified.
+                rest = [copy.deepcopy(r) for r in records]
             try:
                 if waiters is not None:
                     msg = function(rest, vid, waiters)
@@ -643,7 +704,8 @@ class QoS(object):
         if self.version == ofproto_v1_0.OFP_VERSION:
             raise ValueError('get_status operation is not supported')
 
-        msgs = self.ofctl.get_queue_stats(self.dp, waiters)
+        msgs = QoSController._STATS_CACHE.get(
+            self.dp, 'queue', self.ofctl.get_queue_stats, waiters)
         return REST_COMMAND_RESULT, msgs
 
     @rest_command
@@ -732,9 +794,62 @@ class QoS(object):
         for cookie, vid in cookie_list:
             msg = self._set_qos(cookie, rest, waiters, vid)
             msgs.append(msg)
+        self._invalidate_stats(_FLOW_STATS)
         return REST_COMMAND_RESULT, msgs
 
+    @rest_command
+    def set_qos_rules(self, rests, vlan_id, waiters):
+        msgs = []
+        flow_mods = []
+        for index, rest in enumerate(rests):
+            try:
+                if not isinstance(rest, dict):
+                    raise ValueError('Invalid rule format.')
+                rule_msgs = []
+                rule_flow_mods = []
+                for cookie, vid in self._get_cookie(vlan_id):
+                    rule_flow_mods.append(
+                        self._to_flow_mod(cookie, rest, waiters, vid))
+                    rule_msgs.append(self._qos_added_msg(cookie, vid, index))
+            except ValueError as message:
+                msgs.append({'index': index, 'result': 'failure',
+                             'details': str(message)})
+                continue
+            flow_mods.extend(rule_flow_mods)
+            msgs.extend(rule_msgs)
+
+        self._send_msgs(flow_mods)
+        self._invalidate_stats(_FLOW_STATS)
+        return REST_COMMAND_RESULT, msgs
+
+    def _invalidate_stats(self, stats_types):
+        QoSController._STATS_CACHE.invalidate(self.dp.id, stats_types)
+
+    def _send_msgs(self, msgs):
+        try:
+            self.dp.send_msgs_and_wait(msgs)
+        except (OFPRequestTimeout, OFPRequestError) as e:
+            QoSController._LOGGER.warning(
+                'dpid=%s: %s', dpid_lib.dpid_to_str(self.dp.id), e)
+
     def _set_qos(self, cookie, rest, waiters, vlan_id):
+        self.dp.send_msg(self._to_flow_mod(cookie, rest, waiters, vlan_id))
+        return self._qos_added_msg(cookie, vlan_id)
+
+    @staticmethod
+    def _qos_added_msg(cookie, vlan_id, index=None):
+        qos_id = QoS._cookie_to_qosid(cookie)
+        msg = {'result': 'success',
+               'details': 'QoS added. : qos_id=%d' % qos_id}
+        if index is not None:
+            msg['index'] = index
+        if vlan_id != VLANID_NONE:
+            msg.setdefault(REST_VLANID, vlan_id)
+        return msg
+
+    def _to_flow_mod(self, cookie, rest, waiters, vlan_id):
+        if not isinstance(rest.get(REST_MATCH), dict):
+            raise ValueError('Invalid rule parameter. : key=%s' % REST_MATCH)
         match_value = rest[REST_MATCH]
         if vlan_id:
             match_value[REST_DL_VLAN] = vlan_id
@@ -770,22 +885,15 @@ class QoS(object):
 
         cmd = self.dp.ofproto.OFPFC_ADD
         try:
-            self.ofctl.mod_flow_entry(self.dp, flow, cmd)
+            return self.ofctl.to_flow_mod(self.dp, flow, cmd)
         except:
             raise ValueError('Invalid rule parameter.')
 
-        qos_id = QoS._cookie_to_qosid(cookie)
-        msg = {'result': 'success',
-               'details': 'QoS added. : qos_id=%d' % qos_id}
-
-        if vlan_id != VLANID_NONE:
-            msg.setdefault(REST_VLANID, vlan_id)
-        return msg
-
     @rest_command
     def get_qos(self, rest, vlan_id, waiters):
         rules = {}
-        msgs = self.ofctl.get_flow_stats(self.dp, waiters)
+        msgs = QoSController._STATS_CACHE.get(
+            self.dp, 'flow', self.ofctl.get_flow_stats, waiters)
         if str(self.dp.id) in msgs:
             flow_stats = msgs[str(self.dp.id)]
             for flow_stat in flow_stats:
@@ -870,6 +978,7 @@ class QoS(object):
                 if vid != VLANID_NONE:
                     del_msg.setdefault(REST_VLANID, vid)
                 msg.append(del_msg)
+            self._invalidate_stats(_FLOW_STATS)
 
         return REST_COMMAND_RESULT, msg
 
@@ -881,6 +990,7 @@ class QoS(object):
         msgs = []
         msg = self._set_meter(rest, waiters)
         msgs.append(msg)
+        self._invalidate_stats(_METER_STATS)
         return REST_COMMAND_RESULT, msgs
 
     def _set_meter(self, rest, waiters):
@@ -901,7 +1011,8 @@ class QoS(object):
                 self.version == ofproto_v1_2.OFP_VERSION):
             raise ValueError('get_meter operation is not supported')
 
-        msgs = self.ofctl.get_meter_stats(self.dp, waiters)
+        msgs = QoSController._STATS_CACHE.get(
+            self.dp, 'meter', self.ofctl.get_meter_stats, waiters)
         return REST_COMMAND_RESULT, msgs
 
     @rest_command
@@ -919,6 +1030,7 @@ class QoS(object):
         msg = {'result': 'success',
                'details': 'Meter deleted. : Meter ID=%s' %
                rest[REST_METER_ID]}
+        self._invalidate_stats(_METER_STATS)
         return REST_COMMAND_RESULT, msg
 
     def _to_of_flow(self, cookie, priority, match, actions):
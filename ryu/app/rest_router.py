@@ -34,6 +34,7 @@ from ryu.exception import RyuException
 from ryu.lib import dpid as dpid_lib
 from ryu.lib import hub
 from ryu.lib import mac as mac_lib
+from ryu.lib import timer
 from ryu.lib import addrconv
 from ryu.lib.packet import arp
 from ryu.lib.packet import ethernet
@@ -112,7 +113,7 @@ ICMP = icmp.icmp.__name__
 TCP = tcp.tcp.__name__
 UDP = udp.udp.__name__
 
-MAX_SUSPENDPACKETS = 50  # Threshold of the packet suspends thread count.
+MAX_SUSPENDPACKETS = 50  # Threshold of the suspended packet count.
 
 ARP_REPLY_TIMER = 2  # sec
 OFP_REPLY_TIMER = 1.0  # sec
@@ -463,8 +464,13 @@ class Router(dict):
         self.logger.info('Set L2 switching (normal) flow [cookie=0x%x]',
                          cookie, extra=self.sw_id)
 
+        # Start ARP reply wait timer scheduler.
+        self.scheduler = timer.TimerScheduler()
+        self.scheduler.start()
+
         # Set VlanRouter for vid=None.
-        vlan_router = VlanRouter(VLANID_NONE, dp, self.port_data, logger)
+        vlan_router = VlanRouter(VLANID_NONE, dp, self.port_data, logger,
+                                 self.scheduler)
         self[VLANID_NONE] = vlan_router
 
         # Start cyclic routing table check.
@@ -477,6 +483,7 @@ class Router(dict):
         self.thread.wait()
         self.logger.info('Stop cyclic routing table update.',
                          extra=self.sw_id)
+        self.scheduler.stop()
 
     def _get_vlan_router(self, vlan_id):
         vlan_routers = []
@@ -498,7 +505,7 @@ class Router(dict):
         vlan_id = int(vlan_id)
         if vlan_id not in self:
             vlan_router = VlanRouter(vlan_id, self.dp, self.port_data,
-                                     self.logger)
+                                     self.logger, self.scheduler)
             self[vlan_id] = vlan_router
         return self[vlan_id]
 
@@ -591,7 +598,7 @@ class Router(dict):
 
 
 class VlanRouter(object):
-    def __init__(self, vlan_id, dp, port_data, logger):
+    def __init__(self, vlan_id, dp, port_data, logger, scheduler):
         super(VlanRouter, self).__init__()
         self.vlan_id = vlan_id
         self.dp = dp
@@ -601,7 +608,8 @@ class VlanRouter(object):
         self.port_data = port_data
         self.address_data = AddressData()
         self.routing_tbl = RoutingTable()
-        self.packet_buffer = SuspendPacketList(self.send_icmp_unreach_error)
+        self.packet_buffer = SuspendPacketTable(scheduler,
+                                                self.send_icmp_unreach_error)
         self.ofctl = OfCtl.factory(dp, logger)
 
         # Set flow: default route (drop)
@@ -842,8 +850,8 @@ class VlanRouter(object):
 
             del_address = self.address_data.get_data(addr_id=address_id)
             if del_address is not None:
-                # Clean up suspend packet threads.
-                self.packet_buffer.delete(del_addr=del_address)
+                # Clean up suspend packets.
+                self.packet_buffer.delete(del_address)
 
                 # Delete data.
                 self.address_data.delete(address_id)
@@ -1025,20 +1033,16 @@ class VlanRouter(object):
                 log_msg = 'Receive ARP reply from [%s] to router port [%s].'
                 self.logger.info(log_msg, srcip, dstip, extra=self.sw_id)
 
-                packet_list = self.packet_buffer.get_data(src_ip)
+                packet_list = self.packet_buffer.pop(src_ip)
                 if packet_list:
-                    # stop ARP reply wait thread.
-                    for suspend_packet in packet_list:
-                        self.packet_buffer.delete(pkt=suspend_packet)
-
-                    # send suspend packet.
+                    # send suspend packets at once.
                     output = self.ofctl.dp.ofproto.OFPP_TABLE
-                    for suspend_packet in packet_list:
-                        self.ofctl.send_packet_out(suspend_packet.in_port,
-                                                   output,
-                                                   suspend_packet.data)
-                        self.logger.info('Send suspend packet to [%s].',
-                                         srcip, extra=self.sw_id)
+                    self.ofctl.send_packet_outs(
+                        [(suspend_packet.in_port, output, suspend_packet.data)
+                         for suspend_packet in packet_list])
+                    self.logger.info('Send %d suspend packet(s) to [%s].',
+                                     len(packet_list), srcip,
+                                     extra=self.sw_id)
 
     def _packetin_icmp_req(self, msg, header_list):
         # Send ICMP echo reply.
@@ -1099,9 +1103,11 @@ class VlanRouter(object):
                     dst_ip = route.gateway_ip
 
         if src_ip is not None:
-            self.packet_buffer.add(in_port, header_list, msg.data)
-            self.send_arp_request(src_ip, dst_ip, in_port=in_port)
-            self.logger.info('Send ARP request (flood)', extra=self.sw_id)
+            # Packets to the same next hop share an ARP request.
+            if self.packet_buffer.add(dst_ip, in_port, header_list,
+                                      msg.data):
+                self.send_arp_request(src_ip, dst_ip, in_port=in_port)
+                self.logger.info('Send ARP request (flood)', extra=self.sw_id)
 
     def _packetin_invalid_ttl(self, msg, header_list):
         # Send ICMP TTL error.
@@ -1122,11 +1128,15 @@ class VlanRouter(object):
     def send_arp_all_gw(self):
         gateways = self.routing_tbl.get_gateways()
         for gateway in gateways:
+            if gateway in self.packet_buffer:
+                # ARP request is already in flight.
+                continue
             address = self.address_data.get_data(ip=gateway)
             self.send_arp_request(address.default_gw, gateway)
 
     def send_arp_request(self, src_ip, dst_ip, in_port=None):
         # Send ARP request from all ports.
+        packets = []
         for send_port in self.port_data.values():
             if in_port is None or in_port != send_port.port_no:
                 src_mac = send_port.mac
@@ -1134,9 +1144,11 @@ class VlanRouter(object):
                 arp_target_mac = mac_lib.DONTCARE_STR
                 inport = self.ofctl.dp.ofproto.OFPP_CONTROLLER
                 output = send_port.port_no
-                self.ofctl.send_arp(arp.ARP_REQUEST, self.vlan_id,
-                                    src_mac, dst_mac, src_ip, dst_ip,
-                                    arp_target_mac, inport, output)
+                pkt = self.ofctl.arp_packet(arp.ARP_REQUEST, self.vlan_id,
+                                            src_mac, dst_mac, src_ip, dst_ip,
+                                            arp_target_mac)
+                packets.append((inport, output, pkt.data))
+        self.ofctl.send_packet_outs(packets)
 
     def send_icmp_unreach_error(self, packet_buffer):
         # Send ICMP host unreach error.
@@ -1164,25 +1176,24 @@ class VlanRouter(object):
         src_ip = header_list[ARP].src_ip
 
         gateway_flg = False
-        for key, value in self.routing_tbl.items():
-            if value.gateway_ip == src_ip:
-                gateway_flg = True
-                if value.gateway_mac == src_mac:
-                    continue
-                self.routing_tbl[key].gateway_mac = src_mac
-
-                cookie = self._id_to_cookie(REST_ROUTEID, value.route_id)
-                priority, log_msg = self._get_priority(PRIORITY_TYPE_ROUTE,
-                                                       route=value)
-                self.ofctl.set_routing_flow(cookie, priority, out_port,
-                                            dl_vlan=self.vlan_id,
-                                            src_mac=dst_mac,
-                                            dst_mac=src_mac,
-                                            nw_dst=value.dst_ip,
-                                            dst_mask=value.netmask,
-                                            dec_ttl=True)
-                self.logger.info('Set %s flow [cookie=0x%x]', log_msg, cookie,
-                                 extra=self.sw_id)
+        for value in self.routing_tbl.get_routes(src_ip):
+            gateway_flg = True
+            if value.gateway_mac == src_mac:
+                continue
+            self.routing_tbl.set_gateway_mac(value, src_mac)
+
+            cookie = self._id_to_cookie(REST_ROUTEID, value.route_id)
+            priority, log_msg = self._get_priority(PRIORITY_TYPE_ROUTE,
+                                                   route=value)
+            self.ofctl.set_routing_flow(cookie, priority, out_port,
+                                        dl_vlan=self.vlan_id,
+                                        src_mac=dst_mac,
+                                        dst_mac=src_mac,
+                                        nw_dst=value.dst_ip,
+                                        dst_mask=value.netmask,
+                                        dec_ttl=True)
+            self.logger.info('Set %s flow [cookie=0x%x]', log_msg, cookie,
+                             extra=self.sw_id)
         return gateway_flg
 
     def _learning_host_mac(self, msg, header_list):
@@ -1192,8 +1203,7 @@ class VlanRouter(object):
         dst_mac = self.port_data[out_port].mac
         src_ip = header_list[ARP].src_ip
 
-        gateways = self.routing_tbl.get_gateways()
-        if src_ip not in gateways:
+        if not self.routing_tbl.get_routes(src_ip):
             address = self.address_data.get_data(ip=src_ip)
             if address is not None:
                 cookie = self._id_to_cookie(REST_ADDRESSID, address.address_id)
@@ -1248,29 +1258,114 @@ class Port(object):
         self.mac = hw_addr
 
 
+class PrefixTrie(object):
+    """ Binary trie of IPv4 prefixes (as integers) for longest match. """
+
+    class _Node(object):
+        __slots__ = ('children', 'value')
+
+        def __init__(self):
+            self.children = [None, None]
+            self.value = None
+
+    def __init__(self):
+        super(PrefixTrie, self).__init__()
+        self._root = PrefixTrie._Node()
+
+    @staticmethod
+    def _bit(addr, depth):
+        return (addr >> (31 - depth)) & 1
+
+    def _path(self, addr, prefix_len):
+        # nodes from the root down to the prefix (missing ones are cut).
+        node = self._root
+        path = [node]
+        for depth in range(prefix_len):
+            node = node.children[self._bit(addr, depth)]
+            if node is None:
+                break
+            path.append(node)
+        return path
+
+    def insert(self, addr, prefix_len, value):
+        node = self._root
+        for depth in range(prefix_len):
+            bit = self._bit(addr, depth)
+            if node.children[bit] is None:
+                node.children[bit] = PrefixTrie._Node()
+            node = node.children[bit]
+        node.value = value
+
+    def get(self, addr, prefix_len):
+        path = self._path(addr, prefix_len)
+        if len(path) == prefix_len + 1:
+            return path[-1].value
+        return None
+
+    def delete(self, addr, prefix_len):
+        path = self._path(addr, prefix_len)
+        if len(path) != prefix_len + 1:
+            return
+        path[-1].value = None
+        # remove the nodes left without value and children.
+        for depth in range(prefix_len, 0, -1):
+            node = path[depth]
+            if node.value is not None or any(node.children):
+                break
+            path[depth - 1].children[self._bit(addr, depth - 1)] = None
+
+    def longest_match(self, addr):
+        node = self._root
+        match = node.value
+        for depth in range(32):
+            node = node.children[self._bit(addr, depth)]
+            if node is None:
+                break
+            if node.value is not None:
+                match = node.value
+        return match
+
+    def overlap(self, addr, prefix_len):
+        """ Returns a value whose prefix contains or is contained
+        by the given prefix, or None. """
+        path = self._path(addr, prefix_len)
+        for node in path:
+            if node.value is not None:
+                return node.value
+        if len(path) != prefix_len + 1:
+            return None
+        # empty nodes are removed, so any node below has a value.
+        node = path[-1]
+        while node.value is None:
+            node = node.children[0] or node.children[1]
+            if node is None:
+                return None
+        return node.value
+
+
 class AddressData(dict):
     def __init__(self):
         super(AddressData, self).__init__()
         self.address_id = 1
+        self._trie = PrefixTrie()
+        self._keys = {}     # address_id -> key
 
     def add(self, address):
         err_msg = 'Invalid [%s] value.' % REST_ADDRESS
         nw_addr, mask, default_gw = nw_addr_aton(address, err_msg=err_msg)
 
         # Check overlaps
-        for other in self.values():
-            other_mask = mask_ntob(other.netmask)
-            add_mask = mask_ntob(mask, err_msg=err_msg)
-            if (other.nw_addr == ipv4_apply_mask(default_gw, other.netmask) or
-                    nw_addr == ipv4_apply_mask(other.default_gw, mask,
-                                               err_msg)):
-                msg = 'Address overlaps [address_id=%d]' % other.address_id
-                raise CommandFailure(msg=msg)
+        other = self._trie.overlap(ipv4_text_to_int(nw_addr), mask)
+        if other is not None:
+            msg = 'Address overlaps [address_id=%d]' % other.address_id
+            raise CommandFailure(msg=msg)
 
         address = Address(self.address_id, nw_addr, mask, default_gw)
         ip_str = ip_addr_ntoa(nw_addr)
         key = '%s/%d' % (ip_str, mask)
         self[key] = address
+        self._keys[address.address_id] = key
+        self._trie.insert(ipv4_text_to_int(nw_addr), mask, address)
 
         self.address_id += 1
         self.address_id &= UINT32_MAX
@@ -1280,24 +1375,21 @@ class AddressData(dict):
         return address
 
     def delete(self, address_id):
-        for key, value in self.items():
-            if value.address_id == address_id:
-                del self[key]
-                return
+        key = self._keys.pop(address_id, None)
+        if key is not None:
+            address = self.pop(key)
+            self._trie.delete(ipv4_text_to_int(address.nw_addr),
+                              address.netmask)
 
     def get_default_gw(self):
         return [address.default_gw for address in self.values()]
 
     def get_data(self, addr_id=None, ip=None):
-        for address in self.values():
-            if addr_id is not None:
-                if addr_id == address.address_id:
-                    return address
-            else:
-                assert ip is not None
-                if ipv4_apply_mask(ip, address.netmask) == address.nw_addr:
-                    return address
-        return None
+        if addr_id is not None:
+            key = self._keys.get(addr_id)
+            return self[key] if key is not None else None
+        assert ip is not None
+        return self._trie.longest_match(ipv4_text_to_int(ip))
 
 
 class Address(object):
@@ -1316,6 +1408,10 @@ class RoutingTable(dict):
     def __init__(self):
         super(RoutingTable, self).__init__()
         self.route_id = 1
+        self._trie = PrefixTrie()
+        self._keys = {}         # route_id -> key
+        self._gateways = {}     # gateway_ip -> [Route]
+        self._gateway_macs = {}     # gateway_mac -> [Route]
 
     def add(self, dst_nw_addr, gateway_ip):
         err_msg = 'Invalid [%s] value.'
@@ -1330,21 +1426,18 @@ class RoutingTable(dict):
         gateway_ip = ip_addr_aton(gateway_ip, err_msg=err_msg % REST_GATEWAY)
 
         # Check overlaps
-        overlap_route = None
-        if dst_nw_addr == DEFAULT_ROUTE:
-            if DEFAULT_ROUTE in self:
-                overlap_route = self[DEFAULT_ROUTE].route_id
-        elif dst_nw_addr in self:
-            overlap_route = self[dst_nw_addr].route_id
-
+        overlap_route = self._trie.get(ipv4_text_to_int(dst_ip), netmask)
         if overlap_route is not None:
-            msg = 'Destination overlaps [route_id=%d]' % overlap_route
+            msg = 'Destination overlaps [route_id=%d]' % overlap_route.route_id
             raise CommandFailure(msg=msg)
 
         routing_data = Route(self.route_id, dst_ip, netmask, gateway_ip)
         ip_str = ip_addr_ntoa(dst_ip)
         key = '%s/%d' % (ip_str, netmask)
         self[key] = routing_data
+        self._keys[routing_data.route_id] = key
+        self._trie.insert(ipv4_text_to_int(dst_ip), netmask, routing_data)
+        self._gateways.setdefault(gateway_ip, []).append(routing_data)
 
         self.route_id += 1
         self.route_id &= UINT32_MAX
@@ -1354,34 +1447,40 @@ class RoutingTable(dict):
         return routing_data
 
     def delete(self, route_id):
-        for key, value in self.items():
-            if value.route_id == route_id:
-                del self[key]
-                return
+        key = self._keys.pop(route_id, None)
+        if key is None:
+            return
+        route = self.pop(key)
+        self._trie.delete(ipv4_text_to_int(route.dst_ip), route.netmask)
+        self._remove_index(self._gateways, route.gateway_ip, route)
+        self._remove_index(self._gateway_macs, route.gateway_mac, route)
+
+    @staticmethod
+    def _remove_index(index, key, route):
+        routes = index.get(key)
+        if routes is not None and route in routes:
+            routes.remove(route)
+            if not routes:
+                del index[key]
+
+    def set_gateway_mac(self, route, gateway_mac):
+        self._remove_index(self._gateway_macs, route.gateway_mac, route)
+        route.gateway_mac = gateway_mac
+        self._gateway_macs.setdefault(gateway_mac, []).append(route)
 
     def get_gateways(self):
-        return [routing_data.gateway_ip for routing_data in self.values()]
+        return list(self._gateways)
+
+    def get_routes(self, gateway_ip):
+        return list(self._gateways.get(gateway_ip, []))
 
     def get_data(self, gw_mac=None, dst_ip=None):
         if gw_mac is not None:
-            for route in self.values():
-                if gw_mac == route.gateway_mac:
-                    return route
-            return None
+            routes = self._gateway_macs.get(gw_mac)
+            return routes[0] if routes else None
 
         elif dst_ip is not None:
-            get_route = None
-            mask = 0
-            for route in self.values():
-                if ipv4_apply_mask(dst_ip, route.netmask) == route.dst_ip:
-                    # For longest match
-                    if mask < route.netmask:
-                        get_route = route
-                        mask = route.netmask
-
-            if get_route is None:
-                get_route = self.get(DEFAULT_ROUTE, None)
-            return get_route
+            return self._trie.longest_match(ipv4_text_to_int(dst_ip))
         else:
             return None
 
@@ -1396,47 +1495,72 @@ class Route(object):
         self.gateway_mac = None
 
 
-class SuspendPacketList(list):
-    def __init__(self, timeout_function):
-        super(SuspendPacketList, self).__init__()
-        self.timeout_function = timeout_function
-
-    def add(self, in_port, header_list, data):
-        suspend_pkt = SuspendPacket(in_port, header_list, data,
-                                    self.wait_arp_reply_timer)
-        self.append(suspend_pkt)
+class SuspendPacketTable(object):
+    """
+    Packets waiting for the ARP reply of their next hop.
 
-    def delete(self, pkt=None, del_addr=None):
-        if pkt is not None:
-            del_list = [pkt]
-        else:
-            assert del_addr is not None
-            del_list = [pkt for pkt in self if pkt.dst_ip in del_addr]
+    Packets are grouped by the next hop IP address; the first packet
+    to a next hop starts a single ARP reply wait timer on the shared
+    scheduler, and the following packets just join the group.
+    """
 
-        for pkt in del_list:
-            self.remove(pkt)
-            hub.kill(pkt.wait_thread)
-            pkt.wait_thread.wait()
-
-    def get_data(self, dst_ip):
-        return [pkt for pkt in self if pkt.dst_ip == dst_ip]
+    def __init__(self, scheduler, timeout_function):
+        super(SuspendPacketTable, self).__init__()
+        self.scheduler = scheduler
+        self.timeout_function = timeout_function
+        self._pending = {}  # next hop -> ([SuspendPacket], Timer)
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def __contains__(self, next_hop):
+        return next_hop in self._pending
+
+    def add(self, next_hop, in_port, header_list, data):
+        """
+        Suspend a packet until the ARP reply from ``next_hop``.
+        Returns True if an ARP request needs to be sent.
+        """
+        suspend_pkt = SuspendPacket(in_port, header_list, data)
+        self._count += 1
+        if next_hop in self._pending:
+            self._pending[next_hop][0].append(suspend_pkt)
+            return False
 
-    def wait_arp_reply_timer(self, suspend_pkt):
-        hub.sleep(ARP_REPLY_TIMER)
-        if suspend_pkt in self:
+        # Start ARP reply wait timer.
+        wait_timer = self.scheduler.call_later(ARP_REPLY_TIMER,
+                                               self._timeout, next_hop)
+        self._pending[next_hop] = ([suspend_pkt], wait_timer)
+        return True
+
+    def pop(self, next_hop):
+        """
+        Remove and return the packets waiting for ``next_hop``.
+        """
+        if next_hop not in self._pending:
+            return []
+        packets, wait_timer = self._pending.pop(next_hop)
+        wait_timer.cancel()
+        self._count -= len(packets)
+        return packets
+
+    def delete(self, del_addr):
+        for next_hop in [ip for ip in self._pending if ip in del_addr]:
+            self.pop(next_hop)
+
+    def _timeout(self, next_hop):
+        for suspend_pkt in self.pop(next_hop):
             self.timeout_function(suspend_pkt)
-            self.delete(pkt=suspend_pkt)
 
 
 class SuspendPacket(object):
-    def __init__(self, in_port, header_list, data, timer):
+    def __init__(self, in_port, header_list, data):
         super(SuspendPacket, self).__init__()
         self.in_port = in_port
         self.dst_ip = header_list[IPV4].dst
         self.header_list = header_list
         self.data = data
-        # Start ARP reply wait timer.
-        self.wait_thread = hub.spawn(timer, self)
 
 
 class OfCtl(object):
@@ -1477,6 +1601,14 @@ class OfCtl(object):
 
     def send_arp(self, arp_opcode, vlan_id, src_mac, dst_mac,
                  src_ip, dst_ip, arp_target_mac, in_port, output):
+        pkt = self.arp_packet(arp_opcode, vlan_id, src_mac, dst_mac,
+                              src_ip, dst_ip, arp_target_mac)
+
+        # Send packet out
+        self.send_packet_out(in_port, output, pkt.data, data_str=str(pkt))
+
+    def arp_packet(self, arp_opcode, vlan_id, src_mac, dst_mac,
+                   src_ip, dst_ip, arp_target_mac):
         # Generate ARP packet
         if vlan_id != VLANID_NONE:
             ether_proto = ether.ETH_TYPE_8021Q
@@ -1500,9 +1632,7 @@ class OfCtl(object):
             pkt.add_protocol(v)
         pkt.add_protocol(a)
         pkt.serialize()
-
-        # Send packet out
-        self.send_packet_out(in_port, output, pkt.data, data_str=str(pkt))
+        return pkt
 
     def send_icmp(self, in_port, protocol_list, vlan_id, icmp_type,
                   icmp_code, icmp_data=None, msg_data=None, src_ip=None):
@@ -1568,6 +1698,16 @@ class OfCtl(object):
         #     data_str = str(packet.Packet(data))
         # self.logger.debug('Packet out = %s', data_str, extra=self.sw_id)
 
+    def send_packet_outs(self, packets):
+        # Send (in_port, output, data) packets in a single write.
+        parser = self.dp.ofproto_parser
+        msgs = [parser.OFPPacketOut(self.dp, UINT32_MAX, in_port,
+                                    [parser.OFPActionOutput(output, 0)],
+                                    data)
+                for in_port, output, data in packets]
+        if msgs:
+            self.dp.send_msgs(msgs)
+
     def set_normal_flow(self, cookie, priority):
         out_port = self.dp.ofproto.OFPP_NORMAL
         actions = [self.dp.ofproto_parser.OFPActionOutput(out_port, 0)]
@@ -7,8 +7,9 @@ from ryu.ofproto import ofproto_v1_3
 from ryu.controller import ofp_event
 from ryu.controller.handler import MAIN_DISPATCHER, DEAD_DISPATCHER, CONFIG_DISPATCHER
 from ryu.controller.handler import set_ev_cls
-from ryu.lib import hub
-import csv
+from ryu.lib.ip import ipv4_to_str
+from ryu.lib import telemetry
+from ryu.services.protocols.xflow import event as xflow_event
 import logging
 import math
 import time
@@ -24,30 +25,15 @@ class SimpleMonitor(app_manager.RyuApp):
         super(SimpleMonitor, self).__init__(*args, **kwargs)
         self.mac_to_port = {}
         self.datapaths = {}
-        self.monitor_thread = hub.spawn(self._monitor)
         self.entropy_ipsrc, self.entropy_ipdst, self.entropy_portsrc, self.entropy_portdst, self.abscisse_time = ([] for i in range(5))  # Entropy Lists
         self.datapaths, self.ipsrc, self.ipdst, self.portsrc, self.portdst, self.tcp_portsrc, self.tcp_portdst, self.udp_portsrc, self.udp_portdst = ({} for i in range(9)) # Datapath + Features dictionaries
         # Lists specific for sFlow to drop counters that were detected as possible attacks
         self.victim_address_sflow, self.victim_port_sflow, self.attacker_address_sflow, self.attacker_port_sflow, self.proto_src_sflow, self.proto_dst_sflow = ([] for i in range(6))
-        with open('sflow_entropy.csv', 'wb') as csvfile:  # Set the header and Empty the file
-            writer = csv.writer(csvfile, delimiter=',', quoting=csv.QUOTE_MINIMAL, lineterminator='\n')
-            writer.writerow(
-                ["Time (s)", " IP Src Entropy", " IP Dst Entropy", " Port Src Entropy", " Port Dst Entropy"])
-            csvfile.close()
-        with open('sflow_counters.csv', 'wb') as csvfile:
-            writer = csv.writer(csvfile, delimiter=';', quoting=csv.QUOTE_MINIMAL, lineterminator='\n')
-            writer.writerow(
-                ["Time (s)", " IPsrc", " State", " IPdst", " State", " Portsrc", " State", " Portdst", " State"])
-            csvfile.close()
-        open('sflow_counter_ip_src.csv', 'wb').close()
-        open('sflow_counter_ip_dst.csv', 'wb').close()
-        open('sflow_counter_port_src.csv', 'wb').close()
-        open('sflow_counter_port_dst.csv', 'wb').close()
+        # Entropies and counters are appended to sflow-*.tlm files
+        # (CSV export: ryu telemetry-export --prefix=sflow)
+        self.telemetry = telemetry.TelemetryWriter('.', 'sflow')
+        self.telemetry.start()
         self.timer = 1
-        self.line_offset = 0
-        with open('sflowtraces.csv', 'wb') as csvfile:  # Set the header and Empty the file
-            writer = csv.writer(csvfile, delimiter=',', quoting=csv.QUOTE_MINIMAL, lineterminator='\n')
-            csvfile.close()
 
     @set_ev_cls(ofp_event.EventOFPSwitchFeatures, CONFIG_DISPATCHER)
     def switch_features_handler(self, ev):
@@ -149,116 +135,50 @@ class SimpleMonitor(app_manager.RyuApp):
                 self.logger.debug('unregister datapath: %016x', datapath.id)
                 del self.datapaths[datapath.id]
 
-    def _monitor(self):
-        while True:
-            self.getsFlowvalues()
-            if (len(self.udp_portdst) != 0 or len(self.tcp_portdst) != 0):  # If counters are != 0
-                self.entropy_computation()
-            hub.sleep(timewindow)  # Wait X seconds
-
-    def getsFlowvalues(self):
-        with open('sflowtraces.csv', 'rb') as csvfile:
-            csvfile.seek(self.line_offset)
-            reader = csv.reader(csvfile)
-            for row in reader:
-                if (len(row) == 5 and len(row[4]) != 0):
-                    for i in range(len(row)):
-                        self.line_offset += len(row[i])
-                    self.line_offset += 5  # add the number of commas + escape char
-                    if (len(row[0]) <= 15 and (row[2] == '17' or row[2] == '6' or row[2] == '1') and row[
-                        1] != '255.255.255.255'):  # An IPv4, NOT An IPv6, only TCP, UDP and ICMP packets; NOT TO BROADCAST DST
-                        Count = True
-                        # Do not count features if we have mitigate the attack
-                        # Time to retrieve all information about the attack
-                        if (len(self.attacker_address_sflow) != 0 and len(self.victim_address_sflow) != 0 and len(
-                                self.attacker_port_sflow) != 0 and len(self.victim_port_sflow) != 0):
-                            if (len(self.attacker_address_sflow) != 0 and len(self.attacker_port_sflow) != 0 and Count):
-                                i = j = 0
-                                while i < len(self.attacker_address_sflow):
-                                    if (row[0] == self.attacker_address_sflow[i]):
-                                        for j in range(len(self.attacker_port_sflow)):
-                                            if (row[3] == self.attacker_port_sflow[j] and int(row[2]) ==
-                                                self.proto_src_sflow[j]):
-                                                i = len(self.attacker_address_sflow)
-                                                Count = False
-                                                break;
-                                    i += 1
-                            elif (len(self.attacker_address_sflow) != 0 and len(self.attacker_port_sflow) == 0 and Count):
-                                i = j = 0
-                                while i < len(self.attacker_address_sflow):
-                                    if (row[0] == self.attacker_address_sflow[i]):
-                                        i = len(self.attacker_address_sflow)
-                                        Count = False
-                                        break;
-                                    i += 1
-                            elif (len(self.victim_address_sflow) != 0 and len(self.victim_port_sflow) != 0 and Count):
-                                i = j = 0
-                                while i < len(self.victim_address_sflow):
-                                    if (row[0] == self.victim_address_sflow[i]):
-                                        for j in range(len(self.victim_port_sflow)):
-                                            if (row[3] == self.victim_port_sflow[j] and int(row[2]) ==
-                                                self.proto_dst_sflow[j]):
-                                                i = len(self.victim_address_sflow)
-                                                Count = False
-                                                break;
-                                    i += 1
-                            elif (len(self.victim_address_sflow) != 0 and len(self.victim_port_sflow) == 0 and Count):
-                                i = j = 0
-                                while i < len(self.victim_address_sflow):
-                                    if (row[0] == self.victim_address_sflow[i]):
-                                        i = len(self.victim_address_sflow)
-                                        Count = False
-                                        break;
-                                    i += 1
-
-                        if (Count):
-                            # Counters:
-                            # IP_Src
-                            if (row[0] in self.ipsrc):
-                                new_state = self.ipsrc[row[0]] + 1
-                                self.ipsrc[row[0]] = new_state
-                            else:
-                                self.ipsrc[row[0]] = 1
-                            # IP_Dst
-                            if (row[1] in self.ipdst):
-                                new_state = self.ipdst[row[1]] + 1
-                                self.ipdst[row[1]] = new_state
-                            else:
-                                self.ipdst[row[1]] = 1
-                            # Port_Src/Dst
-                            # UDP
-                            if (row[2] == '17'):
-                                # UDP_Port_Src
-                                if (row[3] in self.udp_portsrc):
-                                    new_state = self.udp_portsrc[row[3]] + 1
-                                    self.udp_portsrc[row[3]] = new_state
-                                else:
-                                    self.udp_portsrc[row[3]] = 1
-                                # UDP_Port_Dst
-                                if (row[4] in self.udp_portdst):
-                                    new_state = self.udp_portdst[row[4]] + 1
-                                    self.udp_portdst[row[4]] = new_state
-                                else:
-                                    self.udp_portdst[row[4]] = 1
-                            # TCP
-                            elif (row[2] == '6'):
-                                # TCP_Port_Src
-                                if (row[3] in self.tcp_portsrc):
-                                    new_state = self.tcp_portsrc[row[3]] + 1
-                                    self.tcp_portsrc[row[3]] = new_state
-                                    self.portsrc[row[3]] = new_state
-                                else:
-                                    self.tcp_portsrc[row[3]] = 1
-                                    self.portsrc[row[3]] = 1
-                                # TCP_Port_Dst
-                                if (row[4] in self.tcp_portdst):
-                                    new_state = self.tcp_portdst[row[4]] + 1
-                                    self.tcp_portdst[row[4]] = new_state
-                                    self.portdst[row[4]] = new_state
-                                else:
-                                    self.tcp_portdst[row[4]] = 1
-                                    self.portdst[row[4]] = 1
-            csvfile.close()
+    @set_ev_cls(xflow_event.EventXFlowSummary)
+    def _xflow_summary_handler(self, ev):
+        self.getsFlowvalues(ev.flows)
+        if (len(self.udp_portdst) != 0 or len(self.tcp_portdst) != 0):  # If counters are != 0
+            self.entropy_computation()
+
+    def isMitigated(self, ip_src, proto, port_src):
+        # Do not count features if we have mitigate the attack
+        if (len(self.attacker_address_sflow) == 0 or len(self.victim_address_sflow) == 0 or
+                len(self.attacker_port_sflow) == 0 or len(self.victim_port_sflow) == 0):
+            return False
+        if ip_src not in self.attacker_address_sflow:
+            return False
+        for j in range(len(self.attacker_port_sflow)):
+            if (port_src == self.attacker_port_sflow[j] and proto == self.proto_src_sflow[j]):
+                return True
+        return False
+
+    def getsFlowvalues(self, flows):
+        # flows: (ip_src, ip_dst, proto, port_src, port_dst) -> sampled packets of the window
+        for (ip_src, ip_dst, proto, port_src, port_dst), count in flows.items():
+            if (proto not in (in_proto.IPPROTO_ICMP, in_proto.IPPROTO_TCP, in_proto.IPPROTO_UDP) or
+                    ip_dst == 0xffffffff):  # only TCP, UDP and ICMP packets; NOT TO BROADCAST DST
+                continue
+            ip_src = ipv4_to_str(ip_src)
+            port_src = str(port_src)
+            if self.isMitigated(ip_src, proto, port_src):
+                continue
+            ip_dst = ipv4_to_str(ip_dst)
+            port_dst = str(port_dst)
+
+            # Counters:
+            self.ipsrc[ip_src] = self.ipsrc.get(ip_src, 0) + count
+            self.ipdst[ip_dst] = self.ipdst.get(ip_dst, 0) + count
+            # Port_Src/Dst
+            if (proto == in_proto.IPPROTO_UDP):
+                self.udp_portsrc[port_src] = self.udp_portsrc.get(port_src, 0) + count
+                self.udp_portdst[port_dst] = self.udp_portdst.get(port_dst, 0) + count
+            elif (proto == in_proto.IPPROTO_TCP):
+                self.tcp_portsrc[port_src] = self.tcp_portsrc.get(port_src, 0) + count
+                self.tcp_portdst[port_dst] = self.tcp_portdst.get(port_dst, 0) + count
+        # TCP ports; the UDP ports are added by entropy_computation()
+        self.portsrc.update(self.tcp_portsrc)
+        self.portdst.update(self.tcp_portdst)
 
     def mean(self, mylist):
         return float(sum(mylist)) / len(mylist) if len(mylist) > 0 else float('nan')
@@ -530,58 +450,22 @@ class SimpleMonitor(app_manager.RyuApp):
         self.abscisse_time.append(timewindow * self.timer)
         self.timer += 1
 
-        with open('sflow_entropy.csv', 'ab') as csvfile:
-            writer = csv.writer(csvfile, delimiter=',', quoting=csv.QUOTE_MINIMAL, lineterminator='\n')
-            writer.writerow(
-                [self.abscisse_time[-1], self.entropy_ipsrc[-1], self.entropy_ipdst[-1], self.entropy_portsrc[-1],
-                 self.entropy_portdst[-1]])
-            csvfile.close()
-
-        with open('sflow_counters.csv', 'ab') as csvfile:
-            writer = csv.writer(csvfile, delimiter=';', quoting=csv.QUOTE_MINIMAL, lineterminator='\n')
-            for index in self.ipsrc:
-                writer.writerow([self.abscisse_time[-1], index, self.ipsrc[index], None, None, None, None, None, None])
-            for index in self.ipdst:
-                writer.writerow([self.abscisse_time[-1], None, None, index, self.ipdst[index], None, None, None, None])
-            for index in self.portsrc:
-                writer.writerow(
-                    [self.abscisse_time[-1], None, None, None, None, index, self.portsrc[index], None, None])
-            for index in self.portdst:
-                writer.writerow(
-                    [self.abscisse_time[-1], None, None, None, None, None, None, index, self.portdst[index]])
-            csvfile.close()
-
-        with open('sflow_counter_ip_src.csv', 'wb') as csvfile:
-            writer = csv.writer(csvfile, delimiter=';', quoting=csv.QUOTE_MINIMAL, lineterminator='\n')
-            writer.writerow(["IP Src", " IP Src ID", " State"])
-            positionID = 1
-            for index in self.ipsrc:
-                writer.writerow([index, positionID, self.ipsrc[index]])
-                positionID += 1
-            csvfile.close()
-
-        with open('sflow_counter_ip_dst.csv', 'wb') as csvfile:
-            writer = csv.writer(csvfile, delimiter=';', quoting=csv.QUOTE_MINIMAL, lineterminator='\n')
-            writer.writerow(["IP Dst", " IP Dst ID", " State"])
-            positionID = 1
-            for index in self.ipdst:
-                writer.writerow([index, positionID, self.ipdst[index]])
-                positionID += 1
-            csvfile.close()
-
-        with open('sflow_counter_port_src.csv', 'wb') as csvfile:
-            writer = csv.writer(csvfile, delimiter=',', quoting=csv.QUOTE_MINIMAL, lineterminator='\n')
-            writer.writerow(["Port Src", " State"])
-            for index in self.portsrc:
-                writer.writerow([index, self.portsrc[index]])
-            csvfile.close()
-
-        with open('sflow_counter_port_dst.csv', 'wb') as csvfile:
-            writer = csv.writer(csvfile, delimiter=',', quoting=csv.QUOTE_MINIMAL, lineterminator='\n')
-            writer.writerow(["Port Dst", " State"])
-            for index in self.portdst:
-                writer.writerow([index, self.portdst[index]])
-            csvfile.close()
+        # Written off the event loop; the dictionaries are copied as they are cleared afterwards
+        self.telemetry.write('entropy', {'time': self.abscisse_time[-1],
+                                         'ip_src': self.entropy_ipsrc[-1],
+                                         'ip_dst': self.entropy_ipdst[-1],
+                                         'port_src': self.entropy_portsrc[-1],
+                                         'port_dst': self.entropy_portdst[-1]})
+        for counters, series, key in ((self.ipsrc, 'ip_src', 'ip'),
+                                      (self.ipdst, 'ip_dst', 'ip'),
+                                      (self.portsrc, 'port_src', 'port'),
+                                      (self.portdst, 'port_dst', 'port')):
+            self.telemetry.write(series, {'time': self.abscisse_time[-1],
+                                          key: list(counters.keys()),
+                                          'state': list(counters.values())})
+
+    def close(self):
+        self.telemetry.stop()
 
     def printcounters(self):
         # Print the state stats of the dictionaries
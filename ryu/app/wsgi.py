@@ -15,11 +15,14 @@
 # limitations under the License.
 
 import inspect
+import json
 from types import MethodType
 
+import six
 import webob.dec
 from webob.response import Response
 from ryu import cfg
+from ryu import flags  # noqa: registers wsapi-host and wsapi-port
 from ryu.lib import hub
 from routes import Mapper
 from routes.util import URLGenerator
@@ -35,10 +38,6 @@ from tinyrpc.client import RPCClient
 ryu.contrib.restore_module_path()
 
 CONF = cfg.CONF
-CONF.register_cli_opts([
-    cfg.StrOpt('wsapi-host', default='', help='webapp listen host'),
-    cfg.IntOpt('wsapi-port', default=8080, help='webapp listen port')
-])
 
 HEX_PATTERN = r'0x[0-9a-z]+'
 DIGIT_PATTERN = r'[1-9][0-9]*'
@@ -56,6 +55,38 @@ def route(name, path, methods=None, requirements=None):
     return _route
 
 
+def load_json_records(body):
+    """
+    Decode a request body holding a JSON array, or a stream of newline
+    delimited JSON values (NDJSON), into a list.
+
+    A body holding a single JSON object, on one or several lines, is
+    returned as a list of one element.  Raises ValueError when the body
+    cannot be decoded.
+    """
+    if isinstance(body, six.binary_type):
+        body = body.decode('utf-8')
+    body = body.strip()
+    try:
+        value = json.loads(body)
+    except ValueError:
+        # not a single JSON value, so NDJSON
+        pass
+    else:
+        return value if isinstance(value, list) else [value]
+
+    records = []
+    for lineno, line in enumerate(body.splitlines(), 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            records.append(json.loads(line))
+        except ValueError as e:
+            raise ValueError('line %d: %s' % (lineno, e))
+    return records
+
+
 class WebSocketRegistrationWrapper(object):
 
     def __init__(self, func, controller):
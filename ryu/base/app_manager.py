@@ -32,11 +32,11 @@ import gc
 
 from ryu import cfg
 from ryu import utils
-from ryu.app import wsgi
 from ryu.controller.handler import register_instance, get_dependent_services
 from ryu.controller.controller import Datapath
 from ryu.controller import event
 from ryu.controller.event import EventRequestBase, EventReplyBase
+from ryu.lib import dispatch_stats
 from ryu.lib import hub
 from ryu.ofproto import ofproto_protocol
 
@@ -44,11 +44,27 @@ LOG = logging.getLogger('ryu.base.app_manager')
 
 SERVICE_BRICKS = {}
 
+# ev_cls -> number of changes of its handlers and observers
+_EVENT_GENERATIONS = {}
+
 
 def lookup_service_brick(name):
     return SERVICE_BRICKS.get(name)
 
 
+def event_generation(ev_cls):
+    """
+    Returns a number which changes whenever a handler or an observer
+    of ev_cls is registered or unregistered, so that data derived from
+    them can be cached.
+    """
+    return _EVENT_GENERATIONS.get(ev_cls, 0)
+
+
+def _event_changed(ev_cls):
+    _EVENT_GENERATIONS[ev_cls] = _EVENT_GENERATIONS.get(ev_cls, 0) + 1
+
+
 def _lookup_service_brick_by_ev_cls(ev_cls):
     return _lookup_service_brick_by_mod_name(ev_cls.__module__)
 
@@ -66,6 +82,8 @@ def register_app(app):
 
 def unregister_app(app):
     SERVICE_BRICKS.pop(app.name)
+    for ev_cls in app.event_handlers:
+        _event_changed(ev_cls)
 
 
 def require_app(app_name, api_style=False):
@@ -77,8 +95,16 @@ def require_app(app_name, api_style=False):
 
     If this is used for client application module, set api_style=False.
     """
-    iterable = (inspect.getmodule(frame[0]) for frame in inspect.stack())
-    modules = [module for module in iterable if module is not None]
+    # not inspect.stack(), which reads the source of every frame.
+    # the frames of the import machinery are skipped.
+    modules = []
+    frame = sys._getframe()
+    while frame is not None:
+        if not frame.f_code.co_filename.startswith('<'):
+            module = sys.modules.get(frame.f_globals.get('__name__'))
+            if module is not None:
+                modules.append(module)
+        frame = frame.f_back
     if api_style:
         m = modules[2]  # skip a frame for "api" module
     else:
@@ -195,25 +221,30 @@ class RyuApp(object):
         assert callable(handler)
         self.event_handlers.setdefault(ev_cls, [])
         self.event_handlers[ev_cls].append(handler)
+        _event_changed(ev_cls)
 
     def unregister_handler(self, ev_cls, handler):
         assert callable(handler)
         self.event_handlers[ev_cls].remove(handler)
         if not self.event_handlers[ev_cls]:
             del self.event_handlers[ev_cls]
+        _event_changed(ev_cls)
 
     def register_observer(self, ev_cls, name, states=None):
         states = states or set()
         ev_cls_observers = self.observers.setdefault(ev_cls, {})
         ev_cls_observers.setdefault(name, set()).update(states)
+        _event_changed(ev_cls)
 
     def unregister_observer(self, ev_cls, name):
         observers = self.observers.get(ev_cls, {})
         observers.pop(name)
+        _event_changed(ev_cls)
 
     def unregister_observer_all_event(self, name):
-        for observers in self.observers.values():
-            observers.pop(name, None)
+        for ev_cls, observers in self.observers.items():
+            if observers.pop(name, None) is not None:
+                _event_changed(ev_cls)
 
     def observe_event(self, ev_cls, states=None):
         brick = _lookup_service_brick_by_ev_cls(ev_cls)
@@ -278,16 +309,24 @@ class RyuApp(object):
         return req.reply_q.get()
 
     def _event_loop(self):
+        stats = dispatch_stats.STATS
         while self.is_active or not self.events.empty():
-            ev, state = self.events.get()
+            ev, state, queued = self.events.get()
             if ev == self._event_stop:
                 continue
             handlers = self.get_handlers(ev, state)
-            for handler in handlers:
-                handler(ev)
+            if stats.enabled:
+                for handler in handlers:
+                    stats.call(self.name, ev, handler, queued)
+            else:
+                for handler in handlers:
+                    handler(ev)
 
     def _send_event(self, ev, state):
-        self.events.put((ev, state))
+        stats = dispatch_stats.STATS
+        # the time the event is queued, only taken when enabled
+        queued = stats.clock() if stats.enabled else None
+        self.events.put((ev, state, queued))
 
     def send_event(self, name, ev, state=None):
         """
@@ -350,7 +389,9 @@ class AppManager(object):
         app_mgr.load_apps(app_lists)
         contexts = app_mgr.create_contexts()
         services = app_mgr.instantiate_apps(**contexts)
-        webapp = wsgi.start_service(app_mgr)
+        # only the applications with a wsgi context import ryu.app.wsgi
+        wsgi = sys.modules.get('ryu.app.wsgi')
+        webapp = wsgi.start_service(app_mgr) if wsgi else None
         if webapp:
             services.append(hub.spawn(webapp))
         try:
@@ -37,10 +37,10 @@ log.early_init_log(logging.DEBUG)
 
 from ryu import flags
 from ryu import version
-from ryu.app import wsgi
 from ryu.base.app_manager import AppManager
 from ryu.controller import controller
-from ryu.topology import switches
+from ryu.lib import dispatch_stats
+from ryu.lib import profiler
 
 
 CONF = cfg.CONF
@@ -84,13 +84,18 @@ def main(args=None, prog=None):
     if not app_lists:
         app_lists = ['ryu.controller.ofp_handler']
 
+    dispatch_stats.setup()
+    profiler.setup()
+
     app_mgr = AppManager.get_instance()
     app_mgr.load_apps(app_lists)
     contexts = app_mgr.create_contexts()
     services = []
     services.extend(app_mgr.instantiate_apps(**contexts))
 
-    webapp = wsgi.start_service(app_mgr)
+    # only the applications with a wsgi context import ryu.app.wsgi
+    wsgi = sys.modules.get('ryu.app.wsgi')
+    webapp = wsgi.start_service(app_mgr) if wsgi else None
     if webapp:
         thr = hub.spawn(webapp)
         services.append(thr)
@@ -98,6 +103,7 @@ def main(args=None, prog=None):
     try:
         hub.joinall(services)
     finally:
+        profiler.shutdown()
         app_mgr.close()
 
 
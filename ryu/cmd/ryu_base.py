@@ -29,6 +29,7 @@ subcommands = {
     'run': 'ryu.cmd.manager',
     'of-config-cli': 'ryu.cmd.of_config_cli',
     'rpc-cli': 'ryu.cmd.rpc_cli',
+    'telemetry-export': 'ryu.cmd.telemetry_export',
 }
 
 
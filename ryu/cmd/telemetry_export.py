@@ -0,0 +1,149 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# export the telemetry files written by ryu.lib.telemetry to CSV files
+#
+# a usage example:
+#     % ryu telemetry-export --directory=. --prefix=ddos \
+#       --output-dir=csv --series=entropy,ip_src
+#
+# writes csv/ddos-entropy.csv and csv/ddos-ip_src.csv with a row per
+# snapshot, or per element of the sequence columns of a snapshot, the
+# columns in alphabetical order.
+
+from __future__ import print_function
+
+import csv
+import os
+import struct
+
+import six
+
+from ryu import cfg
+from ryu.lib import addrconv
+from ryu.lib import telemetry
+
+
+CONF = cfg.CONF
+CONF.register_cli_opts([
+    cfg.StrOpt('directory', default='.', help='telemetry files directory'),
+    cfg.StrOpt('prefix', default=None, help='telemetry files prefix'),
+    cfg.StrOpt('output-dir', default='.', help='CSV files directory'),
+    cfg.ListOpt('series', default=[], help='series to export (default: all)'),
+    cfg.BoolOpt('last', default=False,
+                help='export only the last snapshot of each series'),
+    cfg.ListOpt('ipv4-columns', default=['ipv4'],
+                help='columns of IPv4 addresses stored as integers'),
+])
+
+
+def _ipv4(value):
+    if isinstance(value, six.integer_types):
+        return addrconv.ipv4.bin_to_text(struct.pack('!I', value))
+    return value
+
+
+def _rows(timestamp, columns, names, ipv4_columns=()):
+    values = [columns.get(name) for name in names]
+    length = None
+    for i, value in enumerate(values):
+        if hasattr(value, 'tolist'):
+            value = value.tolist()
+            values[i] = value
+        if names[i] in ipv4_columns:
+            if isinstance(value, list):
+                value = [_ipv4(v) for v in value]
+            else:
+                value = _ipv4(value)
+            values[i] = value
+        if isinstance(value, list):
+            length = len(value) if length is None else min(length, len(value))
+    if length is None:
+        return [[timestamp] + values]
+    columns = [value if isinstance(value, list) else [value] * length
+               for value in values]
+    return [[timestamp] + list(row) for row in zip(*columns)]
+
+
+def _open(path):
+    if six.PY2:
+        return open(path, 'wb')
+    return open(path, 'w', newline='')
+
+
+class Exporter(object):
+    def __init__(self, output_dir, prefix, ipv4_columns=()):
+        self.output_dir = output_dir
+        self.prefix = prefix
+        self.ipv4_columns = ipv4_columns
+        self._files = {}  # series -> (file, csv writer, column names)
+
+    def write(self, timestamp, series, columns):
+        entry = self._files.get(series)
+        if entry is None:
+            path = os.path.join(self.output_dir,
+                                '%s-%s.csv' % (self.prefix, series))
+            f = _open(path)
+            writer = csv.writer(f, lineterminator='\n')
+            # sorted, as the order of the columns of a snapshot is lost
+            # on Python 2
+            names = sorted(columns.keys())
+            writer.writerow(['timestamp'] + names)
+            entry = (f, writer, names)
+            self._files[series] = entry
+        _f, writer, names = entry
+        writer.writerows(_rows(timestamp, columns, names, self.ipv4_columns))
+
+    def close(self):
+        for f, _writer, _names in self._files.values():
+            f.close()
+        paths = sorted(f.name for f, _writer, _names in self._files.values())
+        self._files = {}
+        return paths
+
+
+def export(directory, prefix, output_dir, series=None, last=False,
+           ipv4_columns=()):
+    """
+    Writes a CSV file per series of the telemetry files of ``prefix``.
+    Returns the paths of the CSV files.
+    """
+    if not os.path.isdir(output_dir):
+        os.makedirs(output_dir)
+    exporter = Exporter(output_dir, prefix, ipv4_columns)
+    snapshots = telemetry.read(telemetry.list_files(directory, prefix))
+    if series:
+        snapshots = (snapshot for snapshot in snapshots
+                     if snapshot[1] in series)
+    if last:
+        latest = {}
+        for timestamp, name, columns in snapshots:
+            latest[name] = (timestamp, name, columns)
+        snapshots = sorted(latest.values(), key=lambda s: s[1])
+    for timestamp, name, columns in snapshots:
+        exporter.write(timestamp, name, columns)
+    return exporter.close()
+
+
+def main(args=None, prog=None):
+    CONF(args=args, prog=prog, project='telemetry-export',
+         version='telemetry-export')
+    if not CONF.prefix:
+        raise SystemExit('--prefix is required')
+    for path in export(CONF.directory, CONF.prefix, CONF.output_dir,
+                       CONF.series, CONF.last, CONF.ipv4_columns):
+        print(path)
+
+
+if __name__ == "__main__":
+    main()
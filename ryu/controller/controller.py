@@ -34,6 +34,7 @@ from socket import IPPROTO_TCP, TCP_NODELAY, timeout as SocketTimeout, error as
 import warnings
 
 import ryu.base.app_manager
+from ryu.exception import OFPRequestError, OFPRequestTimeout
 
 from ryu.ofproto import ofproto_common
 from ryu.ofproto import ofproto_parser
@@ -45,6 +46,8 @@ from ryu.controller import handler
 from ryu.controller import ofp_event
 
 from ryu.lib.dpid import dpid_to_str
+from ryu.lib import dispatch_stats
+from ryu.lib import timer
 
 LOG = logging.getLogger('ryu.controller.controller')
 
@@ -108,6 +111,81 @@ def _deactivate(method):
     return deactivate
 
 
+# default number of seconds to wait for a reply of send_request().
+DEFAULT_REQUEST_TIMEOUT = 5.0
+
+# default number of messages serialized into one write by
+# send_msgs_and_wait().
+DEFAULT_SEND_BATCH_SIZE = 1024
+
+# timeouts of the pending requests of all datapaths.
+_request_timer = timer.TimerScheduler()
+
+# messages a switch sends on its own, which are never replies.
+_ASYNC_MSG_TYPE_NAMES = ['OFPT_HELLO', 'OFPT_ECHO_REQUEST', 'OFPT_PACKET_IN',
+                         'OFPT_FLOW_REMOVED', 'OFPT_PORT_STATUS',
+                         'OFPT_ROLE_STATUS', 'OFPT_TABLE_STATUS',
+                         'OFPT_REQUESTFORWARD', 'OFPT_CONTROLLER_STATUS']
+
+
+def _async_msg_types(ofproto):
+    return frozenset(getattr(ofproto, name) for name in _ASYNC_MSG_TYPE_NAMES
+                     if hasattr(ofproto, name))
+
+
+def _multipart_reply_type(ofproto):
+    return getattr(ofproto, 'OFPT_MULTIPART_REPLY',
+                   getattr(ofproto, 'OFPT_STATS_REPLY', None))
+
+
+class RequestFuture(object):
+    """
+    The pending reply of a request sent by Datapath.send_request().
+
+    ``result()`` blocks the calling greenlet until the reply arrives and
+    returns the reply message, or the list of reply messages for
+    a multipart (stats) request.  OFPRequestError is raised if the
+    switch returned an error message or the connection was closed,
+    OFPRequestTimeout if no reply arrived in time.
+    """
+
+    def __init__(self, datapath, msg, multipart, timeout):
+        self.datapath = datapath
+        self.msg = msg
+        self.multipart = multipart
+        self.timeout = timeout
+        self.replies = []
+        self.exception = None
+        self._event = hub.Event()
+        self._timer = None
+
+    def done(self):
+        return self._event.is_set()
+
+    def result(self, timeout=None):
+        if not self._event.wait(timeout=timeout):
+            raise OFPRequestTimeout(xid=self.msg.xid)
+        if self.exception is not None:
+            raise self.exception
+        if self.multipart:
+            return self.replies
+        return self.replies[0]
+
+    def cancel(self):
+        """
+        Stop waiting for the reply.
+        Replies which arrive later are dispatched as usual events.
+        """
+        self.datapath._finish_request(self.msg.xid)
+
+    def _finish(self, exception=None):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self.exception = exception
+        self._event.set()
+
+
 class Datapath(ofproto_protocol.ProtocolDesc):
     def __init__(self, socket, address):
         super(Datapath, self).__init__()
@@ -129,6 +207,8 @@ class Datapath(ofproto_protocol.ProtocolDesc):
         self._ports = None
         self.flow_format = ofproto_v1_0.NXFF_OPENFLOW10
         self.ofp_brick = ryu.base.app_manager.lookup_service_brick('ofp_event')
+        self._requests = {}     # xid -> RequestFuture
+        self._async_msg_types = frozenset()
         self.set_state(handler.HANDSHAKE_DISPATCHER)
 
     def _get_ports(self):
@@ -167,6 +247,7 @@ class Datapath(ofproto_protocol.ProtocolDesc):
         required_len = ofproto_common.OFP_HEADER_SIZE
 
         count = 0
+        stats = dispatch_stats.STATS
         while True:
             ret = ""
 
@@ -192,6 +273,12 @@ class Datapath(ofproto_protocol.ProtocolDesc):
                 msg = ofproto_parser.msg(
                     self, version, msg_type, msg_len, xid, buf[:msg_len])
                 # LOG.debug('queue msg %s cls %s', msg, msg.__class__)
+                if msg and stats.enabled:
+                    stats.count_msg(self.id, msg)
+                if msg and self._requests:
+                    # wake a greenlet waiting in send_request(); the
+                    # reply is dispatched to the applications as well.
+                    self._recv_reply(msg)
                 if msg:
                     ev = ofp_event.ofp_msg_to_ev(msg)
                     self.ofp_brick.send_event_to_observers(ev, self.state)
@@ -200,8 +287,12 @@ class Datapath(ofproto_protocol.ProtocolDesc):
                     handlers = [handler for handler in
                                 self.ofp_brick.get_handlers(ev) if
                                 self.state in dispatchers(handler)]
-                    for handler in handlers:
-                        handler(ev)
+                    if stats.enabled:
+                        for handler in handlers:
+                            stats.call(self.ofp_brick.name, ev, handler)
+                    else:
+                        for handler in handlers:
+                            handler(ev)
 
                 buf = buf[required_len:]
                 required_len = ofproto_common.OFP_HEADER_SIZE
@@ -254,6 +345,107 @@ class Datapath(ofproto_protocol.ProtocolDesc):
         LOG.debug('send_msg %s', msg)
         self.send(msg.buf)
 
+    def send_msgs(self, msgs):
+        """
+        Serialize the given messages and queue them as a single buffer,
+        so that a batch costs one send queue entry and one write.
+        """
+        bufs = []
+        for msg in msgs:
+            assert isinstance(msg, self.ofproto_parser.MsgBase)
+            if msg.xid is None:
+                self.set_xid(msg)
+            msg.serialize()
+            bufs.append(bytes(msg.buf))
+        if bufs:
+            LOG.debug('send_msgs %d messages', len(bufs))
+            self.send(b''.join(bufs))
+
+    def send_request(self, msg, timeout=DEFAULT_REQUEST_TIMEOUT):
+        """
+        Send a request message and return a RequestFuture for its reply.
+
+        The reply (all the parts of a multipart reply, or an error
+        message with the same xid) is handed to the future directly
+        from the receive loop, then dispatched as an event to the
+        applications like any other message.  ``timeout`` is the number
+        of seconds to wait for the (next part of the) reply.
+        """
+        if msg.xid is None:
+            self.set_xid(msg)
+        ofproto = self.ofproto
+        multipart = (getattr(ofproto, 'OFPT_MULTIPART_REQUEST', None) or
+                     getattr(ofproto, 'OFPT_STATS_REQUEST', None))
+        future = RequestFuture(self, msg, msg.cls_msg_type == multipart,
+                               timeout)
+        if not self._async_msg_types:
+            self._async_msg_types = _async_msg_types(ofproto)
+        self._requests[msg.xid] = future
+        _request_timer.start()
+        future._timer = _request_timer.call_later(
+            timeout, self._request_timeout, msg.xid)
+        self.send_msg(msg)
+        return future
+
+    def send_barrier_and_wait(self, timeout=DEFAULT_REQUEST_TIMEOUT):
+        """
+        Send a barrier request and block until the switch replies,
+        i.e. until every message sent before has been processed.
+        Returns the barrier reply message.
+        """
+        barrier = self.ofproto_parser.OFPBarrierRequest(self)
+        return self.send_request(barrier, timeout).result()
+
+    def send_msgs_and_wait(self, msgs, batch_size=DEFAULT_SEND_BATCH_SIZE,
+                           timeout=DEFAULT_REQUEST_TIMEOUT):
+        """
+        Send the messages coalesced into writes of ``batch_size``
+        messages, then block until the switch has processed all of them
+        (see send_barrier_and_wait()).  Does nothing if ``msgs`` is
+        empty.
+        """
+        if not msgs:
+            return None
+        for i in range(0, len(msgs), batch_size):
+            self.send_msgs(msgs[i:i + batch_size])
+        return self.send_barrier_and_wait(timeout)
+
+    def _recv_reply(self, msg):
+        future = self._requests.get(msg.xid)
+        if future is None or msg.msg_type in self._async_msg_types:
+            return False
+
+        if msg.msg_type == self.ofproto.OFPT_ERROR:
+            self._finish_request(msg.xid, OFPRequestError(
+                xid=msg.xid, reason='error type %s code %s' % (
+                    msg.type, getattr(msg, 'code', None)), error_msg=msg))
+            return True
+
+        future.replies.append(msg)
+        if (future.multipart and
+                msg.msg_type == _multipart_reply_type(self.ofproto) and
+                msg.flags & 0x1):
+            # OFPSF_REPLY_MORE/OFPMPF_REPLY_MORE: wait for the next part.
+            future._timer.cancel()
+            future._timer = _request_timer.call_later(
+                future.timeout, self._request_timeout, msg.xid)
+            return True
+        self._finish_request(msg.xid)
+        return True
+
+    def _request_timeout(self, xid):
+        self._finish_request(xid, OFPRequestTimeout(xid=xid))
+
+    def _finish_request(self, xid, exception=None):
+        future = self._requests.pop(xid, None)
+        if future is not None:
+            future._finish(exception)
+
+    def _cancel_requests(self):
+        for xid in list(self._requests):
+            self._finish_request(xid, OFPRequestError(
+                xid=xid, reason='connection closed'))
+
     def serve(self):
         send_thr = hub.spawn(self._send_loop)
 
@@ -266,6 +458,7 @@ class Datapath(ofproto_protocol.ProtocolDesc):
         finally:
             hub.kill(send_thr)
             hub.joinall([send_thr])
+            self._cancel_requests()
 
     #
     # Utility methods for convenience
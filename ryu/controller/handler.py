@@ -121,6 +121,7 @@ def register_service(service):
     This mechanism is used to e.g. automatically start ofp_handler if
     there are applications consuming OFP events.
     """
-    frm = inspect.stack()[1]
-    m = inspect.getmodule(frm[0])
+    # not inspect.stack(), which reads the source of every frame
+    frm = sys._getframe(1)
+    m = sys.modules[frm.f_globals['__name__']]
     m._SERVICE_NAME = service
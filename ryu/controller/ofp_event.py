@@ -21,7 +21,6 @@ OpenFlow event definitions.
 import inspect
 
 from ryu.controller import handler
-from ryu import ofproto
 from ryu import utils
 from . import event
 
@@ -49,11 +48,19 @@ def ofp_msg_to_ev(msg):
 
 def ofp_msg_to_ev_cls(msg_cls):
     name = _ofp_msg_name_to_ev_name(msg_cls.__name__)
-    return _OFP_MSG_EVENTS[name]
+    ev_cls = _OFP_MSG_EVENTS.get(name)
+    if ev_cls is None:
+        _create_ofp_msg_ev_class(msg_cls)
+        ev_cls = _OFP_MSG_EVENTS[name]
+    return ev_cls
 
 
 def _create_ofp_msg_ev_class(msg_cls):
-    name = _ofp_msg_name_to_ev_name(msg_cls.__name__)
+    _create_ofp_msg_ev_class_by_name(msg_cls.__name__)
+
+
+def _create_ofp_msg_ev_class_by_name(msg_name):
+    name = _ofp_msg_name_to_ev_name(msg_name)
     # print 'creating ofp_event %s' % name
 
     if name in _OFP_MSG_EVENTS:
@@ -74,10 +81,54 @@ def _create_ofp_msg_ev_from_module(ofp_parser):
         _create_ofp_msg_ev_class(cls)
 
 
-for ofp_mods in ofproto.get_ofp_modules().values():
-    ofp_parser = ofp_mods[1]
-    # print 'loading module %s' % ofp_parser
-    _create_ofp_msg_ev_from_module(ofp_parser)
+# The message classes of the ofproto_vX_parser modules, the ones with
+# cls_msg_type.  The events are created from these names so that the
+# parsers are only imported when a datapath uses their version.
+# test_ofp_event checks that this list matches the parsers.
+_OFP_MSG_NAMES = (
+    'NXAggregateStatsReply', 'NXAggregateStatsRequest', 'NXFlowStatsReply',
+    'NXFlowStatsRequest', 'NXStatsReply', 'NXStatsRequest', 'NXTFlowAge',
+    'NXTFlowMod', 'NXTFlowModTableId', 'NXTFlowRemoved', 'NXTPacketIn',
+    'NXTRoleReply', 'NXTRoleRequest', 'NXTSetAsyncConfig',
+    'NXTSetControllerId', 'NXTSetFlowFormat', 'NXTSetPacketInFormat',
+    'NiciraHeader', 'OFPAggregateStatsReply', 'OFPAggregateStatsRequest',
+    'OFPBarrierReply', 'OFPBarrierRequest', 'OFPBundleAddMsg',
+    'OFPBundleCtrlMsg', 'OFPBundleFeaturesStatsReply',
+    'OFPBundleFeaturesStatsRequest', 'OFPControllerStatus',
+    'OFPControllerStatusStatsReply', 'OFPControllerStatusStatsRequest',
+    'OFPDescStatsReply', 'OFPDescStatsRequest', 'OFPEchoReply',
+    'OFPEchoRequest', 'OFPErrorExperimenterMsg', 'OFPErrorMsg',
+    'OFPExperimenter', 'OFPExperimenterStatsReply',
+    'OFPExperimenterStatsRequest', 'OFPExperimenterStatsRequestBase',
+    'OFPFeaturesRequest', 'OFPFlowDescStatsReply', 'OFPFlowDescStatsRequest',
+    'OFPFlowMod', 'OFPFlowMonitorReply', 'OFPFlowMonitorRequest',
+    'OFPFlowMonitorRequestBase', 'OFPFlowRemoved', 'OFPFlowStatsReply',
+    'OFPFlowStatsRequest', 'OFPFlowStatsRequestBase', 'OFPGetAsyncReply',
+    'OFPGetAsyncRequest', 'OFPGetConfigReply', 'OFPGetConfigRequest',
+    'OFPGroupDescStatsReply', 'OFPGroupDescStatsRequest',
+    'OFPGroupFeaturesStatsReply', 'OFPGroupFeaturesStatsRequest',
+    'OFPGroupMod', 'OFPGroupStatsReply', 'OFPGroupStatsRequest', 'OFPHello',
+    'OFPMeterConfigStatsReply', 'OFPMeterConfigStatsRequest',
+    'OFPMeterDescStatsReply', 'OFPMeterDescStatsRequest',
+    'OFPMeterFeaturesStatsReply', 'OFPMeterFeaturesStatsRequest',
+    'OFPMeterMod', 'OFPMeterStatsReply', 'OFPMeterStatsRequest',
+    'OFPMultipartReply', 'OFPMultipartRequest', 'OFPPacketIn', 'OFPPacketOut',
+    'OFPPortDescStatsReply', 'OFPPortDescStatsRequest', 'OFPPortMod',
+    'OFPPortStatsReply', 'OFPPortStatsRequest', 'OFPPortStatus',
+    'OFPQueueDescStatsReply', 'OFPQueueDescStatsRequest',
+    'OFPQueueGetConfigReply', 'OFPQueueGetConfigRequest',
+    'OFPQueueStatsReply', 'OFPQueueStatsRequest', 'OFPRequestForward',
+    'OFPRoleReply', 'OFPRoleRequest', 'OFPRoleStatus', 'OFPSetAsync',
+    'OFPSetConfig', 'OFPStatsReply', 'OFPSwitchFeatures',
+    'OFPTableDescStatsReply', 'OFPTableDescStatsRequest',
+    'OFPTableFeaturesStatsReply', 'OFPTableFeaturesStatsRequest',
+    'OFPTableMod', 'OFPTableStatsReply', 'OFPTableStatsRequest',
+    'OFPTableStatus', 'OFPVendor', 'OFPVendorStatsReply',
+    'OFPVendorStatsRequest', 'ONFFlowMonitorStatsRequest',
+)
+
+for _msg_name in _OFP_MSG_NAMES:
+    _create_ofp_msg_ev_class_by_name(_msg_name)
 
 
 class EventOFPStateChange(event.EventBase):
@@ -25,6 +25,7 @@ import warnings
 import ryu.base.app_manager
 
 from ryu.lib import hub
+from ryu.lib import ofp_pktinfilter
 from ryu import utils
 from ryu.controller import ofp_event
 from ryu.controller.controller import OpenFlowController
@@ -33,7 +34,6 @@ from ryu.controller.handler import HANDSHAKE_DISPATCHER, CONFIG_DISPATCHER,\
     MAIN_DISPATCHER
 from ryu.ofproto import ofproto_parser
 from ryu.ofproto.ofproto_common import BEBA_EXPERIMENTER_ID
-import ryu.ofproto.beba_v1_0_parser as bebaparser
 
 
 # The state transition: HANDSHAKE -> CONFIG -> MAIN
@@ -54,6 +54,53 @@ class OFPHandler(ryu.base.app_manager.RyuApp):
     def __init__(self, *args, **kwargs):
         super(OFPHandler, self).__init__(*args, **kwargs)
         self.name = 'ofp_event'
+        # packet-in classification; rebuilt when the handlers or the
+        # observers of EventOFPPacketIn change.
+        self._pkt_in_generation = None
+        self._pkt_in_filters = {}
+        self._pkt_in_classifier = None
+
+    def get_observers(self, ev, state):
+        observers = super(OFPHandler, self).get_observers(ev, state)
+        if ev.__class__ is ofp_event.EventOFPPacketIn and observers:
+            observers = self._filter_packet_in_observers(ev, observers)
+        return observers
+
+    def _filter_packet_in_observers(self, ev, observers):
+        generation = ryu.base.app_manager.event_generation(
+            ofp_event.EventOFPPacketIn)
+        if generation != self._pkt_in_generation:
+            self._build_packet_in_classifier()
+            self._pkt_in_generation = generation
+
+        if self._pkt_in_classifier is None:
+            return observers
+        matches = self._pkt_in_classifier.classify(ev.msg)
+        ev.pkt_in_matches = matches
+        filters = self._pkt_in_filters
+        return [name for name in observers
+                if filters.get(name) is None or filters[name] & matches]
+
+    def _build_packet_in_classifier(self):
+        filters = {}
+        all_matches = []
+        for name in self.observers.get(ofp_event.EventOFPPacketIn, {}):
+            app = ryu.base.app_manager.lookup_service_brick(name)
+            hs = (app.event_handlers.get(ofp_event.EventOFPPacketIn, [])
+                  if app else [])
+            matches = [getattr(h, 'pkt_in_match', None) for h in hs]
+            if not matches or None in matches:
+                # this application wants every packet-in.
+                filters[name] = None
+            else:
+                filters[name] = frozenset(matches)
+                all_matches.extend(matches)
+        self._pkt_in_filters = filters
+        self._pkt_in_classifier = None
+        if all_matches:
+            self._pkt_in_classifier = ofp_pktinfilter.PacketInClassifier(
+                all_matches)
+            self.logger.debug('packet-in classifier: %s', all_matches)
 
     def start(self):
         super(OFPHandler, self).start()
@@ -270,6 +317,8 @@ class OFPHandler(ryu.base.app_manager.RyuApp):
     def exp_error_msg_handler(self, ev):
         msg = ev.msg
         if msg.experimenter == BEBA_EXPERIMENTER_ID:
+            # not imported with the module, it pulls the OF1.3 parser
+            import ryu.ofproto.beba_v1_0_parser as bebaparser
             bebaparser.OFPErrorExperimenterMsg_handler(ev)
         '''
         elif experimenter_id == {OTHER_EXPERIMENTER_ID}:
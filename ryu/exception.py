@@ -39,6 +39,14 @@ class OFPMalformedMessage(RyuException):
     message = 'malformed message'
 
 
+class OFPRequestTimeout(RyuException):
+    message = 'no reply for the request xid %(xid)s'
+
+
+class OFPRequestError(RyuException):
+    message = 'request xid %(xid)s failed: %(reason)s'
+
+
 class NetworkNotFound(RyuException):
     message = 'no such network id %(network_id)s'
 
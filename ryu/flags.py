@@ -21,6 +21,23 @@ from ryu import cfg
 
 CONF = cfg.CONF
 
+# The options of the modules which ryu-manager only imports if an
+# application uses them.  They are registered here as the command line
+# is parsed before the applications are loaded.
+CONF.register_cli_opts([
+    # app/wsgi
+    cfg.StrOpt('wsapi-host', default='', help='webapp listen host'),
+    cfg.IntOpt('wsapi-port', default=8080, help='webapp listen port'),
+    # topology/switches
+    cfg.BoolOpt('observe-links', default=False,
+                help='observe link discovery events.'),
+    cfg.BoolOpt('install-lldp-flow', default=True,
+                help='link discovery: explicitly install flow entry '
+                     'to send lldp packet to controller'),
+    cfg.BoolOpt('explicit-drop', default=True,
+                help='link discovery: explicitly drop lldp packet in')
+])
+
 CONF.register_cli_opts([
     # tests/switch/tester
     cfg.StrOpt('target', default='0000000000000001', help='target sw dp-id'),
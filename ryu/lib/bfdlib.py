@@ -35,7 +35,7 @@ Please note that:
 
 import logging
 import six
-import time
+import struct
 import random
 
 from ryu.base import app_manager
@@ -48,8 +48,10 @@ from ryu.ofproto.ether import ETH_TYPE_IP, ETH_TYPE_ARP
 from ryu.ofproto import ofproto_v1_3
 from ryu.ofproto import inet
 from ryu.lib import ofctl_v1_3
-from ryu.lib import hub
+from ryu.lib import addrconv
+from ryu.lib import timer
 from ryu.lib.packet import packet
+from ryu.lib.packet import packet_utils
 from ryu.lib.packet import ethernet
 from ryu.lib.packet import ipv4
 from ryu.lib.packet import udp
@@ -66,6 +68,8 @@ UINT32_MAX = (1 << 32) - 1
 BFD_CONTROL_UDP_PORT = 3784
 BFD_ECHO_UDP_PORT = 3785
 
+_ETH_TYPE_IP_BIN = struct.pack('!H', ETH_TYPE_IP)
+
 
 class BFDSession(object):
     """BFD Session class.
@@ -170,7 +174,10 @@ class BFDSession(object):
         # _enable_send indicates the switch of the periodic transmission of
         # BFD Control packets.
         self._enable_send = True
-        self._lock = None
+        # Timers of this session driven by the shared scheduler of BFDLib.
+        self._xmit_timer = None
+        self._detect_timer = None
+        self._last_rx = 0
 
         # L2/L3/L4 Header fields
         self.src_mac = src_mac
@@ -181,6 +188,10 @@ class BFDSession(object):
         self.src_port = src_port
         self.dst_port = BFD_CONTROL_UDP_PORT
 
+        # Prebuilt frame of unauthenticated BFD Control packets.
+        self._template = None
+        self._update_template()
+
         if dst_mac == "FF:FF:FF:FF:FF:FF" or dst_ip == "255.255.255.255":
             self._remote_addr_config = False
         else:
@@ -191,8 +202,8 @@ class BFDSession(object):
         self.datapath = None
         self.ofport = ofport
 
-        # Spawn a periodic transmission loop for BFD Control packets.
-        hub.spawn(self._send_loop)
+        # Start the periodic transmission of BFD Control packets.
+        self._start_xmit()
 
         LOG.info("[BFD][%s][INIT] BFD Session initialized.",
                  hex(self._local_discr))
@@ -217,6 +228,7 @@ class BFDSession(object):
         """
         self.dst_mac = dst_mac
         self.dst_ip = dst_ip
+        self._update_template()
 
         if not (dst_mac == "FF:FF:FF:FF:FF:FF" or dst_ip == "255.255.255.255"):
             self._remote_addr_config = True
@@ -224,47 +236,76 @@ class BFDSession(object):
         LOG.info("[BFD][%s][REMOTE] Remote address configured: %s, %s.",
                  hex(self._local_discr), self.dst_ip, self.dst_mac)
 
+    def _update_template(self):
+        """
+        Rebuild the frame template after the addresses were changed.
+        """
+        if self._auth_type:
+            return
+        self._template = BFDPacket.bfd_template(
+            src_mac=self.src_mac, dst_mac=self.dst_mac,
+            src_ip=self.src_ip, dst_ip=self.dst_ip,
+            src_port=self.src_port, dst_port=self.dst_port,
+            my_discr=self._local_discr)
+
     def recv(self, bfd_pkt):
         """
         BFD packet receiver.
         """
         LOG.debug("[BFD][%s][RECV] BFD Control received: %s",
-                  hex(self._local_discr), six.binary_type(bfd_pkt))
-        self._remote_discr = bfd_pkt.my_discr
-        self._remote_state = bfd_pkt.state
-        self._remote_demand_mode = bfd_pkt.flags & bfd.BFD_FLAG_DEMAND
+                  hex(self._local_discr), bfd_pkt)
+        if bfd_pkt.auth_cls is not None:
+            auth_seq = getattr(bfd_pkt.auth_cls, 'seq', None)
+        else:
+            auth_seq = None
+        self.recv_fields(bfd_pkt.state, bfd_pkt.flags, bfd_pkt.detect_mult,
+                         bfd_pkt.my_discr, bfd_pkt.desired_min_tx_interval,
+                         bfd_pkt.required_min_rx_interval, auth_seq)
+
+    def recv_fields(self, state, flags, detect_mult, my_discr,
+                    desired_min_tx_interval, required_min_rx_interval,
+                    auth_seq=None):
+        """
+        BFD packet receiver which takes the decoded BFD Control fields.
+
+        This is used by the fast path of BFDLib which does not build
+        any packet object.
+        """
+        self._remote_discr = my_discr
+        self._remote_state = state
+        self._remote_demand_mode = flags & bfd.BFD_FLAG_DEMAND
 
-        if self._remote_min_rx_interval != bfd_pkt.required_min_rx_interval:
-            self._remote_min_rx_interval = bfd_pkt.required_min_rx_interval
+        if self._remote_min_rx_interval != required_min_rx_interval:
+            self._remote_min_rx_interval = required_min_rx_interval
             # Update transmit interval (RFC5880 Section 6.8.2.)
             self._update_xmit_period()
 
         # TODO: Echo function (RFC5880 Page 35)
 
-        if bfd_pkt.flags & bfd.BFD_FLAG_FINAL and self._is_polling:
+        if flags & bfd.BFD_FLAG_FINAL and self._is_polling:
             self._is_polling = False
 
         # Check and update the session state (RFC5880 Page 35)
         if self._session_state == bfd.BFD_STATE_ADMIN_DOWN:
             return
 
-        if bfd_pkt.state == bfd.BFD_STATE_ADMIN_DOWN:
+        if state == bfd.BFD_STATE_ADMIN_DOWN:
             if self._session_state != bfd.BFD_STATE_DOWN:
                 self._set_state(bfd.BFD_STATE_DOWN,
                                 bfd.BFD_DIAG_NEIG_SIG_SESS_DOWN)
         else:
             if self._session_state == bfd.BFD_STATE_DOWN:
-                if bfd_pkt.state == bfd.BFD_STATE_DOWN:
+                if state == bfd.BFD_STATE_DOWN:
                     self._set_state(bfd.BFD_STATE_INIT)
-                elif bfd_pkt.state == bfd.BFD_STATE_INIT:
+                elif state == bfd.BFD_STATE_INIT:
                     self._set_state(bfd.BFD_STATE_UP)
 
             elif self._session_state == bfd.BFD_STATE_INIT:
-                if bfd_pkt.state in [bfd.BFD_STATE_INIT, bfd.BFD_STATE_UP]:
+                if state in [bfd.BFD_STATE_INIT, bfd.BFD_STATE_UP]:
                     self._set_state(bfd.BFD_STATE_UP)
 
             else:
-                if bfd_pkt.state == bfd.BFD_STATE_DOWN:
+                if state == bfd.BFD_STATE_DOWN:
                     self._set_state(bfd.BFD_STATE_DOWN,
                                     bfd.BFD_DIAG_NEIG_SIG_SESS_DOWN)
 
@@ -280,32 +321,30 @@ class BFDSession(object):
                 self._remote_session_state != bfd.BFD_STATE_UP:
             if not self._enable_send:
                 self._enable_send = True
-                hub.spawn(self._send_loop)
+                self._start_xmit()
 
         # Update the detection time (RFC5880 Section 6.8.4.)
+        self._last_rx = self.app.timer.clock()
         if self._detect_time == 0:
-            self._detect_time = bfd_pkt.desired_min_tx_interval * \
-                bfd_pkt.detect_mult / 1000000.0
-            # Start the timeout loop.
-            hub.spawn(self._recv_timeout_loop)
+            self._detect_time = desired_min_tx_interval * \
+                detect_mult / 1000000.0
+            # Start the detection timer.
+            self._detect_timer = self.app.timer.call_at(
+                self._last_rx + self._detect_time, self._detect_timeout)
 
-        if bfd_pkt.flags & bfd.BFD_FLAG_POLL:
+        if flags & bfd.BFD_FLAG_POLL:
             self._pending_final = True
-            self._detect_time = bfd_pkt.desired_min_tx_interval * \
-                bfd_pkt.detect_mult / 1000000.0
+            self._detect_time = desired_min_tx_interval * \
+                detect_mult / 1000000.0
 
         # Update the remote authentication sequence number.
         if self._auth_type in [bfd.BFD_AUTH_KEYED_MD5,
                                bfd.BFD_AUTH_METICULOUS_KEYED_MD5,
                                bfd.BFD_AUTH_KEYED_SHA1,
                                bfd.BFD_AUTH_METICULOUS_KEYED_SHA1]:
-            self._rcv_auth_seq = bfd_pkt.auth_cls.seq
+            self._rcv_auth_seq = auth_seq
             self._auth_seq_known = 1
 
-        # Set the lock.
-        if self._lock is not None:
-            self._lock.set()
-
     def _set_state(self, new_state, diag=None):
         """
         Set the state of the BFD session.
@@ -332,34 +371,38 @@ class BFDSession(object):
         self.app.send_event_to_observers(
             EventBFDSessionStateChanged(self, old_state, new_state))
 
-    def _recv_timeout_loop(self):
+    def _detect_timeout(self):
         """
-        A loop to check timeout of receiving remote BFD packet.
+        Timer callback to check timeout of receiving remote BFD packet.
+
+        Received packets only update the reception time, so the timer is
+        re-armed here instead of on every packet.
         """
-        while self._detect_time:
-            last_wait = time.time()
-            self._lock = hub.Event()
+        self._detect_timer = None
+        if not self._detect_time:
+            return
 
-            self._lock.wait(timeout=self._detect_time)
+        sched = self.app.timer
+        deadline = self._last_rx + self._detect_time
+        now = sched.clock()
 
-            if self._lock.is_set():
-                # Authentication variable check (RFC5880 Section 6.8.1.)
-                if getattr(self, "_auth_seq_known", 0):
-                    if last_wait > time.time() + 2 * self._detect_time:
-                        self._auth_seq_known = 0
+        if deadline <= now:
+            # Check Detection Time expiration (RFC5880 section 6.8.4.)
+            LOG.info("[BFD][%s][RECV] BFD Session timed out.",
+                     hex(self._local_discr))
+            if self._session_state not in [bfd.BFD_STATE_DOWN,
+                                           bfd.BFD_STATE_ADMIN_DOWN]:
+                self._set_state(bfd.BFD_STATE_DOWN,
+                                bfd.BFD_DIAG_CTRL_DETECT_TIME_EXPIRED)
 
-            else:
-                # Check Detection Time expiration (RFC5880 section 6.8.4.)
-                LOG.info("[BFD][%s][RECV] BFD Session timed out.",
-                         hex(self._local_discr))
-                if self._session_state not in [bfd.BFD_STATE_DOWN,
-                                               bfd.BFD_STATE_ADMIN_DOWN]:
-                    self._set_state(bfd.BFD_STATE_DOWN,
-                                    bfd.BFD_DIAG_CTRL_DETECT_TIME_EXPIRED)
+            # Authentication variable check (RFC5880 Section 6.8.1.)
+            if getattr(self, "_auth_seq_known", 0):
+                self._auth_seq_known = 0
 
-                # Authentication variable check (RFC5880 Section 6.8.1.)
-                if getattr(self, "_auth_seq_known", 0):
-                    self._auth_seq_known = 0
+            self._last_rx = now
+            deadline = now + self._detect_time
+
+        self._detect_timer = sched.call_at(deadline, self._detect_timeout)
 
     def _update_xmit_period(self):
         """
@@ -382,28 +425,51 @@ class BFDSession(object):
         LOG.info("[BFD][%s][XMIT] Transmission period changed to %f",
                  hex(self._local_discr), self._xmit_period)
 
-    def _send_loop(self):
+    def _start_xmit(self):
         """
-        A loop to proceed periodic BFD packet transmission.
+        Arm the periodic transmission timer of BFD Control packets.
         """
-        while self._enable_send:
-            hub.sleep(self._xmit_period)
+        if self._xmit_timer is None:
+            self._xmit_timer = self.app.timer.call_later(
+                self._xmit_period, self._xmit_timeout)
 
-            # Send BFD packet. (RFC5880 Section 6.8.7.)
+    def _xmit_timeout(self):
+        """
+        Timer callback to proceed periodic BFD packet transmission.
+        """
+        self._xmit_timer = None
+        if not self._enable_send:
+            return
 
-            if self._remote_discr == 0 and not self._active_role:
-                continue
+        self._start_xmit()
 
-            if self._remote_min_rx_interval == 0:
-                continue
+        # Send BFD packet. (RFC5880 Section 6.8.7.)
 
-            if self._remote_demand_mode and \
-                    self._session_state == bfd.BFD_STATE_UP and \
-                    self._remote_session_state == bfd.BFD_STATE_UP and \
-                    not self._is_polling:
-                continue
+        if self._remote_discr == 0 and not self._active_role:
+            return
 
-            self._send()
+        if self._remote_min_rx_interval == 0:
+            return
+
+        if self._remote_demand_mode and \
+                self._session_state == bfd.BFD_STATE_UP and \
+                self._remote_session_state == bfd.BFD_STATE_UP and \
+                not self._is_polling:
+            return
+
+        self._send()
+
+    def close(self):
+        """
+        Stop the timers of the BFD session.
+        """
+        self._enable_send = False
+        self._detect_time = 0
+        for t in (self._xmit_timer, self._detect_timer):
+            if t is not None:
+                t.cancel()
+        self._xmit_timer = None
+        self._detect_timer = None
 
     def _send(self):
         """
@@ -482,16 +548,27 @@ class BFDSession(object):
         dst_port = self.dst_port
 
         # Construct BFD Control packet
-        data = BFDPacket.bfd_packet(
-            src_mac=src_mac, dst_mac=dst_mac,
-            src_ip=src_ip, dst_ip=dst_ip, ipv4_id=ipv4_id,
-            src_port=src_port, dst_port=dst_port,
-            diag=diag, state=state, flags=flags, detect_mult=detect_mult,
-            my_discr=my_discr, your_discr=your_discr,
-            desired_min_tx_interval=desired_min_tx_interval,
-            required_min_rx_interval=required_min_rx_interval,
-            required_min_echo_rx_interval=required_min_echo_rx_interval,
-            auth_cls=auth_cls)
+        if auth_cls is None:
+            # Only the variable fields of the prebuilt frame are patched.
+            data = self._template.build(
+                ipv4_id=ipv4_id,
+                diag=diag, state=state, flags=flags, detect_mult=detect_mult,
+                your_discr=your_discr,
+                desired_min_tx_interval=desired_min_tx_interval,
+                required_min_rx_interval=required_min_rx_interval,
+                required_min_echo_rx_interval=required_min_echo_rx_interval)
+        else:
+            # The digest covers the whole BFD packet, build it as a whole.
+            data = BFDPacket.bfd_packet(
+                src_mac=src_mac, dst_mac=dst_mac,
+                src_ip=src_ip, dst_ip=dst_ip, ipv4_id=ipv4_id,
+                src_port=src_port, dst_port=dst_port,
+                diag=diag, state=state, flags=flags, detect_mult=detect_mult,
+                my_discr=my_discr, your_discr=your_discr,
+                desired_min_tx_interval=desired_min_tx_interval,
+                required_min_rx_interval=required_min_rx_interval,
+                required_min_echo_rx_interval=required_min_echo_rx_interval,
+                auth_cls=auth_cls)
 
         # Prepare for a datapath
         datapath = self.datapath
@@ -510,6 +587,62 @@ class BFDSession(object):
         LOG.debug("[BFD][%s][SEND] BFD Control sent.", hex(self._local_discr))
 
 
+class BFDFrameTemplate(object):
+    """
+    A prebuilt Ethernet/IPv4/UDP/BFD Control frame without authentication.
+
+    ``build()`` patches the IPv4 identification, the variable BFD fields
+    and the checksums instead of serializing the whole packet again.
+    """
+    _IPV4_OFFSET = ethernet.ethernet._MIN_LEN
+    _UDP_OFFSET = _IPV4_OFFSET + ipv4.ipv4._MIN_LEN
+    _BFD_OFFSET = _UDP_OFFSET + udp.udp._MIN_LEN
+    # Variable fields around My Discriminator which is left untouched.
+    _BFD_HDR_PACK_STR = '!BBBB'
+    _BFD_INTERVAL_PACK_STR = '!IIII'
+
+    def __init__(self, data):
+        self._data = bytearray(data)
+        ip_off = self._IPV4_OFFSET
+        udp_off = self._UDP_OFFSET
+        udp_len = len(self._data) - udp_off
+        # IPv4 pseudo header and the UDP header without its checksum.
+        self._udp_csum_prefix = \
+            six.binary_type(self._data[ip_off + 12:ip_off + 20]) + \
+            struct.pack('!BBH', 0, inet.IPPROTO_UDP, udp_len) + \
+            six.binary_type(self._data[udp_off:udp_off + 6]) + b'\x00\x00'
+
+    def build(self, ipv4_id, diag, state, flags, detect_mult, your_discr,
+              desired_min_tx_interval, required_min_rx_interval,
+              required_min_echo_rx_interval):
+        """
+        Returns the frame with the given variable fields patched.
+        """
+        data = self._data
+        ip_off = self._IPV4_OFFSET
+        udp_off = self._UDP_OFFSET
+        bfd_off = self._BFD_OFFSET
+
+        struct.pack_into(self._BFD_HDR_PACK_STR, data, bfd_off,
+                         (1 << 5) | diag, (state << 6) | flags,
+                         detect_mult, bfd.bfd._PACK_STR_LEN)
+        struct.pack_into(self._BFD_INTERVAL_PACK_STR, data, bfd_off + 8,
+                         your_discr, desired_min_tx_interval,
+                         required_min_rx_interval,
+                         required_min_echo_rx_interval)
+
+        struct.pack_into('!H', data, ip_off + 4, ipv4_id)
+        struct.pack_into('!H', data, ip_off + 10, 0)
+        struct.pack_into('!H', data, ip_off + 10, packet_utils.checksum(
+            data[ip_off:udp_off]))
+
+        csum = packet_utils.checksum(
+            self._udp_csum_prefix + six.binary_type(data[bfd_off:]))
+        struct.pack_into('!H', data, udp_off + 6, csum)
+
+        return six.binary_type(data)
+
+
 class BFDPacket(object):
     """
     BFDPacket class for parsing raw BFD packet, and generating BFD packet with
@@ -519,6 +652,18 @@ class BFDPacket(object):
     class BFDUnknownFormat(RyuException):
         message = '%(msg)s'
 
+    @staticmethod
+    def bfd_template(src_mac, dst_mac, src_ip, dst_ip, src_port, dst_port,
+                     my_discr):
+        """
+        Generate a BFDFrameTemplate for unauthenticated BFD Control packets.
+        """
+        return BFDFrameTemplate(BFDPacket.bfd_packet(
+            src_mac=src_mac, dst_mac=dst_mac,
+            src_ip=src_ip, dst_ip=dst_ip, ipv4_id=0,
+            src_port=src_port, dst_port=dst_port,
+            my_discr=my_discr))
+
     @staticmethod
     def bfd_packet(src_mac, dst_mac, src_ip, dst_ip, ipv4_id,
                    src_port, dst_port,
@@ -560,6 +705,36 @@ class BFDPacket(object):
         pkt.serialize()
         return pkt.data
 
+    @staticmethod
+    def bfd_fast_parse(data):
+        """
+        Recognize an untagged Ethernet/IPv4/UDP BFD frame from raw bytes.
+
+        Returns None if the frame is not destined to the BFD Control or
+        Echo UDP port, otherwise a tuple of
+        (UDP destination port, IPv4 header offset, IPv4 TTL, BFD offset).
+        """
+        ip_off = ethernet.ethernet._MIN_LEN
+        if len(data) < ip_off + ipv4.ipv4._MIN_LEN or \
+                data[12:14] != _ETH_TYPE_IP_BIN:
+            return None
+
+        ver_hlen, ttl, proto = struct.unpack_from('!B7xBB', data, ip_off)
+        ip_hlen = (ver_hlen & 0xf) << 2
+        if ver_hlen >> 4 != 4 or proto != inet.IPPROTO_UDP:
+            return None
+
+        udp_off = ip_off + ip_hlen
+        bfd_off = udp_off + udp.udp._MIN_LEN
+        if len(data) < bfd_off:
+            return None
+
+        (dst_port, ) = struct.unpack_from('!H', data, udp_off + 2)
+        if dst_port not in (BFD_CONTROL_UDP_PORT, BFD_ECHO_UDP_PORT):
+            return None
+
+        return dst_port, ip_off, ttl, bfd_off
+
     @staticmethod
     def bfd_parse(data):
         """
@@ -574,7 +749,7 @@ class BFDPacket(object):
         ipv4_pkt = next(i)
         assert type(ipv4_pkt) == ipv4.ipv4
 
-        udp_pkt = i.next()
+        udp_pkt = next(i)
         assert type(udp_pkt) == udp.udp
 
         udp_payload = next(i)
@@ -698,9 +873,25 @@ class BFDLib(app_manager.RyuApp):
         # key: My Discriminator
         # value: BFDSession object
         self.session = {}
+        # UDP source ports in use by the BFD sessions.
+        self._src_ports = set()
+        # BFD Session selected by the packets with Your Discriminator 0.
+        # key: (Datapath ID, Openflow port number)
+        # value: BFDSession object
+        self._port_session = {}
+
+        # Shared scheduler of the transmission and detection timers
+        # of all BFD sessions.
+        self.timer = timer.TimerScheduler()
+
+    def start(self):
+        self.timer.start()
+        return super(BFDLib, self).start()
 
     def close(self):
-        pass
+        for s in self.session.values():
+            s.close()
+        self.timer.stop()
 
     @set_ev_cls(ofp_event.EventOFPSwitchFeatures, CONFIG_DISPATCHER)
     def switch_features_handler(self, ev):
@@ -746,6 +937,16 @@ class BFDLib(app_manager.RyuApp):
         parser = datapath.ofproto_parser
         in_port = msg.match['in_port']
 
+        # Fast path: handle BFD packets without building packet objects.
+        fast = BFDPacket.bfd_fast_parse(msg.data)
+        if fast is not None:
+            dst_port, ip_off, ttl, bfd_off = fast
+            # TODO: Echo function is not yet supported.
+            if dst_port == BFD_CONTROL_UDP_PORT:
+                self._recv_bfd_fast(datapath, in_port, msg.data,
+                                    ip_off, ttl, bfd_off)
+            return
+
         pkt = packet.Packet(msg.data)
 
         # If there's someone asked for an IP address associated
@@ -831,13 +1032,13 @@ class BFDLib(app_manager.RyuApp):
             src_port = random.randint(49152, 65535)
 
             # Ensure generated discriminator and UDP port are unique.
-            if my_discr in self.session:
+            if my_discr in self.session or src_port in self._src_ports:
                 continue
 
             unique_flag = True
 
             for s in self.session.values():
-                if s.your_discr == my_discr or s.src_port == src_port:
+                if s.your_discr == my_discr:
                     unique_flag = False
                     break
 
@@ -851,9 +1052,64 @@ class BFDLib(app_manager.RyuApp):
                           auth_type=auth_type, auth_keys=auth_keys)
 
         self.session[my_discr] = sess
+        self._src_ports.add(src_port)
+        self._port_session.setdefault((dpid, ofport), sess)
 
         return my_discr
 
+    def _recv_bfd_fast(self, datapath, in_port, data, ip_off, ttl, bfd_off):
+        """
+        Receive BFD Control packet recognized by BFDPacket.bfd_fast_parse.
+
+        The BFD header is decoded in place.  Packets with authentication
+        sections fall back to recv_bfd_pkt.
+        """
+        if len(data) < bfd_off + bfd.bfd._PACK_STR_LEN:
+            return
+
+        (diag, flags, detect_mult, length, my_discr, your_discr,
+         desired_min_tx_interval, required_min_rx_interval, _echo) = \
+            struct.unpack_from(bfd.bfd._PACK_STR, data, bfd_off)
+        ver = diag >> 5
+        state = flags >> 6
+        flags &= 0x3f
+
+        if flags & bfd.BFD_FLAG_AUTH_PRESENT:
+            self.recv_bfd_pkt(datapath, in_port, data)
+            return
+
+        # Discard it if TTL != 255 for single hop bfd. (RFC5881 Section 5.)
+        if ttl != 255:
+            return
+
+        # BFD sanity checks
+        # RFC 5880 Section 6.8.6.
+        if ver != 1 or length < bfd.bfd._PACK_STR_LEN or \
+                detect_mult == 0 or flags & bfd.BFD_FLAG_MULTIPOINT or \
+                my_discr == 0:
+            return
+
+        if your_discr == 0:
+            if state not in [bfd.BFD_STATE_ADMIN_DOWN, bfd.BFD_STATE_DOWN]:
+                return
+            # Select session (Page 34)
+            sess = self._port_session.get((datapath.id, in_port))
+        else:
+            sess = self.session.get(your_discr)
+
+        # BFD Session not found or authentication is required.
+        if sess is None or sess._auth_type != 0:
+            return
+
+        # Check whether L2/L3 addresses were configured or not.
+        if not sess._remote_addr_config:
+            sess.set_remote_addr(
+                addrconv.mac.bin_to_text(data[6:12]),
+                addrconv.ipv4.bin_to_text(data[ip_off + 12:ip_off + 16]))
+
+        sess.recv_fields(state, flags, detect_mult, my_discr,
+                         desired_min_tx_interval, required_min_rx_interval)
+
     def recv_bfd_pkt(self, datapath, in_port, data):
         pkt = packet.Packet(data)
         eth = pkt.get_protocols(ethernet.ethernet)[0]
@@ -906,14 +1162,12 @@ class BFDLib(app_manager.RyuApp):
 
         if bfd_pkt.your_discr == 0:
             # Select session (Page 34)
-            for s in self.session.values():
-                if s.dpid == datapath.id and s.ofport == in_port:
-                    sess_my_discr = s.my_discr
-                    break
+            s = self._port_session.get((datapath.id, in_port))
 
             # BFD Session not found.
-            if sess_my_discr is None:
+            if s is None:
                 return
+            sess_my_discr = s.my_discr
         else:
             sess_my_discr = bfd_pkt.your_discr
 
@@ -0,0 +1,303 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Event dispatch statistics
+
+When enabled (``--dispatch-stats``), the event loops of the Ryu
+applications and the synchronous handler loop of the datapaths record,
+per (application, event class, handler):
+
+- the number of calls,
+- a histogram of the handler latency,
+- a histogram of the time the event waited in the event queue of the
+  application before the handler was called.
+
+Every call is counted but only one call in ``--dispatch-stats-sample``
+is timed, to bound the overhead.  The messages received from each
+datapath are counted by type.
+
+The statistics are logged every ``--dispatch-stats-log-interval``
+seconds and are available through ``ryu.app.rest_dispatch_stats``.
+
+Example::
+
+    from ryu.lib import dispatch_stats
+
+    dispatch_stats.STATS.enable(sample=1)
+    ...
+    for handler in dispatch_stats.STATS.snapshot()['handlers']:
+        print(handler['app'], handler['handler'], handler['latency'])
+"""
+
+import collections
+import logging
+import time
+
+from ryu import cfg
+from ryu.lib import hub
+from ryu.lib.dpid import dpid_to_str
+
+LOG = logging.getLogger(__name__)
+
+CONF = cfg.CONF
+CONF.register_cli_opts([
+    cfg.BoolOpt('dispatch-stats', default=False,
+                help='record the latency of the event handlers and the '
+                'message rates of the datapaths'),
+    cfg.IntOpt('dispatch-stats-sample', default=16,
+               help='time one handler call out of N (default: 16)'),
+    cfg.FloatOpt('dispatch-stats-log-interval', default=0,
+                 help='seconds between two logs of the dispatch statistics '
+                 '(default: 0, never)'),
+])
+
+_clock = getattr(time, 'perf_counter', time.time)
+
+# log2 buckets of microseconds: [2 ** (i - 1), 2 ** i), up to ~1 hour
+_BUCKETS = 32
+
+# handlers and datapaths in a log dump
+_LOG_TOP = 10
+
+
+class Histogram(object):
+    """Histogram of durations in power of two microsecond buckets."""
+
+    __slots__ = ('buckets', 'count', 'total', 'max')
+
+    def __init__(self):
+        self.buckets = [0] * _BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        self.buckets[min(_BUCKETS - 1,
+                         int(seconds * 1e6).bit_length())] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, q):
+        """
+        Returns the upper bound in seconds of the bucket of the ``q``
+        quantile, None if empty.
+        """
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.buckets):
+            seen += count
+            if seen >= rank and count:
+                return min(self.max, (1 << i) / 1e6)
+        return self.max
+
+    def summary(self):
+        """Returns the count, mean, max and percentiles in ms."""
+        if not self.count:
+            return None
+        summary = {'count': self.count,
+                   'mean_ms': self.total * 1000 / self.count,
+                   'max_ms': self.max * 1000}
+        for q in (0.5, 0.9, 0.99):
+            summary['p%d_ms' % round(q * 100)] = self.percentile(q) * 1000
+        return summary
+
+
+class HandlerStats(object):
+    __slots__ = ('app', 'event', 'handler', 'calls', 'latency', 'wait')
+
+    def __init__(self, app, event, handler):
+        self.app = app
+        self.event = event
+        self.handler = handler
+        self.calls = 0
+        self.latency = Histogram()
+        self.wait = Histogram()
+
+    def busy_time(self):
+        """Returns the estimated time spent in the handler."""
+        if not self.latency.count:
+            return 0.0
+        return self.latency.total * self.calls / self.latency.count
+
+    def to_dict(self):
+        return {'app': self.app,
+                'event': self.event,
+                'handler': self.handler,
+                'calls': self.calls,
+                'busy_s': self.busy_time(),
+                'latency': self.latency.summary(),
+                'wait': self.wait.summary()}
+
+
+def _handler_name(handler):
+    func = getattr(handler, '__func__', handler)
+    return getattr(func, '__name__', repr(handler))
+
+
+class DispatchStats(object):
+    """
+    Dispatch statistics of the handlers and the datapaths.
+
+    ``now()`` is the timestamp of an event put in an event queue, None
+    when disabled.  ``call()`` calls a handler and records it.
+    """
+
+    def __init__(self, clock=_clock):
+        self.clock = clock
+        self.enabled = False
+        self.sample = 1
+        self.start = None
+        self._handlers = {}
+        self._messages = collections.defaultdict(collections.Counter)
+        self._logger = None
+
+    def enable(self, sample=None):
+        if sample is not None:
+            self.sample = max(1, sample)
+        if not self.enabled:
+            self.reset()
+            self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def reset(self):
+        self.start = self.clock()
+        self._handlers = {}
+        self._messages = collections.defaultdict(collections.Counter)
+
+    def now(self):
+        return self.clock() if self.enabled else None
+
+    def call(self, app, ev, handler, queued=None):
+        """
+        Calls ``handler(ev)`` for the application ``app`` and records
+        it.  ``queued`` is the time the event was queued, if any.
+        """
+        key = (app, ev.__class__, handler)
+        stats = self._handlers.get(key)
+        if stats is None:
+            stats = HandlerStats(app, ev.__class__.__name__,
+                                 _handler_name(handler))
+            self._handlers[key] = stats
+        stats.calls += 1
+        if stats.calls % self.sample:
+            return handler(ev)
+        start = self.clock()
+        if queued is not None:
+            stats.wait.add(start - queued)
+        try:
+            return handler(ev)
+        finally:
+            stats.latency.add(self.clock() - start)
+
+    def count_msg(self, dpid, msg):
+        """Counts a message received from the datapath ``dpid``."""
+        self._messages[dpid][msg.__class__.__name__] += 1
+
+    def handlers(self):
+        """Returns the HandlerStats, the busiest first."""
+        return sorted(self._handlers.values(),
+                      key=lambda stats: stats.busy_time(), reverse=True)
+
+    def messages(self):
+        """Returns {datapath ID string: {message class: count}}."""
+        return dict(('unknown' if dpid is None else dpid_to_str(dpid),
+                     dict(counts))
+                    for dpid, counts in self._messages.items())
+
+    def snapshot(self):
+        elapsed = self.clock() - self.start if self.start is not None else 0
+        return {'enabled': self.enabled,
+                'sample': self.sample,
+                'elapsed_s': elapsed,
+                'handlers': [stats.to_dict() for stats in self.handlers()],
+                'datapaths': self.messages()}
+
+    def start_logger(self, interval):
+        """Logs the statistics every ``interval`` seconds."""
+        if self._logger is None and interval > 0:
+            self._logger = hub.spawn(self._log_loop, interval)
+
+    def stop_logger(self):
+        if self._logger is not None:
+            hub.kill(self._logger)
+            hub.joinall([self._logger])
+            self._logger = None
+
+    def _log_loop(self, interval):
+        calls = {}
+        messages = {}
+        while True:
+            hub.sleep(interval)
+            if not self.enabled:
+                continue
+            calls, messages = self.log(interval, calls, messages)
+
+    def log(self, interval, prev_calls=None, prev_messages=None):
+        """
+        Logs the busiest handlers and datapaths with their rates since
+        ``prev_calls`` and ``prev_messages``.  Returns the current call
+        and message counts.
+        """
+        prev_calls = prev_calls or {}
+        prev_messages = prev_messages or {}
+        calls = {}
+        lines = []
+        for stats in self.handlers():
+            key = (stats.app, stats.event, stats.handler)
+            calls[key] = stats.calls
+            rate = (stats.calls - prev_calls.get(key, 0)) / interval
+            if len(lines) >= _LOG_TOP or not rate:
+                continue
+            latency = stats.latency.summary() or {}
+            wait = stats.wait.summary() or {}
+            lines.append(
+                '  %s.%s(%s): %.1f calls/s, latency p50 %s p99 %s max %s ms, '
+                'wait p99 %s ms' % (
+                    stats.app, stats.handler, stats.event, rate,
+                    _ms(latency.get('p50_ms')), _ms(latency.get('p99_ms')),
+                    _ms(latency.get('max_ms')), _ms(wait.get('p99_ms'))))
+        messages = dict((dpid, sum(counts.values()))
+                        for dpid, counts in self._messages.items())
+        rates = sorted((((count - prev_messages.get(dpid, 0)) / interval,
+                         dpid) for dpid, count in messages.items()),
+                       key=lambda item: item[0], reverse=True)
+        for rate, dpid in rates[:_LOG_TOP]:
+            if rate:
+                lines.append('  datapath %s: %.1f msgs/s %s' % (
+                    'unknown' if dpid is None else dpid_to_str(dpid), rate,
+                    ', '.join('%s %d' % item for item in
+                              self._messages[dpid].most_common(3))))
+        LOG.info('dispatch statistics (1/%d calls timed):\n%s',
+                 self.sample, '\n'.join(lines) or '  idle')
+        return calls, messages
+
+
+def _ms(value):
+    return '-' if value is None else '%.3f' % value
+
+
+STATS = DispatchStats()
+
+
+def setup():
+    """Configures STATS from the command line options."""
+    if CONF.dispatch_stats:
+        STATS.enable(CONF.dispatch_stats_sample)
+        STATS.start_logger(CONF.dispatch_stats_log_interval)
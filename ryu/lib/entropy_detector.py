@@ -0,0 +1,333 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Entropy based DDoS detection engine
+
+Counters of traffic features (e.g. packets per IPv4 source) are fed per
+time window as NumPy arrays of keys and counts.  At the end of each
+window, the counters of every feature are aggregated, their normalized
+entropy is computed and compared with the mean and the variance of the
+entropies of the previous windows.
+
+The BEBA state tables dumps (OFPMP_EXP_STATE_STATS replies) can be
+converted to such arrays without building any Python object per entry.
+
+Example::
+
+    from ryu.lib import entropy_detector
+
+    detector = entropy_detector.EntropyDetector(precision=3)
+
+    # for each reply of the window
+    records = entropy_detector.parse_state_stats(msg.body.data)
+    detector.add('ipv4_src', entropy_detector.ipv4_keys(records),
+                 records['state'])
+
+    window = detector.end_window()
+    if detector.deviation('ipv4_dst') < 0:
+        victims = window.outliers('ipv4_dst')
+
+This module requires NumPy.
+"""
+
+import collections
+
+import numpy as np
+
+from ryu.ofproto import beba_v1_0 as bebaproto
+
+
+# layout of an entry of the OFPMP_EXP_STATE_STATS(_AND_DELETE) replies
+STATE_STATS_DTYPE = np.dtype([
+    ('length', '>u2'),
+    ('table_id', 'u1'),
+    ('pad', 'u1'),
+    ('dur_sec', '>u4'),
+    ('dur_nsec', '>u4'),
+    ('field_count', '>u4'),
+    ('fields', '>u4', (bebaproto.MAX_FIELD_COUNT,)),
+    ('key_count', '>u4'),
+    ('key', 'u1', (bebaproto.MAX_KEY_LEN,)),
+    ('state', '>u4'),
+    ('flow_data_var', '>u4', (bebaproto.MAX_FLOW_DATA_VAR_NUM,)),
+    ('hard_rb', '>u4'),
+    ('idle_rb', '>u4'),
+    ('hard_to', '>u4'),
+    ('idle_to', '>u4'),
+])
+assert STATE_STATS_DTYPE.itemsize == bebaproto.OFP_STATE_STATS_SIZE
+_KEY_OFFSET = STATE_STATS_DTYPE.fields['key'][1]
+
+# counts up to this are summed through a histogram of their values
+_COUNT_HISTOGRAM_MAX = 1 << 16
+
+
+def parse_state_stats(buf):
+    """
+    Returns the entries of a state stats reply body as a structured
+    array of STATE_STATS_DTYPE, without copying ``buf``.
+    """
+    count = len(buf) // STATE_STATS_DTYPE.itemsize
+    return np.frombuffer(buf, STATE_STATS_DTYPE, count=count)
+
+
+def ipv4_keys(records):
+    """
+    Returns the IPv4 addresses of the state keys of ``records`` as
+    uint32 in host order.
+    """
+    return records.getfield(np.dtype('>u4'), _KEY_OFFSET).astype(np.uint32)
+
+
+def port_keys(records):
+    """
+    Returns the TCP/UDP ports of the state keys of ``records`` as
+    uint16.  The switch stores the ports in little endian order.
+    """
+    return records.getfield(np.dtype('<u2'), _KEY_OFFSET).astype(np.uint16)
+
+
+def ipv4_to_str(key):
+    key = int(key)
+    return '%d.%d.%d.%d' % (key >> 24, (key >> 16) & 0xff,
+                            (key >> 8) & 0xff, key & 0xff)
+
+
+def aggregate(keys, counts):
+    """
+    Sums the ``counts`` of the same ``keys``.
+    Returns the sorted distinct keys and their counts.
+    """
+    keys = np.asarray(keys)
+    counts = np.asarray(counts, dtype=np.int64)
+    if keys.dtype.kind == 'u' and keys.dtype.itemsize <= 2:
+        totals = np.bincount(keys, weights=counts)
+        distinct = np.flatnonzero(totals)
+        return distinct.astype(keys.dtype), totals[distinct].astype(np.int64)
+    distinct, inverse = np.unique(keys, return_inverse=True)
+    totals = np.bincount(inverse.ravel(), weights=counts,
+                         minlength=len(distinct))
+    return distinct, totals.astype(np.int64)
+
+
+def entropy(counts):
+    """
+    Returns the entropy of the distribution of ``counts`` normalized by
+    its maximum, log2(len(counts)), so that it is in [0, 1].
+    """
+    counts = np.asarray(counts)
+    n = len(counts)
+    total = counts.sum()
+    if n <= 1 or total <= 1:
+        return 0.0
+    # H = log2(total) - sum(c * log2(c)) / total; the counts are mostly
+    # small, so c * log2(c) is computed once per distinct value.
+    if counts.max() <= _COUNT_HISTOGRAM_MAX:
+        values = np.bincount(counts)
+        counts = np.flatnonzero(values)
+        weights = values[counts]
+    else:
+        weights = 1
+    clogc = np.sum(weights * counts * np.log2(counts.astype(np.float64)))
+    total = float(total)
+    return float((np.log2(total) - clogc / total) / np.log2(n))
+
+
+class Window(object):
+    """
+    Aggregated counters of the features of a time window.
+    """
+
+    def __init__(self, counters):
+        # feature -> (keys, counts, sorted)
+        self._counters = counters
+        self._entropies = {}
+
+    def __contains__(self, feature):
+        return feature in self._counters
+
+    def features(self):
+        return list(self._counters.keys())
+
+    def keys(self, feature):
+        return self._counters[feature][0]
+
+    def counts(self, feature):
+        return self._counters[feature][1]
+
+    def entropy(self, feature):
+        value = self._entropies.get(feature)
+        if value is None:
+            value = entropy(self.counts(feature))
+            self._entropies[feature] = value
+        return value
+
+    def count_stats(self, feature):
+        """Returns the mean and the variance of the counts."""
+        counts = self.counts(feature)
+        if not len(counts):
+            return float('nan'), float('nan')
+        return float(counts.mean()), float(counts.var())
+
+    def outliers(self, feature, precision=3):
+        """
+        Returns the keys whose count is greater than the mean of the
+        counts by more than ``precision`` standard deviations.
+        """
+        counts = self.counts(feature)
+        if not len(counts):
+            return self.keys(feature)
+        mean, var = self.count_stats(feature)
+        return self.keys(feature)[counts > mean + precision * var ** 0.5]
+
+    def lookup(self, feature, keys):
+        """Returns the counts of ``keys``, 0 for the unknown ones."""
+        distinct, counts, sort = self._counters[feature]
+        if not sort:
+            order = np.argsort(distinct, kind='mergesort')
+            distinct = distinct[order]
+            counts = counts[order]
+            self._counters[feature] = (distinct, counts, True)
+        keys = np.asarray(keys, dtype=distinct.dtype)
+        if not len(distinct):
+            return np.zeros(len(keys), dtype=np.int64)
+        index = np.searchsorted(distinct, keys)
+        index[index == len(distinct)] = 0
+        return np.where(distinct[index] == keys, counts[index], 0)
+
+
+class EntropyDetector(object):
+    """
+    Streaming entropy computation and deviation check.
+
+    ``add()`` feeds the counters of the current window; ``end_window()``
+    closes it and records the entropy of each feature in ``history``,
+    which keeps the last ``history_len`` windows (all if None).  The
+    recorded entropies are rounded to ``digits`` decimals unless None.
+    A feature which got no counters in a window has an entropy of 0.
+    """
+
+    def __init__(self, features=(), precision=3, history_len=None,
+                 digits=None):
+        self.precision = precision
+        self.history_len = history_len
+        self.digits = digits
+        self.history = {}
+        self._pending = {}
+        for feature in features:
+            self._history(feature)
+
+    def _history(self, feature):
+        history = self.history.get(feature)
+        if history is None:
+            history = collections.deque(maxlen=self.history_len)
+            self.history[feature] = history
+        return history
+
+    def add(self, feature, keys, counts):
+        """
+        Adds the ``counts`` of ``keys`` to ``feature`` in the current
+        window.  The keys of a single call must be distinct, as in a
+        state table dump; counts of the same key in several calls are
+        summed.  Zero counts are ignored.
+        """
+        keys = np.asarray(keys)
+        counts = np.asarray(counts).astype(np.int64)
+        nonzero = counts != 0
+        if not nonzero.all():
+            keys = keys[nonzero]
+            counts = counts[nonzero]
+        self._pending.setdefault(feature, []).append((keys, counts))
+        self._history(feature)
+
+    def pending(self, feature):
+        """
+        Returns the number of counters of ``feature`` added to the
+        current window.
+        """
+        return sum(len(keys) for keys, _ in self._pending.get(feature, ()))
+
+    def discard_window(self):
+        """Drops the counters of the current window."""
+        self._pending = {}
+
+    def end_window(self):
+        """
+        Aggregates the counters of the current window, records the
+        entropies and starts a new window.  Returns the Window.
+        """
+        counters = {}
+        for feature in self.history:
+            chunks = self._pending.get(feature)
+            if not chunks:
+                counters[feature] = (np.zeros(0, dtype=np.uint32),
+                                     np.zeros(0, dtype=np.int64), True)
+            elif len(chunks) == 1:
+                keys, counts = chunks[0]
+                counters[feature] = (keys, counts, False)
+            else:
+                keys, counts = aggregate(
+                    np.concatenate([keys for keys, _ in chunks]),
+                    np.concatenate([counts for _, counts in chunks]))
+                counters[feature] = (keys, counts, True)
+        self._pending = {}
+
+        window = Window(counters)
+        for feature, history in self.history.items():
+            value = window.entropy(feature)
+            if self.digits is not None:
+                value = round(value, self.digits)
+            history.append(value)
+        return window
+
+    def baseline(self, feature):
+        """
+        Returns the mean and the variance of the entropies of the
+        windows before the last one.
+        """
+        history = np.fromiter(self.history[feature], dtype=np.float64,
+                              count=len(self.history[feature]))[:-1]
+        if not len(history):
+            return float('nan'), float('nan')
+        return float(history.mean()), float(history.var())
+
+    def deviation(self, feature):
+        """
+        Returns -1 (resp. 1) if the entropy of the last window is lower
+        (resp. higher) than the baseline mean by more than ``precision``
+        standard deviations, 0 otherwise.
+        """
+        history = self.history[feature]
+        if len(history) < 2:
+            return 0
+        mean, var = self.baseline(feature)
+        margin = self.precision * var ** 0.5
+        last = history[-1]
+        if last < mean - margin:
+            return -1
+        if last > mean + margin:
+            return 1
+        return 0
+
+    def discard_last(self, features=None):
+        """
+        Removes the entropies of the last window, e.g. when it was
+        abnormal and must not pollute the baseline.
+        """
+        if features is None:
+            features = self.history.keys()
+        for feature in features:
+            history = self.history[feature]
+            if history:
+                history.pop()
@@ -28,9 +28,11 @@ LOG = logging.getLogger('ryu.lib.hub')
 if HUB_TYPE == 'eventlet':
     import eventlet
     import eventlet.event
+    import eventlet.patcher
     import eventlet.queue
     import eventlet.semaphore
     import eventlet.timeout
+    import eventlet.tpool
     import eventlet.wsgi
     from eventlet import websocket
     import greenlet
@@ -43,6 +45,19 @@ if HUB_TYPE == 'eventlet':
     sleep = eventlet.sleep
     listen = eventlet.listen
     connect = eventlet.connect
+    # run a blocking function in a native thread; only the calling
+    # green thread waits for its result.
+    execute = eventlet.tpool.execute
+
+    # unpatched threads, which run even while a green thread is busy,
+    # e.g. to sample its stack.  they must not use the green API.
+    try:
+        _native_thread = eventlet.patcher.original('_thread')
+    except ImportError:
+        _native_thread = eventlet.patcher.original('thread')
+    start_native_thread = _native_thread.start_new_thread
+    native_thread_id = _native_thread.get_ident
+    native_sleep = eventlet.patcher.original('time').sleep
 
     def spawn(*args, **kwargs):
         def _launch(func, *args, **kwargs):
@@ -92,6 +107,7 @@ if HUB_TYPE == 'eventlet':
 
     Queue = eventlet.queue.Queue
     QueueEmpty = eventlet.queue.Empty
+    QueueFull = eventlet.queue.Full
     Semaphore = eventlet.semaphore.Semaphore
     BoundedSemaphore = eventlet.semaphore.BoundedSemaphore
 
@@ -18,6 +18,7 @@ import socket
 import logging
 
 from ryu.ofproto import ofproto_v1_0
+from ryu.exception import OFPRequestError, OFPRequestTimeout
 from ryu.lib import hub
 from ryu.lib.mac import haddr_to_bin, haddr_to_str
 
@@ -271,6 +272,17 @@ def nw_dst_to_str(wildcards, addr):
 
 
 def send_stats_request(dp, stats, waiters, msgs):
+    if hasattr(dp, 'send_request'):
+        # the datapath hands the replies over without going through
+        # the event queue of the application owning ``waiters``.
+        future = dp.send_request(stats, timeout=DEFAULT_TIMEOUT)
+        try:
+            future.result()
+        except (OFPRequestError, OFPRequestTimeout) as e:
+            LOG.debug('stats request failed: %s', e)
+        msgs.extend(future.replies)
+        return
+
     dp.set_xid(stats)
     waiters_per_dp = waiters.setdefault(dp.id, {})
     lock = hub.Event()
@@ -487,7 +499,7 @@ def get_port_desc(dp, waiters):
     return descs
 
 
-def mod_flow_entry(dp, flow, cmd):
+def to_flow_mod(dp, flow, cmd):
     cookie = int(flow.get('cookie', 0))
     priority = int(flow.get('priority',
                             dp.ofproto.OFP_DEFAULT_PRIORITY))
@@ -507,7 +519,11 @@ def mod_flow_entry(dp, flow, cmd):
         flags=flags,
         actions=actions)
 
-    dp.send_msg(flow_mod)
+    return flow_mod
+
+
+def mod_flow_entry(dp, flow, cmd):
+    dp.send_msg(to_flow_mod(dp, flow, cmd))
 
 
 def delete_flow_entry(dp):
@@ -21,6 +21,7 @@ from ryu.ofproto import ether
 from ryu.ofproto import inet
 from ryu.ofproto import ofproto_v1_3
 from ryu.ofproto import ofproto_v1_3_parser
+from ryu.exception import OFPRequestError, OFPRequestTimeout
 from ryu.lib import hub
 
 
@@ -420,6 +421,17 @@ def match_vid_to_str(value, mask):
 
 
 def send_stats_request(dp, stats, waiters, msgs):
+    if hasattr(dp, 'send_request'):
+        # the datapath hands the replies over without going through
+        # the event queue of the application owning ``waiters``.
+        future = dp.send_request(stats, timeout=DEFAULT_TIMEOUT)
+        try:
+            future.result()
+        except (OFPRequestError, OFPRequestTimeout) as e:
+            LOG.debug('stats request failed: %s', e)
+        msgs.extend(future.replies)
+        return
+
     dp.set_xid(stats)
     waiters_per_dp = waiters.setdefault(dp.id, {})
     lock = hub.Event()
@@ -981,7 +993,7 @@ def get_port_desc(dp, waiters):
     return descs
 
 
-def mod_flow_entry(dp, flow, cmd):
+def to_flow_mod(dp, flow, cmd):
     cookie = int(flow.get('cookie', 0))
     cookie_mask = int(flow.get('cookie_mask', 0))
     table_id = int(flow.get('table_id', 0))
@@ -1000,7 +1012,11 @@ def mod_flow_entry(dp, flow, cmd):
         hard_timeout, priority, buffer_id, out_port, out_group,
         flags, match, inst)
 
-    dp.send_msg(flow_mod)
+    return flow_mod
+
+
+def mod_flow_entry(dp, flow, cmd):
+    dp.send_msg(to_flow_mod(dp, flow, cmd))
 
 
 def mod_meter_entry(dp, meter, cmd):
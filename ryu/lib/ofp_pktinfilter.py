@@ -15,10 +15,13 @@
 # vim: tabstop=4 shiftwidth=4 softtabstop=4
 
 import logging
+import struct
 from abc import ABCMeta, abstractmethod
 import six
 
 from ryu.lib.packet import packet
+from ryu.ofproto import ether
+from ryu.ofproto import inet
 
 LOG = logging.getLogger(__name__)
 
@@ -56,3 +59,227 @@ class RequiredTypeFilter(PacketInFilterBase):
             if not pkt.get_protocol(required_type):
                 return False
         return True
+
+
+def packet_in_match(**predicates):
+    """
+    Decorator to declare which packet-in messages a handler is
+    interested in.
+
+    The keyword arguments are matched against the packet-in message.
+    Each value is either an integer or a collection of integers, any of
+    which may match.  The supported keys are:
+
+    ========= ========================================================
+    Key       Description
+    ========= ========================================================
+    eth_type  Ethernet type (after any VLAN tags)
+    ip_proto  IP protocol number of IPv4 or IPv6
+    l4_src    TCP/UDP/SCTP source port
+    l4_dst    TCP/UDP/SCTP destination port
+    in_port   Input port
+    table_id  ID of the table that sent the packet (OpenFlow 1.2+)
+    cookie    Cookie of the flow entry (OpenFlow 1.3+)
+    state     BEBA state included in the packet-in match
+    ========= ========================================================
+
+    OFPHandler collects the predicates of the handlers and classifies
+    each packet-in before it is queued to the applications, so that an
+    application only receives the packet-in messages which match at
+    least one of its handlers.  An application which has a handler
+    without predicates receives every packet-in.
+
+    Example::
+
+        @set_ev_cls(ofp_event.EventOFPPacketIn, MAIN_DISPATCHER)
+        @packet_in_match(eth_type=ether.ETH_TYPE_IP,
+                         ip_proto=inet.IPPROTO_UDP, l4_dst=[67, 68])
+        def dhcp_packet_in_handler(self, ev):
+            ...
+    """
+    def _packet_in_match(packet_in_handler):
+        match = PacketInMatch(**predicates)
+
+        def __packet_in_match(self, ev):
+            matches = getattr(ev, 'pkt_in_matches', None)
+            if matches is None:
+                # not classified by OFPHandler (e.g. called directly).
+                if not match.match(ev.msg):
+                    return
+            elif match not in matches:
+                return
+            return packet_in_handler(self, ev)
+        __packet_in_match.pkt_in_match = match
+        return __packet_in_match
+    return _packet_in_match
+
+
+def _to_set(value):
+    if value is None:
+        return None
+    if isinstance(value, six.integer_types):
+        return frozenset([value])
+    return frozenset(value)
+
+
+_VLAN_TYPES = (ether.ETH_TYPE_8021Q, ether.ETH_TYPE_8021AD)
+_L4_PROTOS = (inet.IPPROTO_TCP, inet.IPPROTO_UDP, inet.IPPROTO_SCTP)
+_IPV6_EXT_HEADERS = (inet.IPPROTO_HOPOPTS, inet.IPPROTO_ROUTING,
+                     inet.IPPROTO_FRAGMENT, inet.IPPROTO_AH,
+                     inet.IPPROTO_DSTOPTS)
+
+
+def _skip_ipv6_ext_headers(data, nxt, off):
+    """
+    Walk the IPv6 extension headers starting with ``nxt`` at ``off``.
+    Returns the upper-layer protocol and its offset, None if it is in a
+    non-first fragment.
+    """
+    while nxt in _IPV6_EXT_HEADERS:
+        (hdr_nxt, hdr_len) = struct.unpack_from('!BB', data, off)
+        if nxt == inet.IPPROTO_FRAGMENT:
+            (frag, ) = struct.unpack_from('!H', data, off + 2)
+            if frag & 0xfff8:
+                return hdr_nxt, None
+            off += 8
+        elif nxt == inet.IPPROTO_AH:
+            off += (hdr_len + 2) * 4
+        else:
+            off += (hdr_len + 1) * 8
+        nxt = hdr_nxt
+    return nxt, off
+
+
+def _parse_headers(data):
+    """
+    Extract (eth_type, ip_proto, l4_src, l4_dst) from the raw frame
+    without building a packet.Packet.  Unknown fields are None.  The
+    ip_proto of IPv6 is the protocol following the extension headers.
+    """
+    eth_type = ip_proto = l4_src = l4_dst = None
+    try:
+        (eth_type, ) = struct.unpack_from('!H', data, 12)
+        off = 14
+        while eth_type in _VLAN_TYPES:
+            (eth_type, ) = struct.unpack_from('!H', data, off + 2)
+            off += 4
+        l4_off = None
+        if eth_type == ether.ETH_TYPE_IP:
+            (ver_ihl, ) = struct.unpack_from('!B', data, off)
+            (frag, ) = struct.unpack_from('!H', data, off + 6)
+            (ip_proto, ) = struct.unpack_from('!B', data, off + 9)
+            if not frag & 0x1fff:
+                l4_off = off + (ver_ihl & 0xf) * 4
+        elif eth_type == ether.ETH_TYPE_IPV6:
+            (nxt, ) = struct.unpack_from('!B', data, off + 6)
+            ip_proto, l4_off = _skip_ipv6_ext_headers(data, nxt, off + 40)
+        if l4_off is not None and ip_proto in _L4_PROTOS:
+            (l4_src, l4_dst) = struct.unpack_from('!HH', data, l4_off)
+    except (struct.error, TypeError):
+        pass
+    return eth_type, ip_proto, l4_src, l4_dst
+
+
+def _get_in_port(msg):
+    if msg.datapath.ofproto.OFP_VERSION == 0x01:
+        return msg.in_port
+    return msg.match.get('in_port')
+
+
+def _get_state(msg):
+    match = getattr(msg, 'match', None)
+    if match is None:
+        return None
+    return match.get('state')
+
+
+# residual predicates evaluated after the decision tree.
+# name -> function(msg, headers)
+_RESIDUAL_FIELDS = {
+    'l4_src': lambda msg, hdr: hdr[2],
+    'l4_dst': lambda msg, hdr: hdr[3],
+    'in_port': lambda msg, hdr: _get_in_port(msg),
+    'table_id': lambda msg, hdr: getattr(msg, 'table_id', None),
+    'cookie': lambda msg, hdr: getattr(msg, 'cookie', None),
+    'state': lambda msg, hdr: _get_state(msg),
+}
+
+
+class PacketInMatch(object):
+    """
+    A set of declarative predicates on a packet-in message.
+    See packet_in_match() for the supported keys.
+    """
+
+    def __init__(self, **predicates):
+        unknown = set(predicates) - set(_RESIDUAL_FIELDS) - set(
+            ['eth_type', 'ip_proto'])
+        if unknown:
+            raise ValueError('unknown packet-in predicate: %s' %
+                             ', '.join(sorted(unknown)))
+        self.predicates = predicates
+        self.eth_type = _to_set(predicates.get('eth_type'))
+        self.ip_proto = _to_set(predicates.get('ip_proto'))
+        self.residual = [(_RESIDUAL_FIELDS[k], _to_set(v))
+                         for k, v in sorted(predicates.items())
+                         if k in _RESIDUAL_FIELDS and v is not None]
+
+    def __repr__(self):
+        return '%s(%s)' % (self.__class__.__name__, ', '.join(
+            '%s=%r' % i for i in sorted(self.predicates.items())))
+
+    def match_residual(self, msg, headers):
+        for get, values in self.residual:
+            if get(msg, headers) not in values:
+                return False
+        return True
+
+    def match(self, msg):
+        headers = _parse_headers(msg.data)
+        if self.eth_type is not None and headers[0] not in self.eth_type:
+            return False
+        if self.ip_proto is not None and headers[1] not in self.ip_proto:
+            return False
+        return self.match_residual(msg, headers)
+
+
+class PacketInClassifier(object):
+    """
+    Decision tree over the raw packet-in data built from PacketInMatch
+    objects.
+
+    The first two levels of the tree are dictionaries keyed by
+    eth_type and ip_proto (None being the wildcard branch), so only
+    the matches which can apply to a packet have their remaining
+    predicates evaluated.
+    """
+
+    def __init__(self, matches=()):
+        self.matches = list(matches)
+        self._tree = {}
+        for match in self.matches:
+            for eth_type in match.eth_type or [None]:
+                node = self._tree.setdefault(eth_type, {})
+                for ip_proto in match.ip_proto or [None]:
+                    node.setdefault(ip_proto, []).append(match)
+
+    def classify(self, msg):
+        """
+        Returns the set of PacketInMatch objects matching ``msg``.
+        """
+        matched = set()
+        if not self._tree:
+            return matched
+        headers = _parse_headers(msg.data)
+        eth_type, ip_proto = headers[0], headers[1]
+        for key in (eth_type, None):
+            node = self._tree.get(key)
+            if node is None:
+                continue
+            for proto in (ip_proto, None):
+                for match in node.get(proto, ()):
+                    if match.match_residual(msg, headers):
+                        matched.add(match)
+            if key is None:
+                break
+        return matched
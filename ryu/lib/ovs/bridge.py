@@ -92,10 +92,10 @@ class TunnelPort(object):
 class OVSBridge(object):
 
     def __init__(self, CONF, datapath_id, ovsdb_addr, timeout=None,
-                 exception=None):
+                 exception=None, persistent=False):
         super(OVSBridge, self).__init__()
         self.datapath_id = datapath_id
-        self.vsctl = ovs_vsctl.VSCtl(ovsdb_addr)
+        self.vsctl = ovs_vsctl.VSCtl(ovsdb_addr, persistent=persistent)
         self.timeout = timeout or CONF.ovsdb_timeout
         self.exception = exception
 
@@ -104,6 +104,9 @@ class OVSBridge(object):
     def run_command(self, commands):
         self.vsctl.run_command(commands, self.timeout, self.exception)
 
+    def close(self):
+        self.vsctl.close()
+
     def init(self):
         if self.br_name is None:
             self.br_name = self._get_bridge_name()
@@ -192,11 +195,27 @@ class OVSBridge(object):
         command = ovs_vsctl.VSCtlCommand('del-port', (self.br_name, port_name))
         self.run_command([command])
 
+    def _get_ofports(self, port_names):
+        # a single transaction for all the ports
+        commands = [ovs_vsctl.VSCtlCommand('get',
+                                           ('Interface', name, 'ofport'))
+                    for name in port_names]
+        if commands:
+            self.run_command(commands)
+        ofports = []
+        for command in commands:
+            assert len(command.result) == 1
+            ofport_list = command.result[0]
+            assert len(ofport_list) == 1
+            ofports.append(int(ofport_list[0]))
+        return ofports
+
     def _get_ports(self, get_port):
         ports = []
         port_names = self.get_port_name_list()
-        for name in port_names:
-            if self.get_ofport(name) < 0:
+        ofports = self._get_ofports(port_names)
+        for name, ofport in zip(port_names, ofports):
+            if ofport < 0:
                 continue
             port = get_port(name)
             if port:
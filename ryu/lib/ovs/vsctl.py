@@ -41,6 +41,20 @@ from ryu.lib.ovs import vswitch_idl
 
 LOG = logging.getLogger(__name__)       # use ovs.vlog?
 
+# (schema JSON, IDL schema of all the columns) by (remote, database name),
+# shared by the VSCtl instances.
+_schema_cache = {}
+
+
+def clear_schema_cache(remote=None):
+    """
+    Forgets the cached database schemas of ``remote``, or of all the
+    remotes, e.g. after an upgrade of the ovsdb server.
+    """
+    for key in list(_schema_cache.keys()):
+        if remote is None or key[0] == remote:
+            del _schema_cache[key]
+
 
 # for debug
 def ovsrec_row_changes_to_string(ovsrec_row):
@@ -860,6 +874,18 @@ class VSCtlCommand(object):
 
 
 class VSCtl(object):
+    """
+    Runs ovs-vsctl like commands against the ovsdb server at ``remote``.
+
+    The database schema is fetched once per ``remote`` and shared by the
+    VSCtl instances (see ``clear_schema_cache()``).
+
+    With ``persistent=True``, the IDL connection and its replica of the
+    database are kept between ``run_command()`` calls, so a command costs
+    about a single transaction round trip once the replica is warm.
+    The IDL is rebuilt only when commands need tables or columns which
+    are not replicated yet.  ``close()`` drops the connection.
+    """
 
     def _reset(self):
         self.schema_helper = None
@@ -868,9 +894,10 @@ class VSCtl(object):
         self.wait_for_reload = True
         self.dry_run = False
 
-    def __init__(self, remote):
+    def __init__(self, remote, persistent=False):
         super(VSCtl, self).__init__()
         self.remote = remote
+        self.persistent = persistent
 
         self.schema_json = None
         self.schema = None
@@ -880,6 +907,10 @@ class VSCtl(object):
         self.wait_for_reload = True
         self.dry_run = False
 
+        # IDL of the persistent session and its registered tables
+        self._idl = None
+        self._idl_tables = None
+
     def _rpc_get_schema_json(self, database):
         LOG.debug('remote %s', self.remote)
         error, stream_ = stream.Stream.open_block(
@@ -899,11 +930,16 @@ class VSCtl(object):
 
     def _init_schema_helper(self):
         if self.schema_json is None:
-            self.schema_json = self._rpc_get_schema_json(
-                vswitch_idl.OVSREC_DB_NAME)
-            schema_helper = idl.SchemaHelper(None, self.schema_json)
-            schema_helper.register_all()
-            self.schema = schema_helper.get_idl_schema()
+            key = (self.remote, vswitch_idl.OVSREC_DB_NAME)
+            cached = _schema_cache.get(key)
+            if cached is None:
+                schema_json = self._rpc_get_schema_json(
+                    vswitch_idl.OVSREC_DB_NAME)
+                schema_helper = idl.SchemaHelper(None, schema_json)
+                schema_helper.register_all()
+                cached = (schema_json, schema_helper.get_idl_schema())
+                _schema_cache[key] = cached
+            self.schema_json, self.schema = cached
         # LOG.debug('schema_json %s', schema_json)
         self.schema_helper = idl.SchemaHelper(None, self.schema_json)
 
@@ -1010,6 +1046,68 @@ class VSCtl(object):
 
         return True
 
+    @staticmethod
+    def _tables_cover(tables, other):
+        """
+        Returns True if the registered ``tables`` include ``other``.
+        Both map a table name to its set of columns, an empty set
+        meaning all the columns.
+        """
+        for table, columns in other.items():
+            registered = tables.get(table)
+            if registered is None:
+                return False
+            if registered and (not columns or not columns <= registered):
+                return False
+        return True
+
+    @staticmethod
+    def _merge_tables(tables, other):
+        merged = dict((table, set(columns))
+                      for table, columns in tables.items())
+        for table, columns in other.items():
+            registered = merged.get(table)
+            if registered is None:
+                merged[table] = set(columns)
+            elif not registered or not columns:
+                merged[table] = set()
+            else:
+                registered |= columns
+        return merged
+
+    def _get_idl(self):
+        # SchemaHelper has no accessor for the registered tables.
+        tables = self.schema_helper._tables
+        if self._idl is not None:
+            if self._tables_cover(self._idl_tables, tables):
+                return self._idl
+            LOG.debug('rebuilding idl for %s', self.remote)
+            tables = self._merge_tables(self._idl_tables, tables)
+            self.close()
+
+            schema_helper = idl.SchemaHelper(None, self.schema_json)
+            for table, columns in tables.items():
+                if columns:
+                    schema_helper.register_columns(table, sorted(columns))
+                else:
+                    schema_helper.register_table(table)
+            self.schema_helper = schema_helper
+
+        tables = dict((table, set(columns))
+                      for table, columns in tables.items())
+        self._idl = idl.Idl(self.remote, self.schema_helper)
+        self._idl_tables = tables
+        return self._idl
+
+    def close(self):
+        """
+        Closes the IDL connection of the persistent session, if any.
+        """
+        if self._idl is not None:
+            self._idl.close()
+            self._idl = None
+            self._idl_tables = None
+
     def _do_main(self, commands):
         """
         :type commands: list of VSCtlCommand
@@ -1018,22 +1116,33 @@ class VSCtl(object):
         self._init_schema_helper()
         self._run_prerequisites(commands)
 
-        idl_ = idl.Idl(self.remote, self.schema_helper)
-        seqno = idl_.change_seqno
-        while True:
-            self._idl_wait(idl_, seqno)
-
-            seqno = idl_.change_seqno
-            if self._do_vsctl(idl_, commands):
-                break
+        idl_ = self._get_idl()
+        done = False
+        try:
+            if idl_.change_seqno:
+                # the replica is warm; only apply the pending updates
+                # before the first try.
+                idl_.run()
+                seqno = None
+            else:
+                seqno = idl_.change_seqno
+            while True:
+                self._idl_wait(idl_, seqno)
 
-            if self.txn:
-                self.txn.abort()
-                self.txn = None
-            # TODO:XXX
-            # ovsdb_symbol_table_destroy(symtab)
+                seqno = idl_.change_seqno
+                if self._do_vsctl(idl_, commands):
+                    break
 
-        idl_.close()
+                if self.txn:
+                    self.txn.abort()
+                    self.txn = None
+                # TODO:XXX
+                # ovsdb_symbol_table_destroy(symtab)
+            done = True
+        finally:
+            # an interrupted transaction leaves the IDL unusable.
+            if not (done and self.persistent):
+                self.close()
 
     def _run_command(self, commands):
         """
@@ -1102,6 +1211,12 @@ class VSCtl(object):
         self._do_main(commands)
 
     def run_command(self, commands, timeout_sec=None, exception=None):
+        """
+        Runs ``commands`` in a single transaction and stores their
+        results in ``VSCtlCommand.result``.
+
+        :type commands: list of VSCtlCommand
+        """
         if timeout_sec is None:
             self._run_command(commands)
         else:
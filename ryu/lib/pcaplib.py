@@ -36,6 +36,12 @@ Sample usage of dump packets:
             # Creating an instance with a PCAP filename
             self.pcap_pen = Writer(open('mypcap.pcap', 'wb'))
 
+            # or, for long captures, keeping the disk I/O off the
+            # event loop and rotating the files every 64 MiB
+            # self.pcap_pen = BackgroundWriter(
+            #     RotatingWriter('/var/log/ryu', 'packet_in'))
+            # self.pcap_pen.start()
+
         @set_ev_cls(ofp_event.EventOFPPacketIn, MAIN_DISPATCHER)
         def _packet_in_handler(self, ev):
             msg = ev.msg
@@ -64,13 +70,32 @@ Sample usage of reading PCAP files:
         # and raw packet.
         print frame_count, ts, dst, src, pkt
 
+Large files can be memory-mapped; the records are then memoryviews of
+the file, valid until the reader is closed:
+
+    with pcaplib.MmapReader('test.pcap') as reader:
+        for ts, buf in reader:
+            ...
+
+The writers buffer the records: flush() writes them to the file and
+close() (or the end of a "with" block) flushes and closes the file.
 """
 
+import logging
+import mmap
+import os
 import six
 import struct
-import sys
 import time
 
+from ryu.lib import hub
+
+LOG = logging.getLogger(__name__)
+
+# magic numbers of the files with micro and nanosecond timestamps
+_MAGIC_USEC = 0xa1b2c3d4
+_MAGIC_NSEC = 0xa1b23c4d
+
 
 class PcapFileHdr(object):
     """
@@ -118,11 +143,11 @@ class PcapFileHdr(object):
 
     @classmethod
     def parser(cls, buf):
-        if buf[:4] == b'\xa1\xb2\xc3\xd4':
+        if buf[:4] in (b'\xa1\xb2\xc3\xd4', b'\xa1\xb2\x3c\x4d'):
             # Big Endian
             cls._FILE_HDR_FMT = '>IHHIIII'
             byteorder = '>'
-        elif buf[:4] == b'\xd4\xc3\xb2\xa1':
+        elif buf[:4] in (b'\xd4\xc3\xb2\xa1', b'\x4d\x3c\xb2\xa1'):
             # Little Endian
             cls._FILE_HDR_FMT = '<IHHIIII'
             byteorder = '<'
@@ -194,7 +219,37 @@ class PcapPktHdr(object):
                            self.incl_len, self.orig_len)
 
 
+def _parse_file_hdr(buf):
+    if len(buf) < Reader._FILE_HDR_FMT_LEN:
+        raise Exception('Invalid pcap file.')
+    (filehdr, byteorder) = PcapFileHdr.parser(buf)
+    ts_scale = 1e9 if filehdr.magic == _MAGIC_NSEC else 1e6
+    return filehdr, byteorder, ts_scale
+
+
+def _records(buf, byteorder, ts_scale, offset):
+    """
+    Yields the (timestamp, data) of the records of ``buf`` from
+    ``offset``, data being a slice of ``buf``.
+    A record truncated at the end of ``buf`` is ignored.
+    """
+    pkt_hdr = struct.Struct(byteorder + 'IIII')
+    end = len(buf)
+    while offset + pkt_hdr.size <= end:
+        (ts_sec, ts_frac, incl_len,
+         _orig_len) = pkt_hdr.unpack_from(buf, offset)
+        offset += pkt_hdr.size
+        if offset + incl_len > end:
+            break
+        yield ts_sec + ts_frac / ts_scale, buf[offset:offset + incl_len]
+        offset += incl_len
+
+
 class Reader(object):
+    """
+    Iterates over the (timestamp, data) of the records of ``file_obj``,
+    which is read at once and closed.
+    """
     _FILE_HDR_FMT = '>IHHIIII'
     _PKT_HDR_FMT = '>IIII'
 
@@ -203,87 +258,299 @@ class Reader(object):
 
     def __init__(self, file_obj):
         self._fp = file_obj
-        # self.__filename = filename
         self._file_byteorder = None
-        self._hdr_data = None
-        self.incl_len_pos = 0
+        self._records = None
 
     def __iter__(self):
-        buf = self._fp.read(Reader._FILE_HDR_FMT_LEN)
-        # Only Read PCAP file from 0 to 24th byte
-        (filehdr, self._file_byteorder) = PcapFileHdr.parser(buf)
-
-        # self._fp.seek(Reader._FILE_HDR_FMT_LEN)
-
-        # Read PCAP file from 24th byte to EOF
-        self._hdr_data = self._fp.read()
+        buf = self._fp.read()
         self._fp.close()
-
+        (_filehdr, self._file_byteorder, ts_scale) = _parse_file_hdr(buf)
+        self._records = _records(buf, self._file_byteorder, ts_scale,
+                                 Reader._FILE_HDR_FMT_LEN)
         return self
 
     def next(self):
+        return next(self._records)
+
+    __next__ = next
+
+
+class MmapReader(object):
+    """
+    Iterates over the (timestamp, data) of the records of the file
+    ``path``, which is memory-mapped: ``data`` is a memoryview of the
+    file, without copy, valid until close() is called.
+    On Python 2, whose mmap cannot be viewed, ``data`` is a copy.
+    """
+
+    def __init__(self, path):
+        self._file = open(path, 'rb')
+        self._mmap = None
+        self._view = None
         try:
-            pkt_hdr, pkt_data = PcapPktHdr.parser(self._file_byteorder,
-                                                  self._hdr_data
-                                                  [self.incl_len_pos:])
+            self._mmap = mmap.mmap(self._file.fileno(), 0,
+                                   access=mmap.ACCESS_READ)
+            if six.PY2:
+                self._view = self._mmap
+            else:
+                self._view = memoryview(self._mmap)
+            (self.file_hdr, self._byteorder,
+             self._ts_scale) = _parse_file_hdr(self._view)
+        except Exception:
+            self.close()
+            raise
+
+    def __iter__(self):
+        return _records(self._view, self._byteorder, self._ts_scale,
+                        Reader._FILE_HDR_FMT_LEN)
 
-            next_pos = pkt_hdr.incl_len + Reader._PKT_HDR_LEN
-            self.incl_len_pos += next_pos
-        except IndexError:
-            raise StopIteration
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_args):
+        self.close()
 
-        return float(pkt_hdr.ts_sec + (pkt_hdr.ts_usec / 1e6)), pkt_data
+    def close(self):
+        if isinstance(self._view, memoryview):
+            self._view.release()
+        self._view = None
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                # records are still referenced; the file is unmapped
+                # when the last one is released.
+                pass
+            self._mmap = None
+        self._file.close()
 
 
 class Writer(object):
-    def __init__(self, file_obj, snaplen=65535, linktype=1):
+    """
+    Writes packet records to ``file_obj``, opened in binary mode.
+
+    The records are buffered until ``buffer_size`` bytes are pending or
+    flush() is called; close() flushes and closes the file.  The
+    packets are truncated to ``snaplen`` bytes.
+    """
+    _FILE_HDR_FMT = '=IHHIIII'
+    _PKT_HDR = struct.Struct('=IIII')
+
+    def __init__(self, file_obj, snaplen=65535, linktype=1,
+                 buffer_size=64 * 1024):
         self._f = file_obj
+        self.snaplen = snaplen
+        self.linktype = linktype
+        self.buffer_size = buffer_size
+        # bytes written to the current file, including the pending ones
+        self.size = 0
+        self._pending = []
+        self._pending_len = 0
         self._write_pcap_file_hdr(snaplen, linktype)
 
-    def _write_pcap_file_hdr(self, snaplen, linktype):
-        if sys.byteorder == 'little':
-            pcap_file_hdr = PcapFileHdr(magic=0xa1b2c3d4,
-                                        snaplen=snaplen,
-                                        linktype=linktype)
-            p = pcap_file_hdr.serialize(fmt='<IHHIIII')
-        else:
-            pcap_file_hdr, byteorder = PcapFileHdr(magic=0xd4c3b2a1,
-                                                   naplen=snaplen,
-                                                   linktype=linktype)
-            p = pcap_file_hdr.serialize(fmt='>IHHIIII')
-        self._f.write(str(p))
+    def _write(self, data):
+        self._pending.append(data)
+        self._pending_len += len(data)
+        self.size += len(data)
 
-    def _write_pkt_hdr(self, ts, buf_str_len):
-        sec = int(ts)
-        if sec == 0:
-            usec = 0
-        else:
-            usec = int(ts * 1e6) % int(ts)
-
-        if sys.byteorder == 'little':
-            # usec = int(ts * 1e6) % int(ts)
-            # old_usec = int((float(ts) - int(ts)) * 1e6)
-            pc_pkt_hdr = PcapPktHdr(ts_sec=sec,
-                                    ts_usec=usec,
-                                    incl_len=buf_str_len,
-                                    orig_len=buf_str_len)
-            p = pc_pkt_hdr.serialize(fmt='<IIII')
-        else:
-            pc_pkt_hdr = PcapPktHdr(ts_sec=sec,
-                                    ts_usec=usec,
-                                    incl_len=buf_str_len,
-                                    orig_len=buf_str_len)
-            p = pc_pkt_hdr.serialize(fmt='>IIII')
-        self._f.write(str(p))
+    def _write_pcap_file_hdr(self, snaplen, linktype):
+        # in the native byte order, told by the magic number
+        pcap_file_hdr = PcapFileHdr(magic=_MAGIC_USEC, snaplen=snaplen,
+                                    linktype=linktype)
+        self._write(pcap_file_hdr.serialize(fmt=self._FILE_HDR_FMT))
 
     def write_pkt(self, buf, ts=None):
         if ts is None:
             ts = time.time()
 
+        sec = int(ts)
+        usec = int(round((ts - sec) * 1e6))
+        if usec >= 1000000:
+            sec += 1
+            usec -= 1000000
+
         buf_str = six.binary_type(buf)
-        buf_str_len = len(buf_str)
-        self._write_pkt_hdr(ts, buf_str_len)
-        self._f.write(buf_str)
+        orig_len = len(buf_str)
+        if orig_len > self.snaplen:
+            buf_str = buf_str[:self.snaplen]
+        self._write(self._PKT_HDR.pack(sec, usec, len(buf_str), orig_len))
+        self._write(buf_str)
+        if self._pending_len >= self.buffer_size:
+            self._write_pending()
+
+    def write_pkts(self, pkts):
+        """Writes the (timestamp, data) of ``pkts``."""
+        for ts, buf in pkts:
+            self.write_pkt(buf, ts)
+
+    def _write_pending(self):
+        if self._pending:
+            self._f.write(b''.join(self._pending))
+            self._pending = []
+            self._pending_len = 0
+
+    def flush(self):
+        self._write_pending()
+        self._f.flush()
+
+    def close(self):
+        if self._f is None:
+            return
+        try:
+            self.flush()
+        finally:
+            self._f.close()
+            self._f = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_args):
+        self.close()
 
     def __del__(self):
-        self._f.close()
+        # last resort; close() should be called explicitly
+        if getattr(self, '_f', None) is not None:
+            self.close()
+
+
+class RotatingWriter(Writer):
+    """
+    Writes packet records to the files
+    ``<directory>/<prefix>-<time>-<sequence>.pcap``.
+
+    A new file is started when the current one reaches ``rotate_size``
+    bytes or is ``rotate_interval`` seconds old (None disables the
+    limit).  ``path`` is the current file.
+    """
+
+    def __init__(self, directory, prefix, rotate_size=64 * 1024 * 1024,
+                 rotate_interval=None, snaplen=65535, linktype=1,
+                 buffer_size=64 * 1024, clock=time.time):
+        self.directory = directory
+        self.prefix = prefix
+        self.rotate_size = rotate_size
+        self.rotate_interval = rotate_interval
+        self.clock = clock
+        self.path = None
+        self._file_seq = 0
+        self._file_start = None
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        super(RotatingWriter, self).__init__(self._open(), snaplen,
+                                             linktype, buffer_size)
+
+    def _open(self):
+        now = self.clock()
+        self._file_seq += 1
+        self._file_start = now
+        self.path = os.path.join(self.directory, '%s-%s-%04d.pcap' % (
+            self.prefix, time.strftime('%Y%m%d-%H%M%S', time.gmtime(now)),
+            self._file_seq))
+        return open(self.path, 'wb')
+
+    def rotate(self):
+        """Closes the current file and starts a new one."""
+        self.close()
+        self._f = self._open()
+        self.size = 0
+        self._write_pcap_file_hdr(self.snaplen, self.linktype)
+
+    def write_pkt(self, buf, ts=None):
+        if ((self.rotate_size and self.size >= self.rotate_size) or
+                (self.rotate_interval and
+                 self.clock() - self._file_start >= self.rotate_interval)):
+            self.rotate()
+        super(RotatingWriter, self).write_pkt(buf, ts)
+
+
+class BackgroundWriter(object):
+    """
+    Keeps the disk I/O of a Writer off the event loop.
+
+    write_pkt() queues a copy of the packet and returns at once; a
+    green thread hands the queued packets to ``writer`` in batches
+    from a native thread.  At most ``queue_size`` packets wait to be
+    written; the packets written while the queue is full are dropped
+    and counted in ``dropped``.  stop() writes the queued packets and
+    closes ``writer``.
+    """
+    _BATCH_SIZE = 256
+
+    def __init__(self, writer, queue_size=4096):
+        self.writer = writer
+        self.dropped = 0
+        self._queue = hub.Queue(queue_size)
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = hub.spawn(self._run)
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        hub.joinall([self._thread])
+        self._thread = None
+
+    def write_pkt(self, buf, ts=None):
+        """
+        Queues a packet.  Returns False if it was dropped because the
+        queue is full.
+        """
+        if ts is None:
+            ts = time.time()
+        try:
+            self._queue.put_nowait((ts, six.binary_type(buf)))
+        except hub.QueueFull:
+            self.dropped += 1
+            return False
+        return True
+
+    def flush(self):
+        """
+        Waits until the packets queued so far are in the file.  Raises
+        RuntimeError if the writer thread is not running.
+        """
+        self._check_running()
+        done = hub.Event()
+        self._queue.put(done)
+        while not done.wait(timeout=1):
+            self._check_running()
+
+    def _check_running(self):
+        if self._thread is None or self._thread.dead:
+            raise RuntimeError('the writer thread is not running')
+
+    def _execute(self, func, *args):
+        try:
+            hub.execute(func, *args)
+        except Exception:
+            LOG.exception('failed to write packet records')
+
+    def _run(self):
+        running = True
+        while running:
+            batch = [self._queue.get()]
+            while len(batch) < self._BATCH_SIZE:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except hub.QueueEmpty:
+                    break
+            pkts = []
+            for item in batch:
+                if isinstance(item, tuple):
+                    pkts.append(item)
+                    continue
+                if pkts:
+                    self._execute(self.writer.write_pkts, pkts)
+                    pkts = []
+                if item is None:
+                    self._execute(self.writer.close)
+                    running = False
+                else:
+                    self._execute(self.writer.flush)
+                    item.set()
+            if pkts:
+                self._execute(self.writer.write_pkts, pkts)
@@ -0,0 +1,232 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Sampling profiler of the green threads
+
+A native thread samples, every ``--profile-interval`` seconds, the
+stack of the green thread which is running in the main thread.  As the
+green threads only switch when they yield, the samples are attributed
+to the code which actually uses the CPU, unlike cProfile which charges
+the time to the hub switches.  Samples where the hub waits for I/O are
+counted as idle and are not recorded.  The sampling thread only runs
+when the main thread releases the GIL, i.e. in blocking system calls or
+every sys.getswitchinterval() seconds, so the system calls are somewhat
+over-represented.
+
+Each stack is prefixed with the RyuApp and the datapath it runs for,
+i.e. the ``self`` of the innermost method of a RyuApp and of a
+Datapath, so that the time of the handlers can be split per
+application and per switch.
+
+The output is in the folded stacks format of FlameGraph
+(https://github.com/brendangregg/FlameGraph)::
+
+    app:SimpleSwitch13;dp:0000000000000001;ryu/lib/hub.py:_launch;... 42
+
+``--profile`` profiles ryu-manager from the start and writes the stacks
+to ``--profile-output`` at exit.  ``ryu.app.rest_profiler`` starts and
+stops the profiler at run time and returns the stacks.
+"""
+
+import logging
+import os
+import sys
+
+from ryu import cfg
+from ryu.lib import hub
+from ryu.lib.dpid import dpid_to_str
+
+LOG = logging.getLogger(__name__)
+
+CONF = cfg.CONF
+CONF.register_cli_opts([
+    cfg.BoolOpt('profile', default=False,
+                help='sample the stacks of the green threads'),
+    cfg.FloatOpt('profile-interval', default=0.005,
+                 help='seconds between two stack samples (default: 0.005)'),
+    cfg.StrOpt('profile-output', default='ryu-profile.folded',
+               help='file of the folded stacks written at exit '
+               '(default: ryu-profile.folded)'),
+])
+
+# frames beyond this depth are dropped, from the root
+MAX_DEPTH = 128
+
+# functions in which the hub waits for I/O or timers
+_IDLE_FUNCTIONS = frozenset(['wait', 'do_poll', 'poll', 'select',
+                             'sleep'])
+_HUB_DIR = os.sep + os.path.join('eventlet', 'hubs') + os.sep
+_RYU_DIR = os.sep + 'ryu' + os.sep
+_SITE_DIR = 'site-packages' + os.sep
+
+_OWNER_TYPES = []
+
+
+def _owner_types():
+    if not _OWNER_TYPES:
+        # avoid circular import
+        from ryu.base import app_manager
+        from ryu.controller import controller
+        _OWNER_TYPES.extend([app_manager.RyuApp, controller.Datapath])
+    return _OWNER_TYPES
+
+
+def _frame_label(code):
+    # ryu/lib/hub.py, eventlet/hubs/hub.py, ...
+    filename = code.co_filename
+    index = filename.rfind(_RYU_DIR)
+    if index >= 0:
+        filename = filename[index + 1:]
+    else:
+        index = filename.rfind(_SITE_DIR)
+        if index >= 0:
+            filename = filename[index + len(_SITE_DIR):]
+        else:
+            # logging/__init__.py, ...
+            filename = os.path.join(
+                os.path.basename(os.path.dirname(filename)),
+                os.path.basename(filename))
+    return '%s:%s' % (filename, code.co_name)
+
+
+class SamplingProfiler(object):
+    """
+    Samples the stack of the running green thread every ``interval``
+    seconds from a native thread.
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.samples = 0
+        self.idle = 0
+        self.errors = 0
+        self._stacks = {}
+        self._labels = {}
+        self._thread_id = None
+        self._generation = 0
+        self.running = False
+
+    def start(self, interval=None):
+        """Starts sampling the thread which calls it."""
+        if interval is not None:
+            self.interval = interval
+        if self.running:
+            return
+        self.running = True
+        self._thread_id = hub.native_thread_id()
+        self._generation += 1
+        hub.start_native_thread(self._run, (self._generation, ))
+
+    def stop(self):
+        self.running = False
+        self._generation += 1
+
+    def reset(self):
+        self.samples = 0
+        self.idle = 0
+        self.errors = 0
+        self._stacks = {}
+
+    def _run(self, generation):
+        # native thread: must not use the green API
+        while generation == self._generation:
+            hub.native_sleep(self.interval)
+            if generation != self._generation:
+                break
+            try:
+                self.sample()
+            except Exception:
+                # logging would take green locks
+                self.errors += 1
+
+    def _label(self, code):
+        label = self._labels.get(code)
+        if label is None:
+            label = _frame_label(code)
+            self._labels[code] = label
+        return label
+
+    def stack(self, frame):
+        """
+        Returns the folded stack of ``frame``, None if the hub is
+        waiting.
+        """
+        app_type, datapath_type = _owner_types()
+        labels = []
+        app = None
+        datapath = None
+        while frame is not None and len(labels) < MAX_DEPTH:
+            code = frame.f_code
+            if (not labels and code.co_name in _IDLE_FUNCTIONS and
+                    _HUB_DIR in code.co_filename):
+                return None
+            labels.append(self._label(code))
+            if ((app is None or datapath is None) and code.co_varnames and
+                    code.co_varnames[0] == 'self'):
+                obj = frame.f_locals.get('self')
+                if app is None and isinstance(obj, app_type):
+                    app = obj.name
+                elif datapath is None and isinstance(obj, datapath_type):
+                    datapath = ('unknown' if obj.id is None
+                                else dpid_to_str(obj.id))
+            frame = frame.f_back
+        if datapath is not None:
+            labels.append('dp:%s' % datapath)
+        if app is not None:
+            labels.append('app:%s' % app)
+        return ';'.join(reversed(labels))
+
+    def sample(self):
+        frame = sys._current_frames().get(self._thread_id)
+        if frame is None:
+            return
+        stack = self.stack(frame)
+        del frame
+        if stack is None:
+            self.idle += 1
+            return
+        self.samples += 1
+        stacks = self._stacks
+        stacks[stack] = stacks.get(stack, 0) + 1
+
+    def stacks(self):
+        """Returns {folded stack: samples}."""
+        return dict(self._stacks)
+
+    def folded(self):
+        """Returns the stacks in the folded format, one per line."""
+        return ''.join('%s %d\n' % item
+                       for item in sorted(self.stacks().items()))
+
+    def write(self, path):
+        with open(path, 'w') as f:
+            f.write(self.folded())
+
+
+PROFILER = SamplingProfiler()
+
+
+def setup():
+    """Starts PROFILER if ``--profile`` is given."""
+    if CONF.profile:
+        PROFILER.start(CONF.profile_interval)
+
+
+def shutdown():
+    """Stops PROFILER and writes its stacks to ``--profile-output``."""
+    PROFILER.stop()
+    if PROFILER.samples and CONF.profile_output:
+        PROFILER.write(CONF.profile_output)
+        LOG.info('%d stack samples (%d idle) written to %s',
+                 PROFILER.samples, PROFILER.idle, CONF.profile_output)
@@ -62,6 +62,18 @@ class MessageEncoder(object):
         assert error is None or result is None
         return self._packer.pack([MessageType.RESPONSE, msgid, error, result])
 
+    def create_requests(self, calls):
+        """encode a batch of (method, params) requests into
+        a single buffer.  returns the buffer and a list of msgids.
+        """
+        msgs = []
+        msgids = []
+        for method, params in calls:
+            msg, msgid = self.create_request(method, params)
+            msgs.append(msg)
+            msgids.append(msgid)
+        return b''.join(msgs), msgids
+
     def create_notification(self, method, params):
         assert isinstance(method, six.binary_type)
         assert isinstance(params, list)
@@ -95,6 +107,13 @@ class EndPoint(object):
     """An endpoint
     *sock* is a socket-like.  it can be either blocking or non-blocking.
     """
+
+    # the size of a single recv()
+    _RECV_SIZE = 65536
+    # the sent part of the send buffer is discarded when it's larger
+    # than this and than the unsent part.
+    _COMPACT_SIZE = 65536
+
     def __init__(self, sock, encoder=None, disp_table=None):
         if encoder is None:
             encoder = MessageEncoder()
@@ -109,28 +128,50 @@ class EndPoint(object):
         else:
             self._table = disp_table
         self._send_buffer = bytearray()
+        self._send_offset = 0  # bytes of _send_buffer already sent
+        # while set, outgoing messages are only buffered.  see
+        # receive_messages.
+        self._corked = False
         # msgids for which we sent a request but have not received a response
         self._pending_requests = set()
         # queues for incoming messages
         self._requests = deque()
         self._notifications = deque()
         self._responses = {}
+        # msgid -> list of its caller, to which the msgid is appended
+        # when the response is queued.  see send_requests.
+        self._arrived = {}
         self._incoming = 0  # number of incoming messages in our queues
         self._closed_by_peer = False
 
     def selectable(self):
         rlist = [self._sock]
         wlist = []
-        if self._send_buffer:
+        if self.has_pending_output():
             wlist.append(self._sock)
         return rlist, wlist
 
+    def has_pending_output(self):
+        return self._send_offset < len(self._send_buffer)
+
     def process_outgoing(self):
+        if not self.has_pending_output():
+            return
         try:
-            sent_bytes = self._sock.send(self._send_buffer)
+            sent_bytes = self._sock.send(
+                memoryview(self._send_buffer)[self._send_offset:])
         except IOError:
-            sent_bytes = 0
-        del self._send_buffer[:sent_bytes]
+            return
+        self._send_offset += sent_bytes
+        # advance an offset instead of shifting the unsent bytes on
+        # every partial send.
+        if self._send_offset == len(self._send_buffer):
+            del self._send_buffer[:]
+            self._send_offset = 0
+        elif (self._send_offset > self._COMPACT_SIZE and
+              self._send_offset * 2 > len(self._send_buffer)):
+            del self._send_buffer[:self._send_offset]
+            self._send_offset = 0
 
     def process_incoming(self):
         self.receive_messages(all=True)
@@ -150,16 +191,37 @@ class EndPoint(object):
 
     def _send_message(self, msg):
         self._send_buffer += msg
-        self.process_outgoing()
+        if not self._corked:
+            self.process_outgoing()
 
     def send_request(self, method, params):
         """Send a request
         """
         msg, msgid = self._encoder.create_request(method, params)
-        self._send_message(msg)
         self._pending_requests.add(msgid)
+        self._send_message(msg)
         return msgid
 
+    def send_requests(self, calls, arrived=None):
+        """Send a batch of requests at once
+        *calls* is a list of (method, params).
+        If *arrived* is a list, the msgid of a request is appended to it
+        when its response is queued; see receive_messages.
+        Returns a list of msgids in the same order.
+        """
+        msg, msgids = self._encoder.create_requests(calls)
+        self._pending_requests.update(msgids)
+        if arrived is not None:
+            for msgid in msgids:
+                self._arrived[msgid] = arrived
+        self._send_message(msg)
+        return msgids
+
+    def get_pending_requests(self):
+        """Returns the number of requests waiting for a response
+        """
+        return len(self._pending_requests)
+
     def send_response(self, msgid, error=None, result=None):
         """Send a response
         """
@@ -172,23 +234,39 @@ class EndPoint(object):
         msg = self._encoder.create_notification(method, params)
         self._send_message(msg)
 
-    def receive_messages(self, all=False):
+    def receive_messages(self, all=False, arrived=None):
         """Try to receive some messages.
         Received messages are put on the internal queues.
         They can be retrieved using get_xxx() methods.
         Returns True if there's something queued for get_xxx() methods.
+        If *arrived* is given (see send_requests), receives until it is
+        not empty instead, ignoring the messages queued for the others,
+        and returns True if it is not empty.
         """
-        while all or self._incoming == 0:
-            try:
-                packet = self._sock.recv(4096)  # XXX the size is arbitrary
-            except IOError:
-                packet = None
-            if not packet:
-                if packet is not None:
-                    # socket closed by peer
-                    self._closed_by_peer = True
-                break
-            self._encoder.get_and_dispatch_messages(packet, self._table)
+        # messages sent by the dispatch table (e.g. responses to
+        # pipelined requests) are flushed together after dispatching
+        # everything received.
+        corked = self._corked
+        self._corked = True
+        try:
+            while all or (self._incoming == 0 if arrived is None
+                          else not arrived):
+                try:
+                    packet = self._sock.recv(self._RECV_SIZE)
+                except IOError:
+                    packet = None
+                if not packet:
+                    if packet is not None:
+                        # socket closed by peer
+                        self._closed_by_peer = True
+                    break
+                self._encoder.get_and_dispatch_messages(packet, self._table)
+        finally:
+            self._corked = corked
+        if not corked:
+            self.process_outgoing()
+        if arrived is not None:
+            return len(arrived) > 0
         return self._incoming > 0
 
     def _enqueue_incoming_request(self, m):
@@ -206,6 +284,9 @@ class EndPoint(object):
         assert msgid not in self._responses
         self._responses[msgid] = (error, result)
         self._incoming += 1
+        arrived = self._arrived.pop(msgid, None)
+        if arrived is not None:
+            arrived.append(msgid)
 
     def _enqueue_incoming_notification(self, m):
         self._notifications.append(m)
@@ -291,6 +372,50 @@ class Client(object):
             self._process_input_notification()
             self._process_input_request()
 
+    def call_many(self, calls, window=None):
+        """pipelined synchronous calls.
+        *calls* is a list of (method, params).  up to *window* requests
+        (unlimited if None) are kept in flight at once.
+        return a list of results in the order of *calls*.  or raise
+        RPCError exception for the first call which the peer sends us
+        an error for, after all the responses have been received.
+        """
+        assert window is None or window > 0
+        endpoint = self._endpoint
+        results = [None] * len(calls)
+        errors = {}
+        inflight = {}  # msgid -> index in calls
+        arrived = []  # msgids in inflight which have a response
+        sent = 0
+        while sent < len(calls) or inflight:
+            if sent < len(calls):
+                n = len(calls) - sent
+                if window is not None:
+                    n = min(n, window - len(inflight))
+                if n > 0:
+                    batch = calls[sent:sent + n]
+                    msgids = endpoint.send_requests(batch, arrived)
+                    for i, msgid in enumerate(msgids, sent):
+                        inflight[msgid] = i
+                    sent += n
+            # only our own responses; the others are left to their
+            # callers.
+            if not endpoint.receive_messages(arrived=arrived):
+                raise EOFError("EOF")
+            for msgid in arrived:
+                i = inflight.pop(msgid)
+                result, error = endpoint.get_response(msgid)
+                if error is None:
+                    results[i] = result
+                else:
+                    errors[i] = error
+            del arrived[:]
+            self._process_input_notification()
+            self._process_input_request()
+        if errors:
+            raise RPCError(errors[min(errors)])
+        return results
+
     def send_notification(self, method, params):
         """send a notification to the peer.
         """
@@ -0,0 +1,164 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Statistics cache for the REST applications
+
+Replies of the ``ryu.lib.ofctl_v1_*`` ``get_*`` functions are cached
+per (datapath ID, statistics type, filter) for a short time, and
+concurrent identical requests share a single request to the switch.
+
+Example::
+
+    from ryu.lib import stats_cache
+
+    cache = stats_cache.StatsCache()
+    flows = cache.get(dp, 'flow', ofctl_v1_3.get_flow_stats, waiters,
+                      {'table_id': 0})
+"""
+
+import json
+import time
+
+from ryu import cfg
+from ryu.lib import hub
+
+CONF = cfg.CONF
+CONF.register_cli_opts([
+    cfg.FloatOpt('stats-cache-ttl', default=1.0,
+                 help='seconds to cache statistics replies of the REST '
+                 'applications; 0 only merges concurrent requests '
+                 '(default: 1.0)'),
+])
+
+# replies which seldom change are kept longer.
+DEFAULT_TTLS = {
+    'desc': 60.0,
+    'table_features': 60.0,
+    'meter_features': 60.0,
+    'group_features': 60.0,
+}
+
+# expired entries are swept when the cache grows beyond this.
+_SWEEP_THRESHOLD = 4096
+
+
+class _Entry(object):
+    __slots__ = ('expire', 'value', 'exc', 'event')
+
+    def __init__(self):
+        self.expire = None
+        self.value = None
+        self.exc = None
+        self.event = hub.Event()
+
+
+class StatsCache(object):
+    """
+    Cache of statistics replies with per statistics type TTLs.
+
+    ``ttls`` maps a statistics type to seconds and overrides
+    DEFAULT_TTLS.  The other types are cached for ``default_ttl``
+    seconds, which defaults to the ``--stats-cache-ttl`` option.
+    """
+
+    def __init__(self, ttls=None, default_ttl=None, clock=time.time):
+        self.ttls = dict(DEFAULT_TTLS)
+        self.ttls.update(ttls or {})
+        self.default_ttl = default_ttl
+        self.clock = clock
+        self._entries = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def _ttl(self, stats_type):
+        ttl = self.ttls.get(stats_type)
+        if ttl is None:
+            ttl = self.default_ttl
+        if ttl is None:
+            ttl = CONF.stats_cache_ttl
+        return ttl
+
+    @staticmethod
+    def _key(dpid, stats_type, args):
+        return (dpid, stats_type,
+                json.dumps(args, sort_keys=True, default=repr))
+
+    def get(self, dp, stats_type, func, waiters, *args):
+        """
+        Return ``func(dp, waiters, *args)``, from the cache if a reply
+        newer than the TTL of ``stats_type`` is available.
+
+        ``args`` (e.g. the match of a flow stats request) are a part of
+        the cache key.  While a request is in flight, the callers of
+        the same key wait for it instead of sending their own.
+        The returned value is shared and must not be modified.
+        """
+        key = self._key(dp.id, stats_type, args)
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry.expire is None:
+                self.coalesced += 1
+                entry.event.wait()
+                if entry.exc is not None:
+                    raise entry.exc
+                return entry.value
+            if self.clock() < entry.expire:
+                self.hits += 1
+                return entry.value
+
+        self.misses += 1
+        if len(self._entries) > _SWEEP_THRESHOLD:
+            self._sweep()
+        entry = _Entry()
+        self._entries[key] = entry
+        try:
+            entry.value = func(dp, waiters, *args)
+        except Exception as e:
+            entry.exc = e
+            raise
+        finally:
+            entry.event.set()
+            if self._entries.get(key) is entry:
+                ttl = self._ttl(stats_type)
+                if entry.exc is None and ttl > 0:
+                    entry.expire = self.clock() + ttl
+                else:
+                    del self._entries[key]
+        return entry.value
+
+    def _sweep(self):
+        now = self.clock()
+        for key, entry in list(self._entries.items()):
+            if entry.expire is not None and entry.expire <= now:
+                del self._entries[key]
+
+    def invalidate(self, dpid=None, stats_types=None):
+        """
+        Drop the cached replies of the given datapath (or of all the
+        datapaths) and statistics types (or of all the types).
+        The replies of in-flight requests will not be cached.
+        """
+        for key in list(self._entries.keys()):
+            if dpid is not None and key[0] != dpid:
+                continue
+            if stats_types is not None and key[1] not in stats_types:
+                continue
+            del self._entries[key]
+
+    def metrics(self):
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                'entries': len(self._entries)}
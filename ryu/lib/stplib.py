@@ -14,7 +14,6 @@
 # limitations under the License.
 
 
-import datetime
 import logging
 
 from ryu.base import app_manager
@@ -22,9 +21,8 @@ from ryu.controller import event
 from ryu.controller import handler
 from ryu.controller import ofp_event
 from ryu.controller.handler import set_ev_cls
-from ryu.exception import RyuException
 from ryu.exception import OFPUnknownVersion
-from ryu.lib import hub
+from ryu.lib import timer
 from ryu.lib.dpid import dpid_to_str
 from ryu.lib.packet import bpdu
 from ryu.lib.packet import ethernet
@@ -182,10 +180,17 @@ class Stp(app_manager.RyuApp):
         self._set_logger()
         self.config = {}
         self.bridge_list = {}
+        # Shared scheduler of the port timers of all bridges.
+        self.timer = timer.TimerScheduler()
+
+    def start(self):
+        self.timer.start()
+        return super(Stp, self).start()
 
     def close(self):
-        for dpid in self.bridge_list.keys():
+        for dpid in list(self.bridge_list.keys()):
             self._unregister_bridge(dpid)
+        self.timer.stop()
 
     def _set_logger(self):
         self.logger.propagate = False
@@ -249,7 +254,8 @@ class Stp(app_manager.RyuApp):
         try:
             bridge = Bridge(dp, self.logger,
                             self.config.get(dp.id, {}),
-                            self.send_event_to_observers)
+                            self.send_event_to_observers,
+                            self.timer)
         except OFPUnknownVersion as message:
             self.logger.error(str(message), extra=dpid_str)
             return
@@ -337,9 +343,10 @@ class Stp(app_manager.RyuApp):
                     rcv_priority.designated_port_id.value,
                     my_priority.designated_port_id.value)
                 if not result:
+                    my_mac = my_priority.designated_bridge_id.mac_addr
                     result1 = Stp._cmp_value(
                         rcv_priority.designated_bridge_id.value,
-                        my_priority.designated_bridge_id.mac_addr)
+                        int(my_mac.replace(':', ''), 16))
                     result2 = Stp._cmp_value(
                         rcv_priority.designated_port_id.value,
                         my_priority.designated_port_id.port_no)
@@ -351,7 +358,7 @@ class Stp(app_manager.RyuApp):
 
     @staticmethod
     def _cmp_value(value1, value2):
-        result = cmp(value1, value2)
+        result = (value1 > value2) - (value1 < value2)
         if result < 0:
             return SUPERIOR
         elif result == 0:
@@ -375,12 +382,13 @@ class Bridge(object):
                       'hello_time': bpdu.DEFAULT_HELLO_TIME,
                       'fwd_delay': bpdu.DEFAULT_FORWARD_DELAY}
 
-    def __init__(self, dp, logger, config, send_ev_func):
+    def __init__(self, dp, logger, config, send_ev_func, scheduler):
         super(Bridge, self).__init__()
         self.dp = dp
         self.logger = logger
         self.dpid_str = {'dpid': dpid_to_str(dp.id)}
         self.send_event = send_ev_func
+        self.scheduler = scheduler
 
         # Bridge data
         bridge_conf = config.get('bridge', {})
@@ -427,7 +435,7 @@ class Bridge(object):
                                               self.topology_change_notify,
                                               self.bridge_id,
                                               self.bridge_times,
-                                              ofport)
+                                              ofport, self.scheduler)
 
     def port_delete(self, port_no):
         self.link_down(port_no)
@@ -485,7 +493,7 @@ class Bridge(object):
             if rcv_info is SUPERIOR:
                 self.logger.info('[port=%d] Receive superior BPDU.',
                                  in_port_no, extra=self.dpid_str)
-                self.recalculate_spanning_tree(init=False)
+                self._recalculate_port(in_port)
 
             elif rcv_tc:
                 self.send_event(EventTopologyChange(self.dp))
@@ -515,14 +523,16 @@ class Bridge(object):
             self.send_event(EventPacketIn(msg))
 
     def recalculate_spanning_tree(self, init=True):
-        """ Re-calculation of spanning tree. """
-        # All port down.
-        for port in self.ports.values():
-            if port.state is not PORT_STATE_DISABLE:
-                port.down(PORT_STATE_BLOCK, msg_init=init)
-
-        # Send topology change event.
+        """ Re-calculation of spanning tree.
+             Only the ports whose role is changed are restarted,
+             the others keep their state. """
         if init:
+            # Forget the received BPDU information.
+            for port in self.ports.values():
+                if port.state is not PORT_STATE_DISABLE:
+                    port.clear_designated()
+
+            # Send topology change event.
             self.send_event(EventTopologyChange(self.dp))
 
         # Update tree roles.
@@ -539,11 +549,51 @@ class Bridge(object):
              self.root_priority,
              self.root_times) = self._spanning_tree_algorithm()
 
-        # All port up.
+        self._apply_port_roles(port_roles)
+
+    def _recalculate_port(self, port):
+        """ Incremental re-calculation after a superior BPDU is received.
+             Unless the root port or the root bridge may change,
+             only the role of the receiving port is re-evaluated. """
+        root_port = self._get_root_port()
+        if (root_port is None or port is root_port
+                or self._compare_root_msg(root_port.designated_priority,
+                                          port.designated_priority)
+                is not INFERIOR):
+            # (Possibly) new root port or root bridge.
+            self.recalculate_spanning_tree(init=False)
+            return
+
+        if self._is_designated_port(port, root_port):
+            role = DESIGNATED_PORT
+        else:
+            role = NON_DESIGNATED_PORT
+        self._apply_port_roles({port.ofport.port_no: role})
+
+    def _apply_port_roles(self, port_roles):
+        """ Restart the ports whose role is changed.
+             A forwarding port which stays ROOT_PORT or DESIGNATED_PORT,
+             and a port which keeps its role, just take over the new
+             root bridge information. """
+        forward_roles = (ROOT_PORT, DESIGNATED_PORT)
         for port_no, role in port_roles.items():
-            if self.ports[port_no].state is not PORT_STATE_DISABLE:
-                self.ports[port_no].up(role, self.root_priority,
-                                       self.root_times)
+            port = self.ports[port_no]
+            if port.state is PORT_STATE_DISABLE:
+                continue
+            if (port.role is role
+                    or (port.state is PORT_STATE_FORWARD
+                        and port.role in forward_roles
+                        and role in forward_roles)):
+                port.update(role, self.root_priority, self.root_times)
+            else:
+                port.down(PORT_STATE_BLOCK)
+                port.up(role, self.root_priority, self.root_times)
+
+    def _get_root_port(self):
+        for port in self.ports.values():
+            if port.role is ROOT_PORT and port.state is not PORT_STATE_DISABLE:
+                return port
+        return None
 
     def _spanning_tree_algorithm(self):
         """ Update tree roles.
@@ -595,55 +645,63 @@ class Bridge(object):
             port_msg = port.designated_priority
             if port.state is PORT_STATE_DISABLE or port_msg is None:
                 continue
-            if root_msg.root_id.value > port_msg.root_id.value:
-                result = SUPERIOR
-            elif root_msg.root_id.value == port_msg.root_id.value:
-                if root_msg.designated_bridge_id is None:
-                    result = INFERIOR
-                else:
-                    result = Stp.compare_root_path(
-                        port_msg.root_path_cost,
-                        root_msg.root_path_cost,
-                        port_msg.designated_bridge_id.value,
-                        root_msg.designated_bridge_id.value,
-                        port_msg.designated_port_id.value,
-                        root_msg.designated_port_id.value)
-            else:
-                result = INFERIOR
-
-            if result is SUPERIOR:
+            if self._compare_root_msg(root_msg, port_msg) is SUPERIOR:
                 root_port = port
 
         return root_port
 
+    @staticmethod
+    def _compare_root_msg(root_msg, port_msg):
+        """ Check port_msg is superior to root_msg as a root port. """
+        if port_msg is None:
+            return INFERIOR
+        if root_msg.root_id.value > port_msg.root_id.value:
+            result = SUPERIOR
+        elif root_msg.root_id.value == port_msg.root_id.value:
+            if root_msg.designated_bridge_id is None:
+                result = INFERIOR
+            else:
+                result = Stp.compare_root_path(
+                    port_msg.root_path_cost,
+                    root_msg.root_path_cost,
+                    port_msg.designated_bridge_id.value,
+                    root_msg.designated_bridge_id.value,
+                    port_msg.designated_port_id.value,
+                    root_msg.designated_port_id.value)
+        else:
+            result = INFERIOR
+        return result
+
     def _select_designated_port(self, root_port):
         """ DESIGNATED_PORT is a port of the side near the root bridge
             of each link. It is determined by the cost of each path, etc
             same as ROOT_PORT. """
         d_ports = []
-        root_msg = root_port.designated_priority
 
         for port in self.ports.values():
-            port_msg = port.designated_priority
             if (port.state is PORT_STATE_DISABLE
                     or port.ofport.port_no == root_port.ofport.port_no):
                 continue
-            if (port_msg is None or
-                    (port_msg.root_id.value != root_msg.root_id.value)):
+            if self._is_designated_port(port, root_port):
                 d_ports.append(port.ofport.port_no)
-            else:
-                result = Stp.compare_root_path(
-                    root_msg.root_path_cost,
-                    port_msg.root_path_cost - port.path_cost,
-                    self.bridge_id.value,
-                    port_msg.designated_bridge_id.value,
-                    port.port_id.value,
-                    port_msg.designated_port_id.value)
-                if result is SUPERIOR:
-                    d_ports.append(port.ofport.port_no)
 
         return d_ports
 
+    def _is_designated_port(self, port, root_port):
+        root_msg = root_port.designated_priority
+        port_msg = port.designated_priority
+        if (port_msg is None or
+                (port_msg.root_id.value != root_msg.root_id.value)):
+            return True
+        result = Stp.compare_root_path(
+            root_msg.root_path_cost,
+            port_msg.root_path_cost - port.path_cost,
+            self.bridge_id.value,
+            port_msg.designated_bridge_id.value,
+            port.port_id.value,
+            port_msg.designated_port_id.value)
+        return result is SUPERIOR
+
     def topology_change_notify(self, port_state):
         notice = False
         if port_state is PORT_STATE_FORWARD:
@@ -685,7 +743,8 @@ class Port(object):
                       'enable': True}
 
     def __init__(self, dp, logger, config, send_ev_func, timeout_func,
-                 topology_change_func, bridge_id, bridge_times, ofport):
+                 topology_change_func, bridge_id, bridge_times, ofport,
+                 scheduler):
         super(Port, self).__init__()
         self.dp = dp
         self.logger = logger
@@ -727,36 +786,30 @@ class Port(object):
         # Receive BPDU data
         self.designated_priority = None
         self.designated_times = None
-        # BPDU handling threads
-        self.send_bpdu_thread = PortThread(self._transmit_bpdu)
-        self.wait_bpdu_thread = PortThread(self._wait_bpdu_timer)
+        # BPDU handling timers
+        self.scheduler = scheduler
+        self.send_bpdu_timer = PortTimer(scheduler, self._transmit_bpdu)
+        self.wait_bpdu_timer = PortTimer(scheduler, self._wait_bpdu_timeout)
         self.send_tc_flg = None
         self.send_tc_timer = None
         self.send_tcn_flg = None
-        self.wait_timer_event = None
-        # State machine thread
-        self.state_machine = PortThread(self._state_machine)
-        self.state_event = None
+        # State machine timer
+        self.state_timer = PortTimer(scheduler, self._state_timeout)
 
         self.up(DESIGNATED_PORT,
                 Priority(bridge_id, 0, None, None),
                 bridge_times)
 
-        self.state_machine.start()
+        if self.state is PORT_STATE_DISABLE:
+            self.ofctl.set_port_status(self.ofport, self.state)
         self.logger.debug('[port=%d] Start port state machine.',
                           self.ofport.port_no, extra=self.dpid_str)
 
     def delete(self):
-        self.state_machine.stop()
-        self.send_bpdu_thread.stop()
-        self.wait_bpdu_thread.stop()
-        if self.state_event is not None:
-            self.state_event.set()
-            self.state_event = None
-        if self.wait_timer_event is not None:
-            self.wait_timer_event.set()
-            self.wait_timer_event = None
-        self.logger.debug('[port=%d] Stop port threads.',
+        self.state_timer.stop()
+        self.send_bpdu_timer.stop()
+        self.wait_bpdu_timer.stop()
+        self.logger.debug('[port=%d] Stop port timers.',
                           self.ofport.port_no, extra=self.dpid_str)
 
     def up(self, role, root_priority, root_times):
@@ -778,16 +831,25 @@ class Port(object):
             return
 
         if msg_init:
-            self.designated_priority = None
-            self.designated_times = None
+            self.clear_designated()
 
         self._change_role(DESIGNATED_PORT)
         self._change_status(state)
 
-    def _state_machine(self):
-        """ Port state machine.
-             Change next status when timer is exceeded
-             or _change_status() method is called."""
+    def update(self, role, root_priority, root_times):
+        """ Take over the new role and root bridge data
+             without restarting the port state machine.  """
+        self.port_priority = root_priority
+        self.port_times = root_times
+        if self.role is not role:
+            self._change_role(role)
+            self._log_status()
+
+    def clear_designated(self):
+        self.designated_priority = None
+        self.designated_times = None
+
+    def _log_status(self):
         role_str = {ROOT_PORT: 'ROOT_PORT          ',
                     DESIGNATED_PORT: 'DESIGNATED_PORT    ',
                     NON_DESIGNATED_PORT: 'NON_DESIGNATED_PORT'}
@@ -796,33 +858,14 @@ class Port(object):
                      PORT_STATE_LISTEN: 'LISTEN',
                      PORT_STATE_LEARN: 'LEARN',
                      PORT_STATE_FORWARD: 'FORWARD'}
+        self.logger.info('[port=%d] %s / %s', self.ofport.port_no,
+                         role_str[self.role], state_str[self.state],
+                         extra=self.dpid_str)
 
-        if self.state is PORT_STATE_DISABLE:
-            self.ofctl.set_port_status(self.ofport, self.state)
-
-        while True:
-            self.logger.info('[port=%d] %s / %s', self.ofport.port_no,
-                             role_str[self.role], state_str[self.state],
-                             extra=self.dpid_str)
-
-            self.state_event = hub.Event()
-            timer = self._get_timer()
-            if timer:
-                timeout = hub.Timeout(timer)
-                try:
-                    self.state_event.wait()
-                except hub.Timeout as t:
-                    if t is not timeout:
-                        err_msg = 'Internal error. Not my timeout.'
-                        raise RyuException(msg=err_msg)
-                    new_state = self._get_next_state()
-                    self._change_status(new_state, thread_switch=False)
-                finally:
-                    timeout.cancel()
-            else:
-                self.state_event.wait()
-
-            self.state_event = None
+    def _state_timeout(self):
+        """ Port state machine.
+             Change next status when timer is exceeded."""
+        self._change_status(self._get_next_state())
 
     def _get_timer(self):
         timer = {PORT_STATE_DISABLE: None,
@@ -843,7 +886,7 @@ class Port(object):
                       PORT_STATE_FORWARD: None}
         return next_state[self.state]
 
-    def _change_status(self, new_state, thread_switch=True):
+    def _change_status(self, new_state):
         if new_state is not PORT_STATE_DISABLE:
             self.ofctl.set_port_status(self.ofport, new_state)
 
@@ -858,18 +901,20 @@ class Port(object):
             self.send_tc_flg = False
             self.send_tc_timer = None
             self.send_tcn_flg = False
-            self.send_bpdu_thread.stop()
+            self.send_bpdu_timer.stop()
         elif new_state is PORT_STATE_LISTEN:
-            self.send_bpdu_thread.start()
+            self.send_bpdu_timer.start(0)
 
         self.state = new_state
         self.send_event(EventPortStateChange(self.dp, self))
+        self._log_status()
 
-        if self.state_event is not None:
-            self.state_event.set()
-            self.state_event = None
-        if thread_switch:
-            hub.sleep(0)  # For thread switching.
+        # (Re)start the timer to the next state.
+        timer = self._get_timer()
+        if timer:
+            self.state_timer.start(timer)
+        else:
+            self.state_timer.stop()
 
     def _change_role(self, new_role):
         if self.role is new_role:
@@ -877,10 +922,10 @@ class Port(object):
         self.role = new_role
         if (new_role is ROOT_PORT
                 or new_role is NON_DESIGNATED_PORT):
-            self.wait_bpdu_thread.start()
+            self.wait_bpdu_timer.start(self._get_wait_bpdu_time())
         else:
             assert new_role is DESIGNATED_PORT
-            self.wait_bpdu_thread.stop()
+            self.wait_bpdu_timer.stop()
 
     def rcv_config_bpdu(self, bpdu_pkt):
         # Check received BPDU is superior to currently held BPDU.
@@ -936,76 +981,56 @@ class Port(object):
         return rcv_info, rcv_tc
 
     def _update_wait_bpdu_timer(self):
-        if self.wait_timer_event is not None:
-            self.wait_timer_event.set()
-            self.wait_timer_event = None
+        if self.wait_bpdu_timer.active:
+            self.wait_bpdu_timer.start(self._get_wait_bpdu_time())
             self.logger.debug('[port=%d] Wait BPDU timer is updated.',
                               self.ofport.port_no, extra=self.dpid_str)
-        hub.sleep(0)  # For thread switching.
-
-    def _wait_bpdu_timer(self):
-        time_exceed = False
-
-        while True:
-            self.wait_timer_event = hub.Event()
-            message_age = (self.designated_times.message_age
-                           if self.designated_times else 0)
-            timer = self.port_times.max_age - message_age
-            timeout = hub.Timeout(timer)
-            try:
-                self.wait_timer_event.wait()
-            except hub.Timeout as t:
-                if t is not timeout:
-                    err_msg = 'Internal error. Not my timeout.'
-                    raise RyuException(msg=err_msg)
-                self.logger.info('[port=%d] Wait BPDU timer is exceeded.',
-                                 self.ofport.port_no, extra=self.dpid_str)
-                time_exceed = True
-            finally:
-                timeout.cancel()
-                self.wait_timer_event = None
-
-            if time_exceed:
-                break
 
-        if time_exceed:  # Bridge.recalculate_spanning_tree
-            hub.spawn(self.wait_bpdu_timeout)
+    def _get_wait_bpdu_time(self):
+        message_age = (self.designated_times.message_age
+                       if self.designated_times else 0)
+        return self.port_times.max_age - message_age
+
+    def _wait_bpdu_timeout(self):
+        self.logger.info('[port=%d] Wait BPDU timer is exceeded.',
+                         self.ofport.port_no, extra=self.dpid_str)
+        # Bridge.recalculate_spanning_tree
+        self.wait_bpdu_timeout()
 
     def _transmit_bpdu(self):
-        while True:
-            # Send config BPDU packet if port role is DESIGNATED_PORT.
-            if self.role == DESIGNATED_PORT:
-                now = datetime.datetime.today()
-                if self.send_tc_timer and self.send_tc_timer < now:
-                    self.send_tc_timer = None
-                    self.send_tc_flg = False
-
-                if not self.send_tc_flg:
-                    flags = 0b00000000
-                    log_msg = '[port=%d] Send Config BPDU.'
-                else:
-                    flags = 0b00000001
-                    log_msg = '[port=%d] Send TopologyChange BPDU.'
-                bpdu_data = self._generate_config_bpdu(flags)
-                self.ofctl.send_packet_out(self.ofport.port_no, bpdu_data)
-                self.logger.debug(log_msg, self.ofport.port_no,
-                                  extra=self.dpid_str)
-
-            # Send Topology Change Notification BPDU until receive Ack.
-            if self.send_tcn_flg:
-                bpdu_data = self._generate_tcn_bpdu()
-                self.ofctl.send_packet_out(self.ofport.port_no, bpdu_data)
-                self.logger.debug('[port=%d] Send TopologyChangeNotify BPDU.',
-                                  self.ofport.port_no, extra=self.dpid_str)
+        # Send config BPDU packet if port role is DESIGNATED_PORT.
+        if self.role == DESIGNATED_PORT:
+            now = self.scheduler.clock()
+            if self.send_tc_timer and self.send_tc_timer < now:
+                self.send_tc_timer = None
+                self.send_tc_flg = False
+
+            if not self.send_tc_flg:
+                flags = 0b00000000
+                log_msg = '[port=%d] Send Config BPDU.'
+            else:
+                flags = 0b00000001
+                log_msg = '[port=%d] Send TopologyChange BPDU.'
+            bpdu_data = self._generate_config_bpdu(flags)
+            self.ofctl.send_packet_out(self.ofport.port_no, bpdu_data)
+            self.logger.debug(log_msg, self.ofport.port_no,
+                              extra=self.dpid_str)
+
+        # Send Topology Change Notification BPDU until receive Ack.
+        if self.send_tcn_flg:
+            bpdu_data = self._generate_tcn_bpdu()
+            self.ofctl.send_packet_out(self.ofport.port_no, bpdu_data)
+            self.logger.debug('[port=%d] Send TopologyChangeNotify BPDU.',
+                              self.ofport.port_no, extra=self.dpid_str)
 
-            hub.sleep(self.port_times.hello_time)
+        self.send_bpdu_timer.start(self.port_times.hello_time)
 
     def transmit_tc_bpdu(self):
         """ Set send_tc_flg to send Topology Change BPDU. """
         if not self.send_tc_flg:
-            timer = datetime.timedelta(seconds=self.port_times.max_age
-                                       + self.port_times.forward_delay)
-            self.send_tc_timer = datetime.datetime.today() + timer
+            self.send_tc_timer = (self.scheduler.clock()
+                                  + self.port_times.max_age
+                                  + self.port_times.forward_delay)
             self.send_tc_flg = True
 
     def transmit_ack_bpdu(self):
@@ -1067,21 +1092,29 @@ class Port(object):
         return pkt.data
 
 
-class PortThread(object):
-    def __init__(self, function):
-        super(PortThread, self).__init__()
+class PortTimer(object):
+    def __init__(self, scheduler, function):
+        super(PortTimer, self).__init__()
+        self.scheduler = scheduler
         self.function = function
-        self.thread = None
+        self.timer = None
 
-    def start(self):
+    @property
+    def active(self):
+        return self.timer is not None
+
+    def start(self, delay):
         self.stop()
-        self.thread = hub.spawn(self.function)
+        self.timer = self.scheduler.call_later(delay, self._expire)
 
     def stop(self):
-        if self.thread is not None:
-            hub.kill(self.thread)
-            hub.joinall([self.thread])
-            self.thread = None
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+
+    def _expire(self):
+        self.timer = None
+        self.function()
 
 
 class BridgeId(object):
@@ -47,7 +47,7 @@ except ImportError:
     # Python 3
     import builtins as __builtin__
 
-_RESERVED_KEYWORD = dir(__builtin__)
+_RESERVED_KEYWORD = frozenset(dir(__builtin__))
 
 
 _mapdict = lambda f, d: dict([(k, f(v)) for k, v in d.items()])
@@ -121,6 +121,18 @@ _types = {
     'nx-flow-spec-field': NXFlowSpecFieldType,  # XXX this should not be here
 }
 
+# values which are JSON compatible as they are.
+_SCALAR_TYPES = (bool, float, type(None)) + six.integer_types
+
+# class -> {attribute name: TypeDescr}, compiled from _TYPE on first use.
+_type_maps = {}
+
+# class -> (encode_string, default encoder) built by the last call.
+_default_encoders = {}
+
+# class -> (decode_string, default decoder) built by the last call.
+_default_decoders = {}
+
 
 class StringifyMixin(object):
 
@@ -186,13 +198,22 @@ class StringifyMixin(object):
                 return True
         return False
 
+    @classmethod
+    def _get_type_map(cls):
+        try:
+            return _type_maps[cls]
+        except KeyError:
+            pass
+        type_map = {}
+        for t, attrs in getattr(cls, '_TYPE', {}).items():
+            for k in attrs:
+                type_map.setdefault(k, _types[t])
+        _type_maps[cls] = type_map
+        return type_map
+
     @classmethod
     def _get_type(cls, k):
-        if hasattr(cls, '_TYPE'):
-            for t, attrs in cls._TYPE.items():
-                if k in attrs:
-                    return _types[t]
-        return None
+        return cls._get_type_map().get(k)
 
     @classmethod
     def _get_encoder(cls, k, encode_string):
@@ -207,8 +228,14 @@ class StringifyMixin(object):
 
     @classmethod
     def _get_default_encoder(cls, encode_string):
+        cached = _default_encoders.get(cls)
+        if cached is not None and cached[0] is encode_string:
+            return cached[1]
+
         def _encode(v):
-            if isinstance(v, (bytes, six.text_type)):
+            if isinstance(v, _SCALAR_TYPES):
+                json_value = v
+            elif isinstance(v, (bytes, six.text_type)):
                 if isinstance(v, six.text_type):
                     v = v.encode('utf-8')
                 json_value = encode_string(v)
@@ -228,6 +255,7 @@ class StringifyMixin(object):
                 except:
                     json_value = v
             return json_value
+        _default_encoders[cls] = (encode_string, _encode)
         return _encode
 
     def to_jsondict(self, encode_string=base64.b64encode):
@@ -259,10 +287,12 @@ class StringifyMixin(object):
                        have explicit type annotations in _TYPE class attribute.
         =============  =====================================================
         """
+        type_map = self._get_type_map()
+        default = self._get_default_encoder(encode_string)
         dict_ = {}
-        encode = lambda k, x: self._encode_value(k, x, encode_string)
         for k, v in obj_attrs(self):
-            dict_[k] = encode(k, v)
+            t = type_map.get(k)
+            dict_[k] = t.encode(v) if t else default(v)
         return {self.__class__.__name__: dict_}
 
     @classmethod
@@ -293,8 +323,14 @@ class StringifyMixin(object):
 
     @classmethod
     def _get_default_decoder(cls, decode_string):
+        cached = _default_decoders.get(cls)
+        if cached is not None and cached[0] is decode_string:
+            return cached[1]
+
         def _decode(json_value, **additional_args):
-            if isinstance(json_value, (bytes, six.text_type)):
+            if isinstance(json_value, _SCALAR_TYPES):
+                v = json_value
+            elif isinstance(json_value, (bytes, six.text_type)):
                 v = decode_string(json_value)
             elif isinstance(json_value, list):
                 v = list(map(_decode, json_value))
@@ -313,6 +349,7 @@ class StringifyMixin(object):
             else:
                 v = json_value
             return v
+        _default_decoders[cls] = (decode_string, _decode)
         return _decode
 
     @staticmethod
@@ -347,9 +384,12 @@ class StringifyMixin(object):
         additional_args (Optional) Additional kwargs for constructor.
         =============== =====================================================
         """
-        decode = lambda k, x: cls._decode_value(k, x, decode_string,
-                                                **additional_args)
-        kwargs = cls._restore_args(_mapdict_kv(decode, dict_))
+        kwargs = {}
+        for k, v in dict_.items():
+            v = cls._decode_value(k, v, decode_string, **additional_args)
+            if k in _RESERVED_KEYWORD:
+                k += '_'
+            kwargs[k] = v
         try:
             return cls(**dict(kwargs, **additional_args))
         except TypeError:
@@ -376,15 +416,31 @@ def obj_python_attrs(msg_):
             yield(k, getattr(msg_, k))
         return
     base = getattr(msg_, '_base_attributes', [])
-    for k, v in inspect.getmembers(msg_):
-        if k.startswith('_'):
+    try:
+        dict_ = vars(msg_)
+    except TypeError:
+        dict_ = None
+    if dict_ is None:
+        for k, v in inspect.getmembers(msg_):
+            if k.startswith('_'):
+                continue
+            if callable(v):
+                continue
+            if k in base:
+                continue
+            if hasattr(msg_.__class__, k):
+                continue
+            yield (k, v)
+        return
+
+    # the same as the above, without looking up every class member.
+    cls = msg_.__class__
+    for k in sorted(dict_):
+        if k.startswith('_') or k in base or hasattr(cls, k):
             continue
+        v = dict_[k]
         if callable(v):
             continue
-        if k in base:
-            continue
-        if hasattr(msg_.__class__, k):
-            continue
         yield (k, v)
 
 
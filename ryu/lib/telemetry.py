@@ -0,0 +1,215 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Append-only time series storage for the monitoring applications
+
+A snapshot is a timestamp, a series name and a dict of columns, each
+column being a scalar or a sequence (list or NumPy array).  Snapshots
+are queued by ``TelemetryWriter.write()`` and appended to the current
+file by a green thread, which does the encoding and the file I/O in a
+native thread so that the event loop is not blocked.  The files are
+rotated after ``rotate_interval`` seconds or ``rotate_size`` bytes.
+
+The files are a sequence of msgpack arrays ``[timestamp, series,
+columns]``; NumPy arrays are stored as raw buffers.  ``read()`` loads
+them back and ``ryu telemetry-export`` converts them to CSV files.
+
+Example::
+
+    from ryu.lib import telemetry
+
+    writer = telemetry.TelemetryWriter('/var/log/ryu', 'ddos')
+    writer.start()
+    writer.write('entropy', {'ip_src': 0.82, 'ip_dst': 0.41})
+    writer.write('ip_src', {'key': keys, 'count': counts})
+    ...
+    writer.stop()
+"""
+
+import glob
+import logging
+import os
+import struct
+import time
+
+import msgpack
+
+from ryu.lib import hub
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+LOG = logging.getLogger(__name__)
+
+FILE_SUFFIX = '.tlm'
+
+# msgpack extension type of the NumPy arrays:
+# dtype string length (1 byte), dtype string, raw data
+_NDARRAY_EXT = 1
+
+# snapshots appended by a single native thread call
+_BATCH_SIZE = 64
+
+
+def _default(obj):
+    if np is not None:
+        if isinstance(obj, np.ndarray):
+            dtype = obj.dtype.str.encode('ascii')
+            return msgpack.ExtType(
+                _NDARRAY_EXT, struct.pack('!B', len(dtype)) + dtype +
+                np.ascontiguousarray(obj).tobytes())
+        if isinstance(obj, np.generic):
+            return obj.item()
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    raise TypeError('%r is not serializable' % (obj, ))
+
+
+def _ext_hook(code, data):
+    if code == _NDARRAY_EXT:
+        if np is None:
+            raise ValueError('NumPy is required to read arrays')
+        (length, ) = struct.unpack_from('!B', data)
+        dtype = data[1:1 + length].decode('ascii')
+        return np.frombuffer(data[1 + length:], dtype)
+    return msgpack.ExtType(code, data)
+
+
+def list_files(directory, prefix):
+    """Returns the telemetry files of ``prefix``, oldest first."""
+    return sorted(glob.glob(os.path.join(
+        directory, '%s-*%s' % (prefix, FILE_SUFFIX))))
+
+
+def read(paths):
+    """
+    Yields the (timestamp, series, columns) snapshots of the files.
+    A snapshot truncated by a crash at the end of a file is ignored.
+    """
+    for path in paths:
+        with open(path, 'rb') as f:
+            unpacker = msgpack.Unpacker(f, raw=False, ext_hook=_ext_hook,
+                                        max_buffer_size=2 ** 31 - 1)
+            for timestamp, series, columns in unpacker:
+                yield timestamp, series, columns
+
+
+class TelemetryWriter(object):
+    """
+    Appends snapshots to the files ``<directory>/<prefix>-<time>.tlm``.
+
+    At most ``queue_size`` snapshots wait to be written; the snapshots
+    written while the queue is full are dropped and counted in
+    ``dropped``.  The columns must not be modified after ``write()``.
+    """
+
+    def __init__(self, directory, prefix, rotate_interval=3600,
+                 rotate_size=64 * 1024 * 1024, queue_size=16,
+                 clock=time.time):
+        self.directory = directory
+        self.prefix = prefix
+        self.rotate_interval = rotate_interval
+        self.rotate_size = rotate_size
+        self.clock = clock
+        self.written = 0
+        self.dropped = 0
+        self.path = None
+        self._queue = hub.Queue(queue_size)
+        self._thread = None
+        self._packer = msgpack.Packer(use_bin_type=True, default=_default)
+        self._file = None
+        self._file_start = None
+        self._file_size = 0
+        self._file_seq = 0
+
+    def start(self):
+        if self._thread is not None:
+            return
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+        self._thread = hub.spawn(self._run)
+
+    def stop(self):
+        """Writes the queued snapshots and closes the file."""
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        hub.joinall([self._thread])
+        self._thread = None
+
+    def write(self, series, columns, timestamp=None):
+        """
+        Queues a snapshot of ``columns``.
+        Returns False if it was dropped because the queue is full.
+        """
+        if timestamp is None:
+            timestamp = self.clock()
+        try:
+            self._queue.put_nowait((timestamp, series, columns))
+        except hub.QueueFull:
+            self.dropped += 1
+            return False
+        return True
+
+    def _run(self):
+        running = True
+        while running:
+            batch = [self._queue.get()]
+            while len(batch) < _BATCH_SIZE:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except hub.QueueEmpty:
+                    break
+            if None in batch:
+                running = False
+                batch = batch[:batch.index(None)]
+            try:
+                if batch:
+                    hub.execute(self._append, batch)
+                if not running:
+                    hub.execute(self._close)
+            except Exception:
+                LOG.exception('%s: failed to write %d snapshots',
+                              self.prefix, len(batch))
+
+    def _open(self, now):
+        self._file_seq += 1
+        self.path = os.path.join(self.directory, '%s-%s-%04d%s' % (
+            self.prefix, time.strftime('%Y%m%d-%H%M%S', time.gmtime(now)),
+            self._file_seq, FILE_SUFFIX))
+        self._file = open(self.path, 'ab')
+        self._file_start = now
+        self._file_size = 0
+
+    def _close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _append(self, batch):
+        # called in a native thread
+        now = self.clock()
+        if self._file is not None and (
+                now - self._file_start >= self.rotate_interval or
+                self._file_size >= self.rotate_size):
+            self._close()
+        if self._file is None:
+            self._open(now)
+        data = b''.join(self._packer.pack(snapshot) for snapshot in batch)
+        self._file.write(data)
+        self._file.flush()
+        self._file_size += len(data)
+        self.written += len(batch)
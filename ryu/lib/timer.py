@@ -0,0 +1,181 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Shared timer scheduler
+
+A single greenlet drives any number of one-shot timers kept in a binary
+heap, instead of spawning (and waking up) one greenlet per timer.
+Periodic behaviour is obtained by re-arming the timer from its callback.
+
+Example::
+
+    from ryu.lib import timer
+
+    sched = timer.TimerScheduler()
+    sched.start()
+
+    def _tick(name):
+        print('tick %s' % name)
+        sched.call_later(1.0, _tick, name)
+
+    sched.call_later(1.0, _tick, 'foo')
+"""
+
+import heapq
+import itertools
+import logging
+import time
+import traceback
+
+from ryu.lib import hub
+
+LOG = logging.getLogger(__name__)
+
+
+class Timer(object):
+    """
+    A handle of a scheduled callback returned by TimerScheduler.
+
+    Call ``cancel()`` to prevent the callback from being invoked.
+    """
+    __slots__ = ('deadline', 'func', 'args', 'kwargs', 'cancelled',
+                 '_scheduler')
+
+    def __init__(self, scheduler, deadline, func, args, kwargs):
+        self._scheduler = scheduler
+        self.deadline = deadline
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.cancelled = False
+
+    def cancel(self):
+        if not self.cancelled:
+            self.cancelled = True
+            self._scheduler._cancelled += 1
+
+
+class TimerScheduler(object):
+    """
+    Heap based scheduler which runs timer callbacks in a single greenlet.
+
+    Callbacks run sequentially in the scheduler greenlet, so they should
+    not block.  ``run_pending()`` can also be called directly (e.g. from
+    tests or simulations) without starting the greenlet.
+    """
+
+    # compact the heap when more than this ratio of entries are cancelled.
+    _COMPACT_RATIO = 0.5
+
+    def __init__(self, clock=time.time):
+        self.clock = clock
+        self._heap = []
+        self._seq = itertools.count()
+        self._cancelled = 0
+        self._wakeup = hub.Event()
+        self._thread = None
+        self._running = False
+
+    def __len__(self):
+        return len(self._heap) - self._cancelled
+
+    def start(self):
+        if self._thread is None:
+            self._running = True
+            self._thread = hub.spawn(self._loop)
+        return self._thread
+
+    def stop(self):
+        self._running = False
+        self._wakeup.set()
+        if self._thread is not None:
+            hub.joinall([self._thread])
+            self._thread = None
+
+    def call_at(self, deadline, func, *args, **kwargs):
+        """
+        Schedule ``func(*args, **kwargs)`` to be called at ``deadline``
+        (in the time base of ``clock``) and return a Timer.
+        """
+        timer = Timer(self, deadline, func, args, kwargs)
+        entry = (deadline, next(self._seq), timer)
+        heapq.heappush(self._heap, entry)
+        if self._heap[0] is entry:
+            # a new earliest deadline; let the loop recompute its sleep.
+            self._wakeup.set()
+        return timer
+
+    def call_later(self, delay, func, *args, **kwargs):
+        """
+        Schedule ``func(*args, **kwargs)`` to be called after ``delay``
+        seconds and return a Timer.
+        """
+        return self.call_at(self.clock() + delay, func, *args, **kwargs)
+
+    def next_deadline(self):
+        """
+        Returns the deadline of the earliest active timer or None.
+        """
+        heap = self._heap
+        while heap and heap[0][2].cancelled:
+            heapq.heappop(heap)
+            self._cancelled -= 1
+        if heap:
+            return heap[0][0]
+        return None
+
+    def run_pending(self, now=None):
+        """
+        Run every timer whose deadline is not later than ``now``
+        and return the number of invoked callbacks.
+        """
+        if now is None:
+            now = self.clock()
+        heap = self._heap
+        count = 0
+        while heap and heap[0][0] <= now:
+            _deadline, _seq, timer = heapq.heappop(heap)
+            if timer.cancelled:
+                self._cancelled -= 1
+                continue
+            # mark as done so that a late cancel() is harmless.
+            timer.cancelled = True
+            count += 1
+            try:
+                timer.func(*timer.args, **timer.kwargs)
+            except Exception:
+                LOG.error('timer: uncaught exception: %s',
+                          traceback.format_exc())
+
+        if self._cancelled > len(heap) * self._COMPACT_RATIO:
+            self._compact()
+        return count
+
+    def _compact(self):
+        self._heap = [e for e in self._heap if not e[2].cancelled]
+        heapq.heapify(self._heap)
+        self._cancelled = 0
+
+    def _loop(self):
+        while self._running:
+            self._wakeup.clear()
+            deadline = self.next_deadline()
+            if deadline is None:
+                self._wakeup.wait()
+            else:
+                timeout = deadline - self.clock()
+                if timeout > 0:
+                    self._wakeup.wait(timeout=timeout)
+            if self._running:
+                self.run_pending()
@@ -23,6 +23,48 @@ SFLOW_V5 = 0x00000005
 
 LOG = logging.getLogger('ryu.lib.xflow.sflow')
 
+# sFlowV5RawPacketHeader.header_protocol
+SFLOW_HEADER_ETHERNET = 1
+
+_ETH_TYPE_IP = 0x0800
+_ETH_TYPE_VLAN = (0x8100, 0x88a8)
+_IPPROTO_TCP = 6
+_IPPROTO_UDP = 17
+
+_U16 = struct.Struct('!H')
+# version/IHL, flags/fragment offset, protocol, source, destination
+_IPV4 = struct.Struct('!B5xHxB2xII')
+_PORTS = struct.Struct('!HH')
+
+
+def ethernet_five_tuple(buf, offset=0, end=None):
+    """
+    Returns the (ipv4_src, ipv4_dst, ip_proto, port_src, port_dst) of
+    the packet whose Ethernet header starts at buf[offset], or None if
+    it is not an IPv4 packet.  The addresses are int in host order; the
+    ports are 0 except for TCP and UDP.  Only buf[offset:end] is read.
+    """
+    if end is None:
+        end = len(buf)
+    if end - offset < 14:
+        return None
+    (eth_type, ) = _U16.unpack_from(buf, offset + 12)
+    offset += 14
+    while eth_type in _ETH_TYPE_VLAN and end - offset >= 4:
+        (eth_type, ) = _U16.unpack_from(buf, offset + 2)
+        offset += 4
+    if eth_type != _ETH_TYPE_IP or end - offset < _IPV4.size:
+        return None
+    version_ihl, frag, proto, src, dst = _IPV4.unpack_from(buf, offset)
+    if version_ihl >> 4 != 4:
+        return None
+    src_port = dst_port = 0
+    if proto in (_IPPROTO_TCP, _IPPROTO_UDP) and not frag & 0x1fff:
+        offset += (version_ihl & 0xf) * 4
+        if end - offset >= 4:
+            src_port, dst_port = _PORTS.unpack_from(buf, offset)
+    return (src, dst, proto, src_port, dst_port)
+
 
 class sFlow(object):
     _PACK_STR = '!i'
@@ -39,9 +81,19 @@ class sFlow(object):
         super(sFlow, self).__init__()
 
     @classmethod
-    def parser(cls, buf):
+    def parser(cls, buf, lazy=False):
+        """
+        Decodes the datagram ``buf``.  If ``lazy`` is true, returns a
+        sFlowV5Lazy (None for other versions) which decodes the samples
+        on access.
+        """
         (version,) = struct.unpack_from(cls._PACK_STR, buf)
 
+        if lazy:
+            if version == SFLOW_V5:
+                return sFlowV5Lazy.parser(buf)
+            return None
+
         cls_ = cls._SFLOW_VERSIONS.get(version, None)
         if cls_:
             return cls_.parser(buf)
@@ -252,6 +304,7 @@ class sFlowV5FlowRecord(object):
 
 class sFlowV5RawPacketHeader(object):
     _PACK_STR = '!iIII'
+    MIN_LEN = struct.calcsize(_PACK_STR)
 
     def __init__(self, header_protocol, frame_length, stripped,
                  header_size, header):
@@ -275,6 +328,26 @@ class sFlowV5RawPacketHeader(object):
         msg = cls(header_protocol, frame_length, stripped, header_size, header)
         return msg
 
+    @classmethod
+    def parse_five_tuple(cls, buf, offset):
+        """
+        Returns the 5-tuple of the packet sampled in the raw packet
+        header record body at buf[offset], as ethernet_five_tuple(),
+        without decoding the record.
+        """
+        (header_protocol, _frame_length, _stripped,
+         header_size) = struct.unpack_from(cls._PACK_STR, buf, offset)
+        if header_protocol != SFLOW_HEADER_ETHERNET:
+            return None
+        offset += cls.MIN_LEN
+        return ethernet_five_tuple(buf, offset,
+                                   min(offset + header_size, len(buf)))
+
+    def five_tuple(self):
+        if self.header_protocol != SFLOW_HEADER_ETHERNET:
+            return None
+        return ethernet_five_tuple(b''.join(self.header))
+
 
 class sFlowV5ExtendedSwitchData(object):
     _PACK_STR = '!IIII'
@@ -434,3 +507,261 @@ class sFlowV5GenericInterfaceCounters(object):
                   ifOutDiscards, ifOutErrors, ifPromiscuousMode)
 
         return msg
+
+
+# sample format -> offsets of the number of records and of the records
+# in the body of the samples (flow, counters and their expanded forms)
+_SAMPLE_RECORDS = {
+    1: (28, 32),
+    2: (8, 12),
+    3: (40, 44),
+    4: (12, 16),
+}
+_FLOW_SAMPLE_FORMATS = (1, 3)
+# sample format -> offset of the sampling rate of flow samples
+_SAMPLING_RATE = {1: 8, 3: 12}
+_RAW_PACKET_HEADER = 1
+
+_U32 = struct.Struct('!I')
+_U32_PAIR = struct.Struct('!II')
+
+
+class sFlowV5Lazy(object):
+    """
+    sFlow v5 datagram decoded on access.
+
+    parser() only decodes the datagram header.  ``buf`` is kept as a
+    memoryview: ``samples`` indexes the offsets of the samples on its
+    first access, and the samples and their records decode their body
+    only when it is asked for.  ``flow_samples()`` extracts the 5-tuple
+    of the sampled packets without building any object per sample.
+    """
+    _PACK_STR = '!ii'
+    _PACK_STR_HEADER = '!IIII'
+    _AGENT_IPTYPE_V4 = 1
+    _AGENT_IPTYPE_V6 = 2
+
+    def __init__(self, buf, version, address_type, agent_address,
+                 sub_agent_id, sequence_number, uptime, samples_num,
+                 samples_offset):
+        super(sFlowV5Lazy, self).__init__()
+        self.buf = buf
+        self.version = version
+        self.address_type = address_type
+        self.agent_address = agent_address
+        self.sub_agent_id = sub_agent_id
+        self.sequence_number = sequence_number
+        self.uptime = uptime
+        self.samples_num = samples_num
+        self._samples_offset = samples_offset
+        self._samples = None
+
+    @classmethod
+    def parser(cls, buf):
+        buf = memoryview(buf)
+        (version, address_type) = struct.unpack_from(cls._PACK_STR, buf)
+
+        # the IPv4 address is an int, the IPv6 one 16 bytes
+        offset = struct.calcsize(cls._PACK_STR)
+        if address_type == cls._AGENT_IPTYPE_V4:
+            (agent_address, ) = _U32.unpack_from(buf, offset)
+            offset += 4
+        elif address_type == cls._AGENT_IPTYPE_V6:
+            agent_address = buf[offset:offset + 16].tobytes()
+            offset += 16
+        else:
+            LOG.info("Unknown address_type. sFlowV5.address_type=%d",
+                     address_type)
+            return None
+
+        (sub_agent_id, sequence_number, uptime,
+         samples_num) = struct.unpack_from(cls._PACK_STR_HEADER, buf, offset)
+        offset += struct.calcsize(cls._PACK_STR_HEADER)
+
+        return cls(buf, version, address_type, agent_address, sub_agent_id,
+                   sequence_number, uptime, samples_num, offset)
+
+    @property
+    def samples(self):
+        if self._samples is None:
+            samples = []
+            offset = self._samples_offset
+            for _ in range(self.samples_num):
+                sample = sFlowV5LazySample.parser(self.buf, offset)
+                offset += sFlowV5LazySample.MIN_LEN + sample.sample_length
+                samples.append(sample)
+            self._samples = samples
+        return self._samples
+
+    def flow_samples(self):
+        """
+        Yields the (sampling_rate, five_tuple) of each flow sample, as
+        returned by sFlowV5RawPacketHeader.parse_five_tuple() for its
+        first raw packet header record (None without such a record).
+        """
+        buf = self.buf
+        offset = self._samples_offset
+        for _ in range(self.samples_num):
+            sample_format, sample_length = _U32_PAIR.unpack_from(buf, offset)
+            offset += sFlowV5LazySample.MIN_LEN
+            next_sample = offset + sample_length
+            if sample_format in _FLOW_SAMPLE_FORMATS:
+                num_offset, records_offset = _SAMPLE_RECORDS[sample_format]
+                (sampling_rate, ) = _U32.unpack_from(
+                    buf, offset + _SAMPLING_RATE[sample_format])
+                (records_num, ) = _U32.unpack_from(buf, offset + num_offset)
+                offset += records_offset
+                five_tuple = None
+                for _ in range(records_num):
+                    data_format, data_length = _U32_PAIR.unpack_from(buf,
+                                                                     offset)
+                    offset += sFlowV5LazyRecord.MIN_LEN
+                    if (data_format == _RAW_PACKET_HEADER and
+                            five_tuple is None):
+                        five_tuple = sFlowV5RawPacketHeader.parse_five_tuple(
+                            buf, offset)
+                    offset += data_length
+                yield sampling_rate, five_tuple
+            offset = next_sample
+
+
+class sFlowV5LazySample(object):
+    """
+    Sample of a sFlowV5Lazy datagram.
+
+    ``sample`` decodes the body as sFlowV5Sample.parser() would do
+    (the raw ``data`` for the formats it does not know); ``records``
+    indexes the records of the flow and counters samples.
+    """
+    _PACK_STR = '!II'
+    MIN_LEN = struct.calcsize(_PACK_STR)
+
+    def __init__(self, buf, offset, enterprise, sample_format,
+                 sample_length):
+        super(sFlowV5LazySample, self).__init__()
+        self.buf = buf
+        self.offset = offset
+        self.enterprise = enterprise
+        self.sample_format = sample_format
+        self.sample_length = sample_length
+        self._sample = None
+        self._records = None
+
+    @classmethod
+    def parser(cls, buf, offset):
+        (sampledata_format,
+         sample_length) = struct.unpack_from(cls._PACK_STR, buf, offset)
+
+        format_mask = 0xfff
+        enterprise_shiftbit = 12
+
+        sample_format = sampledata_format & format_mask
+        enterprise = sampledata_format >> enterprise_shiftbit
+
+        return cls(buf, offset + cls.MIN_LEN, enterprise, sample_format,
+                   sample_length)
+
+    @property
+    def data(self):
+        return self.buf[self.offset:self.offset + self.sample_length]
+
+    @property
+    def sample(self):
+        if self._sample is None:
+            if self.enterprise == 0 and self.sample_format == 1:
+                self._sample = sFlowV5FlowSample.parser(self.buf,
+                                                        self.offset)
+            elif self.enterprise == 0 and self.sample_format == 2:
+                self._sample = sFlowV5CounterSample.parser(self.buf,
+                                                           self.offset)
+            else:
+                self._sample = self.data
+        return self._sample
+
+    @property
+    def sampling_rate(self):
+        """The sampling rate of a flow sample, None for the others."""
+        if self.enterprise != 0 or self.sample_format not in _SAMPLING_RATE:
+            return None
+        (sampling_rate, ) = _U32.unpack_from(
+            self.buf, self.offset + _SAMPLING_RATE[self.sample_format])
+        return sampling_rate
+
+    @property
+    def records(self):
+        if self._records is None:
+            records = []
+            if (self.enterprise == 0 and
+                    self.sample_format in _SAMPLE_RECORDS):
+                num_offset, offset = _SAMPLE_RECORDS[self.sample_format]
+                (records_num, ) = _U32.unpack_from(self.buf,
+                                                   self.offset + num_offset)
+                offset += self.offset
+                flow = self.sample_format in _FLOW_SAMPLE_FORMATS
+                for _ in range(records_num):
+                    record = sFlowV5LazyRecord.parser(self.buf, offset, flow)
+                    offset += sFlowV5LazyRecord.MIN_LEN + record.data_length
+                    records.append(record)
+            self._records = records
+        return self._records
+
+
+class sFlowV5LazyRecord(object):
+    """
+    Flow or counter record of a sFlowV5LazySample.
+
+    ``data`` is the body of the record (a memoryview of the datagram);
+    ``decode()`` returns it as decoded by sFlowV5FlowRecord.parser() or
+    sFlowV5CounterRecord.parser().
+    """
+    _PACK_STR = '!II'
+    MIN_LEN = struct.calcsize(_PACK_STR)
+
+    def __init__(self, buf, offset, flow, enterprise, data_format,
+                 data_length):
+        super(sFlowV5LazyRecord, self).__init__()
+        self.buf = buf
+        self.offset = offset
+        self.flow = flow
+        self.enterprise = enterprise
+        self.data_format = data_format
+        self.data_length = data_length
+        self._decoded = None
+
+    @classmethod
+    def parser(cls, buf, offset, flow):
+        (data_format,
+         data_length) = struct.unpack_from(cls._PACK_STR, buf, offset)
+
+        format_mask = 0xfff
+        enterprise_shiftbit = 12
+
+        return cls(buf, offset + cls.MIN_LEN, flow,
+                   data_format >> enterprise_shiftbit,
+                   data_format & format_mask, data_length)
+
+    @property
+    def data(self):
+        return self.buf[self.offset:self.offset + self.data_length]
+
+    def decode(self):
+        if self._decoded is None:
+            offset = self.offset - self.MIN_LEN
+            if self.flow:
+                record = sFlowV5FlowRecord.parser(self.buf, offset)
+                self._decoded = record.flow_data
+            else:
+                record = sFlowV5CounterRecord.parser(self.buf, offset)
+                self._decoded = record.counter_data
+        return self._decoded
+
+    def five_tuple(self):
+        """
+        Returns the 5-tuple of the packet of a raw packet header record
+        (see sFlowV5RawPacketHeader.parse_five_tuple()), None for the
+        other records.
+        """
+        if (not self.flow or self.enterprise != 0 or
+                self.data_format != _RAW_PACKET_HEADER):
+            return None
+        return sFlowV5RawPacketHeader.parse_five_tuple(self.buf, self.offset)
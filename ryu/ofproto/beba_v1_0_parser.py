@@ -656,7 +656,7 @@ class OFPStateStats(StringifyMixin):
     def parser(cls, buf, offset=0):
         state_stats_list = []
         
-        for i in range(len(buf)/bebaproto.OFP_STATE_STATS_SIZE):
+        for i in range(len(buf) // bebaproto.OFP_STATE_STATS_SIZE):
             state_stats = cls()
 
             (state_stats.length, state_stats.table_id, state_stats.dur_sec,
@@ -1098,7 +1098,6 @@ returns a function object as a return value.
 '''
 
 from ryu.controller.controller import Datapath
-from sets import Set
 
 '''
 OVSDatapath class inherits Datapath class to override send_msg() method in order to intercept and adapt Beba messages.
@@ -1332,14 +1331,19 @@ class OVSDatapath(Datapath):
 
         return super(OVSDatapath, self).send_msg(msg)
 
+    def send_msgs(self, msgs):
+        # Datapath.send_msgs() would bypass send_msg(): each message is adapted and sent alone
+        for msg in msgs:
+            self.send_msg(msg)
+
     # It builds a set of NXFlowSpecMatch(dst=(LOOKUP_SCOPE_FIELD_OXM_NAME, 0),n_bits=OXM_FIELD_BITS_LENGTH,src=UPDATE_SCOPE_FIELD_OXM_NAME)
     # for each field of the lookup/update-scope. It adds to the set also an eventual match for being compliant to match prerequisites.
     def generate_NXFlowSpecMatch_and_prereq(self,table_id):
         # We save the result in the object (attribute self.flowSpecMatchDict) to avoid generate NXFlowSpecMatch multiple times for the same table!
-        if table_id in self.flowSpecMatchDict and self.flowSpecMatchDict[table_id]!=Set([]):
+        if table_id in self.flowSpecMatchDict and self.flowSpecMatchDict[table_id]!=set():
             return self.flowSpecMatchDict[table_id]
 
-        self.flowSpecMatchDict[table_id] = Set([]) # we use a Set instead of a list to avoid duplicates in case of 2 fields with the same pre-req
+        self.flowSpecMatchDict[table_id] = set() # we use a Set instead of a list to avoid duplicates in case of 2 fields with the same pre-req
 
         # We create an hashable NXFlowSpecMatch to be able to use NXFlowSpecMatch in a Set
         class NXHashableFlowSpecMatch(ofproto_parser.NXFlowSpecMatch):
@@ -1510,6 +1514,6 @@ def Beba2OVSWrapper(function):
         datapath.lookup_scope = {}
         datapath.update_scope = {}
         datapath.flowSpecMatchDict = {}
-        datapath.stateful_stages_in_use = Set([])
+        datapath.stateful_stages_in_use = set()
         return function(self, ev)
     return inner
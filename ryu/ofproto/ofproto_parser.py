@@ -27,6 +27,7 @@ from ryu import utils
 from ryu.lib import stringify
 
 from ryu.ofproto import ofproto_common
+from ryu.ofproto import ofproto_protocol
 
 LOG = logging.getLogger('ryu.ofproto.ofproto_parser')
 
@@ -56,6 +57,10 @@ def msg(datapath, version, msg_type, msg_len, xid, buf):
     assert len(buf) >= msg_len
 
     msg_parser = _MSG_PARSERS.get(version)
+    if msg_parser is None:
+        # the parser registers itself when its version is first used
+        ofproto_protocol.load_version(version)
+        msg_parser = _MSG_PARSERS.get(version)
     if msg_parser is None:
         raise exception.OFPUnknownVersion(version=version)
 
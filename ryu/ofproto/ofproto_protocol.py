@@ -14,31 +14,68 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from ryu.ofproto import ofproto_v1_0
-from ryu.ofproto import ofproto_v1_0_parser
-from ryu.ofproto import ofproto_v1_2
-from ryu.ofproto import ofproto_v1_2_parser
-from ryu.ofproto import ofproto_v1_3
-from ryu.ofproto import ofproto_v1_3_parser
-from ryu.ofproto import ofproto_v1_4
-from ryu.ofproto import ofproto_v1_4_parser
-from ryu.ofproto import ofproto_v1_5
-from ryu.ofproto import ofproto_v1_5_parser
-
-
-_versions = {
-    ofproto_v1_0.OFP_VERSION: (ofproto_v1_0, ofproto_v1_0_parser),
-    ofproto_v1_2.OFP_VERSION: (ofproto_v1_2, ofproto_v1_2_parser),
-    ofproto_v1_3.OFP_VERSION: (ofproto_v1_3, ofproto_v1_3_parser),
-    ofproto_v1_4.OFP_VERSION: (ofproto_v1_4, ofproto_v1_4_parser),
-    ofproto_v1_5.OFP_VERSION: (ofproto_v1_5, ofproto_v1_5_parser),
-}
+import importlib
+
+try:
+    from collections.abc import Mapping
+except ImportError:
+    from collections import Mapping
+
+
+class _Versions(Mapping):
+    """
+    {OF version: (constants module, parser module)}
+
+    The modules of a version are imported on its first lookup, as the
+    parsers are big and most processes use a single version.
+    """
+
+    def __init__(self, names):
+        self._names = names
+        self._modules = {}
+
+    def __getitem__(self, version):
+        modules = self._modules.get(version)
+        if modules is None:
+            modules = tuple(importlib.import_module(name)
+                            for name in self._names[version])
+            self._modules[version] = modules
+        return modules
+
+    def __iter__(self):
+        return iter(self._names)
+
+    def __len__(self):
+        return len(self._names)
+
+    def loaded(self):
+        """Returns the versions whose modules are imported."""
+        return set(self._modules)
+
+
+_versions = _Versions({
+    0x01: ('ryu.ofproto.ofproto_v1_0', 'ryu.ofproto.ofproto_v1_0_parser'),
+    0x03: ('ryu.ofproto.ofproto_v1_2', 'ryu.ofproto.ofproto_v1_2_parser'),
+    0x04: ('ryu.ofproto.ofproto_v1_3', 'ryu.ofproto.ofproto_v1_3_parser'),
+    0x05: ('ryu.ofproto.ofproto_v1_4', 'ryu.ofproto.ofproto_v1_4_parser'),
+    0x06: ('ryu.ofproto.ofproto_v1_5', 'ryu.ofproto.ofproto_v1_5_parser'),
+})
 
 
 # OF versions supported by every apps in this process (intersection)
 _supported_versions = set(_versions.keys())
 
 
+def load_version(version):
+    """
+    Imports the modules of an OF version if it is known, and returns
+    them, None otherwise.
+    """
+    if version not in _versions:
+        return None
+    return _versions[version]
+
+
 def set_app_supported_versions(vers):
     global _supported_versions
 
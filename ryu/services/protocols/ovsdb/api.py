@@ -36,9 +36,27 @@ def match_rows(manager, system_id, table, fn):
     return reply.result
 
 
+def lookup_rows(manager, system_id, table, column, key):
+    """
+    Returns a list of the rows of ``table`` whose ``column`` matches
+    ``key``, using the secondary indexes of the IDL.
+    e.g. lookup_rows(manager, system_id, 'Interface', 'ofport', 1)
+    """
+    def _lookup_rows(tables):
+        return tables[table].idl.lookup(table, column, key)
+
+    request = ovsdb_event.EventReadRequest(system_id, _lookup_rows)
+    reply = manager.send_request(request)
+    return reply.result
+
+
+def lookup_row(manager, system_id, table, column, key):
+    rows = lookup_rows(manager, system_id, table, column, key)
+    return rows[0] if rows else None
+
+
 def row_by_name(manager, system_id, name, table='Bridge', fn=None):
-    matched_row = match_row(manager, system_id, table,
-                            lambda row: row.name == name)
+    matched_row = lookup_row(manager, system_id, table, 'name', name)
 
     if fn is not None:
         return fn(matched_row)
@@ -71,10 +89,12 @@ def get_iface_by_name(manager, system_id, name, fn=None):
 
 def get_bridge_for_iface_name(manager, system_id, iface_name, fn=None):
     iface = row_by_name(manager, system_id, iface_name, 'Interface')
-    port = match_row(manager, system_id, 'Port',
-                     lambda x: iface in x.interfaces)
-    bridge = match_row(manager, system_id, 'Bridge',
-                       lambda x: port in x.ports)
+    port = None
+    if iface is not None:
+        port = lookup_row(manager, system_id, 'Port', 'interfaces', iface)
+    bridge = None
+    if port is not None:
+        bridge = lookup_row(manager, system_id, 'Bridge', 'ports', port)
 
     if fn is not None:
         return fn(bridge)
@@ -97,7 +117,11 @@ def get_bridge_by_datapath_id(manager, system_id, datapath_id, fn=None):
         row_dpid = dpidlib.str_to_dpid(str(row.datapath_id[0]))
         return row_dpid == datapath_id
 
-    bridge = match_row(manager, system_id, 'Bridge', _match_fn)
+    bridge = lookup_row(manager, system_id, 'Bridge', 'datapath_id',
+                        dpidlib.dpid_to_str(datapath_id))
+    if bridge is None:
+        # datapath_id is not in the canonical format.
+        bridge = match_row(manager, system_id, 'Bridge', _match_fn)
 
     if fn is not None:
         return fn(bridge)
@@ -41,6 +41,7 @@ from ovs.db import idl
 from ryu.base import app_manager
 from ryu.lib import hub
 from ryu.services.protocols.ovsdb import event
+from ryu.services.protocols.ovsdb import index
 from ryu.services.protocols.ovsdb import model
 
 
@@ -67,6 +68,20 @@ def dictify(row):
                  for k, v in row._data.items()])
 
 
+def _uuid_to_key(atom, base):
+    # a reference is the UUID of the referred row, even if this row is
+    # not in the replica yet (e.g. inserted later by the same update).
+    if base.ref_table:
+        return str(atom)
+
+    return atom
+
+
+def _index_row(row):
+    return dict([(k, v.to_python(_uuid_to_key))
+                 for k, v in row._data.items()])
+
+
 def discover_schemas(connection):
     # NOTE(jkoelker) currently only the Open_vSwitch schema
     #                is supported.
@@ -111,7 +126,7 @@ def discover_system_id(idl):
 # NOTE(jkoelker) Wrap ovs's Idl to accept an existing session, and
 #                trigger callbacks on changes
 class Idl(idl.Idl):
-    def __init__(self, session, schema):
+    def __init__(self, session, schema, indexes=None):
         if not isinstance(schema, idl.SchemaHelper):
             schema = idl.SchemaHelper(schema_json=schema)
             schema.register_all()
@@ -146,6 +161,18 @@ class Idl(idl.Idl):
             table.rows = {}
             table.idl = self
 
+        # NOTE(jkoelker) secondary indexes of the rows
+        if indexes is None:
+            indexes = index.DEFAULT_INDEXES
+        self.indexes = {}
+        for name, columns in indexes.items():
+            table = schema.tables.get(name)
+            if table is None:
+                continue
+            columns = [c for c in columns if c in table.columns]
+            if columns:
+                self.indexes[name] = index.TableIndex(columns)
+
     @property
     def events(self):
         events = self._events
@@ -161,8 +188,10 @@ class Idl(idl.Idl):
         changed = idl.Idl.__process_update(self, table, uuid, old, new)
 
         if changed:
+            table_index = self.indexes.get(table.name)
             if not new:
                 ev = (event.EventRowDelete, (table.name, old_row))
+                new_row = None
 
             elif not old:
                 new_row = model.Row(dictify(table.rows.get(uuid)))
@@ -175,15 +204,46 @@ class Idl(idl.Idl):
 
                 ev = (event.EventRowUpdate, (table.name, old_row, new_row))
 
+            if table_index is not None:
+                table_index.update(uuid, None if new_row is None
+                                   else _index_row(table.rows[uuid]))
+
             self._events.append(ev)
 
         return changed
 
+    def __clear(self):
+        idl.Idl.__clear(self)
+
+        for table_index in self.indexes.values():
+            table_index.clear()
+
+    def lookup(self, table_name, column, key):
+        """
+        Returns a list of the rows of ``table_name`` whose ``column``
+        value matches ``key`` (see ryu.services.protocols.ovsdb.index).
+        Rows are referred by their UUID strings, and an idl.Row can be
+        given as ``key`` for reference columns.  Columns which are not
+        indexed are looked up with a table scan.
+        """
+        if isinstance(key, idl.Row):
+            key = str(key.uuid)
+
+        rows = self.tables[table_name].rows
+        table_index = self.indexes.get(table_name)
+        if table_index is not None and column in table_index:
+            return [rows[uuid] for uuid in table_index.lookup(column, key)
+                    if uuid in rows]
+
+        return [row for row in rows.values()
+                if key in index.index_keys(_index_row(row).get(column))]
+
 
 class RemoteOvsdb(app_manager.RyuApp):
     _EVENTS = [event.EventRowUpdate,
                event.EventRowDelete,
                event.EventRowInsert,
+               event.EventRowChanges,
                event.EventInterfaceDeleted,
                event.EventInterfaceInserted,
                event.EventInterfaceUpdated,
@@ -191,6 +251,11 @@ class RemoteOvsdb(app_manager.RyuApp):
                event.EventPortInserted,
                event.EventPortUpdated]
 
+    # modify requests merged into a single transaction at most.
+    TXN_BATCH_SIZE = 64
+    # transactions waiting for the reply from the server at most.
+    TXN_MAX_INFLIGHT = 8
+
     @classmethod
     def factory(cls, sock, address, *args, **kwargs):
         ovs_stream = stream.Stream(sock, None, None)
@@ -252,6 +317,7 @@ class RemoteOvsdb(app_manager.RyuApp):
         self.system_id = kwargs['system_id']
         self.name = kwargs['name']
         self._txn_q = collections.deque()
+        self._txn_inflight = []  # [(txn, [(req, uuids)])]
 
     def _event_proxy_loop(self):
         while self.is_active:
@@ -261,10 +327,15 @@ class RemoteOvsdb(app_manager.RyuApp):
                 hub.sleep(0.1)
                 continue
 
-            for event in events:
-                ev = event[0]
-                args = event[1]
-                self._submit_event(ev(self.system_id, *args))
+            # merge the updates of the same row since the last loop.
+            evs = event.coalesce_row_events(
+                [ev_cls(self.system_id, *args) for ev_cls, args in events])
+            for ev in evs:
+                self._submit_event(ev)
+
+            if evs:
+                self.send_event_to_observers(
+                    event.EventRowChanges(self.system_id, evs))
 
             hub.sleep(0)
 
@@ -299,19 +370,79 @@ class RemoteOvsdb(app_manager.RyuApp):
             self.stop()
 
     def _transactions(self):
-        if not self._txn_q:
-            return
+        if self._txn_inflight:
+            self._poll_transactions()
+
+        # commit at once when no transaction is in flight.  Otherwise
+        # the requests queued meanwhile wait for it to complete, unless
+        # they fill a whole batch, and are merged.
+        while (self._txn_q and
+               len(self._txn_inflight) < self.TXN_MAX_INFLIGHT):
+            if (self._txn_inflight and
+                    len(self._txn_q) < self.TXN_BATCH_SIZE):
+                break
 
-        # NOTE(jkoelker) possibly run multiple transactions per loop?
-        self._transaction()
+            batch = []
+            while self._txn_q and len(batch) < self.TXN_BATCH_SIZE:
+                batch.append(self._txn_q.popleft())
+            self._begin_transaction(batch)
 
-    def _transaction(self):
-        req = self._txn_q.popleft()
+    def _begin_transaction(self, batch):
+        # merge the requests into a single transaction.
         txn = idl.Transaction(self._idl)
+        results = []
+        for req in batch:
+            try:
+                uuids = req.func(self._idl.tables, txn.insert)
+            except Exception as e:
+                txn.abort()
+                self.logger.exception('Error in transaction for '
+                                      'system_id %s', self.system_id)
+                if len(batch) == 1:
+                    self._reply_error(req, str(e))
+                else:
+                    self._retry_transactions(batch)
+                return
+            results.append((req, uuids))
 
-        uuids = req.func(self._idl.tables, txn.insert)
-        status = txn.commit_block()
+        status = txn.commit()
+        if status == idl.Transaction.INCOMPLETE:
+            self._txn_inflight.append((txn, results))
+        else:
+            self._end_transaction(txn, results, status)
+
+    def _retry_transactions(self, reqs):
+        # a request spoiled the whole batch; retry them one by one
+        # so that each caller gets its own result.
+        for req in reqs:
+            self._begin_transaction([req])
+
+    def _poll_transactions(self):
+        # the retried requests are appended to _txn_inflight.
+        inflight, self._txn_inflight = self._txn_inflight, []
+        for txn, results in inflight:
+            status = txn.commit()
+            if status == idl.Transaction.INCOMPLETE:
+                self._txn_inflight.append((txn, results))
+            else:
+                self._end_transaction(txn, results, status)
+
+    def _end_transaction(self, txn, results, status):
+        if (len(results) > 1 and
+                status not in (idl.Transaction.SUCCESS,
+                               idl.Transaction.UNCHANGED)):
+            self._retry_transactions([req for req, _uuids in results])
+            return
+
+        for req, uuids in results:
+            self._reply_transaction(req, txn, uuids, status)
+
+    def _reply_error(self, req, err_msg):
+        rep = event.EventModifyReply(self.system_id, idl.Transaction.ERROR,
+                                     {}, err_msg)
+        self.reply_to_request(req, rep)
 
+    def _reply_transaction(self, req, txn, uuids, status):
         insert_uuids = {}
         err_msg = None
 
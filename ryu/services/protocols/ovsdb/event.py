@@ -13,6 +13,8 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import collections
+
 from ryu.controller import event as ryu_event
 from ryu.controller import handler
 
@@ -58,6 +60,66 @@ class EventRowUpdate(ryu_event.EventBase):
                                                        self.old['_uuid'])
 
 
+class EventRowChanges(ryu_event.EventBase):
+    """
+    A batch of the row events coalesced by ``coalesce_row_events()``,
+    sent after the individual row events of the batch.
+    """
+    def __init__(self, system_id, events):
+        super(EventRowChanges, self).__init__()
+        self.system_id = system_id
+        self.events = events
+
+    def __str__(self):
+        return '%s<system_id=%s events=%d>' % (self.__class__.__name__,
+                                               self.system_id,
+                                               len(self.events))
+
+
+def _row_event_key(ev):
+    if isinstance(ev, EventRowUpdate):
+        return (ev.table, ev.old['_uuid'])
+    return (ev.table, ev.row['_uuid'])
+
+
+def coalesce_row_events(events):
+    """
+    Merge the EventRowInsert/Update/Delete events of the same row so
+    that each row is reported at most once, in the order of its first
+    event.  e.g. an insert followed by updates becomes a single insert
+    of the last row, and a row inserted and deleted is not reported.
+    """
+    merged = collections.OrderedDict()
+    for ev in events:
+        key = _row_event_key(ev)
+        prev = merged.get(key)
+        if prev is None:
+            merged[key] = ev
+        elif isinstance(ev, EventRowDelete):
+            if isinstance(prev, EventRowInsert):
+                del merged[key]
+            elif isinstance(prev, EventRowUpdate):
+                merged[key] = EventRowDelete(ev.system_id, ev.table,
+                                             prev.old)
+            else:
+                merged[key] = ev
+        elif isinstance(ev, EventRowUpdate):
+            if isinstance(prev, EventRowInsert):
+                merged[key] = EventRowInsert(ev.system_id, ev.table, ev.new)
+            elif isinstance(prev, EventRowUpdate):
+                merged[key] = EventRowUpdate(ev.system_id, ev.table,
+                                             prev.old, ev.new)
+            else:
+                merged[key] = ev
+        elif isinstance(prev, EventRowDelete):
+            # deleted and inserted again
+            merged[key] = EventRowUpdate(ev.system_id, ev.table,
+                                         prev.row, ev.row)
+        else:
+            merged[key] = ev
+    return list(merged.values())
+
+
 class EventModifyRequest(ryu_event.EventRequestBase):
     """ Dispatch a modify function to OVSDB
 
@@ -0,0 +1,104 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Secondary indexes of the OVSDB rows cached by the IDL
+
+Rows are indexed by the value of some of their columns, as converted by
+``client.dictify()``, except that a reference to another row is the
+UUID string of this row even if it is not in the replica yet:
+
+- a scalar column is indexed by its value,
+- a set column (e.g. ``Interface.ofport``, ``Port.interfaces``) by each
+  of its elements,
+- a map column (e.g. ``external_ids``) by each of its (key, value)
+  pairs.
+"""
+
+# columns indexed by default, per table.
+DEFAULT_INDEXES = {
+    'Bridge': ('name', 'datapath_id', 'ports'),
+    'Port': ('name', 'interfaces', 'qos', 'external_ids'),
+    'Interface': ('name', 'ofport', 'external_ids'),
+    'QoS': ('queues', 'external_ids'),
+    'Queue': ('external_ids',),
+}
+
+
+def index_keys(value):
+    """Returns the index keys of a column value."""
+    if value is None:
+        return ()
+    if isinstance(value, dict):
+        return tuple(value.items())
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return tuple(value)
+    return (value,)
+
+
+class TableIndex(object):
+    """
+    Index of the rows of a table by the given columns.
+
+    ``update()`` must be called with the dict of each inserted or
+    modified row, and with None for each deleted row.
+    """
+
+    def __init__(self, columns):
+        self.columns = tuple(columns)
+        self._index = dict((column, {}) for column in self.columns)
+        self._keys = {}  # row uuid -> {column: keys}
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, column):
+        return column in self._index
+
+    def _remove(self, uuid, column, keys):
+        index = self._index[column]
+        for key in keys:
+            uuids = index.get(key)
+            if uuids is None:
+                continue
+            uuids.discard(uuid)
+            if not uuids:
+                del index[key]
+
+    def update(self, uuid, row):
+        old = self._keys.pop(uuid, None) or {}
+        if row is None:
+            for column, keys in old.items():
+                self._remove(uuid, column, keys)
+            return
+
+        new = {}
+        for column in self.columns:
+            keys = index_keys(row.get(column))
+            old_keys = old.get(column, ())
+            if keys != old_keys:
+                self._remove(uuid, column, old_keys)
+                index = self._index[column]
+                for key in keys:
+                    index.setdefault(key, set()).add(uuid)
+            new[column] = keys
+        self._keys[uuid] = new
+
+    def lookup(self, column, key):
+        """Returns the set of the UUIDs of the rows indexed by ``key``."""
+        return frozenset(self._index[column].get(key, ()))
+
+    def clear(self):
+        for index in self._index.values():
+            index.clear()
+        self._keys.clear()
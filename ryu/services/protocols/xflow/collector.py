@@ -0,0 +1,207 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+sFlow v5 / NetFlow v5 collector
+
+Receives the datagrams of the agents on UDP sockets and aggregates the
+sampled packets of each time window by (ipv4_src, ipv4_dst, ip_proto,
+port_src, port_dst).  An EventXFlowSummary is sent to the observers at
+the end of each window.
+
+The datagrams are decoded in place (sFlow by the flow_samples() fast
+path of ryu.lib.xflow.sflow.sFlowV5Lazy) and are received in batches:
+after a datagram is received, the datagrams already queued on the
+socket are read without going back to the hub.
+"""
+
+import socket
+import struct
+import time
+
+from ryu import cfg
+from ryu.base import app_manager
+from ryu.lib import hub
+from ryu.lib.xflow import sflow
+from ryu.services.protocols.xflow import event
+
+
+opts = (cfg.StrOpt('address', default='0.0.0.0',
+                   help='sFlow/NetFlow collector address'),
+        cfg.IntOpt('sflow-port', default=6343,
+                   help='sFlow port (0: disabled)'),
+        cfg.IntOpt('netflow-port', default=2055,
+                   help='NetFlow port (0: disabled)'),
+        cfg.FloatOpt('window', default=1.0,
+                     help='summary window in seconds'),
+        cfg.BoolOpt('scale-samples', default=False,
+                    help='count each sFlow sample as sampling rate packets'))
+
+cfg.CONF.register_opts(opts, 'xflow')
+
+# datagrams read from a socket before yielding to the other threads
+_BATCH_SIZE = 256
+_MAX_DATAGRAM = 65535
+
+_NETFLOW_VERSION = 5
+
+_IPPROTO_TCP = 6
+_IPPROTO_UDP = 17
+
+# version, count (uptime, time, sequence, engine, sampling skipped)
+_NETFLOW_HEADER = struct.Struct('!HH20x')
+# srcaddr, dstaddr, dPkts, srcport, dstport, prot
+_NETFLOW_RECORD = struct.Struct('!II8xI12xHH2xB9x')
+
+
+def add_sflow(buf, flows, scale=False):
+    """
+    Adds the packets sampled in the sFlow v5 datagram ``buf`` to the
+    ``flows`` counters.  Returns the number of flow samples.
+    Raises ValueError or struct.error if the datagram is malformed.
+    """
+    msg = sflow.sFlow.parser(buf, lazy=True)
+    if msg is None:
+        raise ValueError('not a sFlow v5 datagram')
+    samples = 0
+    for sampling_rate, flow in msg.flow_samples():
+        samples += 1
+        if flow is not None:
+            flows[flow] = flows.get(flow, 0) + (sampling_rate if scale
+                                                else 1)
+    return samples
+
+
+def add_netflow(buf, flows):
+    """
+    Adds the packets of the flow records of the NetFlow v5 datagram
+    ``buf`` to the ``flows`` counters.  Returns the number of records.
+    Raises ValueError or struct.error if the datagram is malformed.
+    """
+    version, count = _NETFLOW_HEADER.unpack_from(buf)
+    if version != _NETFLOW_VERSION:
+        raise ValueError('unsupported NetFlow version %d' % version)
+    offset = _NETFLOW_HEADER.size
+    if len(buf) < offset + count * _NETFLOW_RECORD.size:
+        raise ValueError('truncated NetFlow datagram')
+    for _ in range(count):
+        (src, dst, packets, src_port, dst_port,
+         proto) = _NETFLOW_RECORD.unpack_from(buf, offset)
+        offset += _NETFLOW_RECORD.size
+        if proto not in (_IPPROTO_TCP, _IPPROTO_UDP):
+            src_port = dst_port = 0
+        flow = (src, dst, proto, src_port, dst_port)
+        flows[flow] = flows.get(flow, 0) + packets
+    return count
+
+
+class XFlowCollector(app_manager.RyuApp):
+    _EVENTS = [event.EventXFlowSummary]
+
+    def __init__(self, *args, **kwargs):
+        super(XFlowCollector, self).__init__(*args, **kwargs)
+        self._address = self.CONF.xflow.address
+        self._ports = ((self.CONF.xflow.sflow_port, self._add_sflow),
+                       (self.CONF.xflow.netflow_port, add_netflow))
+        self.window = self.CONF.xflow.window
+        self._scale = self.CONF.xflow.scale_samples
+        self._sockets = []
+        self._flows = {}
+        self._stats = self._new_stats()
+        self._window_start = time.time()
+        self._receivers = []
+        self._publisher = None
+
+    @staticmethod
+    def _new_stats():
+        return {'datagrams': 0, 'samples': 0, 'errors': 0}
+
+    def _add_sflow(self, buf, flows):
+        return add_sflow(buf, flows, self._scale)
+
+    def start(self):
+        super(XFlowCollector, self).start()
+        for port, add in self._ports:
+            if not port:
+                continue
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            sock.bind((self._address, port))
+            self._sockets.append(sock)
+            self.logger.info('Listening on %s:%s for %s datagrams',
+                             self._address, port,
+                             'NetFlow' if add is add_netflow else 'sFlow')
+            self._receivers.append(hub.spawn(self._serve, sock, add))
+        self._window_start = time.time()
+        self._publisher = hub.spawn(self._publish)
+
+    def stop(self):
+        threads = self._receivers
+        if self._publisher is not None:
+            threads.append(self._publisher)
+        for thread in threads:
+            hub.kill(thread)
+        hub.joinall(threads)
+        self._receivers = []
+        self._publisher = None
+        for sock in self._sockets:
+            sock.close()
+        self._sockets = []
+        super(XFlowCollector, self).stop()
+
+    def _receive(self, data, add):
+        stats = self._stats
+        stats['datagrams'] += 1
+        try:
+            stats['samples'] += add(data, self._flows)
+        except (ValueError, struct.error) as e:
+            stats['errors'] += 1
+            self.logger.debug('malformed datagram: %s', e)
+
+    def _serve(self, sock, add):
+        while self.is_active:
+            try:
+                self._receive(sock.recv(_MAX_DATAGRAM), add)
+                # drain the datagrams already queued without blocking
+                sock.settimeout(0.0)
+                try:
+                    for _ in range(_BATCH_SIZE - 1):
+                        self._receive(sock.recv(_MAX_DATAGRAM), add)
+                except socket.error:
+                    pass
+                finally:
+                    sock.settimeout(None)
+            except socket.error:
+                self.logger.exception('failed to receive datagrams')
+                hub.sleep(self.window)
+            hub.sleep(0)
+
+    def _publish(self):
+        deadline = self._window_start
+        while self.is_active:
+            deadline += self.window
+            hub.sleep(max(0, deadline - time.time()))
+            self.end_window()
+
+    def end_window(self):
+        """
+        Sends the EventXFlowSummary of the current window to the
+        observers and starts a new window.
+        """
+        now = time.time()
+        ev = event.EventXFlowSummary(self._window_start, now,
+                                     self._flows, self._stats)
+        self._flows = {}
+        self._stats = self._new_stats()
+        self._window_start = now
+        self.send_event_to_observers(ev)
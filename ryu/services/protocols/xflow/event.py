@@ -0,0 +1,76 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from ryu.controller import event as ryu_event
+from ryu.controller import handler
+
+
+# fields of the flow keys of EventXFlowSummary
+IPV4_SRC = 0
+IPV4_DST = 1
+IP_PROTO = 2
+PORT_SRC = 3
+PORT_DST = 4
+
+FIELDS = {
+    'ipv4_src': IPV4_SRC,
+    'ipv4_dst': IPV4_DST,
+    'ip_proto': IP_PROTO,
+    'port_src': PORT_SRC,
+    'port_dst': PORT_DST,
+}
+
+
+class EventXFlowSummary(ryu_event.EventBase):
+    """
+    Traffic reported by the sFlow and NetFlow agents during a window.
+
+    ``flows`` maps the (ipv4_src, ipv4_dst, ip_proto, port_src,
+    port_dst) keys to packet counts: sampled packets for sFlow (scaled
+    by the sampling rate if ``[xflow] scale_samples`` is set), packets
+    of the flow records for NetFlow.  The addresses are int in host
+    order; the ports are 0 except for TCP and UDP.
+
+    ``stats`` counts the datagrams, samples (flow samples and NetFlow
+    records) and malformed datagrams received during the window.
+    """
+
+    def __init__(self, start, end, flows, stats):
+        super(EventXFlowSummary, self).__init__()
+        self.start = start
+        self.end = end
+        self.flows = flows
+        self.stats = stats
+
+    def counters(self, field, select=None):
+        """
+        Returns a dict of the packet counts of each value of ``field``
+        (a name of FIELDS), summed over the flows for which
+        ``select(flow)`` is true (all flows if None).
+        """
+        index = FIELDS[field]
+        counters = {}
+        for flow, packets in self.flows.items():
+            if select is not None and not select(flow):
+                continue
+            value = flow[index]
+            counters[value] = counters.get(value, 0) + packets
+        return counters
+
+    def __str__(self):
+        return '%s<start=%s end=%s flows=%d stats=%s>' % (
+            self.__class__.__name__, self.start, self.end,
+            len(self.flows), self.stats)
+
+
+handler.register_service('ryu.services.protocols.xflow.collector')
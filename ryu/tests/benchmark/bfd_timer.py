@@ -0,0 +1,126 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Timer accuracy benchmark of BFDLib.
+
+Establishes a number of BFD sessions on a dummy datapath and measures
+how late each periodic BFD Control transmission is compared with the
+transmission period of its session.
+
+Usage::
+
+    python -m ryu.tests.benchmark.bfd_timer [--sessions 10000] \\
+        [--interval 1000000] [--duration 10]
+"""
+
+from __future__ import print_function
+
+import argparse
+import random
+import resource
+
+from ryu.lib import hub
+hub.patch()
+
+from ryu.lib import bfdlib
+from ryu.ofproto import ofproto_v1_3
+from ryu.ofproto import ofproto_v1_3_parser
+
+
+class _Datapath(object):
+    ofproto = ofproto_v1_3
+    ofproto_parser = ofproto_v1_3_parser
+
+    def __init__(self, dpid):
+        self.id = dpid
+        self.sent = 0
+
+    def send_msg(self, msg):
+        self.sent += 1
+
+
+def _cpu_time():
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def _percentile(values, p):
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(len(values) * p / 100.0))]
+
+
+def run(sessions, interval, duration):
+    lib = bfdlib.BFDLib()
+    dp = _Datapath(1)
+    lateness = []
+
+    def _wrap(sess):
+        orig = sess._xmit_timeout
+
+        def _xmit_timeout():
+            t = sess._xmit_timer
+            if t is not None:
+                lateness.append(lib.timer.clock() - t.deadline)
+            orig()
+        sess._xmit_timeout = _xmit_timeout
+
+    for i in range(sessions):
+        discr = lib.add_bfd_session(
+            dpid=dp.id, ofport=i % 48 + 1,
+            src_mac='00:00:00:00:00:01', src_ip='10.0.0.1',
+            dst_mac='00:00:00:00:00:02', dst_ip='10.0.0.2')
+        sess = lib.session[discr]
+        sess.datapath = dp
+        # pretend the remote peer asked for the given interval.
+        sess._remote_min_rx_interval = interval
+        sess._desired_min_tx_interval = interval
+        sess._update_xmit_period()
+        _wrap(sess)
+
+    # re-arm the transmission timers now that the setup is done,
+    # spreading the first transmissions over one period.
+    for sess in lib.session.values():
+        sess._xmit_timer.cancel()
+        sess._xmit_timer = lib.timer.call_later(
+            random.uniform(0, sess._xmit_period), sess._xmit_timeout)
+
+    cpu_start = _cpu_time()
+    lib.timer.start()
+    hub.sleep(duration)
+    lib.close()
+    cpu = _cpu_time() - cpu_start
+
+    lateness.sort()
+    print('sessions:          %d' % sessions)
+    print('packets sent:      %d (%.0f pps)' % (dp.sent, dp.sent / duration))
+    print('cpu time:          %.2f sec (%.0f%%)' % (
+        cpu, cpu * 100 / duration))
+    for p in (50, 90, 99, 100):
+        print('lateness p%-3d     %.3f msec' % (
+            p, _percentile(lateness, p) * 1000))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--sessions', type=int, default=10000)
+    parser.add_argument('--interval', type=int, default=1000000,
+                        help='transmission interval in microseconds')
+    parser.add_argument('--duration', type=float, default=10)
+    args = parser.parse_args()
+    run(args.sessions, args.interval, args.duration)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Per window cost of ryu.lib.entropy_detector.
+
+Feeds the six state tables of the DDoS use case (IPv4 src/dst, TCP and
+UDP ports src/dst) for a number of tracked sources and measures the
+time to convert the keys, aggregate the counters, compute the entropies
+and check the deviations.
+
+Usage::
+
+    python -m ryu.tests.benchmark.entropy_window [--sources 1000000] \\
+        [--windows 10]
+"""
+
+from __future__ import print_function
+
+import argparse
+import time
+
+import numpy as np
+
+from ryu.lib import entropy_detector
+
+
+def _records(table_id, keys, counts, key_len):
+    records = np.zeros(len(keys), dtype=entropy_detector.STATE_STATS_DTYPE)
+    records['table_id'] = table_id
+    records['key_count'] = key_len
+    if key_len == 4:
+        records['key'][:, :4] = keys.astype('>u4').view('u1').reshape(-1, 4)
+    else:
+        records['key'][:, :2] = keys.astype('<u2').view('u1').reshape(-1, 2)
+    records['state'] = counts
+    return records.tobytes()
+
+
+def run(sources, windows):
+    rand = np.random.RandomState(0)
+    # distinct addresses spread over the IPv4 space
+    ips = (np.arange(sources, dtype=np.uint64) * 2654435761 %
+           2 ** 32).astype(np.uint32)
+    ports = np.arange(2 ** 16, dtype=np.uint16)
+    tables = []
+    for table_id in range(6):
+        if table_id < 2:
+            keys, key_len = ips, 4
+        else:
+            keys, key_len = ports, 2
+        counts = rand.poisson(10, len(keys)) + 1
+        tables.append(_records(table_id, keys, counts, key_len))
+
+    features = {0: ('ipv4_src',), 1: ('ipv4_dst',),
+                2: ('port_src', 'tcp_port_src'),
+                3: ('port_dst', 'tcp_port_dst'),
+                4: ('port_src', 'udp_port_src'),
+                5: ('port_dst', 'udp_port_dst')}
+    detector = entropy_detector.EntropyDetector()
+    elapsed = []
+    for _ in range(windows):
+        start = time.time()
+        for table_id, buf in enumerate(tables):
+            records = entropy_detector.parse_state_stats(buf)
+            if table_id < 2:
+                keys = entropy_detector.ipv4_keys(records)
+            else:
+                keys = entropy_detector.port_keys(records)
+            for feature in features[table_id]:
+                detector.add(feature, keys, records['state'])
+        detector.end_window()
+        for feature in ('ipv4_src', 'ipv4_dst', 'port_dst'):
+            detector.deviation(feature)
+        elapsed.append(time.time() - start)
+
+    print('sources: %d, windows: %d' % (sources, windows))
+    print('per window: min %.1f ms, mean %.1f ms' %
+          (min(elapsed) * 1000, sum(elapsed) / len(elapsed) * 1000))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--sources', type=int, default=1000000)
+    parser.add_argument('--windows', type=int, default=10)
+    args = parser.parse_args()
+    run(args.sources, args.windows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,439 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Emulated OpenFlow 1.3 + BEBA switches and ryu-manager processes for the
+controller benchmarks.
+
+A FakeSwitch connects to the controller over TCP, answers the
+handshake, echo, barrier and multipart requests, including the BEBA
+state statistics requests which get the entries of a synthetic state
+table, and counts all the messages of the controller.  It sends
+packet-ins, port-status and BEBA state-changed notifications on demand
+or at given rates.
+
+The BEBA state-changed notification (OFPT_EXP_STATE_CHANGED) has the
+layout of the BEBA switch: table_id, old_state, new_state, state_mask,
+key_len and a MAX_KEY_LEN bytes key after the experimenter header.
+"""
+
+import collections
+import os
+import random
+import socket
+import struct
+import subprocess
+import sys
+import time
+
+from ryu.lib import hub
+hub.patch()
+
+from ryu.ofproto import beba_v1_0 as bebaproto
+from ryu.ofproto import ofproto_v1_3
+from ryu.ofproto import ofproto_v1_3_parser
+
+
+MSG_NAMES = dict((value, name[len('OFPT_'):])
+                 for name, value in vars(ofproto_v1_3).items()
+                 if name.startswith('OFPT_'))
+
+_HEADER = struct.Struct(ofproto_v1_3.OFP_HEADER_PACK_STR)
+_PACKET_OUT = struct.Struct(ofproto_v1_3.OFP_PACKET_OUT_PACK_STR)
+_EXPERIMENTER = struct.Struct(ofproto_v1_3.OFP_EXPERIMENTER_HEADER_PACK_STR)
+_MULTIPART = struct.Struct(ofproto_v1_3.OFP_MULTIPART_REQUEST_PACK_STR)
+_MULTIPART_REPLY = struct.Struct(ofproto_v1_3.OFP_MULTIPART_REPLY_PACK_STR)
+_STATE_CHANGED = struct.Struct('!IIIII%ds' % bebaproto.MAX_KEY_LEN)
+_STATE_STATS = struct.Struct(
+    bebaproto.OFP_STATE_STATS_0_PACK_STR +
+    '%dI' % bebaproto.MAX_FIELD_COUNT +
+    'I%dsI' % bebaproto.MAX_KEY_LEN +
+    '%dI' % bebaproto.MAX_FLOW_DATA_VAR_NUM +
+    bebaproto.OFP_STATE_STATS_1_PACK_STR[1:])
+assert _STATE_STATS.size == bebaproto.OFP_STATE_STATS_SIZE
+
+_MAX_MSG_LEN = 0xffff
+_STATE_STATS_PER_REPLY = (
+    (_MAX_MSG_LEN - _HEADER.size - _MULTIPART_REPLY.size -
+     _EXPERIMENTER.size) // _STATE_STATS.size)
+
+
+def message(msg_type, xid, body):
+    return _HEADER.pack(ofproto_v1_3.OFP_VERSION, msg_type,
+                        _HEADER.size + len(body), xid) + body
+
+
+def packet_in(data, in_port, xid=0):
+    """Returns an unbuffered OFPT_PACKET_IN of ``data``."""
+    match = bytearray()
+    ofproto_v1_3_parser.OFPMatch(in_port=in_port).serialize(match, 0)
+    body = struct.pack(ofproto_v1_3.OFP_PACKET_IN_PACK_STR,
+                       ofproto_v1_3.OFP_NO_BUFFER, len(data),
+                       ofproto_v1_3.OFPR_NO_MATCH, 0, 0)
+    return message(ofproto_v1_3.OFPT_PACKET_IN, xid,
+                   body + bytes(match) + b'\0\0' + data)
+
+
+def state_changed(table_id, old_state, new_state, key, xid=0):
+    """Returns a BEBA OFPT_EXP_STATE_CHANGED notification."""
+    body = _EXPERIMENTER.pack(bebaproto.BEBA_EXPERIMENTER_ID,
+                              bebaproto.OFPT_EXP_STATE_CHANGED)
+    body += _STATE_CHANGED.pack(table_id, old_state, new_state, 0xffffffff,
+                                len(key), key)
+    return message(ofproto_v1_3.OFPT_EXPERIMENTER, xid, body)
+
+
+def state_table(n_entries, table_id=0, n_states=4, seed=0):
+    """
+    Returns the body of the OFPMP_EXP_STATE_STATS replies of a
+    synthetic state table of ``n_entries`` entries keyed by IPv4 source
+    addresses, with random states in [0, n_states).
+    """
+    rand = random.Random(seed)
+    fields = ((ofproto_v1_3.OXM_OF_IPV4_SRC, ) +
+              (0, ) * (bebaproto.MAX_FIELD_COUNT - 1))
+    flow_data_var = (0, ) * bebaproto.MAX_FLOW_DATA_VAR_NUM
+    entries = []
+    for i in range(n_entries):
+        key = struct.pack('!I', 0x0a000000 + i)
+        entries.append(_STATE_STATS.pack(*(
+            (_STATE_STATS.size, table_id, rand.randint(0, 3600), 0, 1) +
+            fields + (len(key), key, rand.randrange(n_states)) +
+            flow_data_var + (0, 0, 0, 0))))
+    return b''.join(entries)
+
+
+def percentile(values, q):
+    """Returns the ``q`` quantile of the sorted ``values``."""
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+class FakeSwitch(object):
+    """
+    OpenFlow 1.3 + BEBA switch which answers the handshake, echo,
+    barrier and multipart requests, counts the messages of the
+    controller and sends packet-ins and notifications.
+
+    ``state_table`` is the body of the BEBA state statistics replies,
+    as returned by ``state_table()``.  The latency of the packet-outs
+    is measured from the packet-in of the same data, the latency of the
+    echo replies from the echo requests sent by ``echo()``.
+    """
+
+    def __init__(self, dpid, n_ports, state_table=b''):
+        self.dpid = dpid
+        self.n_ports = n_ports
+        self.state_table = state_table
+        self.counters = collections.Counter()
+        self.sent = collections.Counter()
+        self.latencies = []
+        self.echo_latencies = []
+        self.last_rx = None
+        self.connected = None
+        self.ready = hub.Event()
+        self._sock = None
+        self._thread = None
+        self._pending = collections.defaultdict(collections.deque)
+        self._echoes = {}
+        self._xid = 0
+        self._ports_down = set()
+
+    def connect(self, address, timeout, alive=lambda: True, interval=0.1):
+        """
+        Connects to the controller, retrying every ``interval`` seconds,
+        and waits for the end of the handshake, i.e. the port
+        description request.
+        """
+        deadline = time.time() + timeout
+        while True:
+            try:
+                self._sock = socket.create_connection(address)
+                break
+            except socket.error:
+                if time.time() > deadline or not alive():
+                    raise
+                hub.sleep(interval)
+        self.connected = time.time()
+        self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._thread = hub.spawn(self._serve)
+        self._send(ofproto_v1_3.OFPT_HELLO, 0, b'')
+        if not self.ready.wait(max(0, deadline - time.time())):
+            raise RuntimeError('handshake timed out')
+
+    def close(self):
+        if self._thread is not None:
+            hub.kill(self._thread)
+            hub.joinall([self._thread])
+            self._thread = None
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+    def reset_counters(self):
+        counters = self.counters
+        self.counters = collections.Counter()
+        self.sent = collections.Counter()
+        self.latencies = []
+        self.echo_latencies = []
+        self._pending.clear()
+        self._echoes.clear()
+        return counters
+
+    def _next_xid(self):
+        self._xid = (self._xid + 1) & 0xffffffff
+        return self._xid
+
+    def _send(self, msg_type, xid, body):
+        self._sock.sendall(message(msg_type, xid, body))
+
+    def _port(self, port_no):
+        state = (ofproto_v1_3.OFPPS_LINK_DOWN
+                 if port_no in self._ports_down else 0)
+        return (port_no, struct.pack('!HI', 0x0200, port_no),
+                ('eth%d' % port_no).encode('ascii'), 0, state,
+                ofproto_v1_3.OFPPF_1GB_FD, 0, 0, 0, 1000000, 1000000)
+
+    def _features_reply(self, xid):
+        self._send(ofproto_v1_3.OFPT_FEATURES_REPLY, xid, struct.pack(
+            ofproto_v1_3.OFP_SWITCH_FEATURES_PACK_STR, self.dpid, 0, 64, 0,
+            ofproto_v1_3.OFPC_FLOW_STATS | ofproto_v1_3.OFPC_PORT_STATS, 0))
+
+    def _multipart_reply(self, xid, mp_type, body, flags=0):
+        self._send(ofproto_v1_3.OFPT_MULTIPART_REPLY, xid,
+                   _MULTIPART_REPLY.pack(mp_type, flags) + body)
+
+    def _port_desc_reply(self, xid):
+        ports = b''.join(
+            struct.pack(ofproto_v1_3.OFP_PORT_PACK_STR, *self._port(port_no))
+            for port_no in range(1, self.n_ports + 1))
+        self._multipart_reply(xid, ofproto_v1_3.OFPMP_PORT_DESC, ports)
+        self.ready.set()
+
+    def _desc_reply(self, xid):
+        self._multipart_reply(xid, ofproto_v1_3.OFPMP_DESC, struct.pack(
+            ofproto_v1_3.OFP_DESC_PACK_STR, b'Ryu', b'FakeSwitch', b'1.0',
+            ('%d' % self.dpid).encode('ascii'),
+            b'fake'))
+
+    def _beba_stats_reply(self, xid, exp_type):
+        header = _EXPERIMENTER.pack(bebaproto.BEBA_EXPERIMENTER_ID, exp_type)
+        if exp_type == bebaproto.OFPMP_EXP_GLOBAL_STATE_STATS:
+            self._multipart_reply(xid, ofproto_v1_3.OFPMP_EXPERIMENTER,
+                                  header + struct.pack('!4xI', 0))
+            return
+        # OFPMP_EXP_STATE_STATS(_AND_DELETE), the table is not emptied
+        chunk = _STATE_STATS_PER_REPLY * _STATE_STATS.size
+        table = self.state_table
+        offset = 0
+        while True:
+            body = table[offset:offset + chunk]
+            offset += chunk
+            more = offset < len(table)
+            self._multipart_reply(
+                xid, ofproto_v1_3.OFPMP_EXPERIMENTER, header + body,
+                ofproto_v1_3.OFPMPF_REPLY_MORE if more else 0)
+            if not more:
+                break
+
+    def _multipart_request(self, xid, msg):
+        (mp_type, _flags) = _MULTIPART.unpack_from(msg, _HEADER.size)
+        if mp_type == ofproto_v1_3.OFPMP_EXPERIMENTER:
+            experimenter, exp_type = _EXPERIMENTER.unpack_from(
+                msg, _HEADER.size + _MULTIPART.size)
+            if experimenter == bebaproto.BEBA_EXPERIMENTER_ID:
+                self._beba_stats_reply(xid, exp_type)
+            return 'MULTIPART_REQUEST(EXPERIMENTER(0x%08x, %d))' % (
+                experimenter, exp_type)
+        if mp_type == ofproto_v1_3.OFPMP_PORT_DESC:
+            self._port_desc_reply(xid)
+        elif mp_type == ofproto_v1_3.OFPMP_DESC:
+            self._desc_reply(xid)
+        else:
+            # no flow, group, meter, ... and no statistics
+            self._multipart_reply(xid, mp_type, b'')
+        return 'MULTIPART_REQUEST(%d)' % mp_type
+
+    def _handle(self, msg_type, xid, msg, now):
+        name = MSG_NAMES.get(msg_type, str(msg_type))
+        if msg_type == ofproto_v1_3.OFPT_EXPERIMENTER:
+            experimenter, exp_type = _EXPERIMENTER.unpack_from(
+                msg, _HEADER.size)
+            name = 'EXPERIMENTER(0x%08x, %d)' % (experimenter, exp_type)
+        elif msg_type == ofproto_v1_3.OFPT_MULTIPART_REQUEST:
+            name = self._multipart_request(xid, msg)
+        elif msg_type == ofproto_v1_3.OFPT_FEATURES_REQUEST:
+            self._features_reply(xid)
+        elif msg_type == ofproto_v1_3.OFPT_ECHO_REQUEST:
+            self._send(ofproto_v1_3.OFPT_ECHO_REPLY, xid,
+                       msg[_HEADER.size:])
+        elif msg_type == ofproto_v1_3.OFPT_ECHO_REPLY:
+            sent = self._echoes.pop(xid, None)
+            if sent is not None:
+                self.echo_latencies.append(now - sent)
+        elif msg_type == ofproto_v1_3.OFPT_BARRIER_REQUEST:
+            self._send(ofproto_v1_3.OFPT_BARRIER_REPLY, xid, b'')
+        elif msg_type == ofproto_v1_3.OFPT_PACKET_OUT:
+            (_buffer_id, _in_port,
+             actions_len) = _PACKET_OUT.unpack_from(msg, _HEADER.size)
+            data = msg[_HEADER.size + _PACKET_OUT.size + actions_len:]
+            sent = self._pending.get(data)
+            if sent:
+                self.latencies.append(now - sent.popleft())
+        self.counters[name] += 1
+        self.last_rx = now
+
+    def _serve(self):
+        buf = bytearray()
+        while True:
+            data = self._sock.recv(65536)
+            if not data:
+                break
+            now = time.time()
+            buf += data
+            offset = 0
+            while len(buf) - offset >= _HEADER.size:
+                (_version, msg_type, length,
+                 xid) = _HEADER.unpack_from(buf, offset)
+                if len(buf) - offset < length:
+                    break
+                self._handle(msg_type, xid, bytes(buf[offset:offset + length]),
+                             now)
+                offset += length
+            del buf[:offset]
+
+    def echo(self):
+        """Sends an echo request whose reply latency is recorded."""
+        xid = self._next_xid()
+        self._echoes[xid] = time.time()
+        self._send(ofproto_v1_3.OFPT_ECHO_REQUEST, xid, b'')
+        self.sent['ECHO_REQUEST'] += 1
+
+    def port_status(self, port_no):
+        """
+        Toggles the link state of ``port_no`` and sends the
+        OFPPR_MODIFY port status.
+        """
+        self._ports_down ^= set([port_no])
+        self._send(ofproto_v1_3.OFPT_PORT_STATUS, 0, struct.pack(
+            ofproto_v1_3.OFP_PORT_STATUS_PACK_STR, ofproto_v1_3.OFPPR_MODIFY,
+            *self._port(port_no)))
+        self.sent['PORT_STATUS'] += 1
+
+    def send_packet_ins(self, pkts):
+        """Sends the (data, packet-in message) pairs ``pkts``."""
+        now = time.time()
+        for data, _msg in pkts:
+            self._pending[data].append(now)
+        self._sock.sendall(b''.join(msg for _data, msg in pkts))
+        self.sent['PACKET_IN'] += len(pkts)
+
+    def send_state_changes(self, count, table_id=0, n_keys=1024, n_states=4):
+        """
+        Sends ``count`` state-changed notifications of random IPv4
+        source keys.
+        """
+        msgs = []
+        for _ in range(count):
+            key = struct.pack('!I', 0x0a000000 + random.randrange(n_keys))
+            old_state = random.randrange(n_states)
+            msgs.append(state_changed(table_id, old_state,
+                                      (old_state + 1) % n_states, key))
+        self._sock.sendall(b''.join(msgs))
+        self.sent['EXPERIMENTER(STATE_CHANGED)'] += count
+
+    def replay(self, pkts, in_port, count, rate):
+        """
+        Sends ``count`` packet-ins of ``pkts``, cycling through them, at
+        ``rate`` per second (as fast as possible if 0).
+        Returns the duration.
+        """
+        msgs = [(data, packet_in(data, in_port, xid))
+                for xid, data in enumerate(pkts)]
+        # about one burst per millisecond
+        burst = max(1, int(rate / 1000)) if rate else 64
+        start = time.time()
+        sent = 0
+        while sent < count:
+            chunk = [msgs[i % len(msgs)]
+                     for i in range(sent, min(count, sent + burst))]
+            self.send_packet_ins(chunk)
+            sent += len(chunk)
+            delay = start + sent / float(rate) - time.time() if rate else 0
+            hub.sleep(max(0, delay))
+        return time.time() - start
+
+    def drain(self, idle, timeout):
+        """
+        Waits until no message was received for ``idle`` seconds, from
+        now on.
+        """
+        start = time.time()
+        while time.time() - start < timeout:
+            last = max(start, self.last_rx or 0)
+            if time.time() - last >= idle:
+                break
+            hub.sleep(idle / 4.0)
+
+
+def free_port():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.bind(('127.0.0.1', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+def start_controller(apps, log=None, extra_args=()):
+    """
+    Runs ryu-manager with ``apps`` on a free local OpenFlow port.
+    Returns the process and the port.
+    """
+    port = free_port()
+    cmd = [sys.executable, '-m', 'ryu.cmd.manager',
+           '--ofp-listen-host', '127.0.0.1',
+           '--ofp-tcp-listen-port', str(port),
+           '--wsapi-host', '127.0.0.1', '--wsapi-port', str(free_port())]
+    cmd.extend(extra_args)
+    cmd.extend(apps)
+    with open(log or os.devnull, 'ab') as f:
+        proc = subprocess.Popen(cmd, stdout=f, stderr=subprocess.STDOUT)
+    return proc, port
+
+
+def stop_controller(proc):
+    if proc.poll() is None:
+        proc.terminate()
+    proc.wait()
+
+
+def cpu_time(pid):
+    """Returns the user and system CPU seconds of the process ``pid``."""
+    try:
+        with open('/proc/%d/stat' % pid) as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+    except IOError:
+        return None
+    ticks = float(os.sysconf('SC_CLK_TCK'))
+    return int(fields[11]) / ticks, int(fields[12]) / ticks
+
+
+def rss(pid):
+    """Returns the resident memory of the process ``pid`` in bytes."""
+    try:
+        with open('/proc/%d/status' % pid) as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except IOError:
+        pass
+    return None
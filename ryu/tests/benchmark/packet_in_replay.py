@@ -0,0 +1,146 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Packet-in replay benchmark of Ryu applications.
+
+Each application is run by ryu-manager in a child process listening on
+a local port.  A fake OpenFlow 1.3 switch connects to it, completes the
+OFPHandler handshake (features and port description), lets the
+application configure it, then replays the packets of a pcap file as
+packet-ins at the given rate.  All the messages of the controller are
+recorded.
+
+For each application the report gives:
+
+- the packet-in and response throughput,
+- the latency percentiles of the packet-outs, matched with their
+  packet-in by their data (applications which do not send the packet
+  back have no latency),
+- the messages sent by the controller, experimenter messages by
+  experimenter ID and type, during the setup and during the replay,
+- the CPU time of the controller process during the replay (read
+  from /proc, Linux only).
+
+Usage::
+
+    python -m ryu.tests.benchmark.packet_in_replay \\
+        [--pcap ryu/app/beba/ddos_use_case/Databases/test.pcap] \\
+        [--count 10000] [--rate 5000] [--in-port 1] \\
+        ryu.app.beba.maclearning ryu.app.simple_switch_13 \\
+        ryu.app.rest_router+ryu.app.ofctl_rest
+
+Applications joined with '+' are run together.
+"""
+
+from __future__ import print_function
+
+import argparse
+import os
+import socket
+import time
+
+import ryu
+from ryu.lib import pcaplib
+from ryu.tests.benchmark import of_harness
+
+
+_DEFAULT_PCAP = os.path.join(os.path.dirname(ryu.__file__), 'app', 'beba',
+                             'ddos_use_case', 'Databases', 'test.pcap')
+
+
+def _print_counters(title, counters):
+    print('  %s:' % title)
+    for name, count in sorted(counters.items()):
+        print('    %-34s %8d' % (name, count))
+
+
+def run(app, args, pkts):
+    proc, port = of_harness.start_controller(app.split('+'), args.log)
+    switch = of_harness.FakeSwitch(args.dpid, args.ports)
+    try:
+        switch.connect(('127.0.0.1', port), args.timeout,
+                       alive=lambda: proc.poll() is None)
+        switch.drain(args.settle, args.timeout)
+        setup = switch.reset_counters()
+
+        cpu_start = of_harness.cpu_time(proc.pid)
+        start = time.time()
+        duration = switch.replay(pkts, args.in_port, args.count, args.rate)
+        switch.drain(args.settle, args.timeout)
+        cpu_end = of_harness.cpu_time(proc.pid)
+    except (socket.error, RuntimeError) as e:
+        print('%s\n  failed: %s (ryu-manager %s)' % (
+            app, e, 'exited with status %s' % proc.poll()
+            if proc.poll() is not None else 'running'))
+        return
+    finally:
+        switch.close()
+        of_harness.stop_controller(proc)
+
+    counters = switch.counters
+    responses = sum(counters.values())
+    elapsed = max(duration, (switch.last_rx or start) - start)
+    print('%s' % app)
+    print('  packet-ins  %8d in %6.2f s  %10.0f /s' % (
+        args.count, duration, args.count / duration))
+    print('  responses   %8d in %6.2f s  %10.0f /s' % (
+        responses, elapsed, responses / elapsed))
+    latencies = sorted(switch.latencies)
+    if latencies:
+        print('  packet-out latency (ms, %d matched): p50 %.3f  p90 %.3f  '
+              'p99 %.3f  max %.3f' % ((len(latencies), ) + tuple(
+                  of_harness.percentile(latencies, q) * 1000
+                  for q in (0.5, 0.9, 0.99, 1))))
+    else:
+        print('  packet-out latency: no packet-out matched a packet-in')
+    if cpu_start is not None and cpu_end is not None:
+        user = cpu_end[0] - cpu_start[0]
+        system = cpu_end[1] - cpu_start[1]
+        print('  controller CPU: %.2f s user, %.2f s system, '
+              '%.0f us per packet-in' % (user, system,
+                                         1e6 * (user + system) / args.count))
+    _print_counters('setup messages', setup)
+    _print_counters('replay messages', counters)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('apps', nargs='+',
+                        help="applications, '+' joins applications run "
+                        "together")
+    parser.add_argument('--pcap', default=_DEFAULT_PCAP)
+    parser.add_argument('--count', type=int, default=10000,
+                        help='packet-ins to send, cycling through the pcap')
+    parser.add_argument('--rate', type=float, default=0,
+                        help='packet-ins per second (0: as fast as possible)')
+    parser.add_argument('--in-port', type=int, default=1)
+    parser.add_argument('--ports', type=int, default=4,
+                        help='ports of the fake switch')
+    parser.add_argument('--dpid', type=int, default=1)
+    parser.add_argument('--settle', type=float, default=0.5,
+                        help='seconds without message ending the setup and '
+                        'the replay')
+    parser.add_argument('--timeout', type=float, default=30)
+    parser.add_argument('--log', help='file of the ryu-manager output')
+    args = parser.parse_args()
+
+    pkts = [data for _ts, data in pcaplib.Reader(open(args.pcap, 'rb'))]
+    print('pcap: %s (%d packets), rate: %s' % (
+        args.pcap, len(pkts), args.rate or 'unlimited'))
+    for app in args.apps:
+        run(app, args, pkts)
+
+
+if __name__ == '__main__':
+    main()
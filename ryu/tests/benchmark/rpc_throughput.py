@@ -0,0 +1,95 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Throughput benchmark of ryu.lib.rpc.
+
+Serves an echo method with an EndPoint over a socketpair and measures
+the calls per second of synchronous calls and of pipelined batch calls
+with several in-flight windows.
+
+Usage::
+
+    python -m ryu.tests.benchmark.rpc_throughput [--calls 20000] \\
+        [--size 64] [--windows 1,16,256,0]
+"""
+
+from __future__ import print_function
+
+import argparse
+import socket
+import time
+
+from ryu.lib import hub
+hub.patch()
+
+from ryu.lib import rpc
+
+
+def _serve(sock):
+    endpoint = None
+
+    def _handle_request(m):
+        msgid, _method, params = m
+        endpoint.send_response(msgid, result=params[0])
+
+    sock.setblocking(0)
+    endpoint = rpc.EndPoint(sock, disp_table={
+        rpc.MessageType.REQUEST: _handle_request})
+    endpoint.serve()
+
+
+def _measure(label, calls, func):
+    start = time.time()
+    func()
+    elapsed = time.time() - start
+    print('%-24s %8.0f calls/s' % (label, calls / elapsed))
+
+
+def run(calls, size, windows):
+    server_sock, client_sock = socket.socketpair()
+    server = hub.spawn(_serve, server_sock)
+    client = rpc.Client(client_sock)
+    payload = b'x' * size
+    batch = [(b'echo', [payload])] * calls
+
+    def _call():
+        for method, params in batch:
+            client.call(method, params)
+
+    print('calls: %d, payload: %d bytes' % (calls, size))
+    _measure('call', calls, _call)
+    for window in windows:
+        label = 'call_many window=%s' % (window or 'inf')
+        _measure(label, calls,
+                 lambda: client.call_many(batch, window=window or None))
+
+    client_sock.close()
+    hub.joinall([server])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--calls', type=int, default=20000)
+    parser.add_argument('--size', type=int, default=64,
+                        help='payload size in bytes')
+    parser.add_argument('--windows', default='1,16,256,0',
+                        help='comma separated in-flight windows '
+                        '(0: unlimited)')
+    args = parser.parse_args()
+    run(args.calls, args.size,
+        [int(w) for w in args.windows.split(',')])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,180 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Startup time benchmark of ryu-manager.
+
+Measures how long a restarted controller, e.g. after a failover, takes
+to serve its switches.  Each run starts ryu-manager with the
+applications in a child process, and an emulated OpenFlow 1.3 + BEBA
+switch (see of_harness.FakeSwitch) connects to it as soon as it
+listens, retrying every millisecond.
+
+The report gives the percentiles over the runs of:
+
+- listen: time from the start of ryu-manager to the TCP connection of
+  the switch,
+- handshake: time from the start of ryu-manager to the end of the
+  OpenFlow handshake, i.e. the port description request,
+- the CPU time and resident memory of the controller at the end of the
+  handshake (Linux only),
+
+and the import time of ryu.cmd.manager in a fresh interpreter, with
+the OpenFlow parsers it imports.  There should be none, the parser of
+a version is imported when a datapath first uses it.
+
+The ``--warmup`` first runs are not counted, as they may compile the
+bytecode.  ``--json`` also writes the results to a file for CI.
+
+Usage::
+
+    python -m ryu.tests.benchmark.startup \\
+        [--runs 10] [--warmup 1] ryu.app.simple_switch_13
+"""
+
+from __future__ import print_function
+
+import argparse
+import json
+import socket
+import subprocess
+import sys
+import time
+
+from ryu.tests.benchmark import of_harness
+
+
+# run by a fresh interpreter: prints the import time of ryu.cmd.manager
+# and the OpenFlow parsers it imported
+_IMPORT_SCRIPT = '''
+import re
+import sys
+import time
+start = time.time()
+import ryu.cmd.manager
+print(time.time() - start)
+print(' '.join(sorted(name for name in sys.modules
+                      if re.match(r'ryu\\.ofproto\\.\\w+_v\\d_\\d_parser$',
+                                  name))))
+'''
+
+
+def import_time():
+    """
+    Returns the seconds to import ryu.cmd.manager in a fresh interpreter
+    and the OpenFlow parser modules it imported.
+    """
+    out = subprocess.check_output([sys.executable, '-c', _IMPORT_SCRIPT])
+    lines = out.decode('ascii').splitlines()
+    return float(lines[-2]), lines[-1].split()
+
+
+def run_once(args):
+    """
+    Starts ryu-manager and connects a switch.  Returns the timings of
+    the run, seconds from the start of ryu-manager.
+    """
+    start = time.time()
+    proc, port = of_harness.start_controller(args.apps, args.log)
+    switch = of_harness.FakeSwitch(args.dpid, args.ports)
+    try:
+        switch.connect(('127.0.0.1', port), args.timeout,
+                       lambda: proc.poll() is None, interval=0.001)
+        result = {'listen': switch.connected - start,
+                  'handshake': time.time() - start}
+        cpu = of_harness.cpu_time(proc.pid)
+        if cpu is not None:
+            result['cpu'] = cpu[0] + cpu[1]
+        rss = of_harness.rss(proc.pid)
+        if rss is not None:
+            result['rss'] = rss
+    finally:
+        switch.close()
+        of_harness.stop_controller(proc)
+    return result
+
+
+def _percentiles(values):
+    values = sorted(values)
+    if not values:
+        return None
+    return dict(('p%d' % round(q * 100), of_harness.percentile(values, q))
+                for q in (0, 0.5, 0.9, 1))
+
+
+def run(args):
+    results = {'apps': args.apps, 'runs': []}
+    seconds, parsers = import_time()
+    results['import'] = {'seconds': seconds, 'parsers': parsers}
+    for i in range(args.warmup + args.runs):
+        try:
+            result = run_once(args)
+        except (socket.error, RuntimeError) as e:
+            results['error'] = str(e)
+            break
+        if i >= args.warmup:
+            results['runs'].append(result)
+    for key in ('listen', 'handshake', 'cpu', 'rss'):
+        values = [result[key] for result in results['runs']
+                  if key in result]
+        results[key] = _percentiles(values)
+    return results
+
+
+def report(results):
+    print('%s, %d runs' % ('+'.join(results['apps']), len(results['runs'])))
+    if 'error' in results:
+        print('  failed: %s' % results['error'])
+    imports = results['import']
+    print('  import ryu.cmd.manager: %.1f ms, parsers: %s' % (
+        imports['seconds'] * 1000, ' '.join(imports['parsers']) or 'none'))
+    for key, title, scale, unit in (
+            ('listen', 'listen', 1000, 'ms'),
+            ('handshake', 'handshake', 1000, 'ms'),
+            ('cpu', 'CPU at handshake', 1000, 'ms'),
+            ('rss', 'RSS at handshake', 1 / 1048576.0, 'MiB')):
+        values = results[key]
+        if values is None:
+            continue
+        print('  %s (%s): min %.1f  p50 %.1f  p90 %.1f  max %.1f' % (
+            title, unit, values['p0'] * scale, values['p50'] * scale,
+            values['p90'] * scale, values['p100'] * scale))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('apps', nargs='*',
+                        default=['ryu.controller.ofp_handler'],
+                        help='applications, run together '
+                        '(default: ryu.controller.ofp_handler)')
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--warmup', type=int, default=1,
+                        help='first runs which are not counted')
+    parser.add_argument('--ports', type=int, default=4,
+                        help='ports of the switch')
+    parser.add_argument('--dpid', type=int, default=1,
+                        help='datapath ID of the switch')
+    parser.add_argument('--timeout', type=float, default=60)
+    parser.add_argument('--log', help='file of the ryu-manager output')
+    parser.add_argument('--json', help='file of the results')
+    args = parser.parse_args()
+
+    results = run(args)
+    report(results)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
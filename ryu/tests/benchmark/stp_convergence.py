@@ -0,0 +1,238 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Convergence simulation of stplib.
+
+Bridges are connected in a ring and each of them has a number of edge
+ports.  BPDUs are delivered between dummy datapaths in-process and the
+port timers run on a virtual clock, so the simulation finishes as fast
+as the CPU allows.  The initial convergence and the convergence after
+a ring link flap are reported in simulated seconds, along with how many
+ports left the FORWARD state.
+
+Usage::
+
+    python -m ryu.tests.benchmark.stp_convergence [--bridges 8] \\
+        [--edge-ports 100] [--full]
+
+With ``--full`` every role change restarts all the ports of the bridge,
+which mimics the former full re-calculation for comparison.
+"""
+
+from __future__ import print_function
+
+import argparse
+import collections
+import logging
+import resource
+
+from ryu.lib import stplib
+from ryu.lib import timer
+from ryu.ofproto import ofproto_v1_3
+from ryu.ofproto import ofproto_v1_3_parser
+
+
+class _Clock(object):
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class _OFPort(object):
+    def __init__(self, dpid, port_no):
+        self.port_no = port_no
+        self.hw_addr = '02:00:00:%02x:%02x:%02x' % (
+            dpid & 0xff, port_no >> 8, port_no & 0xff)
+        self.curr = ofproto_v1_3.OFPPF_1GB_FD
+        self.advertised = 0
+        self.state = 0
+
+
+class _Field(object):
+    def __init__(self, header, value):
+        self.header = header
+        self.value = value
+
+
+class _Match(object):
+    def __init__(self, in_port):
+        self.fields = [_Field(ofproto_v1_3.OXM_OF_IN_PORT, in_port)]
+
+
+class _PacketIn(object):
+    def __init__(self, datapath, in_port, data):
+        self.datapath = datapath
+        self.match = _Match(in_port)
+        self.data = data
+
+
+class _Datapath(object):
+    ofproto = ofproto_v1_3
+    ofproto_parser = ofproto_v1_3_parser
+
+    def __init__(self, sim, dpid, nports):
+        self.sim = sim
+        self.id = dpid
+        self.ports = dict((no, _OFPort(dpid, no))
+                          for no in range(1, nports + 1))
+
+    def send_msg(self, msg):
+        self.sim.msg_count[msg.__class__.__name__] += 1
+
+    def send_packet_out(self, buffer_id, in_port, actions, data):
+        self.sim.msg_count['OFPPacketOut'] += 1
+        peer = self.sim.links.get((self.id, actions[0].port))
+        if peer is not None:
+            self.sim.pending.append((peer, data))
+
+
+class _FullBridge(stplib.Bridge):
+    """ Restart every port on each re-calculation (former behaviour). """
+
+    def _recalculate_port(self, port):
+        self.recalculate_spanning_tree(init=False)
+
+    def _apply_port_roles(self, port_roles):
+        for port in self.ports.values():
+            if port.state is not stplib.PORT_STATE_DISABLE:
+                port.down(stplib.PORT_STATE_BLOCK)
+        for port_no, role in port_roles.items():
+            port = self.ports[port_no]
+            if port.state is not stplib.PORT_STATE_DISABLE:
+                port.up(role, self.root_priority, self.root_times)
+
+
+class Simulation(object):
+    def __init__(self, nbridges, nedges, full=False):
+        self.clock = _Clock()
+        self.scheduler = timer.TimerScheduler(clock=self.clock)
+        self.pending = collections.deque()
+        self.links = {}
+        self.msg_count = collections.Counter()
+        self.last_change = 0.0
+        self.changes = 0
+        self.left_forward = set()
+        self.port_state = {}
+
+        logger = logging.getLogger('stp_convergence')
+        logger.setLevel(logging.WARNING)
+        bridge_cls = _FullBridge if full else stplib.Bridge
+
+        # ring ports are 1 (to the next bridge) and 2 (to the previous).
+        self.dps = [_Datapath(self, dpid, nedges + 2)
+                    for dpid in range(1, nbridges + 1)]
+        for i, dp in enumerate(self.dps):
+            peer = self.dps[(i + 1) % nbridges]
+            self.links[(dp.id, 1)] = (peer.id, 2)
+            self.links[(peer.id, 2)] = (dp.id, 1)
+
+        self.bridges = {}
+        for dp in self.dps:
+            self.bridges[dp.id] = bridge_cls(dp, logger, {},
+                                             self._send_event,
+                                             self.scheduler)
+
+    def _send_event(self, ev):
+        if not isinstance(ev, stplib.EventPortStateChange):
+            return
+        key = (ev.dp.id, ev.port_no)
+        if self.port_state.get(key) is stplib.PORT_STATE_FORWARD:
+            self.left_forward.add(key)
+        self.port_state[key] = ev.port_state
+        self.last_change = self.clock.now
+        self.changes += 1
+
+    def _deliver(self):
+        while self.pending:
+            (dpid, port_no), data = self.pending.popleft()
+            bridge = self.bridges[dpid]
+            bridge.packet_in_handler(_PacketIn(bridge.dp, port_no, data))
+
+    def run(self, duration):
+        end = self.clock.now + duration
+        while True:
+            self._deliver()
+            deadline = self.scheduler.next_deadline()
+            if deadline is None or deadline > end:
+                break
+            self.clock.now = max(self.clock.now, deadline)
+            self.scheduler.run_pending()
+        self.clock.now = end
+
+    def link_down(self, dpid, port_no):
+        peer = self.links.pop((dpid, port_no))
+        self.links.pop(peer)
+        self._link_event(dpid, port_no, peer, 'link_down')
+        return peer
+
+    def link_up(self, dpid, port_no, peer):
+        self.links[(dpid, port_no)] = peer
+        self.links[peer] = (dpid, port_no)
+        self._link_event(dpid, port_no, peer, 'link_up')
+
+    def _link_event(self, dpid, port_no, peer, name):
+        for d, p in ((dpid, port_no), peer):
+            getattr(self.bridges[d], name)(p)
+
+    def measure(self, name, func, duration):
+        start = self.clock.now
+        self.changes = 0
+        self.left_forward = set()
+        cpu_start = _cpu_time()
+        func()
+        self.run(duration)
+        cpu = _cpu_time() - cpu_start
+        forward = sum(1 for s in self.port_state.values()
+                      if s is stplib.PORT_STATE_FORWARD)
+        print('%-12s converged in %6.1f sec, %6d state changes, '
+              '%5d ports left FORWARD, %5d ports FORWARD, cpu %.2f sec' % (
+                  name, max(0, self.last_change - start), self.changes,
+                  len(self.left_forward), forward, cpu))
+
+
+def _cpu_time():
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--bridges', type=int, default=8)
+    parser.add_argument('--edge-ports', type=int, default=100)
+    parser.add_argument('--duration', type=float, default=120,
+                        help='simulated seconds for each phase')
+    parser.add_argument('--full', action='store_true',
+                        help='restart all ports on each re-calculation')
+    args = parser.parse_args()
+
+    sim = Simulation(args.bridges, args.edge_ports, args.full)
+    print('%d bridges, %d ports' % (
+        args.bridges, sum(len(dp.ports) for dp in sim.dps)))
+    sim.measure('initial', lambda: None, args.duration)
+
+    # fail a ring link of the root bridge, so that the blocked port
+    # somewhere in the ring has to take over.
+    dpid = sim.dps[0].id
+    peer = []
+    sim.measure('link down',
+                lambda: peer.append(sim.link_down(dpid, 1)), args.duration)
+    sim.measure('link up',
+                lambda: sim.link_up(dpid, 1, peer[0]), args.duration)
+    print('messages: %s' % dict(sim.msg_count))
+
+
+if __name__ == '__main__':
+    main()
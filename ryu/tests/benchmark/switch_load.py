@@ -0,0 +1,355 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Multi-switch load generator for controller scale testing.
+
+The applications are run together by ryu-manager in a child process
+listening on a local port.  Hundreds of emulated OpenFlow 1.3 + BEBA
+switches (see of_harness.FakeSwitch) connect to it over TCP, complete
+the handshake and answer the requests of the applications, the BEBA
+state statistics requests getting a synthetic state table.  Then each
+switch sends packet-ins, port-status and BEBA state-changed
+notifications at the given rates, and echo requests which probe the
+dispatch latency of the controller, for the given duration.
+
+The report gives:
+
+- the connection scaling: time to connect all the switches, handshake
+  latency percentiles,
+- the memory per datapath: resident memory growth of the controller
+  process from the first to the last connected switch (Linux only),
+- the load sent and the messages of the controller,
+- the echo and packet-out latency percentiles during the load,
+- the CPU time of the controller during the load (Linux only).
+
+``--json`` also writes the results to a file for CI.
+
+Usage::
+
+    python -m ryu.tests.benchmark.switch_load \\
+        [--switches 100] [--duration 10] [--packet-in-rate 10] \\
+        [--port-status-rate 0.1] [--state-change-rate 1] \\
+        [--state-entries 1000] ryu.app.simple_switch_13
+"""
+
+from __future__ import print_function
+
+import argparse
+import collections
+import json
+import random
+import socket
+import time
+
+from ryu.lib import hub
+from ryu.lib import pcaplib
+from ryu.lib.packet import ethernet
+from ryu.lib.packet import ipv4
+from ryu.lib.packet import packet
+from ryu.lib.packet import udp
+from ryu.tests.benchmark import of_harness
+
+
+# seconds between two bursts of the load of a switch
+_TICK = 0.01
+
+
+def synthetic_packets(n_flows):
+    """Returns ``n_flows`` UDP frames of distinct hosts."""
+    pkts = []
+    for i in range(n_flows):
+        pkt = packet.Packet()
+        pkt.add_protocol(ethernet.ethernet(
+            dst='02:00:00:00:%02x:%02x' % ((i + 1) >> 8 & 0xff,
+                                           (i + 1) & 0xff),
+            src='02:00:01:00:%02x:%02x' % (i >> 8 & 0xff, i & 0xff)))
+        pkt.add_protocol(ipv4.ipv4(
+            src='10.1.%d.%d' % (i >> 8 & 0xff, i & 0xff),
+            dst='10.2.%d.%d' % ((i + 1) >> 8 & 0xff, (i + 1) & 0xff),
+            proto=17))
+        pkt.add_protocol(udp.udp(src_port=1024 + i, dst_port=53))
+        pkt.serialize()
+        pkts.append(bytes(pkt.data) + b'\0' * 18)
+    return pkts
+
+
+def _latencies(values):
+    values = sorted(values)
+    if not values:
+        return None
+    return dict(('p%d' % round(q * 100),
+                 of_harness.percentile(values, q) * 1000)
+                for q in (0.5, 0.9, 0.99, 1))
+
+
+def _connect(switches, address, args, alive):
+    """
+    Connects ``switches``, ``args.concurrency`` at a time.
+    Returns the handshake durations and the errors.
+    """
+    durations = []
+    errors = collections.Counter()
+
+    def connect(switch):
+        start = time.time()
+        try:
+            switch.connect(address, args.timeout, alive)
+        except (socket.error, RuntimeError) as e:
+            errors[str(e)] += 1
+            return
+        durations.append(time.time() - start)
+
+    for i in range(0, len(switches), args.concurrency):
+        hub.joinall([hub.spawn(connect, switch)
+                     for switch in switches[i:i + args.concurrency]])
+    return durations, errors
+
+
+def _drain(switches, args):
+    hub.joinall([hub.spawn(switch.drain, args.settle, args.timeout)
+                 for switch in switches])
+
+
+def _load(switch, msgs, args, end):
+    ports = list(range(1, args.ports + 1))
+    # random phases, so that low rates add up over the switches
+    credits = [random.random() for _ in range(3)]
+    rates = (args.packet_in_rate, args.port_status_rate,
+             args.state_change_rate)
+    next_pkt = random.randrange(len(msgs))
+    next_probe = time.time() + random.uniform(0, args.probe_interval)
+    # spread the bursts of the switches over the tick
+    hub.sleep(random.uniform(0, _TICK))
+    last = time.time()
+    while last < end:
+        now = time.time()
+        for i, rate in enumerate(rates):
+            credits[i] += rate * (now - last)
+        last = now
+        count = int(credits[0])
+        if count:
+            credits[0] -= count
+            switch.send_packet_ins(
+                [msgs[(next_pkt + i) % len(msgs)] for i in range(count)])
+            next_pkt += count
+        for _ in range(int(credits[1])):
+            credits[1] -= 1
+            switch.port_status(random.choice(ports))
+        count = int(credits[2])
+        if count:
+            credits[2] -= count
+            switch.send_state_changes(count, n_keys=args.state_entries or 1)
+        if args.probe_interval and now >= next_probe:
+            next_probe += args.probe_interval
+            switch.echo()
+        hub.sleep(max(0, last + _TICK - time.time()))
+
+
+def run(args, pkts):
+    proc, port = of_harness.start_controller(args.apps, args.log)
+    alive = lambda: proc.poll() is None
+    address = ('127.0.0.1', port)
+    table = of_harness.state_table(args.state_entries)
+    switches = [of_harness.FakeSwitch(args.dpid + i, args.ports, table)
+                for i in range(args.switches)]
+    msgs = [(data, of_harness.packet_in(data, 1 + i % args.ports))
+            for i, data in enumerate(pkts)]
+    results = {'apps': args.apps, 'switches': args.switches}
+    try:
+        # the first switch waits for the controller to start
+        durations, errors = _connect(switches[:1], address, args, alive)
+        if errors:
+            raise RuntimeError(list(errors)[0])
+        switches[0].drain(args.settle, args.timeout)
+        rss_start = of_harness.rss(proc.pid)
+        start = time.time()
+        more, errors = _connect(switches[1:], address, args, alive)
+        connect_time = time.time() - start
+        durations += more
+        connected = [switch for switch in switches if switch.ready.is_set()]
+        _drain(connected, args)
+        rss_end = of_harness.rss(proc.pid)
+
+        results['connect'] = {
+            'connected': len(connected),
+            'errors': dict(errors),
+            'seconds': connect_time,
+            'handshake_ms': _latencies(durations),
+        }
+        if rss_start is not None and rss_end is not None:
+            results['memory'] = {
+                'rss_start': rss_start,
+                'rss_end': rss_end,
+                'per_datapath': ((rss_end - rss_start) /
+                                 float(max(1, len(connected) - 1))),
+            }
+        setup = collections.Counter()
+        for switch in connected:
+            setup.update(switch.reset_counters())
+        results['setup_messages'] = dict(setup)
+
+        cpu_start = of_harness.cpu_time(proc.pid)
+        start = time.time()
+        end = start + args.duration
+        hub.joinall([hub.spawn(_load, switch, msgs, args, end)
+                     for switch in connected])
+        duration = time.time() - start
+        _drain(connected, args)
+        cpu_end = of_harness.cpu_time(proc.pid)
+        rss_load = of_harness.rss(proc.pid)
+        if not alive():
+            raise RuntimeError('ryu-manager exited with status %s' %
+                               proc.poll())
+    except (socket.error, RuntimeError) as e:
+        results['error'] = str(e)
+        return results
+    finally:
+        for switch in switches:
+            switch.close()
+        of_harness.stop_controller(proc)
+
+    sent = collections.Counter()
+    received = collections.Counter()
+    latencies = []
+    echo_latencies = []
+    for switch in connected:
+        sent.update(switch.sent)
+        received.update(switch.counters)
+        latencies += switch.latencies
+        echo_latencies += switch.echo_latencies
+    results['load'] = {
+        'seconds': duration,
+        'sent': dict(sent),
+        'received': dict(received),
+        'echo_ms': _latencies(echo_latencies),
+        'echo_lost': sent['ECHO_REQUEST'] - len(echo_latencies),
+        'packet_out_ms': _latencies(latencies),
+    }
+    if rss_load is not None:
+        results['load']['rss'] = rss_load
+    if cpu_start is not None and cpu_end is not None:
+        results['load']['cpu_user'] = cpu_end[0] - cpu_start[0]
+        results['load']['cpu_system'] = cpu_end[1] - cpu_start[1]
+    return results
+
+
+def _print_latencies(title, latencies):
+    if latencies is None:
+        print('  %s: none' % title)
+    else:
+        print('  %s: p50 %.3f  p90 %.3f  p99 %.3f  max %.3f' % (
+            title, latencies['p50'], latencies['p90'], latencies['p99'],
+            latencies['p100']))
+
+
+def _print_counters(title, counters, seconds=None):
+    print('  %s:' % title)
+    for name, count in sorted(counters.items()):
+        if seconds:
+            print('    %-48s %8d %10.0f /s' % (name, count, count / seconds))
+        else:
+            print('    %-48s %8d' % (name, count))
+
+
+def report(results):
+    print('%s, %d switches' % ('+'.join(results['apps']),
+                               results['switches']))
+    if 'error' in results:
+        print('  failed: %s' % results['error'])
+    connect = results.get('connect')
+    if connect is not None:
+        print('  connected %d in %.2f s (%.0f /s)' % (
+            connect['connected'], connect['seconds'],
+            connect['connected'] / max(connect['seconds'], 1e-6)))
+        for error, count in connect['errors'].items():
+            print('    %d failed: %s' % (count, error))
+        _print_latencies('handshake (ms)', connect['handshake_ms'])
+    memory = results.get('memory')
+    if memory is not None:
+        print('  controller RSS: %.1f MiB -> %.1f MiB, %.1f KiB per '
+              'datapath' % (memory['rss_start'] / 1048576.0,
+                            memory['rss_end'] / 1048576.0,
+                            memory['per_datapath'] / 1024.0))
+    if 'setup_messages' in results:
+        _print_counters('setup messages', results['setup_messages'])
+    load = results.get('load')
+    if load is None:
+        return
+    seconds = load['seconds']
+    _print_counters('sent in %.2f s' % seconds, load['sent'], seconds)
+    _print_counters('received', load['received'], seconds)
+    _print_latencies('echo latency (ms)', load['echo_ms'])
+    if load['echo_lost']:
+        print('    %d echo requests unanswered' % load['echo_lost'])
+    _print_latencies('packet-out latency (ms)', load['packet_out_ms'])
+    if 'cpu_user' in load:
+        print('  controller CPU: %.2f s user, %.2f s system (%.0f %%)' % (
+            load['cpu_user'], load['cpu_system'],
+            100 * (load['cpu_user'] + load['cpu_system']) / seconds))
+    if 'rss' in load:
+        print('  controller RSS after the load: %.1f MiB' % (
+            load['rss'] / 1048576.0))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('apps', nargs='+',
+                        help='applications, run together')
+    parser.add_argument('--switches', type=int, default=100)
+    parser.add_argument('--ports', type=int, default=4,
+                        help='ports per switch')
+    parser.add_argument('--dpid', type=int, default=1,
+                        help='datapath ID of the first switch')
+    parser.add_argument('--concurrency', type=int, default=50,
+                        help='switches connecting at the same time')
+    parser.add_argument('--duration', type=float, default=10,
+                        help='seconds of load')
+    parser.add_argument('--packet-in-rate', type=float, default=10,
+                        help='packet-ins per second per switch')
+    parser.add_argument('--port-status-rate', type=float, default=0.1,
+                        help='port status per second per switch')
+    parser.add_argument('--state-change-rate', type=float, default=0,
+                        help='BEBA state-changed notifications per second '
+                        'per switch')
+    parser.add_argument('--probe-interval', type=float, default=0.1,
+                        help='seconds between the echo requests of a '
+                        'switch (0: none)')
+    parser.add_argument('--state-entries', type=int, default=1000,
+                        help='entries of the state table of each switch')
+    parser.add_argument('--flows', type=int, default=256,
+                        help='distinct packets of the packet-ins')
+    parser.add_argument('--pcap',
+                        help='packets of the packet-ins, instead of '
+                        'synthetic ones')
+    parser.add_argument('--settle', type=float, default=0.5,
+                        help='seconds without message ending the setup and '
+                        'the load')
+    parser.add_argument('--timeout', type=float, default=60)
+    parser.add_argument('--log', help='file of the ryu-manager output')
+    parser.add_argument('--json', help='file of the results')
+    args = parser.parse_args()
+
+    if args.pcap:
+        pkts = [data for _ts, data in pcaplib.Reader(open(args.pcap, 'rb'))]
+    else:
+        pkts = synthetic_packets(args.flows)
+    results = run(args, pkts)
+    report(results)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
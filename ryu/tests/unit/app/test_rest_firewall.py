@@ -0,0 +1,218 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import unittest
+import six
+from nose.tools import eq_, ok_
+
+from ryu.app import rest_firewall
+from ryu.controller import controller
+from ryu.lib import ofctl_v1_3
+from ryu.ofproto import ofproto_v1_0
+from ryu.ofproto import ofproto_v1_0_parser
+from ryu.ofproto import ofproto_v1_3
+from ryu.ofproto import ofproto_v1_3_parser
+
+
+class _Datapath(object):
+    def __init__(self, ofproto, ofproto_parser):
+        self.id = 1
+        self.xid = 0
+        self.ofproto = ofproto
+        self.ofproto_parser = ofproto_parser
+        self.sent = []
+        self.batches = []
+        self.barriers = 0
+
+    def set_xid(self, msg):
+        self.xid += 1
+        msg.set_xid(self.xid)
+
+    def send_msg(self, msg):
+        self.sent.append(msg)
+
+    def send_msgs(self, msgs):
+        self.batches.append(msgs)
+
+    def send_barrier_and_wait(self, timeout=None):
+        self.barriers += 1
+
+    send_msgs_and_wait = six.get_unbound_function(
+        controller.Datapath.send_msgs_and_wait)
+
+
+class _Ofctl(object):
+    """ ofctl_v1_3 returning the given flow stats. """
+
+    def __init__(self, flow_stats):
+        self.flow_stats = flow_stats
+        self.dumps = 0
+
+    def __getattr__(self, name):
+        return getattr(ofctl_v1_3, name)
+
+    def get_flow_stats(self, dp, waiters):
+        self.dumps += 1
+        return {str(dp.id): self.flow_stats}
+
+
+class Test_Firewall(unittest.TestCase):
+    """ Test case for the rule table of ryu.app.rest_firewall.Firewall
+    """
+
+    def setUp(self):
+        if rest_firewall.FirewallController._LOGGER is None:
+            rest_firewall.FirewallController._LOGGER = logging.getLogger(
+                'test_rest_firewall')
+        self.dp = _Datapath(ofproto_v1_3, ofproto_v1_3_parser)
+        self.fw = rest_firewall.Firewall(self.dp)
+        self.ofctl = _Ofctl([])
+        self.fw.ofctl = self.ofctl
+        self.fw.log_enabled = False
+
+    def _add(self, rule, vlan_id=rest_firewall.VLANID_NONE):
+        return self.fw.set_rule(dict(rule), {}, vlan_id)
+
+    def test_set_and_get(self):
+        self._add({'nw_src': '10.0.0.0/8', 'nw_proto': 'TCP',
+                   'tp_dst': 80, 'actions': 'DENY', 'priority': 10})
+        self._add({'dl_type': 'ARP'}, vlan_id=5)
+        eq_(1, self.ofctl.dumps)
+        eq_(2, len(self.dp.sent))
+        for msg in self.dp.sent:
+            ok_(msg.flags & ofproto_v1_3.OFPFF_SEND_FLOW_REM)
+
+        acl = self.fw.get_rules({}, rest_firewall.REST_ALL)
+        eq_(1, self.ofctl.dumps)
+        rules = dict((d.get('vlan_id', 0), d['rules'])
+                     for d in acl['access_control_list'])
+        eq_([{'rule_id': 1, 'priority': 10, 'dl_type': 'IPv4',
+              'nw_src': '10.0.0.0/255.0.0.0', 'nw_proto': 'TCP',
+              'tp_dst': 80, 'actions': 'DENY'}], rules[0])
+        eq_([{'rule_id': 1, 'priority': 1, 'dl_type': 'ARP',
+              'dl_vlan': '5', 'actions': 'ALLOW'}], rules[5])
+
+        acl = self.fw.get_rules({}, 5)
+        eq_(1, len(acl['access_control_list']))
+        eq_(5, acl['access_control_list'][0]['vlan_id'])
+
+    def test_delete_batch(self):
+        for port in range(1, 11):
+            self._add({'dl_type': 'IPv4', 'in_port': port})
+        self._add({'dl_type': 'IPv4', 'in_port': 1}, vlan_id=5)
+
+        result = self.fw.delete_rule({'rule_id': 'all'}, {},
+                                     rest_firewall.VLANID_NONE)
+        eq_('Rule deleted. : ruleID=1,2,3,4,5,6,7,8,9,10',
+            result['command_result'][0]['details'])
+        eq_(1, len(self.dp.batches))
+        eq_(10, len(self.dp.batches[0]))
+        for msg in self.dp.batches[0]:
+            eq_(ofproto_v1_3.OFPFC_DELETE_STRICT, msg.command)
+        eq_(1, self.dp.barriers)
+        eq_(1, len(self.fw.rules))
+
+        result = self.fw.delete_rule({'rule_id': 1}, {}, 5)
+        eq_(0, len(self.fw.rules))
+        ok_(5 not in self.fw.vlan_list)
+
+        result = self.fw.delete_rule({'rule_id': 1}, {}, 5)
+        eq_('failure', result['command_result']['result'])
+        eq_(2, len(self.dp.batches))
+
+    def test_flow_removed(self):
+        self._add({'dl_type': 'IPv4', 'in_port': 1})
+        self._add({'dl_type': 'IPv4', 'in_port': 2})
+        self.fw.flow_removed(self.dp.sent[0].cookie)
+        acl = self.fw.get_rules({}, rest_firewall.REST_ALL)
+        eq_([2], [r['rule_id']
+                  for r in acl['access_control_list'][0]['rules']])
+
+    def _test_flow_mod_failed(self, ofproto, ofproto_parser):
+        self.dp = _Datapath(ofproto, ofproto_parser)
+        self.fw = rest_firewall.Firewall(self.dp)
+        self.fw.synced = True
+        self.fw.log_enabled = False
+        self._add({'dl_type': 'IPv4', 'in_port': 1}, vlan_id=7)
+        self._add({'dl_type': 'IPv4', 'in_port': 2}, vlan_id=7)
+        msg = self.dp.sent[1]
+        self.dp.set_xid(msg)
+        msg.serialize()
+        self.fw.flow_mod_failed(bytes(msg.buf[:64]))
+        eq_([msg.cookie - 1], list(self.fw.rules.rules.keys()))
+
+    def test_flow_mod_failed_v1_0(self):
+        self._test_flow_mod_failed(ofproto_v1_0, ofproto_v1_0_parser)
+
+    def test_flow_mod_failed_v1_3(self):
+        self._test_flow_mod_failed(ofproto_v1_3, ofproto_v1_3_parser)
+
+    def test_reconcile(self):
+        cookie = (5 << rest_firewall.COOKIE_SHIFT_VLANID) + 3
+        self.ofctl.flow_stats = [
+            {'priority': rest_firewall.STATUS_FLOW_PRIORITY, 'cookie': 0,
+             'match': {}, 'actions': []},
+            {'priority': 100, 'cookie': cookie,
+             'match': {'dl_vlan': '5', 'in_port': 2},
+             'actions': ['OUTPUT:%d' % ofproto_v1_3.OFPP_NORMAL]},
+        ]
+        acl = self.fw.get_rules({}, 5)
+        eq_([{'vlan_id': 5,
+              'rules': [{'rule_id': 3, 'priority': 100, 'in_port': 2,
+                         'dl_vlan': '5', 'actions': 'ALLOW'}]}],
+            acl['access_control_list'])
+
+        # new rule IDs do not collide with the existing ones.
+        self._add({'dl_type': 'IPv4', 'in_port': 3}, vlan_id=5)
+        eq_(cookie + 1, self.dp.sent[-1].cookie)
+
+        self.ofctl.flow_stats = []
+        self.fw.reconcile_rules({})
+        eq_(2, self.ofctl.dumps)
+        eq_(0, len(self.fw.rules))
+
+    def test_set_rules(self):
+        self.fw.synced = True
+        rules = [{'dl_type': 'IPv4', 'in_port': port}
+                 for port in range(1, 2501)]
+        rules[3] = {'dl_type': 'IPv4', 'priority': 70000}
+        rules[5] = 'in_port=1'
+        result = self.fw.set_rules(rules, {}, rest_firewall.VLANID_NONE)
+
+        msgs = result['command_result']
+        eq_(2500, len(msgs))
+        eq_([3, 5], [m['index'] for m in msgs if m['result'] == 'failure'])
+        eq_(list(range(2500)), sorted(m['index'] for m in msgs))
+        eq_([], self.dp.sent)
+        eq_([1024, 1024, 450], [len(b) for b in self.dp.batches])
+        eq_(1, self.dp.barriers)
+        eq_(2498, len(self.fw.rules))
+
+        acl = self.fw.get_rules({}, rest_firewall.VLANID_NONE)
+        eq_(2498, len(acl['access_control_list'][0]['rules']))
+
+    def test_set_rules_vlan(self):
+        self.fw.synced = True
+        self.fw.log_enabled = True
+        result = self.fw.set_rules([{'dl_type': 'IPv4', 'actions': 'DENY'},
+                                    {'dl_type': 'ARP'}], {}, 10)
+        msgs = result['command_result']
+        eq_([0, 1], [m['index'] for m in msgs])
+        eq_([10, 10], [m['vlan_id'] for m in msgs])
+        # DENY rules send packets to the controller while logging.
+        eq_(ofproto_v1_3.OFPP_CONTROLLER,
+            self.dp.batches[0][0].instructions[0].actions[0].port)
+        eq_(['DENY', 'ALLOW'],
+            [r['actions'] for r in self.fw.get_rules({}, 10)[
+                'access_control_list'][0]['rules']])
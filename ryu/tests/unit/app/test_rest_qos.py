@@ -0,0 +1,131 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+import six
+from nose.tools import eq_
+
+from ryu.base import app_manager  # To suppress cyclic import
+from ryu.controller import controller
+from ryu.ofproto import ofproto_v1_3
+from ryu.ofproto import ofproto_v1_3_parser
+try:
+    # rest_qos imports ryu.lib.ovs.bridge, and the bundled ovs library
+    # only runs on Python 2.
+    from ryu.app import rest_qos
+except (ImportError, SyntaxError):
+    rest_qos = None
+
+
+class _Datapath(object):
+    ofproto = ofproto_v1_3
+    ofproto_parser = ofproto_v1_3_parser
+
+    def __init__(self):
+        self.id = 1
+        self.sent = []
+        self.batches = []
+        self.barriers = 0
+
+    def send_msg(self, msg):
+        self.sent.append(msg)
+
+    def send_msgs(self, msgs):
+        self.batches.append(msgs)
+
+    def send_barrier_and_wait(self, timeout=None):
+        self.barriers += 1
+
+    send_msgs_and_wait = six.get_unbound_function(
+        controller.Datapath.send_msgs_and_wait)
+
+
+@unittest.skipIf(rest_qos is None, 'ryu.app.rest_qos cannot be imported')
+class Test_QoS(unittest.TestCase):
+    """ Test case for the bulk API of ryu.app.rest_qos.QoS
+    """
+
+    def setUp(self):
+        self.dp = _Datapath()
+        self.qos = rest_qos.QoS(self.dp, None)
+
+    def test_set_qos(self):
+        result = self.qos.set_qos({'match': {'nw_dst': '10.0.0.1',
+                                             'nw_proto': 'UDP'},
+                                   'actions': {'queue': 1}},
+                                  rest_qos.VLANID_NONE, {})
+        eq_('QoS added. : qos_id=1',
+            result['command_result'][0]['details'])
+        eq_(1, len(self.dp.sent))
+
+    def test_set_qos_rules(self):
+        rules = [{'match': {'nw_dst': '10.0.%d.%d' % (i >> 8, i & 0xff),
+                            'nw_proto': 'UDP', 'tp_dst': 5000},
+                  'actions': {'queue': i % 4}}
+                 for i in range(2000)]
+        rules[1] = {'actions': {'queue': 1}}
+        rules[7] = {'match': {'dl_type': 'foo'}}
+        result = self.qos.set_qos_rules(rules, 5, {})
+
+        msgs = result['command_result']
+        eq_([1, 7], [m['index'] for m in msgs if m['result'] == 'failure'])
+        eq_(1998, len([m for m in msgs if m['result'] == 'success']))
+        eq_(5, msgs[0]['vlan_id'])
+        eq_([], self.dp.sent)
+        eq_([1024, 974], [len(b) for b in self.dp.batches])
+        eq_(1, self.dp.barriers)
+        for msg in self.dp.batches[0]:
+            eq_(ofproto_v1_3.OFPFC_ADD, msg.command)
+            eq_(5, msg.cookie >> rest_qos.COOKIE_SHIFT_VLANID)
+
+
+class _QoS(object):
+    """ QoS recording the rules it is given, and modifying them. """
+
+    def __init__(self):
+        self.rules = []
+
+    def set_qos_rules(self, rests, vlan_id, waiters):
+        self.rules.append([dict(rest) for rest in rests])
+        for rest in rests:
+            rest['priority'] = rest.get('priority', 0) + 1
+        return {'vlan_id': vlan_id}
+
+
+class _Request(object):
+    def __init__(self, body):
+        self.body = body
+
+
+@unittest.skipIf(rest_qos is None, 'ryu.app.rest_qos cannot be imported')
+class Test_QoSController(unittest.TestCase):
+    """ Test case for the bulk API of ryu.app.rest_qos.QoSController
+    """
+
+    def test_access_switch_bulk(self):
+        ofs_list = rest_qos.QoSOfsList()
+        ofs_list[1] = _QoS()
+        ofs_list[2] = _QoS()
+        ctrl = rest_qos.QoSController.__new__(rest_qos.QoSController)
+        ctrl._OFS_LIST = ofs_list
+        req = _Request(b'{"match": {"nw_dst": "10.0.0.1"}}\n'
+                       b'{"match": {"nw_dst": "10.0.0.2"}}\n')
+
+        res = ctrl._access_switch(req, rest_qos.REST_ALL, rest_qos.REST_ALL,
+                                  'set_qos_rules', {}, bulk=True)
+        eq_(200, res.status_code)
+        # every switch gets the rules of the request
+        expected = [[{'match': {'nw_dst': '10.0.0.1'}},
+                     {'match': {'nw_dst': '10.0.0.2'}}]]
+        for qos in ofs_list.values():
+            eq_(expected, qos.rules)
@@ -0,0 +1,230 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import random
+import unittest
+from nose.tools import eq_, ok_, raises
+
+from ryu.app import rest_router
+from ryu.lib import timer
+from ryu.lib.packet import ipv4
+from ryu.ofproto import ofproto_v1_3
+from ryu.ofproto import ofproto_v1_3_parser
+
+
+class Test_PrefixTrie(unittest.TestCase):
+    """ Test case for rest_router.PrefixTrie
+    """
+
+    def setUp(self):
+        self.trie = rest_router.PrefixTrie()
+
+    def test_longest_match(self):
+        self.trie.insert(0x0a000000, 8, 'a')
+        self.trie.insert(0x0a010000, 16, 'b')
+        self.trie.insert(0x0a010100, 24, 'c')
+        eq_('c', self.trie.longest_match(0x0a010101))
+        eq_('b', self.trie.longest_match(0x0a010201))
+        eq_('a', self.trie.longest_match(0x0a020101))
+        eq_(None, self.trie.longest_match(0x0b000001))
+
+        self.trie.insert(0, 0, 'default')
+        eq_('default', self.trie.longest_match(0x0b000001))
+
+    def test_delete(self):
+        self.trie.insert(0x0a000000, 8, 'a')
+        self.trie.insert(0x0a010100, 24, 'c')
+        self.trie.delete(0x0a010100, 24)
+        eq_('a', self.trie.longest_match(0x0a010101))
+        eq_(None, self.trie.get(0x0a010100, 24))
+        # unknown prefixes are ignored
+        self.trie.delete(0x0a010000, 16)
+        self.trie.delete(0x0a000000, 8)
+        eq_([None, None], self.trie._root.children)
+
+    def test_overlap(self):
+        self.trie.insert(0x0a010000, 16, 'b')
+        eq_('b', self.trie.overlap(0x0a010100, 24))
+        eq_('b', self.trie.overlap(0x0a000000, 8))
+        eq_('b', self.trie.overlap(0x0a010000, 16))
+        eq_(None, self.trie.overlap(0x0a020000, 16))
+
+    def test_random(self):
+        rand = random.Random(1)
+        routes = {}
+        for _ in range(500):
+            prefix_len = rand.randint(0, 32)
+            mask = rest_router.mask_ntob(prefix_len)
+            addr = rand.getrandbits(32) & mask
+            routes[(addr, prefix_len)] = (addr, prefix_len)
+            self.trie.insert(addr, prefix_len, (addr, prefix_len))
+        for _ in range(500):
+            ip = rand.getrandbits(32)
+            best = None
+            for addr, prefix_len in routes:
+                if (ip & rest_router.mask_ntob(prefix_len) == addr and
+                        (best is None or best[1] < prefix_len)):
+                    best = (addr, prefix_len)
+            eq_(best, self.trie.longest_match(ip))
+
+
+class Test_RoutingTable(unittest.TestCase):
+    """ Test case for rest_router.RoutingTable
+    """
+
+    def setUp(self):
+        self.tbl = rest_router.RoutingTable()
+
+    def test_get_data(self):
+        r1 = self.tbl.add('10.0.0.0/8', '192.168.0.1')
+        r2 = self.tbl.add('10.1.0.0/16', '192.168.0.2')
+        eq_(r2, self.tbl.get_data(dst_ip='10.1.2.3'))
+        eq_(r1, self.tbl.get_data(dst_ip='10.2.2.3'))
+        eq_(None, self.tbl.get_data(dst_ip='11.0.0.1'))
+
+        default = self.tbl.add(rest_router.DEFAULT_ROUTE, '192.168.0.3')
+        eq_(default, self.tbl.get_data(dst_ip='11.0.0.1'))
+
+        self.tbl.delete(r2.route_id)
+        eq_(r1, self.tbl.get_data(dst_ip='10.1.2.3'))
+        eq_(2, len(self.tbl))
+
+    @raises(rest_router.CommandFailure)
+    def test_overlap(self):
+        self.tbl.add('10.1.0.0/16', '192.168.0.1')
+        self.tbl.add('10.1.2.3/16', '192.168.0.2')
+
+    def test_gateway(self):
+        r1 = self.tbl.add('10.0.0.0/8', '192.168.0.1')
+        r2 = self.tbl.add('11.0.0.0/8', '192.168.0.1')
+        eq_(['192.168.0.1'], self.tbl.get_gateways())
+        eq_([r1, r2], self.tbl.get_routes('192.168.0.1'))
+
+        self.tbl.set_gateway_mac(r1, '00:00:00:00:00:01')
+        eq_(r1, self.tbl.get_data(gw_mac='00:00:00:00:00:01'))
+        self.tbl.set_gateway_mac(r1, '00:00:00:00:00:02')
+        eq_(None, self.tbl.get_data(gw_mac='00:00:00:00:00:01'))
+
+        self.tbl.delete(r1.route_id)
+        self.tbl.delete(r2.route_id)
+        eq_([], self.tbl.get_gateways())
+        eq_(None, self.tbl.get_data(gw_mac='00:00:00:00:00:02'))
+
+
+class Test_AddressData(unittest.TestCase):
+    """ Test case for rest_router.AddressData
+    """
+
+    def setUp(self):
+        self.data = rest_router.AddressData()
+
+    def test_get_data(self):
+        a1 = self.data.add('10.0.0.1/24')
+        a2 = self.data.add('10.0.1.1/24')
+        eq_(a1, self.data.get_data(ip='10.0.0.100'))
+        eq_(a2, self.data.get_data(ip='10.0.1.100'))
+        eq_(None, self.data.get_data(ip='10.0.2.100'))
+        eq_(a2, self.data.get_data(addr_id=a2.address_id))
+
+        self.data.delete(a1.address_id)
+        eq_(None, self.data.get_data(ip='10.0.0.100'))
+        eq_(None, self.data.get_data(addr_id=a1.address_id))
+        ok_('10.0.1.0/24' in self.data)
+
+    def test_overlap(self):
+        self.data.add('10.0.0.1/24')
+        for address in ('10.0.0.2/24', '10.0.0.129/25', '10.0.0.1/16'):
+            self.assertRaises(rest_router.CommandFailure,
+                              self.data.add, address)
+        self.data.add('10.0.1.1/24')
+
+
+class _Datapath(object):
+    def __init__(self):
+        self.id = 1
+        self.ofproto = ofproto_v1_3
+        self.ofproto_parser = ofproto_v1_3_parser
+        self.batches = []
+
+    def send_msgs(self, msgs):
+        self.batches.append(msgs)
+
+
+class Test_SuspendPacketTable(unittest.TestCase):
+    """ Test case for rest_router.SuspendPacketTable
+    """
+
+    def setUp(self):
+        self.now = 0.0
+        self.scheduler = timer.TimerScheduler(clock=lambda: self.now)
+        self.timeouts = []
+        self.tbl = rest_router.SuspendPacketTable(self.scheduler,
+                                                  self.timeouts.append)
+
+    def _add(self, next_hop, dst_ip, in_port=1):
+        header_list = {rest_router.IPV4: ipv4.ipv4(dst=dst_ip)}
+        return self.tbl.add(next_hop, in_port, header_list, b'data')
+
+    def test_add_and_pop(self):
+        ok_(self._add('10.0.0.1', '11.0.0.1'))
+        ok_(not self._add('10.0.0.1', '11.0.0.2'))
+        ok_(self._add('10.0.0.2', '10.0.0.2'))
+        eq_(3, len(self.tbl))
+        # one timer per next hop.
+        eq_(2, len(self.scheduler))
+
+        packets = self.tbl.pop('10.0.0.1')
+        eq_(['11.0.0.1', '11.0.0.2'], [pkt.dst_ip for pkt in packets])
+        eq_([], self.tbl.pop('10.0.0.1'))
+        ok_('10.0.0.1' not in self.tbl)
+        eq_(1, len(self.tbl))
+        eq_(1, len(self.scheduler))
+
+        self.now = rest_router.ARP_REPLY_TIMER
+        self.scheduler.run_pending()
+        eq_(['10.0.0.2'], [pkt.dst_ip for pkt in self.timeouts])
+
+    def test_timeout(self):
+        self._add('10.0.0.1', '11.0.0.1')
+        self.now = 1.0
+        self._add('10.0.0.1', '11.0.0.2')
+        self._add('10.0.0.2', '10.0.0.2')
+
+        self.now = rest_router.ARP_REPLY_TIMER
+        eq_(1, self.scheduler.run_pending())
+        eq_(['11.0.0.1', '11.0.0.2'], [pkt.dst_ip for pkt in self.timeouts])
+        eq_(1, len(self.tbl))
+
+        # a new packet sends a new ARP request.
+        ok_(self._add('10.0.0.1', '11.0.0.3'))
+
+    def test_delete(self):
+        address = rest_router.AddressData().add('10.0.0.254/24')
+        self._add('10.0.0.1', '11.0.0.1')
+        self._add('10.0.1.1', '11.0.0.2')
+        self.tbl.delete(address)
+        ok_('10.0.0.1' not in self.tbl)
+        ok_('10.0.1.1' in self.tbl)
+        eq_(1, len(self.tbl))
+        eq_(1, len(self.scheduler))
+
+    def test_send_packet_outs(self):
+        dp = _Datapath()
+        ofctl = rest_router.OfCtl.factory(dp, None)
+        ofctl.send_packet_outs([])
+        eq_([], dp.batches)
+        ofctl.send_packet_outs([(1, 2, b'a'), (3, 4, b'b')])
+        msgs = dp.batches[0]
+        eq_([1, 3], [msg.in_port for msg in msgs])
+        eq_([2, 4], [msg.actions[0].port for msg in msgs])
+        eq_([b'a', b'b'], [msg.data for msg in msgs])
@@ -25,6 +25,7 @@ from webob.response import Response
 from ryu.app.wsgi import ControllerBase
 from ryu.app.wsgi import WSGIApplication
 from ryu.app.wsgi import route
+from ryu.app.wsgi import load_json_records
 from ryu.lib import dpid as dpidlib
 
 LOG = logging.getLogger('test_wsgi')
@@ -100,5 +101,32 @@ class Test_wsgi(unittest.TestCase):
         eq_(r[0], b'root')
 
 
+class Test_load_json_records(unittest.TestCase):
+
+    def test_array(self):
+        eq_([{'a': 1}, {'b': 2}],
+            load_json_records(b'[{"a": 1}, {"b": 2}]'))
+
+    def test_ndjson(self):
+        eq_([{'a': 1}, {'b': 2}, [3]],
+            load_json_records(b'{"a": 1}\n\n  {"b": 2}\r\n[3]'))
+        eq_([{'a': 1}], load_json_records(u'{"a": 1}'))
+        eq_([], load_json_records(b''))
+
+    def test_object(self):
+        eq_([{'nw_src': '10.0.0.1', 'actions': 'DENY'}],
+            load_json_records(b'{\n  "nw_src": "10.0.0.1",\n'
+                              b'  "actions": "DENY"\n}\n'))
+
+    def test_invalid(self):
+        self.assertRaises(ValueError, load_json_records, b'[{"a": 1}')
+        try:
+            load_json_records(b'{"a": 1}\n{"b": ')
+        except ValueError as e:
+            self.assertTrue(str(e).startswith('line 2: '))
+        else:
+            self.fail()
+
+
 if __name__ == '__main__':
     nose.main(argv=['nosetests', '-s', '-v'], defaultTest=__file__)
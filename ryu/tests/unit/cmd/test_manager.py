@@ -19,13 +19,6 @@ import unittest
 import mock
 from nose.tools import eq_, raises
 
-try:
-    # Python 3
-    from imp import reload
-except ImportError:
-    # Python 2
-    pass
-
 from ryu.cmd.manager import main
 
 
@@ -56,11 +49,15 @@ class Test_Manager(unittest.TestCase):
     def _reset_globals():
         # hack to reset globals like SERVICE_BRICKS.
         # assumption: this is the only test which actually starts RyuApp.
+        # the modules are not reloaded, as the RyuApp subclasses of the
+        # other tests would no longer be subclasses of RyuApp.
         import ryu.base.app_manager
         import ryu.ofproto.ofproto_protocol
 
-        reload(ryu.base.app_manager)
-        reload(ryu.ofproto.ofproto_protocol)
+        ryu.base.app_manager.SERVICE_BRICKS.clear()
+        ryu.base.app_manager.AppManager._instance = None
+        ryu.ofproto.ofproto_protocol._supported_versions = set(
+            ryu.ofproto.ofproto_protocol._versions.keys())
 
     @mock.patch('sys.argv', new=['ryu-manager', '--verbose',
                                  'ryu.tests.unit.cmd.dummy_app'])
@@ -22,6 +22,7 @@ except ImportError:
 
 import json
 import os
+import struct
 import sys
 import warnings
 import unittest
@@ -31,6 +32,9 @@ import random
 from ryu.base import app_manager  # To suppress cyclic import
 from ryu.controller import controller
 from ryu.controller import handler
+from ryu.exception import OFPRequestError, OFPRequestTimeout
+from ryu.lib import hub
+from ryu.ofproto import ofproto_v1_3
 from ryu.ofproto import ofproto_v1_3_parser
 from ryu.ofproto import ofproto_v1_2_parser
 from ryu.ofproto import ofproto_v1_0_parser
@@ -143,3 +147,132 @@ class Test_Datapath(unittest.TestCase):
             self.assertEqual(state, handler.MAIN_DISPATCHER)
             self.assertEqual(kwargs, {})
         self.assertEqual(expected_json, output_json)
+
+
+class Test_Datapath_send_request(unittest.TestCase):
+    """
+    Test cases for controller.Datapath.send_request
+    """
+
+    def setUp(self):
+        self.brick_mock = mock.MagicMock(spec=app_manager.RyuApp)
+        with mock.patch('ryu.base.app_manager.lookup_service_brick',
+                        return_value=self.brick_mock):
+            self.dp = controller.Datapath(mock.MagicMock(), mock.MagicMock())
+        self.dp.set_version(ofproto_v1_3.OFP_VERSION)
+        self.dp.set_state(handler.MAIN_DISPATCHER)
+        self.brick_mock.reset_mock()
+
+    def _reply(self, name, xid, flags=None):
+        this_dir = os.path.dirname(sys.modules[__name__].__file__)
+        packet_data_file = os.path.join(
+            this_dir, '../../packet_data/of13', name + '.packet')
+        buf = bytearray(open(packet_data_file, 'rb').read())
+        struct.pack_into('!I', buf, 4, xid)
+        if flags is not None:
+            # flags of ofp_multipart_reply
+            struct.pack_into('!H', buf, 10, flags)
+        return buf
+
+    def _recv(self, *bufs):
+        self.dp.socket.recv.side_effect = list(bufs) + [b'']
+        self.dp._recv_loop()
+
+    def test_reply(self):
+        req = self.dp.ofproto_parser.OFPDescStatsRequest(self.dp)
+        future = self.dp.send_request(req)
+        self.assertFalse(future.done())
+        self._recv(self._reply('4-0-ofp_desc_reply', req.xid))
+
+        self.assertTrue(future.done())
+        replies = future.result()
+        self.assertEqual(1, len(replies))
+        self.assertEqual('OFPDescStatsReply', replies[0].__class__.__name__)
+        self.assertEqual({}, self.dp._requests)
+        # dispatched to the applications as well
+        evs = [call[0][0] for call in
+               self.brick_mock.send_event_to_observers.call_args_list]
+        self.assertEqual([replies[0]],
+                         [ev.msg for ev in evs if hasattr(ev, 'msg')])
+
+    def test_multipart_reply(self):
+        req = self.dp.ofproto_parser.OFPPortStatsRequest(self.dp, 0)
+        future = self.dp.send_request(req)
+        self._recv(self._reply('4-30-ofp_port_stats_reply', req.xid, 1))
+        self.assertFalse(future.done())
+        self._recv(self._reply('4-30-ofp_port_stats_reply', req.xid, 0))
+        self.assertEqual(2, len(future.result()))
+
+    def test_unknown_xid(self):
+        req = self.dp.ofproto_parser.OFPBarrierRequest(self.dp)
+        future = self.dp.send_request(req)
+        self._recv(self._reply('4-18-ofp_barrier_reply', req.xid + 1))
+        self.assertFalse(future.done())
+        evs = [call[0][0] for call in
+               self.brick_mock.send_event_to_observers.call_args_list]
+        self.assertTrue(any(hasattr(ev, 'msg') for ev in evs))
+        future.cancel()
+        self.assertEqual({}, self.dp._requests)
+
+    def test_error(self):
+        req = self.dp.ofproto_parser.OFPBarrierRequest(self.dp)
+        future = self.dp.send_request(req)
+        self._recv(self._reply('4-15-ofp_error_msg', req.xid))
+        self.assertRaises(OFPRequestError, future.result)
+
+    def test_timeout(self):
+        req = self.dp.ofproto_parser.OFPBarrierRequest(self.dp)
+        future = self.dp.send_request(req, timeout=0.01)
+        self.assertRaises(OFPRequestTimeout, future.result, 2)
+        self.assertEqual({}, self.dp._requests)
+
+    def test_closed(self):
+        req = self.dp.ofproto_parser.OFPBarrierRequest(self.dp)
+        future = self.dp.send_request(req)
+        self.dp._cancel_requests()
+        self.assertRaises(OFPRequestError, future.result)
+
+    def test_send_msgs(self):
+        self.dp.send_q = hub.Queue(16)
+        msgs = [self.dp.ofproto_parser.OFPBarrierRequest(self.dp)
+                for _ in range(3)]
+        self.dp.send_msgs(msgs)
+        self.assertEqual(1, self.dp.send_q.qsize())
+        buf = self.dp.send_q.get()
+        self.assertEqual(b''.join(bytes(msg.buf) for msg in msgs), buf)
+        self.assertEqual(3, len(set(msg.xid for msg in msgs)))
+
+    def test_send_msgs_and_wait(self):
+        self.dp.send_q = hub.Queue(16)
+        msgs = [self.dp.ofproto_parser.OFPBarrierRequest(self.dp)
+                for _ in range(5)]
+        barrier = []
+
+        def _send_barrier_and_wait(timeout):
+            barrier.append(self.dp.send_q.qsize())
+
+        self.dp.send_barrier_and_wait = _send_barrier_and_wait
+        self.dp.send_msgs_and_wait(msgs, batch_size=2)
+        # three writes of 2, 2 and 1 messages, then the barrier
+        self.assertEqual([3], barrier)
+        self.assertEqual(bytes(msgs[4].buf), self.dp.send_q.queue[-1])
+
+        self.dp.send_msgs_and_wait([])
+        self.assertEqual([3], barrier)
+
+    def test_send_msgs_ovs(self):
+        from ryu.ofproto import beba_v1_0_parser
+
+        # as done by beba_v1_0_parser.Beba2OVSWrapper
+        self.dp.__class__ = beba_v1_0_parser.OVSDatapath
+        self.dp.stateful_stages_in_use = set()
+        self.dp.send_q = hub.Queue(16)
+        parser = self.dp.ofproto_parser
+        msgs = [parser.OFPFlowMod(self.dp, table_id=table_id,
+                                  match=parser.OFPMatch())
+                for table_id in (0, 1)]
+        self.dp.send_msgs(msgs)
+        # adapted by OVSDatapath.send_msg(): the flow tables of the
+        # stages are moved to the odd table IDs.
+        self.assertEqual([1, 3], [msg.table_id for msg in msgs])
+        self.assertEqual(2, self.dp.send_q.qsize())
@@ -0,0 +1,114 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+from nose.tools import eq_, ok_
+
+import six
+
+from ryu.base import app_manager
+from ryu.controller import ofp_event
+from ryu.controller import ofp_handler
+from ryu.controller.handler import set_ev_cls, MAIN_DISPATCHER
+from ryu.lib.ofp_pktinfilter import packet_in_match
+from ryu.lib.packet import ethernet, packet
+from ryu.ofproto import ether, ofproto_v1_3, ofproto_v1_3_parser
+from ryu.ofproto.ofproto_protocol import ProtocolDesc
+
+
+class _ArpApp(app_manager.RyuApp):
+    @set_ev_cls(ofp_event.EventOFPPacketIn, MAIN_DISPATCHER)
+    @packet_in_match(eth_type=ether.ETH_TYPE_ARP)
+    def packet_in_handler(self, ev):
+        pass
+
+
+class _LldpApp(app_manager.RyuApp):
+    @set_ev_cls(ofp_event.EventOFPPacketIn, MAIN_DISPATCHER)
+    @packet_in_match(eth_type=ether.ETH_TYPE_LLDP)
+    def packet_in_handler(self, ev):
+        pass
+
+
+class _AllApp(app_manager.RyuApp):
+    @set_ev_cls(ofp_event.EventOFPPacketIn, MAIN_DISPATCHER)
+    @packet_in_match(eth_type=ether.ETH_TYPE_LLDP)
+    def lldp_packet_in_handler(self, ev):
+        pass
+
+    @set_ev_cls(ofp_event.EventOFPPacketIn, MAIN_DISPATCHER)
+    def packet_in_handler(self, ev):
+        pass
+
+
+def _packet_in(ethertype):
+    datapath = ProtocolDesc(version=ofproto_v1_3.OFP_VERSION)
+    pkt = packet.Packet()
+    pkt.add_protocol(ethernet.ethernet(ethertype=ethertype))
+    pkt.serialize()
+    pkt_in = ofproto_v1_3_parser.OFPPacketIn(
+        datapath, data=six.binary_type(pkt.data))
+    return ofp_event.EventOFPPacketIn(pkt_in)
+
+
+class Test_OFPHandler(unittest.TestCase):
+    """ Test case for packet-in classification of OFPHandler
+    """
+
+    def setUp(self):
+        self.bricks = dict(app_manager.SERVICE_BRICKS)
+        self.ofp = ofp_handler.OFPHandler()
+        self.apps = [_ArpApp(), _LldpApp(), _AllApp()]
+        for app in self.apps:
+            app_manager.register_app(app)
+            self.ofp.register_observer(ofp_event.EventOFPPacketIn, app.name,
+                                       [MAIN_DISPATCHER])
+
+    def tearDown(self):
+        app_manager.SERVICE_BRICKS.clear()
+        app_manager.SERVICE_BRICKS.update(self.bricks)
+
+    def _observers(self, ethertype):
+        ev = _packet_in(ethertype)
+        return sorted(self.ofp.get_observers(ev, MAIN_DISPATCHER))
+
+    def test_filter(self):
+        eq_(['_AllApp', '_ArpApp'], self._observers(ether.ETH_TYPE_ARP))
+        eq_(['_AllApp', '_LldpApp'], self._observers(ether.ETH_TYPE_LLDP))
+        eq_(['_AllApp'], self._observers(ether.ETH_TYPE_IP))
+
+    def test_observer_change(self):
+        eq_(['_AllApp'], self._observers(ether.ETH_TYPE_IP))
+        self.ofp.unregister_observer(ofp_event.EventOFPPacketIn, '_AllApp')
+        eq_([], self._observers(ether.ETH_TYPE_IP))
+        eq_(['_ArpApp'], self._observers(ether.ETH_TYPE_ARP))
+
+    def test_handler_change(self):
+        eq_(['_AllApp'], self._observers(ether.ETH_TYPE_IP))
+        classifier = self.ofp._pkt_in_classifier
+        eq_(['_AllApp'], self._observers(ether.ETH_TYPE_IP))
+        ok_(classifier is self.ofp._pkt_in_classifier)
+
+        def _handler(ev):
+            pass
+        # _ArpApp now also wants every packet-in
+        self.apps[0].register_handler(ofp_event.EventOFPPacketIn, _handler)
+        eq_(['_AllApp', '_ArpApp'], self._observers(ether.ETH_TYPE_IP))
+        ok_(classifier is not self.ofp._pkt_in_classifier)
+
+    def test_other_event(self):
+        datapath = ProtocolDesc(version=ofproto_v1_3.OFP_VERSION)
+        ev = ofp_event.EventOFPEchoRequest(
+            ofproto_v1_3_parser.OFPEchoRequest(datapath))
+        self.ofp.register_observer(ofp_event.EventOFPEchoRequest, '_ArpApp')
+        ok_(self.ofp.get_observers(ev, MAIN_DISPATCHER))
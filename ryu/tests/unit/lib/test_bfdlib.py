@@ -0,0 +1,148 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+from nose.tools import eq_
+
+from ryu.lib import bfdlib
+from ryu.lib.packet import bfd
+from ryu.ofproto import ofproto_v1_3
+from ryu.ofproto import ofproto_v1_3_parser
+
+
+class Test_BFDPacket(unittest.TestCase):
+    """ Test case for ryu.lib.bfdlib.BFDPacket
+    """
+
+    addrs = {
+        'src_mac': '00:11:22:33:44:55',
+        'dst_mac': '66:77:88:99:aa:bb',
+        'src_ip': '192.168.1.1',
+        'dst_ip': '192.168.1.2',
+        'src_port': 49152,
+        'dst_port': bfdlib.BFD_CONTROL_UDP_PORT,
+    }
+
+    def _test_template(self, ipv4_id, diag, state, flags, detect_mult,
+                       your_discr, desired_min_tx_interval,
+                       required_min_rx_interval,
+                       required_min_echo_rx_interval):
+        template = bfdlib.BFDPacket.bfd_template(my_discr=0xdeadbeef,
+                                                 **self.addrs)
+        data = template.build(
+            ipv4_id=ipv4_id, diag=diag, state=state, flags=flags,
+            detect_mult=detect_mult, your_discr=your_discr,
+            desired_min_tx_interval=desired_min_tx_interval,
+            required_min_rx_interval=required_min_rx_interval,
+            required_min_echo_rx_interval=required_min_echo_rx_interval)
+        expected = bfdlib.BFDPacket.bfd_packet(
+            ipv4_id=ipv4_id, diag=diag, state=state, flags=flags,
+            detect_mult=detect_mult, my_discr=0xdeadbeef,
+            your_discr=your_discr,
+            desired_min_tx_interval=desired_min_tx_interval,
+            required_min_rx_interval=required_min_rx_interval,
+            required_min_echo_rx_interval=required_min_echo_rx_interval,
+            **self.addrs)
+        eq_(expected, data)
+
+    def test_template_down(self):
+        self._test_template(1, bfd.BFD_DIAG_CTRL_DETECT_TIME_EXPIRED,
+                            bfd.BFD_STATE_DOWN, bfd.BFD_FLAG_POLL, 3,
+                            0, 1000000, 1000000, 0)
+
+    def test_template_up(self):
+        self._test_template(0xffff, bfd.BFD_DIAG_NO_DIAG,
+                            bfd.BFD_STATE_UP, bfd.BFD_FLAG_FINAL, 5,
+                            0x12345678, 300000, 200000, 100)
+
+    def test_fast_parse(self):
+        data = bfdlib.BFDPacket.bfd_packet(ipv4_id=1, **self.addrs)
+        eq_((bfdlib.BFD_CONTROL_UDP_PORT, 14, 255, 42),
+            bfdlib.BFDPacket.bfd_fast_parse(data))
+
+    def test_fast_parse_not_bfd(self):
+        addrs = dict(self.addrs, dst_port=53)
+        data = bfdlib.BFDPacket.bfd_packet(ipv4_id=1, **addrs)
+        eq_(None, bfdlib.BFDPacket.bfd_fast_parse(data))
+
+        data = bfdlib.ARPPacket.arp_packet(
+            1, self.addrs['src_mac'], self.addrs['src_ip'],
+            self.addrs['dst_mac'], self.addrs['dst_ip'])
+        eq_(None, bfdlib.BFDPacket.bfd_fast_parse(data))
+
+
+class _Datapath(object):
+    ofproto = ofproto_v1_3
+    ofproto_parser = ofproto_v1_3_parser
+
+    def __init__(self, dpid):
+        self.id = dpid
+
+    def send_msg(self, msg):
+        pass
+
+
+class Test_BFDLib(unittest.TestCase):
+    """ Test case for ryu.lib.bfdlib.BFDLib
+    """
+
+    def setUp(self):
+        self.lib = bfdlib.BFDLib()
+        self.lib.send_event_to_observers = self._state_changed
+        self.datapath = _Datapath(1)
+        self.states = []
+        self.my_discr = self.lib.add_bfd_session(
+            dpid=1, ofport=1, src_mac='00:11:22:33:44:55',
+            src_ip='192.168.1.1')
+
+    def tearDown(self):
+        self.lib.close()
+
+    def _state_changed(self, ev):
+        self.states.append(ev.new_state)
+
+    def _recv(self, state, your_discr, fast=True):
+        data = bfdlib.BFDPacket.bfd_packet(
+            src_mac='66:77:88:99:aa:bb', dst_mac='00:11:22:33:44:55',
+            src_ip='192.168.1.2', dst_ip='192.168.1.1', ipv4_id=1,
+            src_port=49153, dst_port=bfdlib.BFD_CONTROL_UDP_PORT,
+            state=state, detect_mult=3, my_discr=0x1234,
+            your_discr=your_discr, desired_min_tx_interval=1000000,
+            required_min_rx_interval=1000000)
+        if fast:
+            _, ip_off, ttl, bfd_off = bfdlib.BFDPacket.bfd_fast_parse(data)
+            self.lib._recv_bfd_fast(self.datapath, 1, data,
+                                    ip_off, ttl, bfd_off)
+        else:
+            self.lib.recv_bfd_pkt(self.datapath, 1, data)
+
+    def _test_handshake(self, fast):
+        sess = self.lib.session[self.my_discr]
+        self._recv(bfd.BFD_STATE_DOWN, 0, fast)
+        eq_([bfd.BFD_STATE_INIT], self.states)
+        eq_(0x1234, sess.your_discr)
+        eq_('66:77:88:99:aa:bb', sess.dst_mac)
+        eq_('192.168.1.2', sess.dst_ip)
+
+        self._recv(bfd.BFD_STATE_UP, self.my_discr, fast)
+        eq_([bfd.BFD_STATE_INIT, bfd.BFD_STATE_UP], self.states)
+
+        # unknown discriminator
+        self._recv(bfd.BFD_STATE_DOWN, self.my_discr + 1, fast)
+        eq_([bfd.BFD_STATE_INIT, bfd.BFD_STATE_UP], self.states)
+
+    def test_handshake_fast(self):
+        self._test_handshake(True)
+
+    def test_handshake_slow(self):
+        self._test_handshake(False)
@@ -0,0 +1,177 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+from nose.tools import eq_, ok_
+
+from ryu.lib import hub
+hub.patch()
+from ryu.base import app_manager
+from ryu.controller import event
+from ryu.controller.handler import set_ev_cls
+from ryu.lib import dispatch_stats
+
+
+class _Clock(object):
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class _EventTest(event.EventBase):
+    pass
+
+
+class _Msg(object):
+    pass
+
+
+class _App(app_manager.RyuApp):
+    def __init__(self, *args, **kwargs):
+        super(_App, self).__init__(*args, **kwargs)
+        self.received = []
+
+    @set_ev_cls(_EventTest)
+    def _test_handler(self, ev):
+        self.received.append(ev)
+
+
+class Test_Histogram(unittest.TestCase):
+    """ Test case for ryu.lib.dispatch_stats.Histogram
+    """
+
+    def test_percentiles(self):
+        hist = dispatch_stats.Histogram()
+        eq_(None, hist.summary())
+        for _ in range(90):
+            hist.add(0.000003)   # 3 us: [2, 4) us bucket
+        for _ in range(10):
+            hist.add(0.001)      # 1000 us: [512, 1024) us bucket
+        eq_(100, hist.count)
+        eq_(0.000004, hist.percentile(0.5))
+        eq_(0.000004, hist.percentile(0.9))
+        eq_(0.001, hist.percentile(0.99))
+        summary = hist.summary()
+        eq_(100, summary['count'])
+        eq_(1.0, summary['max_ms'])
+        eq_(0.004, summary['p50_ms'])
+
+
+class Test_DispatchStats(unittest.TestCase):
+    """ Test case for ryu.lib.dispatch_stats.DispatchStats
+    """
+
+    def setUp(self):
+        self.clock = _Clock()
+        self.stats = dispatch_stats.DispatchStats(clock=self.clock)
+        self.calls = []
+
+    def _handler(self, ev):
+        self.clock.now += 0.002
+        self.calls.append(ev)
+        return len(self.calls)
+
+    def test_sampling(self):
+        self.stats.enable(sample=4)
+        eq_(0.0, self.stats.now())
+        ev = _EventTest()
+        for i in range(8):
+            eq_(i + 1, self.stats.call('app', ev, self._handler,
+                                       queued=self.clock.now - 0.001))
+        eq_(8, len(self.calls))
+        (handler, ) = self.stats.handlers()
+        eq_(('app', '_EventTest', '_handler'),
+            (handler.app, handler.event, handler.handler))
+        eq_(8, handler.calls)
+        eq_(2, handler.latency.count)
+        eq_(2, handler.wait.count)
+        ok_(abs(handler.busy_time() - 0.016) < 1e-9)
+        ok_(abs(handler.wait.max - 0.001) < 1e-9)
+
+    def test_exception(self):
+        self.stats.enable(sample=1)
+
+        def fail(ev):
+            raise ValueError(ev)
+
+        self.assertRaises(ValueError, self.stats.call, 'app', _EventTest(),
+                          fail)
+        (handler, ) = self.stats.handlers()
+        eq_(1, handler.latency.count)
+
+    def test_messages(self):
+        self.stats.enable()
+        for dpid in (1, 1, 2, None):
+            self.stats.count_msg(dpid, _Msg())
+        eq_({'0000000000000001': {'_Msg': 2},
+             '0000000000000002': {'_Msg': 1},
+             'unknown': {'_Msg': 1}}, self.stats.messages())
+        calls, messages = self.stats.log(1.0)
+        eq_({1: 2, 2: 1, None: 1}, messages)
+        self.stats.reset()
+        eq_({}, self.stats.messages())
+
+    def test_disabled(self):
+        eq_(None, self.stats.now())
+        self.stats.enable()
+        self.stats.disable()
+        eq_(None, self.stats.now())
+
+
+class Test_EventLoop(unittest.TestCase):
+    """ Test case for the dispatch statistics of RyuApp._event_loop
+    """
+
+    def setUp(self):
+        self.app = _App()
+        self.app.register_handler(_EventTest, self.app._test_handler)
+        self.app.start()
+
+    def tearDown(self):
+        self.app.stop()
+        dispatch_stats.STATS.disable()
+
+    def _dispatch(self, count):
+        for _ in range(count):
+            self.app._send_event(_EventTest(), None)
+        while not self.app.events.empty():
+            hub.sleep(0)
+        hub.sleep(0)
+
+    def test_disabled(self):
+        clock = dispatch_stats.STATS.clock
+        calls = []
+
+        def _clock():
+            calls.append(None)
+            return clock()
+        dispatch_stats.STATS.clock = _clock
+        self.addCleanup(setattr, dispatch_stats.STATS, 'clock', clock)
+        self._dispatch(3)
+        eq_(3, len(self.app.received))
+        eq_([], dispatch_stats.STATS.handlers())
+        # no timestamp is taken
+        eq_([], calls)
+
+    def test_enabled(self):
+        dispatch_stats.STATS.enable(sample=1)
+        self._dispatch(3)
+        eq_(3, len(self.app.received))
+        (handler, ) = dispatch_stats.STATS.handlers()
+        eq_(('_App', '_EventTest', '_test_handler', 3),
+            (handler.app, handler.event, handler.handler, handler.calls))
+        eq_(3, handler.wait.count)
+        snapshot = dispatch_stats.STATS.snapshot()
+        eq_(3, snapshot['handlers'][0]['latency']['count'])
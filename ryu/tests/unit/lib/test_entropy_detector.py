@@ -0,0 +1,153 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import math
+import struct
+import unittest
+from nose.tools import eq_, ok_
+
+import numpy as np
+
+from ryu.lib import entropy_detector
+from ryu.ofproto import beba_v1_0 as bebaproto
+
+
+def _state_stats(table_id, key, state):
+    buf = struct.pack(bebaproto.OFP_STATE_STATS_0_PACK_STR,
+                      bebaproto.OFP_STATE_STATS_SIZE, table_id, 1, 2, 1)
+    buf += struct.pack('!6I', 0x80000c04, 0, 0, 0, 0, 0)
+    buf += struct.pack('!I', len(key))
+    buf += bytes(bytearray(key)).ljust(bebaproto.MAX_KEY_LEN, b'\0')
+    buf += struct.pack('!I', state)
+    buf += b'\0' * 4 * bebaproto.MAX_FLOW_DATA_VAR_NUM
+    buf += struct.pack(bebaproto.OFP_STATE_STATS_1_PACK_STR, 0, 0, 0, 0)
+    return buf
+
+
+def _entropy(counts):
+    # reference implementation of the normalized entropy
+    total = float(sum(counts))
+    if len(counts) <= 1 or total <= 1:
+        return 0.0
+    return sum(-c / total * math.log(c / total, 2)
+               for c in counts) / math.log(len(counts), 2)
+
+
+class Test_entropy_detector(unittest.TestCase):
+    """ Test case for ryu.lib.entropy_detector
+    """
+
+    def test_parse_state_stats(self):
+        buf = (_state_stats(0, [10, 0, 0, 1], 5) +
+               _state_stats(2, [0x50, 0x00], 7) +
+               _state_stats(2, [0xbb, 0x01], 0))
+        records = entropy_detector.parse_state_stats(buf)
+        eq_(3, len(records))
+        eq_([0, 2, 2], records['table_id'].tolist())
+        eq_([5, 7, 0], records['state'].tolist())
+        eq_('10.0.0.1',
+            entropy_detector.ipv4_to_str(
+                entropy_detector.ipv4_keys(records)[0]))
+        eq_([80, 443], entropy_detector.port_keys(records)[1:].tolist())
+
+    def test_aggregate(self):
+        for dtype in (np.uint16, np.uint32):
+            keys, counts = entropy_detector.aggregate(
+                np.array([7, 3, 7, 1000], dtype=dtype), [1, 2, 3, 4])
+            eq_([3, 7, 1000], keys.tolist())
+            eq_([2, 4, 4], counts.tolist())
+            eq_(dtype, keys.dtype)
+
+    def test_entropy(self):
+        eq_(0.0, entropy_detector.entropy([]))
+        eq_(0.0, entropy_detector.entropy([5]))
+        ok_(abs(1.0 - entropy_detector.entropy([3, 3, 3])) < 1e-12)
+        counts = [1, 2, 10, 30]
+        ok_(abs(_entropy(counts) -
+                entropy_detector.entropy(np.array(counts))) < 1e-12)
+
+    def test_window(self):
+        detector = entropy_detector.EntropyDetector(('ipv4_src', 'port'))
+        detector.add('port', np.array([80, 53], dtype=np.uint16), [4, 0])
+        detector.add('port', np.array([80, 22], dtype=np.uint16), [2, 1])
+        eq_(3, detector.pending('port'))
+        window = detector.end_window()
+        eq_(0, detector.pending('port'))
+        eq_([22, 80], window.keys('port').tolist())
+        eq_([1, 6], window.counts('port').tolist())
+        eq_([6, 0, 1], window.lookup('port', [80, 443, 22]).tolist())
+        # no counters
+        eq_(0, len(window.keys('ipv4_src')))
+        eq_(0.0, window.entropy('ipv4_src'))
+        eq_([0.0], list(detector.history['ipv4_src']))
+
+        detector.add('ipv4_src', np.arange(100, dtype=np.uint32),
+                     [1] * 99 + [1000])
+        window = detector.end_window()
+        eq_([99], window.outliers('ipv4_src').tolist())
+        eq_([0, 1000], window.lookup('ipv4_src', [1000, 99]).tolist())
+
+        detector.add('port', np.array([1], dtype=np.uint16), [1])
+        detector.discard_window()
+        eq_(0, detector.pending('port'))
+
+    def test_deviation(self):
+        detector = entropy_detector.EntropyDetector(precision=3)
+        keys = np.arange(64, dtype=np.uint32)
+        for i in range(10):
+            counts = np.full(64, 10)
+            counts[i] += 1
+            detector.add('ipv4_dst', keys, counts)
+            detector.end_window()
+            eq_(0, detector.deviation('ipv4_dst'))
+        mean, var = detector.baseline('ipv4_dst')
+        ok_(0.99 < mean < 1.0)
+        ok_(var < 1e-6)
+
+        # a flood to a single destination lowers the entropy
+        counts = np.full(64, 10)
+        counts[0] = 100000
+        detector.add('ipv4_dst', keys, counts)
+        detector.end_window()
+        eq_(-1, detector.deviation('ipv4_dst'))
+        eq_(11, len(detector.history['ipv4_dst']))
+        detector.discard_last()
+        eq_(10, len(detector.history['ipv4_dst']))
+
+    def test_pending_window(self):
+        # the counters of a window which is not ended are kept for the
+        # next one.
+        detector = entropy_detector.EntropyDetector(('ipv4_src', 'port'))
+        detector.add('port', np.array([80], dtype=np.uint16), [2])
+        eq_(0, detector.pending('ipv4_src'))
+        detector.add('port', np.array([80, 22], dtype=np.uint16), [1, 1])
+        detector.add('ipv4_src', np.array([1], dtype=np.uint32), [1])
+        window = detector.end_window()
+        eq_([22, 80], window.keys('port').tolist())
+        eq_([1, 3], window.counts('port').tolist())
+
+    def test_digits(self):
+        counts = [1, 2, 4]
+        value = entropy_detector.entropy(counts)
+        ok_(value != round(value, 5))
+        for digits, expected in ((None, value), (5, round(value, 5))):
+            detector = entropy_detector.EntropyDetector(digits=digits)
+            detector.add('f', np.arange(3, dtype=np.uint32), counts)
+            detector.end_window()
+            eq_([expected], list(detector.history['f']))
+
+    def test_history_len(self):
+        detector = entropy_detector.EntropyDetector(('f', ), history_len=3)
+        for i in range(5):
+            detector.end_window()
+        eq_(3, len(detector.history['f']))
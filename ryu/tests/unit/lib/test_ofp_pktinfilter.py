@@ -26,10 +26,14 @@ from ryu.controller.handler import (
     set_ev_cls,
     MAIN_DISPATCHER,
 )
-from ryu.lib.packet import vlan, ethernet, ipv4
+from ryu.lib.packet import packet, vlan, ethernet, ipv4, ipv6, udp
+from ryu.lib.packet import icmpv6
+from ryu.lib.packet import arp as arp_
 from ryu.lib.ofp_pktinfilter import packet_in_filter, RequiredTypeFilter
+from ryu.lib.ofp_pktinfilter import packet_in_match
+from ryu.lib.ofp_pktinfilter import PacketInClassifier, PacketInMatch
 from ryu.lib import mac
-from ryu.ofproto import ether, ofproto_v1_3, ofproto_v1_3_parser
+from ryu.ofproto import ether, inet, ofproto_v1_3, ofproto_v1_3_parser
 from ryu.ofproto.ofproto_protocol import ProtocolDesc
 
 
@@ -90,3 +94,113 @@ class Test_packet_in_filter(unittest.TestCase):
                                                  data=truncated_data)
         ev = ofp_event.EventOFPPacketIn(pkt_in)
         ok_(not self.app.packet_in_handler(ev))
+
+
+def _packet_in(*protocols, **kwargs):
+    datapath = ProtocolDesc(version=ofproto_v1_3.OFP_VERSION)
+    pkt = packet.Packet()
+    for p in protocols:
+        pkt.add_protocol(p)
+    pkt.serialize()
+    match = ofproto_v1_3_parser.OFPMatch(in_port=kwargs.pop('in_port', 1))
+    pkt_in = ofproto_v1_3_parser.OFPPacketIn(
+        datapath, match=match, data=six.binary_type(pkt.data), **kwargs)
+    return ofp_event.EventOFPPacketIn(pkt_in)
+
+
+def _udp_packet_in(dst_port, vlan_id=None, **kwargs):
+    protocols = [ethernet.ethernet(mac.BROADCAST_STR, mac.BROADCAST_STR,
+                                   ether.ETH_TYPE_IP)]
+    if vlan_id is not None:
+        protocols[0].ethertype = ether.ETH_TYPE_8021Q
+        protocols.append(vlan.vlan(vid=vlan_id, ethertype=ether.ETH_TYPE_IP))
+    protocols.append(ipv4.ipv4(proto=inet.IPPROTO_UDP))
+    protocols.append(udp.udp(src_port=1234, dst_port=dst_port))
+    return _packet_in(*protocols, **kwargs)
+
+
+class _PacketInMatchApp(object):
+    @set_ev_cls(ofp_event.EventOFPPacketIn, MAIN_DISPATCHER)
+    @packet_in_match(eth_type=ether.ETH_TYPE_IP, ip_proto=inet.IPPROTO_UDP,
+                     l4_dst=[67, 68])
+    def packet_in_handler(self, ev):
+        return True
+
+
+class Test_packet_in_match(unittest.TestCase):
+
+    """ Test case for packet_in_match and PacketInClassifier
+    """
+
+    def test_match(self):
+        match = PacketInMatch(eth_type=ether.ETH_TYPE_IP,
+                              ip_proto=inet.IPPROTO_UDP, l4_dst=53)
+        ok_(match.match(_udp_packet_in(53).msg))
+        ok_(match.match(_udp_packet_in(53, vlan_id=10).msg))
+        ok_(not match.match(_udp_packet_in(54).msg))
+
+    def test_match_ipv6_ext_headers(self):
+        eth = ethernet.ethernet(ethertype=ether.ETH_TYPE_IPV6)
+        # MLD report after a Hop-by-Hop Options header
+        ev = _packet_in(eth, ipv6.ipv6(
+            nxt=inet.IPPROTO_HOPOPTS,
+            ext_hdrs=[ipv6.hop_opts(nxt=inet.IPPROTO_ICMPV6)]),
+            icmpv6.icmpv6(type_=icmpv6.MLDV2_LISTENER_REPORT))
+        ok_(PacketInMatch(ip_proto=inet.IPPROTO_ICMPV6).match(ev.msg))
+
+        def _udp6(offset):
+            return _packet_in(eth, ipv6.ipv6(
+                nxt=inet.IPPROTO_DSTOPTS,
+                ext_hdrs=[ipv6.dst_opts(nxt=inet.IPPROTO_FRAGMENT),
+                          ipv6.fragment(nxt=inet.IPPROTO_UDP,
+                                        offset=offset, more=1)]),
+                udp.udp(src_port=1234, dst_port=53))
+
+        match = PacketInMatch(ip_proto=inet.IPPROTO_UDP, l4_dst=53)
+        ok_(match.match(_udp6(0).msg))
+        # no UDP header in a non-first fragment
+        ok_(PacketInMatch(ip_proto=inet.IPPROTO_UDP).match(_udp6(1).msg))
+        ok_(not match.match(_udp6(1).msg))
+
+    def test_match_msg_fields(self):
+        match = PacketInMatch(in_port=2, table_id=[1, 3], cookie=5)
+        ok_(match.match(_udp_packet_in(53, in_port=2, table_id=3,
+                                       cookie=5).msg))
+        ok_(not match.match(_udp_packet_in(53, in_port=1, table_id=3,
+                                           cookie=5).msg))
+        ok_(not match.match(_udp_packet_in(53, in_port=2, table_id=2,
+                                           cookie=5).msg))
+
+    def test_unknown_predicate(self):
+        assert_raises(ValueError, PacketInMatch, foo=1)
+
+    def test_classify(self):
+        dns = PacketInMatch(ip_proto=inet.IPPROTO_UDP, l4_dst=53)
+        ip = PacketInMatch(eth_type=ether.ETH_TYPE_IP)
+        arp = PacketInMatch(eth_type=ether.ETH_TYPE_ARP)
+        classifier = PacketInClassifier([dns, ip, arp])
+
+        eq_(set([dns, ip]), classifier.classify(_udp_packet_in(53).msg))
+        eq_(set([ip]), classifier.classify(_udp_packet_in(80).msg))
+        ev = _packet_in(ethernet.ethernet(ethertype=ether.ETH_TYPE_ARP),
+                        arp_.arp())
+        eq_(set([arp]), classifier.classify(ev.msg))
+        eq_(set(), classifier.classify(_packet_in(
+            ethernet.ethernet(ethertype=ether.ETH_TYPE_LLDP)).msg))
+
+    def test_classify_truncated(self):
+        classifier = PacketInClassifier([PacketInMatch(l4_dst=53)])
+        datapath = ProtocolDesc(version=ofproto_v1_3.OFP_VERSION)
+        pkt_in = ofproto_v1_3_parser.OFPPacketIn(datapath, data=b'\x00' * 13)
+        eq_(set(), classifier.classify(pkt_in))
+
+    def test_handler(self):
+        app = _PacketInMatchApp()
+        ok_(app.packet_in_handler(_udp_packet_in(67)))
+        ok_(not app.packet_in_handler(_udp_packet_in(53)))
+
+        # classified by OFPHandler
+        match = app.packet_in_handler.pkt_in_match
+        ev = _udp_packet_in(53)
+        ev.pkt_in_matches = set([match])
+        ok_(app.packet_in_handler(ev))
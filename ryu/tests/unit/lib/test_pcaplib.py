@@ -0,0 +1,142 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import shutil
+import six
+import struct
+import tempfile
+import unittest
+from nose.tools import eq_, ok_
+
+from ryu.lib import hub
+hub.patch()
+from ryu.lib import pcaplib
+
+
+PKTS = [(1000.25, b'\x01' * 60), (1000.5, b'\x02' * 1500),
+        (1001.000001, b'\x03' * 14)]
+
+
+class _Clock(object):
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class Test_pcaplib(unittest.TestCase):
+    """ Test case for ryu.lib.pcaplib
+    """
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'test.pcap')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _read(self, path=None):
+        return list(pcaplib.Reader(open(path or self.path, 'rb')))
+
+    def test_write_read(self):
+        with pcaplib.Writer(open(self.path, 'wb', 0), buffer_size=1024) as w:
+            w.write_pkt(PKTS[0][1], PKTS[0][0])
+            # not written yet
+            eq_(0, os.path.getsize(self.path))
+            w.write_pkts(PKTS[1:])
+            ok_(os.path.getsize(self.path) > 0)
+            w.flush()
+            eq_(w.size, os.path.getsize(self.path))
+        eq_(PKTS, self._read())
+
+        with pcaplib.MmapReader(self.path) as reader:
+            records = list(reader)
+            eq_(1, reader.file_hdr.linktype)
+            eq_(PKTS, [(ts, bytes(data)) for ts, data in records])
+            if six.PY3:
+                ok_(isinstance(records[0][1], memoryview))
+            # the reader can be closed while records are referenced.
+        del records
+
+    def test_snaplen(self):
+        with pcaplib.Writer(open(self.path, 'wb'), snaplen=100) as w:
+            w.write_pkts(PKTS)
+        eq_([b'\x02' * 100], [data for _, data in self._read()][1:2])
+
+    def test_truncated(self):
+        with pcaplib.Writer(open(self.path, 'wb')) as w:
+            w.write_pkts(PKTS)
+        with open(self.path, 'ab') as f:
+            f.write(struct.pack('=IIII', 1, 0, 100, 100) + b'\0' * 10)
+        eq_(PKTS, self._read())
+
+    def test_nanosecond(self):
+        with open(self.path, 'wb') as f:
+            f.write(struct.pack('>IHHIIII', 0xa1b23c4d, 2, 4, 0, 0,
+                                65535, 1))
+            f.write(struct.pack('>IIII', 10, 500000000, 4, 4) + b'abcd')
+        eq_([(10.5, b'abcd')], self._read())
+
+    def test_invalid(self):
+        with open(self.path, 'wb') as f:
+            f.write(b'\0' * 24)
+        self.assertRaises(Exception, pcaplib.MmapReader, self.path)
+        self.assertRaises(Exception, self._read)
+
+    def test_rotate(self):
+        clock = _Clock()
+        w = pcaplib.RotatingWriter(self.directory, 'pkt', rotate_size=1600,
+                                   rotate_interval=10, clock=clock)
+        w.write_pkts(PKTS[:2])
+        # size limit
+        w.write_pkt(PKTS[2][1], PKTS[2][0])
+        clock.now = 10.0
+        # time limit
+        w.write_pkt(PKTS[0][1], PKTS[0][0])
+        w.close()
+        paths = sorted(os.path.join(self.directory, name)
+                       for name in os.listdir(self.directory))
+        eq_(3, len(paths))
+        eq_(w.path, paths[-1])
+        eq_([PKTS[:2], PKTS[2:], PKTS[:1]],
+            [self._read(path) for path in paths])
+
+    def test_background(self):
+        writer = pcaplib.BackgroundWriter(
+            pcaplib.Writer(open(self.path, 'wb')), queue_size=2)
+        writer.start()
+        buf = bytearray(PKTS[0][1])
+        ok_(writer.write_pkt(buf, PKTS[0][0]))
+        # the packet is copied.
+        buf[0] = 0
+        ok_(writer.write_pkt(PKTS[1][1], PKTS[1][0]))
+        ok_(not writer.write_pkt(PKTS[2][1], PKTS[2][0]))
+        eq_(1, writer.dropped)
+        writer.flush()
+        eq_(PKTS[:2], self._read())
+        ok_(writer.write_pkt(PKTS[2][1], PKTS[2][0]))
+        writer.stop()
+        eq_(PKTS, self._read())
+
+    def test_background_not_running(self):
+        writer = pcaplib.BackgroundWriter(
+            pcaplib.Writer(open(self.path, 'wb')))
+        ok_(writer.write_pkt(PKTS[0][1], PKTS[0][0]))
+        self.assertRaises(RuntimeError, writer.flush)
+
+        writer.start()
+        hub.kill(writer._thread)
+        hub.joinall([writer._thread])
+        self.assertRaises(RuntimeError, writer.flush)
@@ -0,0 +1,76 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import sys
+import time
+import unittest
+from nose.tools import eq_, ok_
+
+from ryu.lib import hub
+hub.patch()
+from ryu.base import app_manager
+from ryu.lib import profiler
+
+
+class _App(app_manager.RyuApp):
+    def stack(self, prof):
+        return prof.stack(sys._getframe())
+
+    def busy(self, seconds):
+        end = time.time() + seconds
+        while time.time() < end:
+            pass
+
+
+class Test_SamplingProfiler(unittest.TestCase):
+    """ Test case for ryu.lib.profiler.SamplingProfiler
+    """
+
+    def setUp(self):
+        self.profiler = profiler.SamplingProfiler(interval=0.001)
+        self.app = _App()
+
+    def tearDown(self):
+        self.profiler.stop()
+
+    def test_stack(self):
+        stack = self.app.stack(self.profiler).split(';')
+        eq_('app:_App', stack[0])
+        eq_('ryu/tests/unit/lib/test_profiler.py:stack', stack[-1])
+        ok_('ryu/tests/unit/lib/test_profiler.py:test_stack' in stack)
+
+    def test_sampling(self):
+        self.profiler.start()
+        self.app.busy(0.2)
+        self.profiler.stop()
+        ok_(self.profiler.samples > 0)
+        stacks = self.profiler.stacks()
+        busy = [stack for stack in stacks
+                if stack.endswith('ryu/tests/unit/lib/test_profiler.py:busy')]
+        ok_(busy)
+        ok_(all(stack.startswith('app:_App;') for stack in busy))
+        eq_(self.profiler.samples, sum(stacks.values()))
+        for line in self.profiler.folded().splitlines():
+            stack, count = line.rsplit(' ', 1)
+            eq_(stacks[stack], int(count))
+
+        self.profiler.reset()
+        eq_({}, self.profiler.stacks())
+        eq_('', self.profiler.folded())
+
+    def test_idle(self):
+        self.profiler.start()
+        hub.sleep(0.1)
+        self.profiler.stop()
+        ok_(self.profiler.idle > 0)
+        eq_(0, self.profiler.errors)
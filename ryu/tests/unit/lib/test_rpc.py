@@ -369,3 +369,77 @@ class Test_rpc(unittest.TestCase):
         finally:
             self._client_sock.setblocking(old_blocking)
         assert not self._requests
+
+    def test_4_call_many(self):
+        c = rpc.Client(self._client_sock)
+        calls = [(b'resp', [i]) for i in range(1000)]
+        assert c.call_many(calls) == list(range(1000))
+        assert c.call_many(calls, window=7) == list(range(1000))
+        assert c.call_many([]) == []
+
+    def test_4_call_many_error(self):
+        c = rpc.Client(self._client_sock)
+        calls = [(b'resp', [1]), (b'err', [b'e1']), (b'err', [b'e2']),
+                 (b'resp', [2])]
+        try:
+            c.call_many(calls, window=2)
+            raise Exception("unexpected")
+        except rpc.RPCError as e:
+            assert e.get_value() == b'e1'
+        # the stream is still in sync
+        assert c.call(b'resp', [3]) == 3
+
+    def test_4_call_many_other_response(self):
+        c = rpc.Client(self._client_sock)
+        # a request of another caller on the same endpoint
+        msgid = c._endpoint.send_request(b'resp', [0])
+        calls = [(b'resp', [i]) for i in range(1, 4)]
+        assert c.call_many(calls) == [1, 2, 3]
+        # its response is left to it
+        assert c._endpoint.get_response(msgid) == (0, None)
+
+    def test_4_call_many_queued_response(self):
+        c = rpc.Client(self._client_sock)
+        # the response of another caller is queued before call_many
+        msgid = c._endpoint.send_request(b'resp', [0])
+        assert c._endpoint.receive_messages()
+        assert c._endpoint._incoming == 1
+        calls = [(b'resp', [i]) for i in range(1, 4)]
+        assert c.call_many(calls, window=2) == [1, 2, 3]
+        assert c._endpoint.get_response(msgid) == (0, None)
+        assert c._endpoint._incoming == 0
+
+
+class _PartialSocket(object):
+    """a socket-like which sends at most *size* bytes at once
+    """
+    def __init__(self, size):
+        self.size = size
+        self.data = bytearray()
+
+    def send(self, buf):
+        n = min(self.size, len(buf))
+        self.data += buf[:n]
+        return n
+
+
+class Test_EndPoint(unittest.TestCase):
+    """ Test case for ryu.lib.rpc.EndPoint
+    """
+
+    def test_partial_send(self):
+        sock = _PartialSocket(100000)
+        e = rpc.EndPoint(sock)
+        e._corked = True
+        msgids = e.send_requests([(b'foo', [b'x' * 1000])] * 1000)
+        assert msgids == list(range(1000))
+        assert e.get_pending_requests() == 1000
+        e._corked = False
+        expected = bytes(e._send_buffer)
+        while e.has_pending_output():
+            e.process_outgoing()
+            assert e._send_offset <= len(e._send_buffer)
+        assert bytes(sock.data) == expected
+        assert e._send_offset == 0
+        assert not e._send_buffer
+        assert e.selectable()[1] == []
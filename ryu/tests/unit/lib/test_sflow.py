@@ -0,0 +1,126 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import struct
+import unittest
+from nose.tools import eq_, ok_
+
+from ryu.lib.packet import ethernet
+from ryu.lib.packet import ipv4
+from ryu.lib.packet import packet
+from ryu.lib.packet import tcp
+from ryu.lib.packet import vlan
+from ryu.lib.xflow import sflow
+
+SRC = 0x0a000001  # 10.0.0.1
+DST = 0x0a000002  # 10.0.0.2
+
+
+def _frame(vid=None):
+    pkt = packet.Packet()
+    if vid is None:
+        pkt.add_protocol(ethernet.ethernet(ethertype=0x0800))
+    else:
+        pkt.add_protocol(ethernet.ethernet(ethertype=0x8100))
+        pkt.add_protocol(vlan.vlan(vid=vid, ethertype=0x0800))
+    pkt.add_protocol(ipv4.ipv4(src='10.0.0.1', dst='10.0.0.2', proto=6))
+    pkt.add_protocol(tcp.tcp(src_port=1234, dst_port=80))
+    pkt.serialize()
+    return bytes(pkt.data)
+
+
+def _record(data_format, body):
+    body += b'\0' * (-len(body) % 4)
+    return struct.pack('!II', data_format, len(body)) + body
+
+
+def _flow_sample(frame, rate):
+    records = (_record(1001, struct.pack('!IIII', 10, 0, 10, 0)) +
+               _record(1, struct.pack('!IIII', 1, len(frame) + 4, 4,
+                                      len(frame)) + frame))
+    body = struct.pack('!IIIIIIII', 7, 1, rate, 1000, 0, 1, 2, 2) + records
+    return struct.pack('!II', 1, len(body)) + body
+
+
+def _counters_sample():
+    counters = struct.pack('!IIQIIQIIIIIIQIIIIII', 1, 6, 10 ** 9, 1, 3,
+                           100, 1, 2, 3, 4, 5, 6, 200, 7, 8, 9, 10, 11, 0)
+    body = struct.pack('!III', 8, 1, 1) + _record(1, counters)
+    return struct.pack('!II', 2, len(body)) + body
+
+
+def _datagram():
+    samples = [_flow_sample(_frame(), 64),
+               _counters_sample(),
+               _flow_sample(_frame(vid=10), 128)]
+    return struct.pack('!iiIIIII', 5, 1, 0x7f000001, 0, 42, 100,
+                       len(samples)) + b''.join(samples)
+
+
+class Test_sFlowV5Lazy(unittest.TestCase):
+    """ Test case for ryu.lib.xflow.sflow.sFlowV5Lazy
+    """
+
+    def setUp(self):
+        self.buf = _datagram()
+        self.msg = sflow.sFlow.parser(self.buf, lazy=True)
+
+    def test_header(self):
+        ok_(isinstance(self.msg, sflow.sFlowV5Lazy))
+        eq_(0x7f000001, self.msg.agent_address)
+        eq_(42, self.msg.sequence_number)
+        eq_(3, self.msg.samples_num)
+        eq_(None, self.msg._samples)
+
+    def test_samples(self):
+        eager = sflow.sFlow.parser(self.buf)
+        samples = self.msg.samples
+        eq_([1, 2, 1], [sample.sample_format for sample in samples])
+        eq_([64, None, 128], [sample.sampling_rate for sample in samples])
+        for lazy_sample, eager_sample in zip(samples, eager.samples):
+            eq_(eager_sample.sample_length, lazy_sample.sample_length)
+            eq_(eager_sample.sample.sequence_number,
+                lazy_sample.sample.sequence_number)
+
+        records = samples[0].records
+        eq_([1001, 1], [record.data_format for record in records])
+        eq_(10, records[0].decode().src_vlan)
+        header = records[1].decode()
+        eq_(eager.samples[0].sample.flow_records[1].flow_data.header,
+            header.header)
+        # the record bodies are views of the datagram.
+        ok_(isinstance(records[1].data, memoryview))
+        eq_(16 + (header.header_size + 3) // 4 * 4, len(records[1].data))
+
+        counters = samples[1].records[0].decode()
+        eq_(100, counters.ifInOctets)
+        eq_(None, samples[1].records[0].five_tuple())
+
+    def test_five_tuple(self):
+        flow = (SRC, DST, 6, 1234, 80)
+        eq_(None, self.msg.samples[0].records[0].five_tuple())
+        eq_(flow, self.msg.samples[0].records[1].five_tuple())
+        eq_(flow, self.msg.samples[2].records[1].decode().five_tuple())
+        eq_([(64, flow), (128, flow)], list(self.msg.flow_samples()))
+
+    def test_five_tuple_truncated(self):
+        frame = _frame()
+        eq_((SRC, DST, 6, 0, 0), sflow.ethernet_five_tuple(frame, 0, 34))
+        eq_(None, sflow.ethernet_five_tuple(frame, 0, 30))
+        eq_(None, sflow.ethernet_five_tuple(b'\0' * 60))
+
+    def test_unknown(self):
+        eq_(None, sflow.sFlow.parser(struct.pack('!ii', 4, 1) + self.buf[8:],
+                                     lazy=True))
+        eq_(None, sflow.sFlow.parser(struct.pack('!ii', 5, 3) + self.buf[8:],
+                                     lazy=True))
@@ -0,0 +1,131 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+from nose.tools import eq_, ok_
+
+from ryu.lib import hub
+hub.patch()
+from ryu.lib import stats_cache
+
+
+class _Clock(object):
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class _Datapath(object):
+    def __init__(self, dpid):
+        self.id = dpid
+
+
+class Test_StatsCache(unittest.TestCase):
+    """ Test case for ryu.lib.stats_cache.StatsCache
+    """
+
+    def setUp(self):
+        self.clock = _Clock()
+        self.cache = stats_cache.StatsCache(default_ttl=1.0,
+                                            clock=self.clock)
+        self.dp = _Datapath(1)
+        self.requests = []
+        self.results = []
+
+    def _get_stats(self, dp, waiters, *args):
+        self.requests.append((dp.id, args))
+        return {str(dp.id): len(self.requests)}
+
+    def _call(self, func):
+        try:
+            self.results.append(self.cache.get(self.dp, 'flow', func, {}))
+        except IOError as e:
+            self.results.append(e)
+
+    def test_ttl(self):
+        get = self.cache.get
+        eq_({'1': 1}, get(self.dp, 'flow', self._get_stats, {}))
+        eq_({'1': 1}, get(self.dp, 'flow', self._get_stats, {}))
+        # the filter and the stats type are a part of the key.
+        eq_({'1': 2}, get(self.dp, 'flow', self._get_stats, {},
+                          {'table_id': 1}))
+        eq_({'1': 3}, get(self.dp, 'port', self._get_stats, {}))
+        eq_({'1': 2}, get(self.dp, 'flow', self._get_stats, {},
+                          {'table_id': 1}))
+
+        self.clock.now = 1.0
+        eq_({'1': 4}, get(self.dp, 'flow', self._get_stats, {}))
+        # descriptions are kept longer.
+        eq_({'1': 5}, get(self.dp, 'desc', self._get_stats, {}))
+        self.clock.now = 30.0
+        eq_({'1': 5}, get(self.dp, 'desc', self._get_stats, {}))
+
+        eq_({'hits': 3, 'misses': 5, 'coalesced': 0, 'entries': 4},
+            self.cache.metrics())
+
+    def test_invalidate(self):
+        dp2 = _Datapath(2)
+        for dp in (self.dp, dp2):
+            for stats_type in ('flow', 'meter'):
+                self.cache.get(dp, stats_type, self._get_stats, {})
+        self.cache.invalidate(1, ('flow',))
+        eq_(3, self.cache.metrics()['entries'])
+        self.cache.invalidate(2)
+        eq_(1, self.cache.metrics()['entries'])
+        self.cache.get(self.dp, 'flow', self._get_stats, {})
+        eq_(5, len(self.requests))
+
+    def test_no_ttl(self):
+        cache = stats_cache.StatsCache(default_ttl=0, clock=self.clock)
+        cache.get(self.dp, 'flow', self._get_stats, {})
+        cache.get(self.dp, 'flow', self._get_stats, {})
+        eq_(2, len(self.requests))
+        eq_(0, cache.metrics()['entries'])
+
+    def test_coalesce(self):
+        reply = hub.Event()
+
+        def _get_stats(dp, waiters):
+            self.requests.append(dp.id)
+            reply.wait()
+            return {'1': len(self.requests)}
+
+        threads = [hub.spawn(self._call, _get_stats) for _ in range(5)]
+        hub.sleep(0)
+        eq_(1, len(self.requests))
+        reply.set()
+        hub.joinall(threads)
+        eq_([{'1': 1}] * 5, self.results)
+        eq_(1, self.cache.metrics()['misses'])
+        eq_(4, self.cache.metrics()['coalesced'])
+
+    def test_error(self):
+        reply = hub.Event()
+
+        def _get_stats(dp, waiters):
+            self.requests.append(dp.id)
+            reply.wait()
+            raise IOError('closed')
+
+        threads = [hub.spawn(self._call, _get_stats) for _ in range(2)]
+        hub.sleep(0)
+        reply.set()
+        hub.joinall(threads)
+        eq_(2, len(self.results))
+        for result in self.results:
+            ok_(isinstance(result, IOError))
+        # errors are not cached.
+        eq_(0, self.cache.metrics()['entries'])
+        eq_({'1': 2}, self.cache.get(self.dp, 'flow', self._get_stats, {}))
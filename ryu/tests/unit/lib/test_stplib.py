@@ -0,0 +1,165 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import unittest
+from nose.tools import eq_
+
+from ryu.lib import stplib
+from ryu.lib.packet import bpdu
+from ryu.ofproto import ofproto_v1_0
+from ryu.ofproto import ofproto_v1_0_parser
+
+
+LOG = logging.getLogger('test_stplib')
+
+
+class _Timer(object):
+    def cancel(self):
+        pass
+
+
+class _Scheduler(object):
+    """ The timers never expire, the port states are set by the tests. """
+
+    def call_later(self, delay, function):
+        return _Timer()
+
+
+class _Datapath(object):
+    ofproto = ofproto_v1_0
+    ofproto_parser = ofproto_v1_0_parser
+
+    def __init__(self, port_nos):
+        self.id = 1
+        self.ports = dict(
+            (port_no, ofproto_v1_0_parser.OFPPhyPort(
+                port_no, '00:00:00:00:01:%02x' % port_no, b'', 0, 0, 0,
+                0, 0, 0))
+            for port_no in port_nos)
+
+    def send_msg(self, msg):
+        pass
+
+    def send_packet_out(self, **kwargs):
+        pass
+
+
+def _bridge_id(mac, priority=bpdu.DEFAULT_BRIDGE_PRIORITY):
+    return stplib.BridgeId(priority, 0, mac)
+
+
+def _priority(root_id, root_path_cost, bridge_id, port_no):
+    return stplib.Priority(root_id, root_path_cost, bridge_id,
+                           stplib.PortId(bpdu.DEFAULT_PORT_PRIORITY, port_no))
+
+
+_TIMES = stplib.Times(0, bpdu.DEFAULT_MAX_AGE, bpdu.DEFAULT_HELLO_TIME,
+                      bpdu.DEFAULT_FORWARD_DELAY)
+
+# path cost of the ports of the test bridges
+_COST = bpdu.PORT_PATH_COST_10MB
+
+# root bridge, and another bridge connected to port 2
+_ROOT = _bridge_id('00:00:00:00:00:01', priority=0x1000)
+_OTHER = _bridge_id('00:00:00:00:00:03')
+
+
+class Test_Bridge(unittest.TestCase):
+    """ Test case for the incremental re-calculation of
+    ryu.lib.stplib.Bridge
+    """
+
+    def setUp(self):
+        self.bridge = stplib.Bridge(_Datapath([1, 2, 3]), LOG, {},
+                                    lambda ev: None, _Scheduler())
+        # port 1 is connected to the root bridge, port 2 to _OTHER,
+        # port 3 to no bridge.
+        self._receive(1, _priority(_ROOT, 0, _ROOT, 1))
+        self._receive(2, _priority(_ROOT, _COST, _OTHER, 1))
+        self.bridge.recalculate_spanning_tree(init=False)
+        eq_({1: stplib.ROOT_PORT,
+             2: stplib.NON_DESIGNATED_PORT,
+             3: stplib.DESIGNATED_PORT}, self._roles())
+
+    def _receive(self, port_no, priority):
+        port = self.bridge.ports[port_no]
+        port.designated_priority = priority
+        port.designated_times = _TIMES
+        return port
+
+    def _roles(self):
+        return dict((port_no, port.role)
+                    for port_no, port in self.bridge.ports.items())
+
+    def _states(self):
+        return dict((port_no, port.state)
+                    for port_no, port in self.bridge.ports.items())
+
+    def _check_full_recalculation(self):
+        # the roles of a full re-calculation from the same information
+        bridge = self.bridge
+        root_priority = bridge.root_priority
+        bridge.root_priority = stplib.Priority(bridge.bridge_id, 0,
+                                               None, None)
+        port_roles, full_root_priority, _times = (
+            bridge._spanning_tree_algorithm())
+        bridge.root_priority = root_priority
+        eq_(port_roles, self._roles())
+        eq_(full_root_priority, root_priority)
+
+    def test_inferior_on_non_root_port(self):
+        # a bridge farther from the root bridge appears on port 3
+        port = self._receive(
+            3, _priority(_ROOT, 2 * _COST, _bridge_id('00:00:00:00:00:04'), 1))
+        root_priority = self.bridge.root_priority
+        self.bridge._recalculate_port(port)
+        eq_(stplib.DESIGNATED_PORT, port.role)
+        eq_(root_priority, self.bridge.root_priority)
+        self._check_full_recalculation()
+
+        # a bridge as far from the root bridge, with a lower bridge ID,
+        # appears on port 3
+        port = self._receive(
+            3, _priority(_ROOT, _COST, _bridge_id('00:00:00:00:00:02'), 2))
+        self.bridge._recalculate_port(port)
+        eq_(stplib.NON_DESIGNATED_PORT, port.role)
+        self._check_full_recalculation()
+
+    def test_root_port_change(self):
+        # a better root bridge appears on port 2
+        new_root = _bridge_id('00:00:00:00:00:00', priority=0)
+        port = self._receive(2, _priority(new_root, 0, new_root, 1))
+        self.bridge._recalculate_port(port)
+        eq_({1: stplib.DESIGNATED_PORT,
+             2: stplib.ROOT_PORT,
+             3: stplib.DESIGNATED_PORT}, self._roles())
+        eq_(new_root, self.bridge.root_priority.root_id)
+        self._check_full_recalculation()
+
+    def test_keep_forwarding(self):
+        for port in self.bridge.ports.values():
+            port.state = (stplib.PORT_STATE_BLOCK
+                          if port.role is stplib.NON_DESIGNATED_PORT
+                          else stplib.PORT_STATE_FORWARD)
+        new_root = _bridge_id('00:00:00:00:00:00', priority=0)
+        port = self._receive(2, _priority(new_root, 0, new_root, 1))
+        self.bridge._recalculate_port(port)
+        self._check_full_recalculation()
+        # the former root port and the designated port stay forwarding,
+        # the new root port is restarted.
+        eq_({1: stplib.PORT_STATE_FORWARD,
+             2: stplib.PORT_STATE_LISTEN,
+             3: stplib.PORT_STATE_FORWARD}, self._states())
+        for port in self.bridge.ports.values():
+            eq_(self.bridge.root_priority, port.port_priority)
@@ -32,6 +32,27 @@ class C1(stringify.StringifyMixin):
         self.c = c
 
 
+class C2(stringify.StringifyMixin):
+    _TYPE = {
+        'ascii': ['name'],
+        'asciilist': ['names'],
+    }
+
+    _class_prefixes = ['C2']
+    cls_attr = 1
+
+    def __init__(self, name, names, value, type_=None, child=None):
+        self.name = name
+        self.names = names
+        self.value = value
+        self.type_ = type_
+        self.child = child
+
+    @property
+    def prop(self):
+        return self.value
+
+
 class Test_stringify(unittest.TestCase):
     """ Test case for ryu.lib.stringify
     """
@@ -73,3 +94,27 @@ class Test_stringify(unittest.TestCase):
         eq_(c.__class__, c2.__class__)
         eq_(c.__dict__, c2.__dict__)
         eq_(j, c.to_jsondict(encode_string=my_encode))
+
+    def test_jsondict_types(self):
+        j = {'C2': {'name': u'foo', 'names': [u'a', u'b'],
+                    'value': {'1': 2.5}, 'type': True,
+                    'child': {'C2': {'name': u'bar', 'names': [],
+                                     'value': None, 'type': 0,
+                                     'child': None}}}}
+        c = C2(b'foo', [b'a', b'b'], {1: 2.5}, True,
+               C2(b'bar', [], None, 0))
+        eq_(['child', 'name', 'names', 'type_', 'value'],
+            [k for k, v in stringify.obj_python_attrs(c)])
+        eq_(j, c.to_jsondict())
+        c2 = C2.from_jsondict(j['C2'])
+        eq_(c2.type_, True)
+        eq_(c2.value, {1: 2.5})
+        eq_(c2.child.__class__, C2)
+        eq_(j, c2.to_jsondict())
+        # the cached encoders follow encode_string
+        eq_({'C2': {'name': u'x', 'names': [], 'value': u'YQ==',
+                    'type': None, 'child': None}},
+            C2(b'x', [], b'a').to_jsondict())
+        eq_({'C2': {'name': u'x', 'names': [], 'value': u'a',
+                    'type': None, 'child': None}},
+            C2(b'x', [], u'a').to_jsondict(encode_string=lambda x: x))
@@ -0,0 +1,136 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import shutil
+import tempfile
+import unittest
+from nose.tools import eq_, ok_
+
+import numpy as np
+
+from ryu.cmd import telemetry_export
+from ryu.lib import hub
+from ryu.lib import telemetry
+
+
+class Test_telemetry(unittest.TestCase):
+    """ Test case for ryu.lib.telemetry and ryu.cmd.telemetry_export
+    """
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.now = 1000.0
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _clock(self):
+        return self.now
+
+    def _wait_written(self, writer, count):
+        # let the writer thread append the queued snapshots
+        for _ in range(500):
+            if writer.written >= count:
+                break
+            hub.sleep(0.01)
+        eq_(count, writer.written)
+
+    def _read(self):
+        return list(telemetry.read(
+            telemetry.list_files(self.directory, 'test')))
+
+    def test_write(self):
+        writer = telemetry.TelemetryWriter(self.directory, 'test',
+                                           clock=self._clock)
+        writer.start()
+        keys = np.array([0x0a000001, 0x0a000002], dtype=np.uint32)
+        ok_(writer.write('entropy', {'ip_src': 0.5, 'ip_dst': 0.25}))
+        ok_(writer.write('ip_src', {'ipv4': keys, 'state': [3, 4]}, 1001.0))
+        writer.stop()
+        eq_(2, writer.written)
+
+        snapshots = self._read()
+        eq_(2, len(snapshots))
+        eq_((1000.0, 'entropy', {'ip_src': 0.5, 'ip_dst': 0.25}),
+            snapshots[0])
+        timestamp, series, columns = snapshots[1]
+        eq_((1001.0, 'ip_src'), (timestamp, series))
+        eq_(np.uint32, columns['ipv4'].dtype)
+        eq_(keys.tolist(), columns['ipv4'].tolist())
+        eq_([3, 4], columns['state'])
+
+    def test_rotate(self):
+        writer = telemetry.TelemetryWriter(self.directory, 'test',
+                                           rotate_interval=60,
+                                           rotate_size=1024,
+                                           clock=self._clock)
+        writer.start()
+        writer.write('s', {'v': 1})
+        writer.stop()
+        # by age
+        writer.start()
+        self.now += 60
+        writer.write('s', {'v': 2})
+        self._wait_written(writer, 2)
+        # by size
+        writer.write('s', {'v': b'x' * 2048})
+        self._wait_written(writer, 3)
+        writer.write('s', {'v': 4})
+        writer.stop()
+
+        eq_(3, len(telemetry.list_files(self.directory, 'test')))
+        eq_([1, 2, b'x' * 2048, 4],
+            [columns['v'] for _t, _s, columns in self._read()])
+
+    def test_queue_full(self):
+        writer = telemetry.TelemetryWriter(self.directory, 'test',
+                                           queue_size=2, clock=self._clock)
+        writer.start()
+        results = [writer.write('s', {'v': i}) for i in range(4)]
+        eq_([True, True, False, False], results)
+        eq_(2, writer.dropped)
+        writer.stop()
+        eq_([0, 1], [columns['v'] for _t, _s, columns in self._read()])
+
+    def test_export(self):
+        writer = telemetry.TelemetryWriter(self.directory, 'test',
+                                           clock=self._clock)
+        writer.start()
+        writer.write('entropy', {'time': 4, 'ip_src': 0.5})
+        writer.write('ip_src', {'time': 4,
+                                'ipv4': np.array([0x0a000001], np.uint32),
+                                'state': np.array([3], np.int64)})
+        self.now += 1
+        writer.write('entropy', {'time': 8, 'ip_src': 0.75})
+        writer.stop()
+
+        output_dir = os.path.join(self.directory, 'csv')
+        paths = telemetry_export.export(self.directory, 'test', output_dir,
+                                        ipv4_columns=['ipv4'])
+        eq_([os.path.join(output_dir, 'test-entropy.csv'),
+             os.path.join(output_dir, 'test-ip_src.csv')], paths)
+        with open(paths[0]) as f:
+            eq_('timestamp,ip_src,time\n'
+                '1000.0,0.5,4\n'
+                '1001.0,0.75,8\n', f.read())
+        with open(paths[1]) as f:
+            eq_('timestamp,ipv4,state,time\n'
+                '1000.0,10.0.0.1,3,4\n', f.read())
+
+        paths = telemetry_export.export(self.directory, 'test', output_dir,
+                                        series=['entropy'], last=True)
+        eq_(1, len(paths))
+        with open(paths[0]) as f:
+            eq_('timestamp,ip_src,time\n'
+                '1001.0,0.75,8\n', f.read())
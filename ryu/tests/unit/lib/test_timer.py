@@ -0,0 +1,102 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+from nose.tools import eq_, ok_
+
+from ryu.lib import hub
+hub.patch()
+from ryu.lib import timer
+
+
+class _Clock(object):
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class Test_TimerScheduler(unittest.TestCase):
+    """ Test case for ryu.lib.timer.TimerScheduler
+    """
+
+    def setUp(self):
+        self.clock = _Clock()
+        self.sched = timer.TimerScheduler(clock=self.clock)
+        self.fired = []
+
+    def _fire(self, name):
+        self.fired.append((name, self.clock.now))
+
+    def test_order(self):
+        self.sched.call_later(3, self._fire, 'c')
+        self.sched.call_later(1, self._fire, 'a')
+        self.sched.call_later(2, self._fire, 'b')
+        eq_(3, len(self.sched))
+        eq_(1, self.sched.next_deadline())
+
+        self.clock.now = 2
+        eq_(2, self.sched.run_pending())
+        eq_(['a', 'b'], [n for n, _ in self.fired])
+
+        self.clock.now = 10
+        eq_(1, self.sched.run_pending())
+        eq_(['a', 'b', 'c'], [n for n, _ in self.fired])
+        eq_(None, self.sched.next_deadline())
+
+    def test_cancel(self):
+        t1 = self.sched.call_later(1, self._fire, 'a')
+        self.sched.call_later(2, self._fire, 'b')
+        t1.cancel()
+        eq_(1, len(self.sched))
+        eq_(2, self.sched.next_deadline())
+
+        self.clock.now = 5
+        eq_(1, self.sched.run_pending())
+        eq_(['b'], [n for n, _ in self.fired])
+        # cancelling a fired timer is harmless.
+        t1.cancel()
+        eq_(0, len(self.sched))
+
+    def test_rearm(self):
+        def _periodic():
+            self._fire('p')
+            if len(self.fired) < 3:
+                self.sched.call_later(1, _periodic)
+
+        self.sched.call_later(1, _periodic)
+        for now in range(1, 6):
+            self.clock.now = now
+            self.sched.run_pending()
+        eq_([1, 2, 3], [t for _, t in self.fired])
+
+    def test_compact(self):
+        timers = [self.sched.call_later(i, self._fire, i)
+                  for i in range(100)]
+        for t in timers[10:]:
+            t.cancel()
+        self.clock.now = 0
+        self.sched.run_pending()
+        ok_(len(self.sched._heap) < 100)
+        eq_(9, len(self.sched))
+
+    def test_loop(self):
+        sched = timer.TimerScheduler()
+        sched.start()
+        ev = hub.Event()
+        try:
+            sched.call_later(0.1, ev.set)
+            ok_(ev.wait(timeout=2))
+        finally:
+            sched.stop()
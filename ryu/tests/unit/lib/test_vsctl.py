@@ -0,0 +1,139 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+try:
+    import mock  # Python 2
+except ImportError:
+    from unittest import mock  # Python 3
+
+import unittest
+from nose.tools import eq_, ok_
+
+try:
+    # the bundled ovs library only runs on Python 2.
+    from ryu.lib.ovs import vsctl
+except (ImportError, SyntaxError, AttributeError):
+    vsctl = None
+
+
+_REMOTE = 'tcp:127.0.0.1:6640'
+
+_SCHEMA = {
+    'name': 'Open_vSwitch',
+    'version': '7.6.0',
+    'tables': {
+        'Open_vSwitch': {'columns': {
+            'cur_cfg': {'type': 'integer'},
+            'next_cfg': {'type': 'integer'}}},
+        'Bridge': {'columns': {
+            'name': {'type': 'string'},
+            'ports': {'type': {'key': {'type': 'uuid', 'refTable': 'Port'},
+                               'min': 0, 'max': 'unlimited'}}}},
+        'Port': {'columns': {
+            'name': {'type': 'string'}}},
+    },
+}
+
+
+class _Idl(object):
+    """ idl.Idl recording its registered tables. """
+
+    def __init__(self, remote, schema_helper):
+        self.tables = dict((table, set(columns)) for table, columns
+                           in schema_helper._tables.items())
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+@unittest.skipIf(vsctl is None, 'ryu.lib.ovs.vsctl cannot be imported')
+class Test_VSCtl(unittest.TestCase):
+    """ Test case for the persistent IDL and the schema cache of
+    ryu.lib.ovs.vsctl.VSCtl
+    """
+
+    def setUp(self):
+        vsctl.clear_schema_cache()
+        self.addCleanup(vsctl.clear_schema_cache)
+        patcher = mock.patch.object(vsctl.idl, 'Idl', _Idl)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_tables_cover(self):
+        tables = {'Bridge': set(['name', 'ports']), 'Port': set()}
+        ok_(vsctl.VSCtl._tables_cover(tables, {}))
+        ok_(vsctl.VSCtl._tables_cover(tables, {'Bridge': set(['name'])}))
+        ok_(vsctl.VSCtl._tables_cover(tables, {'Port': set(['name'])}))
+        ok_(vsctl.VSCtl._tables_cover(tables, {'Port': set()}))
+        ok_(not vsctl.VSCtl._tables_cover(tables, {'Interface': set()}))
+        ok_(not vsctl.VSCtl._tables_cover(tables, {'Bridge': set()}))
+        ok_(not vsctl.VSCtl._tables_cover(
+            tables, {'Bridge': set(['name', 'stp_enable'])}))
+
+    def test_merge_tables(self):
+        tables = {'Bridge': set(['name']), 'Port': set(['name'])}
+        merged = vsctl.VSCtl._merge_tables(
+            tables, {'Bridge': set(['ports']), 'Port': set(),
+                     'Interface': set(['name'])})
+        eq_({'Bridge': set(['name', 'ports']), 'Port': set(),
+             'Interface': set(['name'])}, merged)
+        # not modified
+        eq_({'Bridge': set(['name']), 'Port': set(['name'])}, tables)
+
+    def _get_idl(self, ctl, tables):
+        ctl.schema_json = _SCHEMA
+        ctl._init_schema_helper()
+        for table, columns in tables.items():
+            if columns:
+                ctl.schema_helper.register_columns(table, columns)
+            else:
+                ctl.schema_helper.register_table(table)
+        return ctl._get_idl()
+
+    def test_get_idl(self):
+        ctl = vsctl.VSCtl(_REMOTE, persistent=True)
+        idl1 = self._get_idl(ctl, {'Bridge': ['name']})
+        eq_({'Bridge': set(['name'])}, idl1.tables)
+
+        # covered by the replicated tables
+        ok_(idl1 is self._get_idl(ctl, {'Bridge': ['name']}))
+        ok_(idl1 is self._get_idl(ctl, {}))
+
+        # rebuilt with the tables of both
+        idl2 = self._get_idl(ctl, {'Port': [], 'Bridge': ['ports']})
+        ok_(idl2 is not idl1)
+        ok_(idl1.closed)
+        eq_({'Bridge': set(['name', 'ports']), 'Port': set()}, idl2.tables)
+        ok_(idl2 is self._get_idl(ctl, {'Bridge': ['name']}))
+
+        ctl.close()
+        ok_(idl2.closed)
+        ok_(idl2 is not self._get_idl(ctl, {'Bridge': ['name']}))
+
+    def test_schema_cache(self):
+        with mock.patch.object(vsctl.VSCtl, '_rpc_get_schema_json',
+                               return_value=_SCHEMA) as get_schema:
+            for ctl in (vsctl.VSCtl(_REMOTE), vsctl.VSCtl(_REMOTE)):
+                ctl._init_schema_helper()
+                eq_(_SCHEMA, ctl.schema_json)
+            eq_(1, get_schema.call_count)
+
+            vsctl.VSCtl('tcp:127.0.0.1:6641')._init_schema_helper()
+            eq_(2, get_schema.call_count)
+
+            vsctl.clear_schema_cache(_REMOTE)
+            vsctl.VSCtl(_REMOTE)._init_schema_helper()
+            eq_(3, get_schema.call_count)
+            vsctl.VSCtl('tcp:127.0.0.1:6641')._init_schema_helper()
+            eq_(3, get_schema.call_count)
@@ -79,3 +79,33 @@ class TestOfprotCommon(unittest.TestCase):
                               ryu.ofproto.ofproto_v1_4_parser,
                               ryu.ofproto.ofproto_v1_5_parser,
                               ]))
+
+    def test_ofp_event_names(self):
+        # ofp_event creates its events from a list of the message
+        # classes, which must follow the parsers.
+        import inspect
+        import ryu.ofproto
+        import ryu.controller.ofp_event
+        names = set()
+        for ofp_mods in ryu.ofproto.get_ofp_modules().values():
+            for name, cls in inspect.getmembers(ofp_mods[1],
+                                                inspect.isclass):
+                if hasattr(cls, 'cls_msg_type'):
+                    names.add(name)
+        eq_(names, set(ryu.controller.ofp_event._OFP_MSG_NAMES))
+
+    def test_lazy_versions(self):
+        from ryu.ofproto import ofproto_protocol
+        versions = ofproto_protocol._Versions({
+            0x04: ('ryu.ofproto.ofproto_v1_3',
+                   'ryu.ofproto.ofproto_v1_3_parser'),
+        })
+        eq_([0x04], list(versions))
+        eq_(set(), versions.loaded())
+
+        import ryu.ofproto.ofproto_v1_3
+        import ryu.ofproto.ofproto_v1_3_parser
+        eq_((ryu.ofproto.ofproto_v1_3, ryu.ofproto.ofproto_v1_3_parser),
+            versions[0x04])
+        eq_(set([0x04]), versions.loaded())
+        eq_(None, ofproto_protocol.load_version(0x7f))
@@ -0,0 +1,261 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+try:
+    import mock  # Python 2
+except ImportError:
+    from unittest import mock  # Python 3
+
+import unittest
+import uuid
+from nose.tools import eq_
+
+import ryu.contrib
+ryu.contrib.update_module_path()
+
+from ryu.services.protocols.ovsdb import event
+try:
+    # the bundled ovs library only runs on Python 2.
+    from ryu.services.protocols.ovsdb import client
+except (ImportError, SyntaxError, AttributeError):
+    client = None
+
+
+_SCHEMA = {
+    'name': 'Open_vSwitch',
+    'version': '7.6.0',
+    'tables': {
+        'Bridge': {'columns': {
+            'name': {'type': 'string'},
+            'ports': {'type': {'key': {'type': 'uuid', 'refTable': 'Port'},
+                               'min': 0, 'max': 'unlimited'}}}},
+        'Port': {'columns': {
+            'name': {'type': 'string'},
+            'interfaces': {'type': {'key': {'type': 'uuid',
+                                            'refTable': 'Interface'},
+                                    'min': 1, 'max': 'unlimited'}}}},
+        'Interface': {'columns': {
+            'name': {'type': 'string'}}},
+    },
+}
+
+
+@unittest.skipIf(client is None,
+                 'ryu.services.protocols.ovsdb.client cannot be imported')
+class Test_Idl(unittest.TestCase):
+    """ Test case for the secondary indexes of
+    ryu.services.protocols.ovsdb.client.Idl
+    """
+
+    def setUp(self):
+        self.idl = client.Idl(None, _SCHEMA)
+        self.uuids = {}
+
+    def _update(self, table_name, name, old=None, **columns):
+        # rows are given in the order of the update, which is the order
+        # of a dict in the table-updates from the server.
+        row_uuid = self.uuids.setdefault(name, uuid.uuid4())
+        new = {'name': name}
+        for column, names in columns.items():
+            new[column] = ['set', [['uuid', str(self.uuids.setdefault(
+                n, uuid.uuid4()))] for n in names]]
+        table = self.idl.tables[table_name]
+        self.idl._Idl__process_update(table, row_uuid, old, new)
+
+    def _lookup(self, table_name, column, key):
+        return [row.name for row in self.idl.lookup(table_name, column, key)]
+
+    def test_reference_before_referent(self):
+        # one update inserts a bridge, its port and its interface,
+        # referring rows first.
+        self._update('Bridge', 'br0', ports=['br0-port'])
+        self._update('Port', 'br0-port', interfaces=['br0-iface'])
+        self._update('Interface', 'br0-iface')
+
+        iface = self._lookup('Interface', 'name', 'br0-iface')
+        eq_(['br0-iface'], iface)
+        iface_row = self.idl.lookup('Interface', 'name', 'br0-iface')[0]
+        eq_(['br0-port'], self._lookup('Port', 'interfaces', iface_row))
+        port_row = self.idl.lookup('Port', 'name', 'br0-port')[0]
+        eq_(['br0'], self._lookup('Bridge', 'ports', port_row))
+        eq_(['br0'], self._lookup('Bridge', 'ports',
+                                  str(self.uuids['br0-port'])))
+
+    def test_delete(self):
+        self._update('Port', 'p1', interfaces=['i1'])
+        self._update('Interface', 'i1')
+        row = self.idl.tables['Interface'].rows[self.uuids['i1']]
+        eq_(['p1'], self._lookup('Port', 'interfaces', row))
+
+        table = self.idl.tables['Port']
+        self.idl._Idl__process_update(table, self.uuids['p1'], {}, None)
+        eq_([], self._lookup('Port', 'interfaces', row))
+        eq_(0, len(self.idl.indexes['Port']))
+
+
+class _Transaction(object):
+    """ idl.Transaction recording the rows inserted by the requests.
+    commit() returns ``status``, or ERROR if a 'bad' row is inserted.
+    The status values are copied from idl.Transaction by the tests.
+    """
+    txns = []  # every transaction created
+    status = None  # initial status of the next transactions
+
+    def __init__(self, idl_):
+        self.names = []
+        self.status = _Transaction.status
+        _Transaction.txns.append(self)
+
+    def insert(self, name):
+        self.names.append(name)
+
+    def commit(self):
+        if 'bad' in self.names:
+            return _Transaction.ERROR
+        return self.status
+
+    def abort(self):
+        pass
+
+    def get_error(self):
+        return 'error'
+
+
+@unittest.skipIf(client is None,
+                 'ryu.services.protocols.ovsdb.client cannot be imported')
+class Test_RemoteOvsdb(unittest.TestCase):
+    """ Test case for the modify transactions of
+    ryu.services.protocols.ovsdb.client.RemoteOvsdb
+    """
+
+    def setUp(self):
+        for status in ('INCOMPLETE', 'SUCCESS', 'UNCHANGED', 'ERROR'):
+            setattr(_Transaction, status,
+                    getattr(client.idl.Transaction, status))
+        _Transaction.txns = []
+        _Transaction.status = _Transaction.INCOMPLETE
+        patcher = mock.patch.object(client.idl, 'Transaction', _Transaction)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.ovsdb = client.RemoteOvsdb(address=None,
+                                        idl=client.Idl(None, _SCHEMA),
+                                        system_id='s', name='ovsdb')
+        self.replies = {}
+        self.err_msgs = {}
+
+        def _reply_to_request(req, rep):
+            self.replies[req.row] = rep.status
+            if rep.err_msg is not None:
+                self.err_msgs[req.row] = rep.err_msg
+        self.ovsdb.reply_to_request = _reply_to_request
+
+    def _modify(self, *names):
+        # the request named 'raise' raises an exception.
+        def _func(tables, insert, name):
+            if name == 'raise':
+                raise ValueError(name)
+            insert(name)
+
+        for name in names:
+            req = event.EventModifyRequest(
+                's', lambda tables, insert, name=name: _func(
+                    tables, insert, name))
+            req.row = name
+            self.ovsdb.modify_request_handler(req)
+
+    def _txns(self):
+        return [txn.names for txn in _Transaction.txns]
+
+    def _complete(self, txn):
+        txn.status = _Transaction.SUCCESS
+        self.ovsdb._transactions()
+
+    def test_commit_at_once(self):
+        self._modify('a')
+        self.ovsdb._transactions()
+        eq_([['a']], self._txns())
+        eq_(1, len(self.ovsdb._txn_inflight))
+
+        self._complete(_Transaction.txns[0])
+        eq_({'a': _Transaction.SUCCESS}, self.replies)
+        eq_([], self.ovsdb._txn_inflight)
+
+    def test_merge_while_inflight(self):
+        self.ovsdb.TXN_BATCH_SIZE = 3
+        self._modify('a')
+        self.ovsdb._transactions()
+        # queued while 'a' is in flight
+        self._modify('b', 'c')
+        self.ovsdb._transactions()
+        eq_([['a']], self._txns())
+
+        # a full batch does not wait
+        self._modify('d', 'e')
+        self.ovsdb._transactions()
+        eq_([['a'], ['b', 'c', 'd']], self._txns())
+
+        # 'e' waits for the transactions in flight
+        self._complete(_Transaction.txns[0])
+        eq_(['a'], list(self.replies))
+        self._complete(_Transaction.txns[1])
+        eq_([['a'], ['b', 'c', 'd'], ['e']], self._txns())
+
+        self._complete(_Transaction.txns[2])
+        eq_(dict((name, _Transaction.SUCCESS)
+                 for name in 'abcde'), self.replies)
+        eq_([], self.ovsdb._txn_inflight)
+
+    def test_one_by_one(self):
+        self._modify('a')
+        self.ovsdb._transactions()
+        self._modify('b', 'bad')
+        self._complete(_Transaction.txns[0])
+        # the merged transaction fails, each request is retried alone
+        # without waiting.
+        eq_([['a'], ['b', 'bad'], ['b'], ['bad']], self._txns())
+        eq_({'a': _Transaction.SUCCESS,
+             'bad': _Transaction.ERROR}, self.replies)
+        eq_(1, len(self.ovsdb._txn_inflight))
+
+        self._complete(_Transaction.txns[2])
+        eq_({'a': _Transaction.SUCCESS,
+             'b': _Transaction.SUCCESS,
+             'bad': _Transaction.ERROR}, self.replies)
+        eq_([], self.ovsdb._txn_inflight)
+
+    def test_raise(self):
+        self._modify('a')
+        self.ovsdb._transactions()
+        self._modify('b', 'raise', 'c')
+        self._complete(_Transaction.txns[0])
+        # the merged transaction is aborted, each request is retried
+        # alone and the failing one gets an error.
+        eq_([['a'], ['b'], ['b'], [], ['c']], self._txns())
+        eq_({'a': _Transaction.SUCCESS,
+             'raise': _Transaction.ERROR}, self.replies)
+        eq_({'raise': 'raise'}, self.err_msgs)
+
+        self._complete(_Transaction.txns[2])
+        self._complete(_Transaction.txns[4])
+        eq_({'a': _Transaction.SUCCESS,
+             'b': _Transaction.SUCCESS,
+             'raise': _Transaction.ERROR,
+             'c': _Transaction.SUCCESS}, self.replies)
+        eq_([], self.ovsdb._txn_inflight)
+
+        # a request alone gets an error too.
+        self._modify('raise')
+        self.ovsdb._transactions()
+        eq_(_Transaction.ERROR, self.replies['raise'])
+        eq_([], self.ovsdb._txn_inflight)
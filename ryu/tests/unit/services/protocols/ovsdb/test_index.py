@@ -0,0 +1,99 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+from nose.tools import eq_
+
+from ryu.services.protocols.ovsdb import event
+from ryu.services.protocols.ovsdb import index
+from ryu.services.protocols.ovsdb import model
+
+
+def _row(uuid, **kwargs):
+    row = model.Row(kwargs)
+    row['_uuid'] = uuid
+    return row
+
+
+class Test_TableIndex(unittest.TestCase):
+    """ Test case for ryu.services.protocols.ovsdb.index.TableIndex
+    """
+
+    def setUp(self):
+        self.index = index.TableIndex(('name', 'ofport', 'external_ids'))
+
+    def test_update(self):
+        self.index.update(1, _row(1, name='eth1', ofport=[1],
+                                  external_ids={'iface-id': 'a'}))
+        self.index.update(2, _row(2, name='eth2', ofport=[],
+                                  external_ids={'iface-id': 'a'}))
+        eq_(2, len(self.index))
+        eq_(set([1]), self.index.lookup('name', 'eth1'))
+        eq_(set([1]), self.index.lookup('ofport', 1))
+        eq_(set([1, 2]), self.index.lookup('external_ids', ('iface-id', 'a')))
+
+        self.index.update(2, _row(2, name='eth2', ofport=[2],
+                                  external_ids={}))
+        eq_(set([2]), self.index.lookup('ofport', 2))
+        eq_(set([1]), self.index.lookup('external_ids', ('iface-id', 'a')))
+
+        self.index.update(1, None)
+        eq_(set(), self.index.lookup('name', 'eth1'))
+        eq_(set(), self.index.lookup('external_ids', ('iface-id', 'a')))
+        eq_(1, len(self.index))
+        eq_({}, self.index._index['external_ids'])
+
+        self.index.clear()
+        eq_(set(), self.index.lookup('name', 'eth2'))
+        eq_(0, len(self.index))
+
+
+class Test_coalesce_row_events(unittest.TestCase):
+    """ Test case for ryu.services.protocols.ovsdb.event.coalesce_row_events
+    """
+
+    def _insert(self, uuid, name):
+        return event.EventRowInsert('s', 'Port', _row(uuid, name=name))
+
+    def _update(self, uuid, old, new):
+        return event.EventRowUpdate('s', 'Port', _row(uuid, name=old),
+                                    _row(uuid, name=new))
+
+    def _delete(self, uuid, name):
+        return event.EventRowDelete('s', 'Port', _row(uuid, name=name))
+
+    def _summary(self, evs):
+        result = []
+        for ev in evs:
+            if isinstance(ev, event.EventRowUpdate):
+                result.append(('U', ev.old['name'], ev.new['name']))
+            else:
+                result.append((ev.event_type[0], ev.row['name']))
+        return result
+
+    def test_coalesce(self):
+        evs = event.coalesce_row_events([
+            self._insert(1, 'a'),
+            self._update(2, 'b', 'b1'),
+            self._update(1, 'a', 'a1'),
+            self._update(2, 'b1', 'b2'),
+            self._insert(3, 'c'),
+            self._delete(3, 'c'),
+            self._update(4, 'd', 'd1'),
+            self._delete(4, 'd1'),
+            self._delete(5, 'e'),
+            self._insert(5, 'e1'),
+            self._update(6, 'f', 'f1'),
+        ])
+        eq_([('I', 'a1'), ('U', 'b', 'b2'), ('D', 'd'), ('U', 'e', 'e1'),
+             ('U', 'f', 'f1')], self._summary(evs))
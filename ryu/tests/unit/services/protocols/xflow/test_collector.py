@@ -0,0 +1,160 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import socket
+import struct
+import unittest
+from nose.tools import eq_, ok_
+
+from ryu.lib import hub
+hub.patch()
+from ryu.lib.packet import ethernet
+from ryu.lib.packet import icmp
+from ryu.lib.packet import ipv4
+from ryu.lib.packet import packet
+from ryu.lib.packet import tcp
+from ryu.lib.packet import udp
+from ryu.lib.packet import vlan
+from ryu.lib.xflow import sflow
+from ryu.services.protocols.xflow import collector
+from ryu.services.protocols.xflow import event
+
+SRC = 0x0a000001  # 10.0.0.1
+DST = 0x0a000002  # 10.0.0.2
+
+
+def _frame(proto, src_port=0, dst_port=0, vid=None):
+    pkt = packet.Packet()
+    if vid is None:
+        pkt.add_protocol(ethernet.ethernet(ethertype=0x0800))
+    else:
+        pkt.add_protocol(ethernet.ethernet(ethertype=0x8100))
+        pkt.add_protocol(vlan.vlan(vid=vid, ethertype=0x0800))
+    pkt.add_protocol(ipv4.ipv4(src='10.0.0.1', dst='10.0.0.2', proto=proto))
+    if proto == 6:
+        pkt.add_protocol(tcp.tcp(src_port=src_port, dst_port=dst_port))
+    elif proto == 17:
+        pkt.add_protocol(udp.udp(src_port=src_port, dst_port=dst_port))
+    else:
+        pkt.add_protocol(icmp.icmp())
+    pkt.serialize()
+    return bytes(pkt.data)
+
+
+def _flow_sample(frame, rate=100):
+    header = frame + b'\0' * (-len(frame) % 4)
+    record = struct.pack('!IIII', 1, len(frame) + 4, 4,
+                         len(frame)) + header
+    body = struct.pack('!IIIIIIII', 1, 1, rate, 1000, 0, 1, 2, 1)
+    body += struct.pack('!II', 1, len(record)) + record
+    return struct.pack('!II', 1, len(body)) + body
+
+
+def _sflow(samples):
+    counters = struct.pack('!III', 1, 1, 0)
+    data = struct.pack('!iiIIIII', 5, 1, 0x7f000001, 0, 1, 100,
+                       len(samples) + 1)
+    data += b''.join(samples)
+    # a counter sample is skipped
+    return data + struct.pack('!II', 2, len(counters)) + counters
+
+
+def _netflow(records):
+    data = struct.pack('!HHIIIIBBH', 5, len(records), 0, 0, 0, 1, 0, 0, 0)
+    for src, dst, packets, src_port, dst_port, proto in records:
+        data += struct.pack('!IIIHHIIIIHHxBBBHHBB2x', src, dst, 0, 1, 2,
+                            packets, packets * 64, 0, 0, src_port,
+                            dst_port, 0, proto, 0, 0, 0, 0, 0)
+    return data
+
+
+class Test_Decoders(unittest.TestCase):
+    """ Test case for the decoders of ryu.services.protocols.xflow.collector
+    """
+
+    def test_sflow(self):
+        data = _sflow([_flow_sample(_frame(6, 1234, 80)),
+                       _flow_sample(_frame(6, 1234, 80, vid=10)),
+                       _flow_sample(_frame(17, 53, 5353)),
+                       _flow_sample(_frame(1))])
+        # the datagram is also valid for the message parser.
+        msg = sflow.sFlow.parser(data)
+        eq_(5, len(msg.samples))
+        eq_(100, msg.samples[0].sample.sampling_rate)
+
+        flows = {}
+        eq_(4, collector.add_sflow(data, flows))
+        eq_({(SRC, DST, 6, 1234, 80): 2,
+             (SRC, DST, 17, 53, 5353): 1,
+             (SRC, DST, 1, 0, 0): 1}, flows)
+
+        flows = {}
+        collector.add_sflow(data, flows, scale=True)
+        eq_(200, flows[(SRC, DST, 6, 1234, 80)])
+
+    def test_sflow_malformed(self):
+        data = _sflow([_flow_sample(_frame(6, 1234, 80))])
+        self.assertRaises(struct.error, collector.add_sflow, data[:60], {})
+        self.assertRaises(ValueError, collector.add_sflow,
+                          struct.pack('!i', 4) + data[4:], {})
+
+    def test_netflow(self):
+        data = _netflow([(SRC, DST, 10, 1234, 80, 6),
+                         (SRC, DST, 5, 1234, 80, 6),
+                         (DST, SRC, 3, 8, 0, 1)])
+        flows = {}
+        eq_(3, collector.add_netflow(data, flows))
+        eq_({(SRC, DST, 6, 1234, 80): 15, (DST, SRC, 1, 0, 0): 3}, flows)
+        self.assertRaises(ValueError, collector.add_netflow, data[:-1], {})
+
+
+class Test_XFlowCollector(unittest.TestCase):
+    """ Test case for ryu.services.protocols.xflow.collector.XFlowCollector
+    """
+
+    def test_summary(self):
+        app = collector.XFlowCollector()
+        events = []
+        app.send_event_to_observers = events.append
+
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.bind(('127.0.0.1', 0))
+        app._sockets.append(sock)
+        app._receivers.append(hub.spawn(app._serve, sock, app._add_sflow))
+
+        sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        data = _sflow([_flow_sample(_frame(6, 1234, 80)),
+                       _flow_sample(_frame(17, 1234, 53))])
+        for _ in range(10):
+            sender.sendto(data, sock.getsockname())
+        sender.sendto(b'\0' * 8, sock.getsockname())
+        for _ in range(100):
+            if app._stats['datagrams'] == 11:
+                break
+            hub.sleep(0.01)
+
+        app.end_window()
+        eq_(1, len(events))
+        ev = events[0]
+        eq_({'datagrams': 11, 'samples': 20, 'errors': 1}, ev.stats)
+        eq_({SRC: 20}, ev.counters('ipv4_src'))
+        eq_({80: 10, 53: 10}, ev.counters('port_dst'))
+        eq_({6: 10}, ev.counters('ip_proto',
+                                 lambda flow: flow[event.PORT_DST] == 80))
+        ok_(ev.start <= ev.end)
+
+        app.end_window()
+        eq_({}, events[1].flows)
+
+        app.stop()
+        sender.close()
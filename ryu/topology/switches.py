@@ -19,6 +19,7 @@ import struct
 import time
 import json
 from ryu import cfg
+from ryu import flags  # noqa: registers the link discovery options
 
 from ryu.topology import event
 from ryu.base import app_manager
@@ -46,16 +47,6 @@ LOG = logging.getLogger(__name__)
 
 CONF = cfg.CONF
 
-CONF.register_cli_opts([
-    cfg.BoolOpt('observe-links', default=False,
-                help='observe link discovery events.'),
-    cfg.BoolOpt('install-lldp-flow', default=True,
-                help='link discovery: explicitly install flow entry '
-                     'to send lldp packet to controller'),
-    cfg.BoolOpt('explicit-drop', default=True,
-                help='link discovery: explicitly drop lldp packet in')
-])
-
 
 class Port(object):
     # This is data class passed by EventPortXXX